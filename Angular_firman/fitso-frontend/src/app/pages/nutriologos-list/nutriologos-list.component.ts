@@ -4,6 +4,7 @@ import { FormsModule } from '@angular/forms';
 import { RouterModule } from '@angular/router';
 import { Subject, finalize, tap, catchError, of, takeUntil } from 'rxjs';
 import { NutriologosService } from '../../services/nutriologos.service';
+import { ResenaService } from '../../services/resenas.service';
 
 /* ---- Tipos (opcional, pero recomendado) ---- */
 export interface Nutriologo {
@@ -14,6 +15,11 @@ export interface Nutriologo {
   validado?: boolean;
 }
 
+export interface CalificacionResumen {
+  calificacion_promedio: number;
+  total_resenas: number;
+}
+
 export interface ListResponse<T> {
   items: T[];
   total: number;
@@ -37,6 +43,7 @@ export class NutriologosListComponent implements OnInit, OnDestroy {
   total = 0;
   loading = false;
   items: Nutriologo[] = [];
+  calificaciones: Record<string, CalificacionResumen> = {};
 
   private destroy$ = new Subject<void>();
   private isFetching = false; // ✅ Flag para evitar llamadas recursivas
@@ -47,6 +54,7 @@ export class NutriologosListComponent implements OnInit, OnDestroy {
 
   constructor(
     private api: NutriologosService,
+    private resenas: ResenaService,
     private cdr: ChangeDetectorRef
   ) {}
 
@@ -79,6 +87,7 @@ export class NutriologosListComponent implements OnInit, OnDestroy {
       tap((res: ListResponse<Nutriologo>) => {
         this.items = res?.items ?? [];
         this.total = typeof res?.total === 'number' ? res.total : this.items.length;
+        this.cargarCalificaciones();
       }),
       catchError(() => {
         this.items = [];
@@ -94,6 +103,33 @@ export class NutriologosListComponent implements OnInit, OnDestroy {
     .subscribe();
   }
 
+  /** Calificaciones de toda la página en una sola petición */
+  private cargarCalificaciones(): void {
+    this.calificaciones = {};
+    const ids = this.items.map(n => Number(n.id_usuario)).filter(id => !isNaN(id));
+    if (!ids.length) return;
+
+    this.resenas.obtenerStatsLote(ids)
+      .pipe(
+        takeUntil(this.destroy$),
+        catchError(() => of([]))
+      )
+      .subscribe((stats: any[]) => {
+        this.calificaciones = {};
+        for (const s of stats ?? []) {
+          this.calificaciones[String(s.id_nutriologo)] = {
+            calificacion_promedio: s.calificacion_promedio ?? 0,
+            total_resenas: s.total_resenas ?? 0
+          };
+        }
+        this.cdr.markForCheck();
+      });
+  }
+
+  calificacionDe(n: Nutriologo): CalificacionResumen | undefined {
+    return this.calificaciones[String(n.id_usuario)];
+  }
+
   onSearch(): void {
     this.page = 1;
     this.fetch();
@@ -155,6 +155,13 @@ export class MensajesService {
       tap(conversacion => {
         console.log(`✅ Conversación cargada con ${conversacion.mensajes.length} mensajes`);
         this.conversacionActualSubject.next(conversacion);
+
+        // Confirmar lectura solo si hay mensajes recibidos sin leer
+        const pendientes = conversacion.mensajes.filter(m => m.remitente_id === usuario_id && !m.leido);
+        if (pendientes.length > 0) {
+          const hasta_id = Math.max(...pendientes.map(m => m.id));
+          this.confirmarLectura(usuario_id, hasta_id).subscribe();
+        }
       }),
       catchError(error => {
         console.error('❌ Error al obtener conversación:', error);
@@ -163,6 +170,24 @@ export class MensajesService {
     );
   }
 
+  /**
+   * Confirmar lectura de una conversación hasta un mensaje
+   */
+  confirmarLectura(usuario_id: number, hasta_id?: number): Observable<any> {
+    return this.http.post(`${this.apiUrl}/chat/${usuario_id}/leido`, { hasta_id }, {
+      headers: this.getHeaders()
+    }).pipe(
+      tap(() => {
+        console.log(`✅ Conversación con ${usuario_id} leída hasta ${hasta_id ?? 'el final'}`);
+        this.cargarMensajesNoLeidos().subscribe();
+      }),
+      catchError(error => {
+        console.error('❌ Error al confirmar lectura:', error);
+        return of(null);
+      })
+    );
+  }
+
   /**
    * Marcar mensaje como leído
    */
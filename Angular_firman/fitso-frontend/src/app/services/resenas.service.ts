@@ -162,6 +162,17 @@ export class ResenaService {
     return this.http.get(url);
   }
 
+  /**
+   * 📊 OBTENER ESTADÍSTICAS DE VARIOS NUTRIÓLOGOS (una sola petición)
+   */
+  obtenerStatsLote(nutriologoIds: number[]): Observable<any[]> {
+    const url = `${this.apiUrl}/stats/nutriologos`;
+    let params = new HttpParams();
+    nutriologoIds.forEach(id => params = params.append('ids', id.toString()));
+    console.log('📊 GET', url, nutriologoIds);
+    return this.http.get<any[]>(url, { params });
+  }
+
   /**
    * ⭐ OBTENER CALIFICACIÓN PROMEDIO
    */
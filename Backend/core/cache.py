@@ -0,0 +1,338 @@
+"""
+core/cache.py - Caché de respuestas HTTP para endpoints públicos
+
+Middleware ASGI que guarda las respuestas GET 200 de las rutas registradas
+con registrar_ruta_cacheable():
+- Clave = ruta + los parámetros de query que la ruta acepta (ordenados);
+  los demás se ignoran para que ?x=<aleatorio> no cree entradas nuevas
+- TTL por ruta y etiquetas para invalidar por evento
+  (p. ej. una reseña nueva invalida "resenas:<id_nutriologo>")
+- Añade ETag, Cache-Control y X-Cache; responde 304 si el cliente
+  envía un If-None-Match que coincide. Las rutas con revalidar=True se
+  envían con "no-cache": el navegador pregunta siempre con el ETag y ve
+  enseguida los cambios tras una invalidación
+
+Backends:
+- Memoria (por defecto, por proceso, máximo CACHE_MAX_ENTRADAS con
+  expulsión LRU)
+- Redis, compartido entre workers, si CACHE_REDIS_URL está definido y el
+  paquete `redis` está instalado (si no, se usa memoria)
+
+Solo debe usarse en rutas cuya respuesta no dependa del usuario autenticado.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Sequence, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CACHE_HABILITADA = os.getenv("CACHE_RESPUESTAS", "true").lower() == "true"
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "5000"))
+
+# Cabeceras de la respuesta original que se guardan junto al cuerpo
+_CABECERAS_GUARDADAS = {b"content-type"}
+
+# (cuerpo, cabeceras, etag)
+Entrada = Tuple[bytes, List[Tuple[bytes, bytes]], str]
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+class CacheMemoria:
+    """Backend en memoria del proceso, acotado a max_entradas (LRU)"""
+
+    bloqueante = False
+
+    def __init__(self, max_entradas: int = CACHE_MAX_ENTRADAS):
+        self._lock = threading.Lock()
+        self._max_entradas = max_entradas
+        # clave -> (expira, entrada, etiquetas); el orden es el de uso (LRU primero)
+        self._datos: "OrderedDict[str, Tuple[float, Entrada, Tuple[str, ...]]]" = OrderedDict()
+        self._etiquetas: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def _quitar(self, clave: str) -> None:
+        """Borra una clave y la saca de sus etiquetas (con el lock tomado)"""
+        guardado = self._datos.pop(clave, None)
+        if guardado is None:
+            return
+        for etiqueta in guardado[2]:
+            claves = self._etiquetas.get(etiqueta)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._etiquetas[etiqueta]
+
+    def obtener(self, clave: str) -> Optional[Entrada]:
+        with self._lock:
+            guardado = self._datos.get(clave)
+            if guardado is None:
+                return None
+            if guardado[0] < time.monotonic():
+                self._quitar(clave)
+                return None
+            self._datos.move_to_end(clave)
+            return guardado[1]
+
+    def guardar(self, clave: str, entrada: Entrada, ttl: int, etiquetas: Iterable[str]) -> None:
+        etiquetas = tuple(etiquetas)
+        with self._lock:
+            self._quitar(clave)
+            self._datos[clave] = (time.monotonic() + ttl, entrada, etiquetas)
+            for etiqueta in etiquetas:
+                self._etiquetas.setdefault(etiqueta, set()).add(clave)
+            while len(self._datos) > self._max_entradas:
+                self._quitar(next(iter(self._datos)))
+
+    def invalidar(self, etiquetas: Iterable[str]) -> None:
+        with self._lock:
+            for etiqueta in etiquetas:
+                for clave in list(self._etiquetas.get(etiqueta, ())):
+                    self._quitar(clave)
+
+
+class CacheRedis:
+    """Backend compartido en Redis (las etiquetas son sets de claves)"""
+
+    bloqueante = True
+    _PREFIJO = "fitso:cache:"
+
+    def __init__(self, url: str):
+        import redis  # dependencia opcional
+        self._cliente = redis.Redis.from_url(url)
+
+    def obtener(self, clave: str) -> Optional[Entrada]:
+        crudo = self._cliente.get(self._PREFIJO + clave)
+        if crudo is None:
+            return None
+        datos = json.loads(crudo)
+        cabeceras = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in datos["cabeceras"]]
+        return datos["cuerpo"].encode("latin-1"), cabeceras, datos["etag"]
+
+    def guardar(self, clave: str, entrada: Entrada, ttl: int, etiquetas: Iterable[str]) -> None:
+        cuerpo, cabeceras, etag = entrada
+        datos = json.dumps({
+            "cuerpo": cuerpo.decode("latin-1"),
+            "cabeceras": [(k.decode("latin-1"), v.decode("latin-1")) for k, v in cabeceras],
+            "etag": etag,
+        })
+        pipe = self._cliente.pipeline()
+        pipe.set(self._PREFIJO + clave, datos, ex=ttl)
+        for etiqueta in etiquetas:
+            pipe.sadd(self._PREFIJO + "tag:" + etiqueta, clave)
+            pipe.expire(self._PREFIJO + "tag:" + etiqueta, ttl)
+        pipe.execute()
+
+    def invalidar(self, etiquetas: Iterable[str]) -> None:
+        for etiqueta in etiquetas:
+            clave_tag = self._PREFIJO + "tag:" + etiqueta
+            claves = [self._PREFIJO + c.decode() for c in self._cliente.smembers(clave_tag)]
+            self._cliente.delete(clave_tag, *claves)
+
+
+def _crear_backend():
+    if CACHE_REDIS_URL:
+        try:
+            backend = CacheRedis(CACHE_REDIS_URL)
+            logger.info("🗄️  Caché de respuestas en Redis")
+            return backend
+        except ImportError:
+            logger.warning("⚠️  CACHE_REDIS_URL definido pero falta el paquete 'redis'; se usa memoria")
+    return CacheMemoria()
+
+
+cache_respuestas = _crear_backend()
+
+
+def invalidar_etiquetas(*etiquetas: str) -> None:
+    """Invalida las respuestas guardadas con cualquiera de las etiquetas"""
+    try:
+        cache_respuestas.invalidar(etiquetas)
+    except Exception as e:
+        logger.error(f"❌ Error invalidando caché {etiquetas}: {str(e)}")
+
+
+def etag_coincide(si_no_coincide: Optional[str], etag: str) -> bool:
+    """
+    Si la cabecera If-None-Match coincide con el ETag (comparación débil:
+    admite listas separadas por comas, prefijos W/ y "*")
+    """
+    if not si_no_coincide:
+        return False
+    etag = etag[2:] if etag.startswith("W/") else etag
+    for candidato in si_no_coincide.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or (candidato[2:] if candidato.startswith("W/") else candidato) == etag:
+            return True
+    return False
+
+
+# ============================================================
+# REGLAS POR RUTA
+# ============================================================
+class _Regla:
+    def __init__(
+        self,
+        patron: str,
+        ttl: int,
+        etiquetas: Callable[[re.Match], List[str]],
+        parametros: Sequence[str],
+        revalidar: bool
+    ):
+        self.patron: Pattern = re.compile(patron)
+        self.ttl = ttl
+        self.etiquetas = etiquetas
+        self.parametros = frozenset(parametros)
+        self.revalidar = revalidar
+
+    def clave(self, path: str, query_string: bytes) -> str:
+        """Ruta + parámetros aceptados por la ruta, en orden estable"""
+        pares = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+        return f"{path}?{urlencode(sorted(p for p in pares if p[0] in self.parametros))}"
+
+    def cache_control(self) -> bytes:
+        if self.revalidar:
+            return b"public, no-cache"
+        return f"public, max-age={self.ttl}".encode("latin-1")
+
+
+_reglas: List[_Regla] = []
+
+
+def registrar_ruta_cacheable(
+    patron: str,
+    ttl: int,
+    etiquetas: Optional[Callable[[re.Match], List[str]]] = None,
+    parametros: Sequence[str] = (),
+    revalidar: bool = False
+) -> None:
+    """
+    Registra una ruta GET pública para cachear su respuesta.
+
+    Args:
+        patron: Regex sobre el path completo (p. ej. r"^/api/users/nutriologos/(?P<id>\\d+)$")
+        ttl: Segundos de validez en el servidor (y Cache-Control max-age si no revalidar)
+        etiquetas: Función que recibe el match y devuelve las etiquetas de invalidación
+        parametros: Parámetros de query que acepta la ruta (los únicos que forman la clave)
+        revalidar: Enviar "no-cache" para que el navegador revalide siempre con el
+            ETag (rutas que se invalidan por eventos)
+    """
+    _reglas.append(_Regla(patron, ttl, etiquetas or (lambda m: []), parametros, revalidar))
+
+
+def _buscar_regla(path: str) -> Optional[Tuple[_Regla, re.Match]]:
+    for regla in _reglas:
+        m = regla.patron.match(path)
+        if m:
+            return regla, m
+    return None
+
+
+# ============================================================
+# MIDDLEWARE
+# ============================================================
+class CacheRespuestasMiddleware:
+    """Middleware ASGI que sirve y guarda respuestas de las rutas registradas"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def _llamar(self, funcion, *args):
+        if cache_respuestas.bloqueante:
+            return await run_in_threadpool(funcion, *args)
+        return funcion(*args)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not CACHE_HABILITADA or scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        encontrada = _buscar_regla(scope["path"])
+        if encontrada is None:
+            await self.app(scope, receive, send)
+            return
+        regla, match = encontrada
+
+        clave = regla.clave(scope["path"], scope.get("query_string", b""))
+        si_no_coincide = Headers(scope=scope).get("if-none-match")
+
+        try:
+            entrada = await self._llamar(cache_respuestas.obtener, clave)
+        except Exception as e:
+            logger.error(f"❌ Error leyendo caché: {str(e)}")
+            entrada = None
+
+        if entrada is not None:
+            await self._enviar(send, entrada, regla, si_no_coincide, "HIT")
+            return
+
+        # MISS: ejecutar la ruta capturando la respuesta
+        inicio: Dict[str, Message] = {}
+        partes: List[bytes] = []
+
+        async def capturar(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                inicio["mensaje"] = message
+            elif message["type"] == "http.response.body":
+                partes.append(message.get("body", b""))
+
+        await self.app(scope, receive, capturar)
+
+        mensaje_inicio = inicio["mensaje"]
+        cuerpo = b"".join(partes)
+
+        if mensaje_inicio["status"] != 200:
+            await send(mensaje_inicio)
+            await send({"type": "http.response.body", "body": cuerpo})
+            return
+
+        cabeceras = [(k, v) for k, v in mensaje_inicio.get("headers", []) if k.lower() in _CABECERAS_GUARDADAS]
+        etag = '"' + hashlib.sha1(cuerpo).hexdigest() + '"'
+        entrada = (cuerpo, cabeceras, etag)
+
+        try:
+            await self._llamar(cache_respuestas.guardar, clave, entrada, regla.ttl, regla.etiquetas(match))
+        except Exception as e:
+            logger.error(f"❌ Error guardando en caché: {str(e)}")
+
+        await self._enviar(send, entrada, regla, si_no_coincide, "MISS")
+
+    @staticmethod
+    async def _enviar(send: Send, entrada: Entrada, regla: _Regla, si_no_coincide: Optional[str], estado: str) -> None:
+        cuerpo, cabeceras, etag = entrada
+        comunes = [
+            (b"etag", etag.encode("latin-1")),
+            (b"cache-control", regla.cache_control()),
+            (b"x-cache", estado.encode("latin-1")),
+        ]
+
+        if etag_coincide(si_no_coincide, etag):
+            await send({"type": "http.response.start", "status": 304, "headers": comunes})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": cabeceras + comunes + [(b"content-length", str(len(cuerpo)).encode("latin-1"))],
+        })
+        await send({"type": "http.response.body", "body": cuerpo})
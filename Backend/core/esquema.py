@@ -0,0 +1,99 @@
+"""
+core/esquema.py - Sincronización del esquema al arrancar
+
+Base.metadata.create_all() solo crea las tablas que faltan: a una tabla
+que ya existe nunca le añade los índices ni las columnas declarados
+después en los modelos. sincronizar_esquema() compara cada tabla con la
+base de datos y añade lo que falte (idempotente, se llama al arrancar
+después de create_all):
+- Índices (Index / index=True) que no existen con ese nombre
+- Columnas nuevas; las NOT NULL con default escalar se añaden con ese
+  DEFAULT para que las filas existentes sean válidas
+
+No modifica ni elimina columnas, índices o claves foráneas existentes.
+"""
+
+import logging
+from typing import Optional, Set
+
+from sqlalchemy import MetaData, Table, inspect, literal, text
+from sqlalchemy.engine import Dialect, Engine
+from sqlalchemy.schema import Column, CreateColumn
+
+from config.database import Base
+
+logger = logging.getLogger(__name__)
+
+
+def _ddl_columna(columna: Column, dialecto: Dialect) -> Optional[str]:
+    """Definición de la columna para ADD COLUMN (None si no se puede añadir)"""
+    ddl = str(CreateColumn(columna).compile(dialect=dialecto))
+    if columna.nullable or columna.server_default is not None:
+        return ddl
+    if columna.default is not None and columna.default.is_scalar:
+        valor = literal(columna.default.arg, type_=columna.type).compile(
+            dialect=dialecto, compile_kwargs={"literal_binds": True}
+        )
+        return f"{ddl} DEFAULT {valor}"
+    return None
+
+
+def _sincronizar_tabla(engine: Engine, tabla: Table) -> bool:
+    """Añade columnas e índices que falten; devuelve si se añadieron columnas"""
+    inspector = inspect(engine)
+    preparador = engine.dialect.identifier_preparer
+
+    columnas = {c["name"] for c in inspector.get_columns(tabla.name)}
+    nuevas = False
+    for columna in tabla.columns:
+        if columna.name in columnas:
+            continue
+        ddl = _ddl_columna(columna, engine.dialect)
+        if ddl is None:
+            logger.error(f"❌ No se puede añadir {tabla.name}.{columna.name}: NOT NULL sin default escalar")
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {preparador.format_table(tabla)} ADD COLUMN {ddl}"))
+            logger.info(f"🧱 Columna añadida: {tabla.name}.{columna.name}")
+            nuevas = True
+        except Exception as e:
+            # Otro worker pudo añadirla a la vez
+            logger.warning(f"⚠️  No se pudo añadir {tabla.name}.{columna.name}: {str(e)}")
+
+    indices = {i["name"] for i in inspector.get_indexes(tabla.name)}
+    for indice in tabla.indexes:
+        if indice.name in indices:
+            continue
+        try:
+            with engine.begin() as conn:
+                indice.create(bind=conn)
+            logger.info(f"🧱 Índice creado: {tabla.name}.{indice.name}")
+        except Exception as e:
+            logger.warning(f"⚠️  No se pudo crear el índice {indice.name}: {str(e)}")
+
+    return nuevas
+
+
+def sincronizar_esquema(engine: Engine, metadata: MetaData = Base.metadata) -> Set[str]:
+    """
+    Añade a las tablas existentes los índices y columnas de los modelos
+    que todavía no tienen
+
+    Returns:
+        Nombres de las tablas a las que se añadieron columnas (p. ej. para
+        recalcular datos derivados)
+    """
+    existentes = set(inspect(engine).get_table_names())
+    con_columnas_nuevas: Set[str] = set()
+
+    for tabla in metadata.sorted_tables:
+        if tabla.name not in existentes:
+            continue
+        try:
+            if _sincronizar_tabla(engine, tabla):
+                con_columnas_nuevas.add(tabla.name)
+        except Exception as e:
+            logger.error(f"❌ Error sincronizando la tabla {tabla.name}: {str(e)}")
+
+    return con_columnas_nuevas
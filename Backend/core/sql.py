@@ -0,0 +1,80 @@
+"""
+core/sql.py - Expresiones SQL portables
+Cálculos de fechas que se resuelven en la base de datos (MySQL en
+producción, SQLite en desarrollo) para no cargar filas solo para hacerlos
+en Python: diferencias en días y agrupación por semana.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Date, Integer, case, literal
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class dias_entre(FunctionElement):
+    """
+    Días completos de `desde` a `hasta` (truncado hacia cero), como
+    timedelta.days para diferencias positivas.
+
+    Uso: dias_entre(literal(ahora), Dieta.fecha_vencimiento)
+    """
+    type = Integer()
+    inherit_cache = True
+    name = "dias_entre"
+
+
+@compiles(dias_entre)
+def _dias_entre_mysql(elemento, compilador, **kw):
+    desde, hasta = list(elemento.clauses)
+    return f"TIMESTAMPDIFF(DAY, {compilador.process(desde, **kw)}, {compilador.process(hasta, **kw)})"
+
+
+@compiles(dias_entre, "sqlite")
+def _dias_entre_sqlite(elemento, compilador, **kw):
+    desde, hasta = list(elemento.clauses)
+    return (
+        f"CAST(julianday({compilador.process(hasta, **kw)}) - "
+        f"julianday({compilador.process(desde, **kw)}) AS INTEGER)"
+    )
+
+
+@compiles(dias_entre, "postgresql")
+def _dias_entre_postgresql(elemento, compilador, **kw):
+    desde, hasta = list(elemento.clauses)
+    return f"EXTRACT(DAY FROM ({compilador.process(hasta, **kw)} - {compilador.process(desde, **kw)}))::integer"
+
+
+def dias_restantes(columna, ahora: datetime):
+    """Días que faltan hasta `columna` (0 si ya pasó, NULL si es NULL)"""
+    ahora_sql = literal(ahora)
+    return case(
+        (columna.is_(None), None),
+        (columna < ahora_sql, 0),
+        else_=dias_entre(ahora_sql, columna)
+    )
+
+
+class inicio_semana(FunctionElement):
+    """Lunes de la semana de una fecha (agrupación semanal de series)"""
+    type = Date()
+    inherit_cache = True
+    name = "inicio_semana"
+
+
+@compiles(inicio_semana)
+def _inicio_semana_mysql(elemento, compilador, **kw):
+    fecha = compilador.process(list(elemento.clauses)[0], **kw)
+    return f"DATE(DATE_SUB({fecha}, INTERVAL WEEKDAY({fecha}) DAY))"
+
+
+@compiles(inicio_semana, "sqlite")
+def _inicio_semana_sqlite(elemento, compilador, **kw):
+    fecha = compilador.process(list(elemento.clauses)[0], **kw)
+    return f"date({fecha}, '-' || ((CAST(strftime('%w', {fecha}) AS INTEGER) + 6) % 7) || ' days')"
+
+
+@compiles(inicio_semana, "postgresql")
+def _inicio_semana_postgresql(elemento, compilador, **kw):
+    fecha = compilador.process(list(elemento.clauses)[0], **kw)
+    return f"CAST(date_trunc('week', {fecha}) AS DATE)"
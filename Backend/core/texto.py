@@ -0,0 +1,29 @@
+"""
+core/texto.py - Utilidades de texto compartidas
+Normalización insensible a acentos y mayúsculas para búsquedas
+"""
+
+import re
+import unicodedata
+from typing import List
+
+_RE_PALABRA = re.compile(r"\w+", re.UNICODE)
+
+
+def plegar_texto(texto: str) -> str:
+    """
+    Quita acentos y pasa a minúsculas conservando la longitud del texto
+    (un carácter de salida por cada carácter de entrada), de modo que las
+    posiciones encontradas en el texto plegado valen para el original.
+    """
+    return "".join(_plegar_caracter(c) for c in texto)
+
+
+def _plegar_caracter(c: str) -> str:
+    base = unicodedata.normalize("NFD", c)[0].lower()
+    return base if len(base) == 1 else c
+
+
+def extraer_terminos(texto: str) -> List[str]:
+    """Divide un texto en términos plegados (sin acentos, en minúsculas)"""
+    return _RE_PALABRA.findall(plegar_texto(texto or ""))
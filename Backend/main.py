@@ -8,6 +8,7 @@
 
 import os
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
@@ -83,6 +84,18 @@ except ImportError as e:
     print("   3. core/security.py FUE ELIMINADO")
     raise
 
+# 🔹 Tareas periódicas en segundo plano (archivo de mensajes, etc.)
+from services.tareas_programadas import iniciar_tareas, detener_tareas
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranca y detiene las tareas periódicas junto con la aplicación"""
+    iniciar_tareas()
+    yield
+    await detener_tareas()
+
+
 # ===============================================
 # Inicializar la aplicación
 # ===============================================
@@ -90,6 +103,7 @@ app = FastAPI(
     title="FitSo API - Backend",
     description="API oficial de la plataforma FitSo — Creación de dietas personalizadas con IA",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # ===============================================
@@ -97,6 +111,40 @@ app = FastAPI(
 # ===============================================
 Base.metadata.create_all(bind=engine)
 
+# Índices y columnas añadidos a los modelos después de crear las tablas
+from core.esquema import sincronizar_esquema
+tablas_con_columnas_nuevas = sincronizar_esquema(engine)
+
+# Índice de texto completo para búsqueda de mensajes (FULLTEXT / FTS5)
+from services.busqueda_mensajes import asegurar_indice_busqueda
+asegurar_indice_busqueda(engine)
+
+# Agregados de reseñas: se calculan si la tabla está recién creada o ganó columnas
+from services.resena_stats_service import inicializar_stats
+inicializar_stats(forzar="resena_stats" in tablas_con_columnas_nuevas)
+
+# ===============================================
+# Caché de respuestas públicas (antes de CORS para que CORS la envuelva)
+# ===============================================
+from core.cache import CacheRespuestasMiddleware, registrar_ruta_cacheable
+
+registrar_ruta_cacheable(r"^/api/catalogo/enfermedades$", ttl=3600, etiquetas=lambda m: ["catalogo"])
+registrar_ruta_cacheable(r"^/api/users/illnesses$", ttl=3600, etiquetas=lambda m: ["catalogo"])
+registrar_ruta_cacheable(
+    r"^/api/catalogo/enfermedades/autocompletar$", ttl=3600,
+    etiquetas=lambda m: ["catalogo"], parametros=("q", "limite")
+)
+# Se invalidan al editar el perfil / escribir una reseña: el navegador revalida con el ETag
+registrar_ruta_cacheable(
+    r"^/api/users/nutriologos/(?P<id>\d+)$", ttl=300,
+    etiquetas=lambda m: [f"nutriologo:{m['id']}"], revalidar=True
+)
+registrar_ruta_cacheable(
+    r"^/api/resenas/stats/nutriologo/(?P<id>\d+)$", ttl=120,
+    etiquetas=lambda m: [f"resenas:{m['id']}"], revalidar=True
+)
+app.add_middleware(CacheRespuestasMiddleware)
+
 # ===============================================
 # CORS
 # ===============================================
@@ -9,14 +9,16 @@ from .user import (
     ValidacionNutriologo,
 )
 from .dieta import Dieta
+from .dieta_uso_ia import DietaUsoIA
 from .receta import Receta
 from .ingrediente import Ingrediente
 from .progreso import Progreso
 from .logro import Logro
-from .calendario import CalendarioDieta
+from .calendario import CalendarioDieta, ComidaDieta
 from .contrato import Contrato, EstadoContrato
 from .resena import Resena
-from  .mensajes import Mensaje
+from .resena_stats import ResenaStats
+from  .mensajes import Mensaje, LecturaConversacion, MensajeArchivado
 
 __all__ = [
     "Usuario",
@@ -25,13 +27,18 @@ __all__ = [
     "EstadoValidacionEnum",
     "ValidacionNutriologo",
     "Dieta",
+    "DietaUsoIA",
     "Receta",
     "Ingrediente",
     "Progreso",
     "Logro",
     "CalendarioDieta",
+    "ComidaDieta",
     "Contrato",
     "EstadoContrato",
     "Resena",
-    "Mensaje"
+    "ResenaStats",
+    "Mensaje",
+    "LecturaConversacion",
+    "MensajeArchivado"
 ]
\ No newline at end of file
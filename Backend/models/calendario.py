@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Enum, ForeignKey
+from sqlalchemy import Column, Integer, Enum, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from config.database import Base
 import enum
@@ -30,3 +30,28 @@ class CalendarioDieta(Base):
     # Relaciones
     usuario = relationship("Usuario", back_populates="calendario")
     receta = relationship("Receta", back_populates="calendario")
+
+
+class ComidaDieta(Base):
+    """
+    Plan semanal de una dieta: qué receta va en cada día y comida.
+
+    A diferencia de CalendarioDieta (el calendario actual del cliente) se
+    conserva por dieta. En una renovación por cambios las comidas que no
+    cambian apuntan a las recetas de la versión anterior en lugar de
+    copiarlas.
+    """
+    __tablename__ = "comidas_dieta"
+
+    id_comida = Column(Integer, primary_key=True, index=True)
+    id_dieta = Column(Integer, ForeignKey("dietas.id_dieta", ondelete="CASCADE"), nullable=False)
+    id_receta = Column(Integer, ForeignKey("recetas.id_receta", ondelete="CASCADE"), nullable=False)
+    dia_semana = Column(Enum(DiaSemana), nullable=False)
+    comida = Column(Enum(TipoComida), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('id_dieta', 'dia_semana', 'comida', name='uq_comida_dieta'),
+    )
+
+    # Relaciones
+    receta = relationship("Receta")
@@ -4,7 +4,7 @@
 # COPIAR A: Backend/models/contrato.py
 # ===============================================
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -49,6 +49,11 @@ class Contrato(Base):
     # Validación
     validado = Column(Boolean, default=False)
 
+    __table_args__ = (
+        # Cartera de clientes de un nutriólogo (/api/clientes/mis-clientes)
+        Index('idx_contratos_nutriologo_estado', 'id_nutriologo', 'estado'),
+    )
+
     # Relaciones
     cliente = relationship(
         "Usuario",
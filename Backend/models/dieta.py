@@ -47,12 +47,15 @@ class Dieta(Base):
     fecha_vencimiento = Column(DateTime, nullable=True)  # Fecha en que vence
     estado = Column(Enum(EstadoDieta), default=EstadoDieta.activa)  # Estado actual
     id_dieta_anterior = Column(Integer, nullable=True)  # Referencia a dieta anterior
+    recordatorio_enviado_en = Column(DateTime, nullable=True)  # Último recordatorio de vencimiento
 
     # ✅ ÍNDICES para búsquedas rápidas
     __table_args__ = (
         Index('idx_estado', 'estado'),
         Index('idx_fecha_vencimiento', 'fecha_vencimiento'),
         Index('idx_id_usuario_estado', 'id_usuario', 'estado'),
+        # Cadena de renovaciones (historial de versiones de un plan)
+        Index('idx_dieta_anterior', 'id_dieta_anterior'),
     )
 
     # ✅ RELACIONES
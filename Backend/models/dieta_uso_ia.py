@@ -0,0 +1,50 @@
+"""
+Backend/models/dieta_uso_ia.py
+Consumo de tokens y costo de cada llamada a la IA
+
+Una fila por llamada (services/uso_ia.py). Permite medir el tamaño real de
+los prompts por plantilla y el gasto por nutriólogo.
+"""
+
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from config.database import Base
+from datetime import datetime
+
+
+class DietaUsoIA(Base):
+    """
+    Uso de la IA en una generación
+
+    Attributes:
+        id_dieta: Dieta generada (None si la llamada no creó una dieta)
+        id_nutriologo: Nutriólogo que la solicitó
+        plantilla: Plantilla de prompt usada (services/prompts_dieta.py)
+        modelo: ID del modelo de IA
+        tokens_estimados: Estimación local antes de enviar
+        tokens_prompt / tokens_cache / tokens_respuesta: Conteo reportado por la API
+            (tokens_cache = parte del prompt servida desde la caché de contexto)
+        costo_usd: Costo calculado con los precios configurados
+        duracion_ms: Latencia de la llamada
+    """
+    __tablename__ = "dieta_uso_ia"
+
+    id_uso = Column(Integer, primary_key=True, index=True)
+    id_dieta = Column(Integer, ForeignKey("dietas.id_dieta", ondelete="SET NULL"), nullable=True)
+    id_nutriologo = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="SET NULL"), nullable=True)
+    plantilla = Column(String(50), nullable=False)
+    modelo = Column(String(100), nullable=False)
+    tokens_estimados = Column(Integer, nullable=False, default=0)
+    tokens_prompt = Column(Integer, nullable=False, default=0)
+    tokens_cache = Column(Integer, nullable=False, default=0)
+    tokens_respuesta = Column(Integer, nullable=False, default=0)
+    costo_usd = Column(Float, nullable=False, default=0.0)
+    duracion_ms = Column(Integer, nullable=True)
+    creado_en = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('idx_uso_ia_nutriologo_fecha', 'id_nutriologo', 'creado_en'),
+        Index('idx_uso_ia_dieta', 'id_dieta'),
+    )
+
+    def __repr__(self):
+        return f"<DietaUsoIA {self.plantilla} dieta={self.id_dieta} tokens={self.tokens_prompt}+{self.tokens_respuesta}>"
@@ -3,7 +3,7 @@ Backend/models/mensajes.py
 Modelo SQLAlchemy para la tabla de mensajes
 """
 
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from config.database import Base
@@ -34,6 +34,11 @@ class Mensaje(Base):
     fecha_creacion = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False, index=True)
     fecha_actualizacion = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    # Índice para localizar los no leídos de una conversación
+    __table_args__ = (
+        Index('idx_mensajes_dest_rem_leido', 'destinatario_id', 'remitente_id', 'leido'),
+    )
+
     # Relaciones
     remitente = relationship(
         "Usuario",
@@ -47,4 +52,57 @@ class Mensaje(Base):
     )
 
     def __repr__(self):
-        return f"<Mensaje {self.id} de {self.remitente_id} a {self.destinatario_id}>"
\ No newline at end of file
+        return f"<Mensaje {self.id} de {self.remitente_id} a {self.destinatario_id}>"
+
+
+class LecturaConversacion(Base):
+    """
+    Marca de lectura ("leído hasta el mensaje X") de un usuario en una conversación
+
+    Permite confirmar lecturas por rango en lugar de mensaje por mensaje y
+    descartar sin tocar la tabla de mensajes las confirmaciones repetidas.
+
+    Attributes:
+        usuario_id: Usuario que lee (PK)
+        otro_usuario_id: Otro participante de la conversación (PK)
+        ultimo_leido_id: ID del último mensaje confirmado como leído
+        fecha_actualizacion: Timestamp de la última confirmación
+    """
+    __tablename__ = "mensajes_lecturas"
+
+    usuario_id = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), primary_key=True)
+    otro_usuario_id = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), primary_key=True)
+    ultimo_leido_id = Column(Integer, nullable=False, default=0)
+    fecha_actualizacion = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<LecturaConversacion {self.usuario_id}->{self.otro_usuario_id} hasta {self.ultimo_leido_id}>"
+
+
+class MensajeArchivado(Base):
+    """
+    Mensajes antiguos movidos fuera de la tabla caliente `mensajes`
+
+    Conserva el id original para que el historial paginado pueda continuar
+    del caché caliente al archivo con el mismo cursor. Solo se archivan
+    mensajes ya leídos, así los conteos de no leídos no necesitan el archivo.
+    """
+    __tablename__ = "mensajes_archivo"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    remitente_id = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), nullable=False)
+    destinatario_id = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), nullable=False)
+    contenido = Column(Text, nullable=False)
+    leido = Column(Boolean, default=True, nullable=False)
+    fecha_creacion = Column(DateTime(timezone=True), nullable=False)
+    fecha_actualizacion = Column(DateTime(timezone=True), nullable=False)
+    fecha_archivado = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('idx_mensajes_archivo_conversacion', 'remitente_id', 'destinatario_id', 'id'),
+        # Lista de conversaciones: mensajes archivados recibidos por el usuario
+        Index('idx_mensajes_archivo_destinatario', 'destinatario_id', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<MensajeArchivado {self.id} de {self.remitente_id} a {self.destinatario_id}>"
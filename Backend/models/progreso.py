@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DECIMAL, Date, String, ForeignKey
+from sqlalchemy import Column, Integer, DECIMAL, Date, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import date
 from config.database import Base
@@ -13,5 +13,10 @@ class Progreso(Base):
     fecha_registro = Column(Date, default=date.today)
     comentario = Column(String(255))
 
+    # Series de progreso de un usuario por rango de fechas
+    __table_args__ = (
+        Index('idx_progreso_usuario_fecha', 'id_usuario', 'fecha_registro'),
+    )
+
     # Relaciones
     usuario = relationship("Usuario", back_populates="progresos")
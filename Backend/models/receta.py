@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -12,8 +12,11 @@ class Receta(Base):
     calorias = Column(Integer)
     tiempo_preparacion = Column(Integer)
     imagen_url = Column(String(255))
+    instrucciones = Column(JSON, nullable=True)  # lista de pasos (recetas generadas por IA)
 
     # Relaciones
+    # Una renovación por cambios reutiliza recetas de la dieta anterior: para
+    # borrar una dieta usar DietaService.eliminar_dieta (las reasigna antes)
     dieta = relationship("Dieta", back_populates="recetas")
     ingredientes = relationship("Ingrediente", back_populates="receta", cascade="all, delete")
     calendario = relationship("CalendarioDieta", back_populates="receta", cascade="all, delete")
@@ -116,6 +116,8 @@ class Resena(Base):
         Index('idx_nutriologo_verificado', 'id_nutriologo', 'verificado'),
         Index('idx_cliente_nutriologo', 'id_cliente', 'id_nutriologo'),
         Index('idx_creado_en_desc', 'creado_en'),
+        # Listado paginado por keyset de las reseñas de un nutriólogo
+        Index('idx_nutriologo_creado_id', 'id_nutriologo', 'creado_en', 'id_resena'),
     )
 
     # ============ MÉTODOS ============
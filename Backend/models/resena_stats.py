@@ -0,0 +1,59 @@
+"""
+Backend/models/resena_stats.py
+Agregados de calificaciones por nutriólogo (una fila por nutriólogo)
+
+Se mantiene de forma incremental en la misma transacción que crea, edita
+o elimina una reseña (services/resena_stats_service.py), de modo que las
+estadísticas se leen con una sola búsqueda por clave primaria.
+"""
+
+from sqlalchemy import Column, Integer, Float, DateTime, Index
+from config.database import Base
+from datetime import datetime
+from typing import Dict
+
+
+class ResenaStats(Base):
+    """
+    Estadísticas agregadas de reseñas de un nutriólogo
+
+    Attributes:
+        id_nutriologo: ID del nutriólogo (PK, referencia a usuarios.id_usuario)
+        total: Número de reseñas
+        suma: Suma de calificaciones (promedio = suma / total)
+        estrellas_1..estrellas_5: Reseñas por estrella (calificación redondeada)
+        total_verificadas / suma_verificadas: Lo mismo, solo reseñas verificadas
+        puntuacion: Promedio bayesiano ponderado (para ordenar el directorio)
+        actualizado_en: Timestamp de la última modificación
+    """
+    __tablename__ = "resena_stats"
+
+    id_nutriologo = Column(Integer, primary_key=True, autoincrement=False)
+    total = Column(Integer, nullable=False, default=0)
+    suma = Column(Float, nullable=False, default=0.0)
+    estrellas_1 = Column(Integer, nullable=False, default=0)
+    estrellas_2 = Column(Integer, nullable=False, default=0)
+    estrellas_3 = Column(Integer, nullable=False, default=0)
+    estrellas_4 = Column(Integer, nullable=False, default=0)
+    estrellas_5 = Column(Integer, nullable=False, default=0)
+    total_verificadas = Column(Integer, nullable=False, default=0)
+    suma_verificadas = Column(Float, nullable=False, default=0.0)
+    puntuacion = Column(Float, nullable=False, default=0.0)
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Ranking del directorio por calificación
+        Index('idx_resena_stats_puntuacion', 'puntuacion', 'total'),
+    )
+
+    @property
+    def promedio(self) -> float:
+        """Calificación promedio redondeada a un decimal"""
+        return round(self.suma / self.total, 1) if self.total else 0.0
+
+    def distribucion(self) -> Dict[str, int]:
+        """Distribución por estrellas con claves "5".."1" """
+        return {str(e): getattr(self, f"estrellas_{e}") or 0 for e in (5, 4, 3, 2, 1)}
+
+    def __repr__(self):
+        return f"<ResenaStats nutriologo={self.id_nutriologo} total={self.total} promedio={self.promedio}>"
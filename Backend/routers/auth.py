@@ -16,6 +16,7 @@ from schemas.user_schema import (
     UsuarioCreateNutriologo,
     UsuarioResponse
 )
+from services.busqueda_nutriologos import indice_nutriologos
 # ✅ IMPORTAR DE core.deps (NO de core.security)
 from core.deps import (
     get_db,
@@ -114,6 +115,7 @@ def register_nutriologo(data: UsuarioCreateNutriologo, db: Session = Depends(get
     db.add(nuevo)
     db.commit()
     db.refresh(nuevo)
+    indice_nutriologos.invalidar()
 
     logger.info(f"✅ Nutriólogo registrado: ID={nuevo.id_usuario}")
 
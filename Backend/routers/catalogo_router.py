@@ -3,56 +3,20 @@ Router para catálogos de la aplicación
 Estructura: Backend/routers/catalogo_router.py
 """
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
+from pydantic import BaseModel, Field
 from typing import List
 
+from services.catalogo_enfermedades import ENFERMEDADES, autocompletar, normalizar, validar_lote
+
 router = APIRouter(prefix="/api/catalogo", tags=["catalogo"])
 
-# Catálogo de enfermedades disponibles
-ENFERMEDADES_CATALOG = [
-    "Diabetes",
-    "Hipertensión",
-    "Asma",
-    "Artritis",
-    "Enfermedad renal",
-    "Cáncer",
-    "Hipotiroidismo",
-    "Cardiopatía",
-    "Obesidad",
-    "Migraña",
-    "Tiroiditis",
-    "Osteoporosis",
-    "Enfermedad pulmonar obstructiva crónica (EPOC)",
-    "Síndrome del intestino irritable",
-    "Enfermedad de Crohn",
-    "Colitis ulcerosa",
-    "Celiaquía",
-    "Alergia alimentaria",
-    "Gastritis",
-    "Reflujo gastroesofágico",
-    "Fibromialgia",
-    "Lupus",
-    "Artritis reumatoide",
-    "Enfermedad de Graves",
-    "Vitíligo",
-    "Psoriasis",
-    "Dermatitis atópica",
-    "Anemia",
-    "Hemofilia",
-    "Trombosis",
-    "Hiperlipidemia",
-    "Gota",
-    "Depresión",
-    "Ansiedad",
-    "Trastorno bipolar",
-    "Esquizofrenia",
-    "Insomnio",
-    "Apnea del sueño",
-    "Síndrome metabólico",
-    "Acné",
-    "Caspa",
-    "Eczema",
-]
+# Compatibilidad: antes la lista vivía en este módulo
+ENFERMEDADES_CATALOG = list(ENFERMEDADES)
+
+
+class ValidarLoteIn(BaseModel):
+    enfermedades: List[str] = Field(..., max_length=100)
 
 
 @router.get("/enfermedades", response_model=List[str])
@@ -61,9 +25,22 @@ def get_enfermedades_catalog():
     Retorna el catálogo completo de enfermedades disponibles.
 
     Usado por el perfil de cliente para mostrar opciones de autocompletado
-    y selección de condiciones médicas.
+    y selección de condiciones médicas. Ya viene ordenado de fábrica.
+    """
+    return ENFERMEDADES
+
+
+@router.get("/enfermedades/autocompletar", response_model=List[str])
+def autocompletar_enfermedades(
+    q: str = Query(..., min_length=1, max_length=100),
+    limite: int = Query(10, ge=1, le=50)
+):
+    """
+    Sugerencias de enfermedades mientras el usuario escribe.
+    Sin acentos/mayúsculas, por prefijo de cualquier palabra y con
+    tolerancia a erratas (?q=dia -> Diabetes, ?q=diabtes -> Diabetes).
     """
-    return sorted(ENFERMEDADES_CATALOG)
+    return autocompletar(q, limite)
 
 
 @router.post("/enfermedades/validar")
@@ -72,15 +49,33 @@ def validar_enfermedad(enfermedad: str):
     Valida si una enfermedad existe en el catálogo.
 
     Parámetros:
-        enfermedad: nombre de la enfermedad a validar
+        enfermedad: nombre de la enfermedad a validar (acepta alias y
+                    variaciones de acentos/mayúsculas)
 
     Retorna:
-        { "valido": true/false }
+        { "valido": true/false, "enfermedad_catalogo": nombre oficial o null }
     """
-    is_valid = enfermedad in ENFERMEDADES_CATALOG
+    nombre = normalizar(enfermedad)
+    is_valid = nombre is not None
 
     return {
         "enfermedad": enfermedad,
         "valido": is_valid,
+        "enfermedad_catalogo": nombre,
         "mensaje": "Enfermedad válida" if is_valid else "Enfermedad no reconocida"
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/enfermedades/validar-lote")
+def validar_enfermedades_lote(payload: ValidarLoteIn):
+    """
+    Valida una lista completa de enfermedades en una sola llamada.
+
+    Retorna:
+        { "valido": true si todas existen,
+          "validas": nombres oficiales (sin duplicados),
+          "invalidas": textos no reconocidos,
+          "sugerencias": { texto inválido: [sugerencias] } }
+    """
+    resultado = validar_lote(payload.enfermedades)
+    return {"valido": not resultado["invalidas"], **resultado}
@@ -1,26 +1,51 @@
 """
 Router para gestionar clientes y dietas generadas por IA
 Estructura: Backend/routers/clientes_router.py
-INTEGRACIÓN: Google Gemini 2.5 + Sistema de Actualización de Dietas
+INTEGRACIÓN: IA (Google Gemini 2.5 / simulada) + Sistema de Actualización de Dietas
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional, Annotated
-import google.generativeai as genai
-import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logging
 
 # ✅ CORRECCIÓN: Importar de core.deps (NO de core.security)
 from config.database import get_db
-from models.user import Usuario
+from models.user import Usuario, ObjetivoUsuario
 from models.contrato import Contrato
 from models.dieta import Dieta, EstadoDieta
-from schemas.cliente import ClienteResponse, DietaAIRequest, DietaAIResponse
+from schemas.cliente import (
+    ClienteResponse,
+    DietaAIRequest,
+    DietaAIResponse,
+    DietaAILoteRequest,
+    DietaVersionResponse,
+    LoteDietaResponse,
+)
 from core.deps import get_current_user
-from services.dieta_ia_service import DietaService
+from services.dieta_ia_service import DietaService, DietaYaRenovada
+from services.relaciones_contrato import ContratoClienteDep, relaciones_contrato
+from services.prompts_dieta import PromptDemasiadoLargo
+from services.uso_ia import resumen_uso
+from services.vencimiento_dietas import (
+    enviar_recordatorios_vencimiento,
+    filtro_vigente,
+    iterar_reporte_vencimientos,
+    reporte_csv,
+    reporte_jsonl,
+)
+from services.generacion_dietas import (
+    SinPlanEstructurado,
+    ejecutar_con_limite,
+    generar_dieta_para_cliente,
+    iniciar_lote,
+    obtener_lote,
+    parsear_enfermedades,
+    renovar_dieta_con_cambios,
+)
 
 # Configurar logging
 logger = logging.getLogger("clientes")
@@ -31,18 +56,20 @@ load_dotenv()
 
 router = APIRouter(prefix="/api/clientes", tags=["clientes"])
 
-# ✅ INICIALIZAR GOOGLE GEMINI 2.5
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL_ID = os.getenv("GEMINI_MODEL_ID", "models/gemini-2.5-flash")
+# ✅ La IA (Gemini o simulada) se configura en services/proveedores_ia.py
+# según IA_PROVEEDOR; la API key se exige en la primera generación
 
-if not GEMINI_API_KEY:
-    logger.warning("⚠️  GEMINI_API_KEY no está configurada en .env")
-    raise ValueError("GEMINI_API_KEY no está configurada en variables de entorno")
 
-# Configurar la API de Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-logger.info(f"✅ Google Gemini 2.5 configurada correctamente")
-logger.info(f"   Modelo: {GEMINI_MODEL_ID}")
+# ============================================================
+# HELPERS
+# ============================================================
+# Columnas de ordenación permitidas en /mis-clientes
+_ORDEN_CLIENTES = {
+    "nombre": Usuario.nombre,
+    "edad": Usuario.edad,
+    "peso": Usuario.peso,
+    "contrato": Contrato.fecha_creacion,
+}
 
 
 # ============================================================
@@ -51,11 +78,22 @@ logger.info(f"   Modelo: {GEMINI_MODEL_ID}")
 @router.get("/mis-clientes", response_model=List[ClienteResponse])
 async def obtener_mis_clientes(
     current_user: Annotated[Usuario, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    response: Response,
+    db: Session = Depends(get_db),
+    q: Optional[str] = Query(None, max_length=100, description="Buscar por nombre"),
+    objetivo: Optional[str] = Query(None, description="bajar_peso | mantener | aumentar_masa"),
+    estado: Optional[str] = Query(None, description="ACTIVO | PENDIENTE"),
+    orden: str = Query("nombre", pattern="^(nombre|edad|peso|contrato)$"),
+    descendente: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    offset: int = Query(0, ge=0)
 ):
     """
     Obtiene la lista de clientes contratados por un nutriólogo
     Solo nutriólogos pueden acceder a esta ruta
+
+    Un solo JOIN Contrato ⋈ Usuario con filtros, orden y paginación en SQL.
+    Con `limit` la respuesta incluye el header X-Total-Count.
     """
 
     logger.info(f"📋 Obteniendo clientes del nutriólogo: {current_user.nombre}")
@@ -68,45 +106,71 @@ async def obtener_mis_clientes(
             detail="Solo los nutriólogos pueden acceder a esta ruta"
         )
 
-    # Obtener contratos activos donde el nutriólogo es el actual
-    contratos = db.query(Contrato).filter(
+    # Contratos activos/pendientes del nutriólogo actual
+    estados = ["ACTIVO", "PENDIENTE"]
+    if estado:
+        if estado.upper() not in estados:
+            raise HTTPException(status_code=400, detail=f"Estado inválido, usa: {', '.join(estados)}")
+        estados = [estado.upper()]
+
+    qry = db.query(
+        Usuario.id_usuario,
+        Usuario.nombre,
+        Usuario.edad,
+        Usuario.peso,
+        Usuario.altura,
+        Usuario.objetivo,
+        Usuario.enfermedades,
+        Usuario.descripcion_medica,
+        Usuario.peso_inicial,
+        Contrato.id_contrato,
+        Contrato.estado,
+    ).join(Usuario, Usuario.id_usuario == Contrato.id_cliente).filter(
         Contrato.id_nutriologo == current_user.id_usuario,
-        Contrato.estado.in_(["ACTIVO", "PENDIENTE"])
-    ).all()
+        Contrato.estado.in_(estados)
+    )
+
+    if objetivo:
+        if objetivo not in ObjetivoUsuario.__members__:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Objetivo inválido, usa: {', '.join(ObjetivoUsuario.__members__)}"
+            )
+        qry = qry.filter(Usuario.objetivo == ObjetivoUsuario[objetivo])
+
+    if q and q.strip():
+        qry = qry.filter(Usuario.nombre.ilike(f"%{q.strip()}%"))
 
-    logger.info(f"✅ Encontrados {len(contratos)} contratos activos")
-
-    # Obtener datos de clientes
-    clientes = []
-    for contrato in contratos:
-        cliente = db.query(Usuario).filter(
-            Usuario.id_usuario == contrato.id_cliente
-        ).first()
-
-        if cliente:
-            # Parsear enfermedades si es string JSON
-            enfermedades = cliente.enfermedades
-            if isinstance(enfermedades, str):
-                try:
-                    enfermedades = json.loads(enfermedades)
-                except:
-                    enfermedades = []
-
-            clientes.append(ClienteResponse(
-                id_usuario=cliente.id_usuario,
-                nombre=cliente.nombre,
-                edad=cliente.edad,
-                peso=cliente.peso,
-                altura=cliente.altura,
-                objetivo=cliente.objetivo.value if cliente.objetivo else None,
-                enfermedades=enfermedades,
-                descripcion_medica=cliente.descripcion_medica,
-                peso_inicial=cliente.peso_inicial,
-                contrato_id=contrato.id_contrato,
-                contrato_estado=contrato.estado
-            ))
-
-    return clientes
+    if limit is not None:
+        response.headers["X-Total-Count"] = str(qry.order_by(None).count())
+
+    columna = _ORDEN_CLIENTES[orden]
+    qry = qry.order_by(
+        columna.desc() if descendente else columna.asc(),
+        Contrato.id_contrato.asc()
+    )
+    if limit is not None:
+        qry = qry.offset(offset).limit(limit)
+
+    filas = qry.all()
+    logger.info(f"✅ Encontrados {len(filas)} clientes")
+
+    return [
+        ClienteResponse(
+            id_usuario=f.id_usuario,
+            nombre=f.nombre,
+            edad=f.edad,
+            peso=f.peso,
+            altura=f.altura,
+            objetivo=f.objetivo.value if f.objetivo else None,
+            enfermedades=parsear_enfermedades(f.enfermedades),
+            descripcion_medica=f.descripcion_medica,
+            peso_inicial=f.peso_inicial,
+            contrato_id=f.id_contrato,
+            contrato_estado=f.estado
+        )
+        for f in filas
+    ]
 
 
 # ============================================================
@@ -115,44 +179,24 @@ async def obtener_mis_clientes(
 @router.get("/cliente/{cliente_id}", response_model=ClienteResponse)
 async def obtener_perfil_cliente(
     cliente_id: int,
-    current_user: Annotated[Usuario, Depends(get_current_user)],
+    contrato: ContratoClienteDep,
     db: Session = Depends(get_db)
 ):
     """
     Obtiene el perfil completo de un cliente específico
     El nutriólogo solo puede ver clientes que tiene contratados
+    (lo comprueba la dependencia ContratoClienteDep)
     """
 
     logger.info(f"📋 Obteniendo perfil del cliente {cliente_id}")
 
-    # Verificar que el usuario es nutriólogo
-    if current_user.tipo_usuario.value != "nutriologo":
-        raise HTTPException(status_code=403, detail="Solo nutriólogos pueden acceder")
-
-    # Verificar que tiene contrato con este cliente
-    contrato = db.query(Contrato).filter(
-        Contrato.id_nutriologo == current_user.id_usuario,
-        Contrato.id_cliente == cliente_id,
-        Contrato.estado.in_(["ACTIVO", "PENDIENTE"])
-    ).first()
-
-    if not contrato:
-        logger.warning(f"❌ No hay contrato entre nutriólogo {current_user.id_usuario} y cliente {cliente_id}")
-        raise HTTPException(status_code=403, detail="No tienes acceso a este cliente")
-
     # Obtener cliente
     cliente = db.query(Usuario).filter(Usuario.id_usuario == cliente_id).first()
 
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
 
-    # Parsear enfermedades
-    enfermedades = cliente.enfermedades
-    if isinstance(enfermedades, str):
-        try:
-            enfermedades = json.loads(enfermedades)
-        except:
-            enfermedades = []
+    enfermedades = parsear_enfermedades(cliente.enfermedades)
 
     return ClienteResponse(
         id_usuario=cliente.id_usuario,
@@ -184,7 +228,7 @@ async def generar_dieta_con_ia(
     Solo nutriólogos pueden generar dietas.
     """
 
-    logger.info(f"🤖 Generando dieta para cliente {dieta_request.id_cliente} con Gemini 2.5")
+    logger.info(f"🤖 Generando dieta para cliente {dieta_request.id_cliente} con IA")
 
     # ✅ VERIFICAR QUE EL USUARIO ES NUTRIÓLOGO
     if current_user.tipo_usuario.value != "nutriologo":
@@ -208,12 +252,8 @@ async def generar_dieta_con_ia(
 
     logger.info(f"✅ Cliente encontrado: {cliente.nombre}")
 
-    # ✅ VERIFICAR QUE TIENE CONTRATO CON ESTE CLIENTE
-    contrato = db.query(Contrato).filter(
-        Contrato.id_nutriologo == current_user.id_usuario,
-        Contrato.id_cliente == cliente.id_usuario,
-        Contrato.estado.in_(["ACTIVO", "PENDIENTE"])
-    ).first()
+    # ✅ VERIFICAR QUE TIENE CONTRATO CON ESTE CLIENTE (caché de relaciones)
+    contrato = relaciones_contrato.contrato_con(db, current_user.id_usuario, cliente.id_usuario)
 
     if not contrato:
         logger.warning(f"❌ No hay contrato entre {current_user.nombre} y {cliente.nombre}")
@@ -224,96 +264,25 @@ async def generar_dieta_con_ia(
 
     logger.info(f"✅ Contrato verificado")
 
-    # ✅ CONSTRUIR PROMPT PARA IA
-    enfermedades = cliente.enfermedades or []
-    if isinstance(enfermedades, str):
-        try:
-            enfermedades = json.loads(enfermedades)
-        except:
-            enfermedades = []
-
-    # Formatear objetivo
-    objetivo_formato = {
-        'bajar_peso': 'Bajar de peso',
-        'mantener': 'Mantener peso',
-        'aumentar_masa': 'Aumentar masa muscular'
-    }.get(str(cliente.objetivo.value) if cliente.objetivo else 'mantener', str(cliente.objetivo.value) if cliente.objetivo else 'Mantener peso')
-
-    prompt = f"""
-    Eres un nutriólogo experto. Necesito que generes una dieta personalizada 
-    para el siguiente cliente:
-    
-    DATOS DEL CLIENTE:
-    - Nombre: {cliente.nombre}
-    - Edad: {cliente.edad} años
-    - Peso actual: {cliente.peso} kg
-    - Altura: {cliente.altura} m
-    - Peso inicial: {cliente.peso_inicial} kg
-    - Objetivo: {objetivo_formato}
-    - Condiciones médicas: {', '.join(enfermedades) if enfermedades else 'Ninguna'}
-    - Descripción médica: {cliente.descripcion_medica or 'Sin información adicional'}
-    
-    INFORMACIÓN DE LA DIETA:
-    - Nombre: {dieta_request.nombre_dieta}
-    - Días de duración: {dieta_request.dias_duracion}
-    - Calorías objetivo: {dieta_request.calorias_objetivo}
-    - Preferencias especiales: {dieta_request.preferencias or 'Ninguna'}
-    
-    Por favor:
-    1. Crea un plan de dieta detallado para {dieta_request.dias_duracion} días
-    2. Incluye desayuno, almuerzo, merienda y cena para cada día
-    3. Asegúrate de que sea adecuada para sus condiciones médicas
-    4. Proporciona recomendaciones nutricionales específicas
-    5. Incluye consejos de salud personalizados
-    6. Mantén aproximadamente {dieta_request.calorias_objetivo} calorías diarias
-    
-    Formatea la respuesta de manera clara y estructurada.
-    """
-
-    logger.info(f"📝 Prompt generado, llamando a Google Gemini 2.5...")
-
     try:
-        # ✅ LLAMAR A API DE GOOGLE GEMINI 2.5
-        model = genai.GenerativeModel(GEMINI_MODEL_ID)
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=8192,
-                candidate_count=1,
-            )
+        # ✅ PROMPT -> GEMINI -> BD -> PDF (en el threadpool, con el límite global de la IA)
+        nueva_dieta = await ejecutar_con_limite(
+            generar_dieta_para_cliente,
+            db,
+            cliente,
+            dieta_request.nombre_dieta,
+            dieta_request.dias_duracion,
+            dieta_request.calorias_objetivo,
+            dieta_request.preferencias,
+            current_user.id_usuario
         )
 
-        dieta_contenido = response.text
-
-        logger.info(f"✅ Respuesta de Gemini recibida ({len(dieta_contenido)} caracteres)")
-
-        # ✅ CREAR DIETA USANDO DIETASERVICE
-        nueva_dieta = DietaService.crear_dieta(
-            db=db,
-            id_usuario=dieta_request.id_cliente,
-            nombre=dieta_request.nombre_dieta,
-            descripcion=dieta_contenido,
-            objetivo=str(cliente.objetivo.value) if cliente.objetivo else "saludable",
-            calorias_totales=dieta_request.calorias_objetivo,
-            dias_duracion=dieta_request.dias_duracion
-        )
-        from services.pdf_generator import generar_pdf_dieta
-        generar_pdf_dieta(
-            nueva_dieta.id_dieta,
-            nueva_dieta.nombre,
-            dieta_contenido
-        )
-        logger.info(f"✅ Dieta guardada en BD con ID={nueva_dieta.id_dieta}")
-
         dias_restantes = nueva_dieta.dias_restantes()
 
         return DietaAIResponse(
             id_dieta=nueva_dieta.id_dieta,
             nombre=nueva_dieta.nombre,
-            contenido=dieta_contenido,
+            contenido=nueva_dieta.descripcion,
             calorias_totales=nueva_dieta.calorias_totales,
             objetivo=nueva_dieta.objetivo.value,
             fecha_creacion=nueva_dieta.fecha_creacion,
@@ -323,14 +292,111 @@ async def generar_dieta_con_ia(
             dias_restantes=dias_restantes
         )
 
+    except PromptDemasiadoLargo as e:
+        logger.warning(f"⚠️  {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Las preferencias son demasiado largas"
+        )
+
     except Exception as e:
-        logger.error(f"❌ Error generando dieta con Gemini: {str(e)}")
+        logger.error(f"❌ Error generando dieta con IA: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generando dieta: {str(e)}"
         )
 
 
+# ============================================================
+# GENERAR DIETAS CON IA POR LOTES
+# ============================================================
+@router.post("/generar-dieta-ia/lote", response_model=LoteDietaResponse, status_code=status.HTTP_202_ACCEPTED)
+async def generar_dietas_lote(
+    lote_request: DietaAILoteRequest,
+    current_user: Annotated[Usuario, Depends(get_current_user)],
+    db: Session = Depends(get_db)
+):
+    """
+    Genera dietas con IA para varios clientes con los mismos parámetros.
+
+    Responde de inmediato (202) con el id del lote; las dietas se generan en
+    paralelo (con el límite global de la IA) y se guardan a medida que
+    terminan. El progreso se consulta en GET /generar-dieta-ia/lote/{id_lote}.
+    Los clientes sin contrato vigente se devuelven en `rechazados`.
+    """
+
+    if current_user.tipo_usuario.value != "nutriologo":
+        logger.warning(f"❌ Acceso denegado: {current_user.nombre} no es nutriólogo")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo los nutriólogos pueden generar dietas"
+        )
+
+    # Una sola consulta (o caché) para validar todos los contratos
+    ids_clientes = list(dict.fromkeys(lote_request.ids_clientes))
+    relaciones = relaciones_contrato.clientes_de(db, current_user.id_usuario)
+    aceptados = [c for c in ids_clientes if c in relaciones]
+    rechazados = [
+        {"id_cliente": c, "estado": "error", "error": "No tienes un contrato activo con este cliente"}
+        for c in ids_clientes if c not in relaciones
+    ]
+
+    if not aceptados:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes contrato activo con ninguno de los clientes indicados"
+        )
+
+    lote = iniciar_lote(
+        current_user.id_usuario,
+        aceptados,
+        lote_request.model_dump(exclude={"ids_clientes"})
+    )
+
+    return LoteDietaResponse(**lote.resumen(), rechazados=rechazados)
+
+
+@router.get("/generar-dieta-ia/lote/{id_lote}", response_model=LoteDietaResponse)
+async def progreso_lote_dietas(
+    id_lote: str,
+    current_user: Annotated[Usuario, Depends(get_current_user)]
+):
+    """Progreso por cliente de un lote de generación"""
+
+    lote = obtener_lote(id_lote)
+    if not lote or lote.id_nutriologo != current_user.id_usuario:
+        raise HTTPException(status_code=404, detail="Lote no encontrado")
+
+    return LoteDietaResponse(**lote.resumen())
+
+
+# ============================================================
+# CONSUMO DE IA (TOKENS Y COSTO)
+# ============================================================
+@router.get("/uso-ia")
+async def obtener_uso_ia(
+    current_user: Annotated[Usuario, Depends(get_current_user)],
+    db: Session = Depends(get_db),
+    dias: int = Query(30, ge=1, le=365, description="Periodo en días")
+):
+    """Tokens y costo de las generaciones del nutriólogo, por plantilla de prompt"""
+
+    if current_user.tipo_usuario.value != "nutriologo":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo nutriólogos pueden ver el consumo de IA"
+        )
+
+    por_plantilla = resumen_uso(db, current_user.id_usuario, datetime.utcnow() - timedelta(days=dias))
+
+    return {
+        "dias": dias,
+        "llamadas": sum(p["llamadas"] for p in por_plantilla),
+        "costo_usd": round(sum(p["costo_usd"] for p in por_plantilla), 6),
+        "por_plantilla": por_plantilla
+    }
+
+
 # ============================================================
 # OBTENER DIETAS DEL USUARIO
 # ============================================================
@@ -410,6 +476,95 @@ async def obtener_dieta(
     )
 
 
+# ============================================================
+# HISTORIAL DE VERSIONES DE UNA DIETA
+# ============================================================
+@router.get("/dieta/{dieta_id}/historial", response_model=List[DietaVersionResponse])
+async def obtener_historial_dieta(
+    dieta_id: int,
+    current_user: Annotated[Usuario, Depends(get_current_user)],
+    db: Session = Depends(get_db)
+):
+    """
+    Cadena completa de renovaciones de una dieta (de la original a la
+    última), en una sola consulta. Accesible para el cliente dueño y para
+    nutriólogos con contrato vigente con él.
+    """
+
+    logger.info(f"🧬 Historial de la dieta {dieta_id}")
+
+    versiones = DietaService.obtener_historial(db, dieta_id)
+    id_cliente = versiones[0].id_usuario if versiones else None
+
+    permitido = id_cliente == current_user.id_usuario or (
+        id_cliente is not None
+        and current_user.tipo_usuario.value == "nutriologo"
+        and relaciones_contrato.contrato_con(db, current_user.id_usuario, id_cliente) is not None
+    )
+    if not permitido:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dieta no encontrada"
+        )
+
+    return [
+        DietaVersionResponse(
+            id_dieta=v.id_dieta,
+            id_dieta_anterior=v.id_dieta_anterior,
+            version=v.version,
+            nombre=v.nombre,
+            objetivo=v.objetivo.value if v.objetivo else None,
+            calorias_totales=v.calorias_totales,
+            fecha_creacion=v.fecha_creacion,
+            dias_duracion=v.dias_duracion,
+            fecha_vencimiento=v.fecha_vencimiento,
+            estado=v.estado.value if v.estado else "activa"
+        )
+        for v in versiones
+    ]
+
+
+# ============================================================
+# ELIMINAR DIETA (Nutriólogo)
+# ============================================================
+@router.delete("/dieta/{dieta_id}")
+async def eliminar_dieta(
+    dieta_id: int,
+    current_user: Annotated[Usuario, Depends(get_current_user)],
+    db: Session = Depends(get_db)
+):
+    """
+    Elimina una dieta de un cliente con contrato vigente. Las recetas que
+    sus renovaciones reutilizan pasan a ellas, así que su plan no cambia.
+    """
+
+    logger.info(f"🗑️  Eliminando dieta {dieta_id}")
+
+    if current_user.tipo_usuario.value != "nutriologo":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo nutriólogos pueden eliminar dietas"
+        )
+
+    dieta = db.query(Dieta).filter(Dieta.id_dieta == dieta_id).first()
+    if not dieta or not relaciones_contrato.contrato_con(db, current_user.id_usuario, dieta.id_usuario):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dieta no encontrada"
+        )
+
+    try:
+        DietaService.eliminar_dieta(db, dieta_id)
+    except Exception as e:
+        logger.error(f"❌ Error eliminando dieta: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+    return {"success": True, "id_dieta": dieta_id}
+
+
 # ============================================================
 # ASIGNAR DIETA A CLIENTE (Nutriólogo)
 # ============================================================
@@ -459,12 +614,8 @@ async def asignar_dieta_a_cliente(
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
 
-    # Verificar que tiene contrato con este cliente
-    contrato = db.query(Contrato).filter(
-        Contrato.id_nutriologo == current_user.id_usuario,
-        Contrato.id_cliente == id_cliente,
-        Contrato.estado.in_(["ACTIVO", "PENDIENTE"])
-    ).first()
+    # Verificar que tiene contrato con este cliente (caché de relaciones)
+    contrato = relaciones_contrato.contrato_con(db, current_user.id_usuario, id_cliente)
 
     if not contrato:
         raise HTTPException(
@@ -505,7 +656,7 @@ async def obtener_mis_dietas_asignadas(
     # Obtener todas las dietas activas de este usuario
     dietas = db.query(Dieta).filter(
         Dieta.id_usuario == current_user.id_usuario,
-        Dieta.estado == EstadoDieta.activa
+        filtro_vigente()
     ).order_by(Dieta.fecha_creacion.desc()).all()
 
     logger.info(f"✅ Encontradas {len(dietas)} dietas activas")
@@ -544,24 +695,81 @@ async def obtener_estado_dietas(
     logger.info(f"📊 Obteniendo estado de dietas para {current_user.id_usuario}")
 
     info = DietaService.obtener_info_dietas(db, current_user.id_usuario)
+    dietas = DietaService.listar_dietas_vigentes(db, current_user.id_usuario) if info["dietas_activas"] else []
 
     return {
         "dietas_activas": info["dietas_activas"],
         "dietas_vencidas": info["dietas_vencidas"],
+        "por_estado": info["por_estado"],
         "proxima_vencimiento": info["proxima_vencimiento"],
+        "dias_restantes_proxima": info["dias_restantes_proxima"],
         "dietas": [
             {
                 "id_dieta": d.id_dieta,
                 "nombre": d.nombre,
-                "dias_restantes": d.dias_restantes(),
+                "dias_restantes": d.dias_restantes,
                 "fecha_vencimiento": d.fecha_vencimiento,
                 "estado": d.estado.value
             }
-            for d in info["dietas_activas_list"]
+            for d in dietas
         ]
     }
 
 
+# ============================================================
+# REPORTE Y RECORDATORIOS DE VENCIMIENTO (Nutriólogo)
+# ============================================================
+@router.get("/reporte-vencimientos")
+async def reporte_vencimientos(
+    current_user: Annotated[Usuario, Depends(get_current_user)],
+    dias: int = Query(7, ge=1, le=90, description="Vencen en los próximos N días"),
+    formato: str = Query("jsonl", pattern="^(jsonl|csv)$")
+):
+    """
+    Dietas de los clientes del nutriólogo que vencen pronto, transmitidas
+    fila a fila (JSON lines o CSV) sin cargar el reporte en memoria
+    """
+
+    if current_user.tipo_usuario.value != "nutriologo":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo nutriólogos pueden ver el reporte de vencimientos"
+        )
+
+    logger.info(f"📊 Reporte de vencimientos ({formato}, {dias} días) para {current_user.id_usuario}")
+
+    # El generador abre su propia sesión: sigue leyendo tras cerrar la del endpoint
+    filas = iterar_reporte_vencimientos(dias=dias, id_nutriologo=current_user.id_usuario)
+    if formato == "csv":
+        return StreamingResponse(
+            reporte_csv(filas),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="reporte_vencimientos.csv"'}
+        )
+    return StreamingResponse(reporte_jsonl(filas), media_type="application/x-ndjson")
+
+
+@router.post("/recordatorios-vencimiento")
+def enviar_recordatorios(
+    current_user: Annotated[Usuario, Depends(get_current_user)],
+    db: Session = Depends(get_db),
+    dias: int = Query(3, ge=0, le=30, description="Vencen en los próximos N días")
+):
+    """
+    Envía un mensaje de renovación a cada cliente cuya dieta vence pronto.
+    Las dietas ya recordadas en los últimos `dias` días se omiten.
+    """
+
+    if current_user.tipo_usuario.value != "nutriologo":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo nutriólogos pueden enviar recordatorios"
+        )
+
+    enviados = enviar_recordatorios_vencimiento(db, current_user.id_usuario, dias)
+    return {"success": True, "enviados": enviados, "dias": dias}
+
+
 # ============================================================
 # ACTUALIZAR DIETA CUANDO VENCE (Nutriólogo)
 # ============================================================
@@ -582,6 +790,11 @@ async def actualizar_dieta_vencida(
         "calorias_nuevas": 2800,
         "dias_duracion": 30
     }
+
+    Con "modo": "cambios" la IA recibe el plan anterior y el progreso del
+    cliente y solo genera las comidas que cambian ("preferencias" opcional,
+    "descripcion_nueva" se ignora); la nueva dieta reutiliza las recetas
+    que no cambian.
     """
 
     logger.info(f"🔄 Actualizando dieta vencida")
@@ -599,6 +812,9 @@ async def actualizar_dieta_vencida(
     calorias_nuevas = request.get("calorias_nuevas", 2000)
     dias_duracion = request.get("dias_duracion", 30)
 
+    if request.get("modo") == "cambios":
+        return await _renovar_con_cambios(request, current_user, db)
+
     try:
         # Usar DietaService para crear nueva dieta
         nueva_dieta = DietaService.crear_nueva_dieta_desde_vencida(
@@ -620,6 +836,16 @@ async def actualizar_dieta_vencida(
             "fecha_vencimiento": nueva_dieta.fecha_vencimiento
         }
 
+    except DietaYaRenovada as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"❌ Error actualizando dieta: {str(e)}")
         raise HTTPException(
@@ -627,6 +853,73 @@ async def actualizar_dieta_vencida(
             detail=str(e)
         )
 
+
+async def _renovar_con_cambios(request: dict, current_user: Usuario, db: Session) -> dict:
+    """Renovación por cambios de /actualizar-dieta-vencida"""
+    dieta_anterior = db.query(Dieta).filter(Dieta.id_dieta == request.get("id_dieta_anterior")).first()
+    if not dieta_anterior:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dieta no encontrada"
+        )
+
+    if not relaciones_contrato.contrato_con(db, current_user.id_usuario, dieta_anterior.id_usuario):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes un contrato activo con este cliente"
+        )
+
+    cliente = db.query(Usuario).filter(Usuario.id_usuario == dieta_anterior.id_usuario).first()
+
+    try:
+        nueva_dieta, resumen = await ejecutar_con_limite(
+            renovar_dieta_con_cambios,
+            db,
+            dieta_anterior,
+            cliente,
+            request.get("nombre_nueva") or dieta_anterior.nombre,
+            request.get("dias_duracion", 30),
+            request.get("calorias_nuevas") or dieta_anterior.calorias_totales or 2000,
+            request.get("preferencias"),
+            current_user.id_usuario
+        )
+
+    except DietaYaRenovada as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except SinPlanEstructurado as e:
+        logger.warning(f"⚠️  {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La dieta anterior no tiene plan semanal guardado; usa la renovación completa"
+        )
+    except PromptDemasiadoLargo as e:
+        logger.warning(f"⚠️  {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Las preferencias son demasiado largas"
+        )
+    except Exception as e:
+        logger.error(f"❌ Error renovando dieta por cambios: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error renovando dieta: {str(e)}"
+        )
+
+    logger.info(f"✅ Dieta {dieta_anterior.id_dieta} renovada por cambios: {nueva_dieta.id_dieta}")
+
+    return {
+        "id_dieta_nueva": nueva_dieta.id_dieta,
+        "id_dieta_anterior": dieta_anterior.id_dieta,
+        "nombre": nueva_dieta.nombre,
+        "mensaje": "Dieta actualizada exitosamente",
+        "fecha_vencimiento": nueva_dieta.fecha_vencimiento,
+        **resumen
+    }
+
+
 from fastapi.responses import FileResponse
 
 @router.get("/descargar-pdf/{dieta_id}")
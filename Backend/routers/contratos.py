@@ -14,6 +14,7 @@ from models.user import Usuario, TipoUsuarioEnum
 from models.contrato import Contrato, EstadoContrato
 from schemas.contrato import PagoStripeRequest, PagoStripeResponse, ContratoDetailResponse
 from services.stripe_service import StripeService
+from services.relaciones_contrato import relaciones_contrato
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/contratos", tags=["contratos"])
@@ -225,6 +226,7 @@ async def confirmar_pago(
             contrato.fecha_fin = contrato.fecha_inicio + timedelta(days=30 * contrato.duracion_meses)
 
             db.commit()
+            relaciones_contrato.invalidar(contrato.id_nutriologo)
             logger.info(f"✅ Contrato {contrato_id} activado correctamente")
         else:
             logger.error(f"❌ Contrato {contrato_id} no encontrado después de confirmar pago")
@@ -404,6 +406,7 @@ async def cancelar_contrato(
     try:
         contrato.estado = EstadoContrato.CANCELADO
         db.commit()
+        relaciones_contrato.invalidar(contrato.id_nutriologo)
 
         logger.info(f"✅ Contrato {contrato_id} cancelado por usuario {usuario_id}")
 
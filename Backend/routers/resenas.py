@@ -7,19 +7,23 @@ Endpoints:
 - PUT /api/resenas/{id} -> Editar reseña (solo cliente dueño)
 - DELETE /api/resenas/{id} -> Eliminar reseña (solo cliente dueño)
 - GET /api/resenas/stats/nutriologo/{id} -> Estadísticas agregadas
+- GET /api/resenas/stats/nutriologos?ids=1&ids=2 -> Estadísticas de varios nutriólogos
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Annotated
+from typing import Optional, List, Dict, Annotated, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, func
+from sqlalchemy import desc, and_, or_, func
 from datetime import datetime
 import logging
 
 from core.deps import get_db, get_current_user
+from core.cache import invalidar_etiquetas
 from models.resena import Resena
 from models.user import Usuario
+from models.resena_stats import ResenaStats
+from services import resena_stats_service
 
 logger = logging.getLogger(__name__)
 
@@ -67,8 +71,76 @@ class ResenaStatsOut(BaseModel):
     distribucion_estrellas: Dict[str, int]
 
 
+# Máximo de nutriólogos por petición de estadísticas en lote
+MAX_STATS_LOTE = 100
+
+
 # ============ HELPERS ============
 
+def _query_resenas_con_cliente(db: Session):
+    """
+    Consulta de reseñas con el nombre del cliente en un solo JOIN.
+    Selecciona solo las columnas que usa ResenaOut.
+    """
+    return db.query(
+        Resena.id_resena,
+        Resena.id_cliente,
+        Resena.id_nutriologo,
+        Resena.calificacion,
+        Resena.titulo,
+        Resena.comentario,
+        Resena.verificado,
+        Resena.creado_en,
+        Usuario.nombre.label("cliente_nombre")
+    ).outerjoin(Usuario, Usuario.id_usuario == Resena.id_cliente)
+
+
+def _fila_a_resena_out(fila) -> ResenaOut:
+    """Convierte una fila de _query_resenas_con_cliente en ResenaOut"""
+    return ResenaOut(
+        id_resena=fila.id_resena,
+        id_cliente=fila.id_cliente,
+        id_nutriologo=fila.id_nutriologo,
+        calificacion=fila.calificacion,
+        titulo=fila.titulo,
+        comentario=fila.comentario,
+        verificado=fila.verificado,
+        creado_en=fila.creado_en.isoformat() if fila.creado_en else None,
+        cliente_nombre=fila.cliente_nombre or "Cliente anónimo"
+    )
+
+
+def _codificar_cursor(fila) -> str:
+    """Cursor keyset: '<creado_en ISO>_<id_resena>'"""
+    return f"{fila.creado_en.isoformat()}_{fila.id_resena}"
+
+
+def _decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        fecha, id_resena = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(fecha), int(id_resena)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _stats_a_out(nutri_id: int, stats: Optional[ResenaStats]) -> ResenaStatsOut:
+    """Convierte el agregado (o su ausencia) en ResenaStatsOut"""
+    if stats is None or not stats.total:
+        return ResenaStatsOut(
+            id_nutriologo=nutri_id,
+            total_resenas=0,
+            calificacion_promedio=0.0,
+            distribucion_estrellas={"5": 0, "4": 0, "3": 0, "2": 0, "1": 0}
+        )
+
+    return ResenaStatsOut(
+        id_nutriologo=nutri_id,
+        total_resenas=stats.total,
+        calificacion_promedio=stats.promedio,
+        distribucion_estrellas=stats.distribucion()
+    )
+
+
 def _get_resena_or_404(db: Session, resena_id: int):
     """Obtiene una reseña o lanza 404"""
     try:
@@ -152,8 +224,10 @@ def crear_resena(
 
         logger.info(f"   Guardando en BD...")
         db.add(resena)
+        resena_stats_service.registrar_alta(db, resena.id_nutriologo, resena.calificacion, resena.verificado)
         db.commit()
         db.refresh(resena)
+        invalidar_etiquetas(f"resenas:{resena.id_nutriologo}")
 
         logger.info(f"✅ Reseña creada exitosamente: ID {resena.id_resena}")
 
@@ -185,20 +259,11 @@ def obtener_resena(
     Obtiene el detalle de una reseña específica (público)
     """
     try:
-        resena = _get_resena_or_404(db, resena_id)
-        cliente = db.query(Usuario).filter(Usuario.id_usuario == resena.id_cliente).first()
-
-        return ResenaOut(
-            id_resena=resena.id_resena,
-            id_cliente=resena.id_cliente,
-            id_nutriologo=resena.id_nutriologo,
-            calificacion=resena.calificacion,
-            titulo=resena.titulo,
-            comentario=resena.comentario,
-            verificado=resena.verificado,
-            creado_en=resena.creado_en.isoformat() if resena.creado_en else None,
-            cliente_nombre=getattr(cliente, "nombre", "Cliente anónimo") if cliente else "Cliente anónimo"
-        )
+        fila = _query_resenas_con_cliente(db).filter(Resena.id_resena == resena_id).first()
+        if not fila:
+            raise HTTPException(status_code=404, detail="Reseña no encontrada")
+
+        return _fila_a_resena_out(fila)
     except HTTPException:
         raise
     except Exception as e:
@@ -210,52 +275,52 @@ def obtener_resena(
 def listar_resenas_nutriologo(
     nutri_id: int,
     db: DbDep,
+    response: Response,
     solo_verificadas: bool = False,
     limit: int = 20,
+    cursor: Optional[str] = None,
     offset: int = 0
 ):
     """
     Obtiene las reseñas de un nutriólogo (público)
 
     ✅ CAMBIO: solo_verificadas por defecto es False (muestra todas)
+
+    Paginación keyset: la respuesta incluye el header X-Siguiente-Cursor,
+    que se envía como ?cursor= para pedir la página siguiente.
+    `offset` se mantiene solo por compatibilidad cuando no hay cursor.
     """
     try:
-        # Verificar que el nutriólogo existe
-        nutriologo = db.query(Usuario).filter(
-            Usuario.id_usuario == nutri_id
-        ).first()
-        if not nutriologo:
-            raise HTTPException(status_code=404, detail="Nutriólogo no encontrado")
+        limit = max(1, min(limit, 100))
 
-        # Construir query
-        qry = db.query(Resena).filter(Resena.id_nutriologo == nutri_id)
+        qry = _query_resenas_con_cliente(db).filter(Resena.id_nutriologo == nutri_id)
 
         if solo_verificadas:
             qry = qry.filter(Resena.verificado == True)
 
-        # Ordenar por más recientes
-        qry = qry.order_by(desc(Resena.creado_en))
-
-        resenas = qry.offset(offset).limit(limit).all()
-
-        # Enriquecer con info del cliente
-        result = []
-        for r in resenas:
-            cliente = db.query(Usuario).filter(Usuario.id_usuario == r.id_cliente).first()
-            out = ResenaOut(
-                id_resena=r.id_resena,
-                id_cliente=r.id_cliente,
-                id_nutriologo=r.id_nutriologo,
-                calificacion=r.calificacion,
-                titulo=r.titulo,
-                comentario=r.comentario,
-                verificado=r.verificado,
-                creado_en=r.creado_en.isoformat() if r.creado_en else None,
-                cliente_nombre=getattr(cliente, "nombre", "Cliente anónimo") if cliente else "Cliente anónimo"
-            )
-            result.append(out)
+        if cursor:
+            creado_en, id_resena = _decodificar_cursor(cursor)
+            qry = qry.filter(or_(
+                Resena.creado_en < creado_en,
+                and_(Resena.creado_en == creado_en, Resena.id_resena < id_resena)
+            ))
+        elif offset:
+            qry = qry.offset(offset)
+
+        # Ordenar por más recientes (id como desempate estable)
+        filas = qry.order_by(desc(Resena.creado_en), desc(Resena.id_resena)).limit(limit + 1).all()
 
-        return result
+        if len(filas) > limit:
+            filas = filas[:limit]
+            response.headers["X-Siguiente-Cursor"] = _codificar_cursor(filas[-1])
+
+        # Solo en la primera página vacía se comprueba que el nutriólogo existe
+        if not filas and not cursor and not offset:
+            existe = db.query(Usuario.id_usuario).filter(Usuario.id_usuario == nutri_id).first()
+            if not existe:
+                raise HTTPException(status_code=404, detail="Nutriólogo no encontrado")
+
+        return [_fila_a_resena_out(f) for f in filas]
 
     except HTTPException:
         raise
@@ -287,6 +352,9 @@ def actualizar_resena(
 
         # Actualizar campos
         if payload.calificacion is not None:
+            resena_stats_service.registrar_cambio(
+                db, resena.id_nutriologo, resena.calificacion, payload.calificacion, resena.verificado
+            )
             resena.calificacion = payload.calificacion
         if payload.titulo is not None:
             resena.titulo = payload.titulo
@@ -298,6 +366,7 @@ def actualizar_resena(
         db.add(resena)
         db.commit()
         db.refresh(resena)
+        invalidar_etiquetas(f"resenas:{resena.id_nutriologo}")
 
         logger.info(f"✅ Reseña actualizada: {resena_id}")
 
@@ -335,8 +404,10 @@ def eliminar_resena(
                 detail="Solo puedes eliminar tu propia reseña"
             )
 
+        resena_stats_service.registrar_baja(db, resena.id_nutriologo, resena.calificacion, resena.verificado)
         db.delete(resena)
         db.commit()
+        invalidar_etiquetas(f"resenas:{resena.id_nutriologo}")
 
         logger.info(f"✅ Reseña eliminada: {resena_id}")
 
@@ -360,53 +431,47 @@ def estadisticas_resenas(
 ):
     """
     Obtiene estadísticas agregadas de un nutriólogo (público)
+    Se leen de la tabla resena_stats (una búsqueda por clave primaria)
     - Total de reseñas
     - Calificación promedio
     - Distribución por estrellas
     """
     try:
-        # Verificar nutriólogo existe
-        nutriologo = db.query(Usuario).filter(
-            Usuario.id_usuario == nutri_id
-        ).first()
-        if not nutriologo:
-            raise HTTPException(status_code=404, detail="Nutriólogo no encontrado")
+        stats = resena_stats_service.obtener_stats(db, nutri_id)
 
-        # ✅ CAMBIO: Obtener todas las reseñas (no solo verificadas)
-        resenas = db.query(Resena).filter(
-            Resena.id_nutriologo == nutri_id
-        ).all()
+        # Sin fila de agregados: solo entonces se comprueba que el nutriólogo existe
+        if stats is None:
+            existe = db.query(Usuario.id_usuario).filter(Usuario.id_usuario == nutri_id).first()
+            if not existe:
+                raise HTTPException(status_code=404, detail="Nutriólogo no encontrado")
 
-        total = len(resenas)
+        return _stats_a_out(nutri_id, stats)
 
-        if total == 0:
-            return ResenaStatsOut(
-                id_nutriologo=nutri_id,
-                total_resenas=0,
-                calificacion_promedio=0.0,
-                distribucion_estrellas={"5": 0, "4": 0, "3": 0, "2": 0, "1": 0}
-            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error calculating review stats: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al calcular estadísticas")
 
-        # Promedio
-        suma_cal = sum(r.calificacion for r in resenas)
-        promedio = round(suma_cal / total, 1)
 
-        # Distribución (redondea hacia arriba para medias estrellas)
-        distribucion = {"5": 0, "4": 0, "3": 0, "2": 0, "1": 0}
-        for r in resenas:
-            estrella = str(round(r.calificacion))  # Redondea 4.5 -> 5, 4.3 -> 4
-            if estrella in distribucion:
-                distribucion[estrella] += 1
+@router.get("/stats/nutriologos", response_model=List[ResenaStatsOut])
+def estadisticas_resenas_lote(
+    db: DbDep,
+    ids: List[int] = Query(..., description="IDs de nutriólogos (?ids=1&ids=2)")
+):
+    """
+    Estadísticas de varios nutriólogos en una sola petición (público)
+    Pensado para el directorio: una llamada por página en lugar de una por tarjeta.
+    Los IDs sin reseñas (o inexistentes) devuelven estadísticas en cero.
+    """
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_STATS_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_STATS_LOTE} nutriólogos por petición")
 
-        return ResenaStatsOut(
-            id_nutriologo=nutri_id,
-            total_resenas=total,
-            calificacion_promedio=promedio,
-            distribucion_estrellas=distribucion
-        )
+    try:
+        stats = resena_stats_service.obtener_stats_lote(db, ids)
+        return [_stats_a_out(nutri_id, stats.get(nutri_id)) for nutri_id in ids]
 
-    except HTTPException:
-        raise
     except Exception as e:
-        logger.error(f"Error calculating review stats: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Error al calcular estadísticas")
\ No newline at end of file
+        logger.error(f"Error calculating batch review stats: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Error al calcular estadísticas")
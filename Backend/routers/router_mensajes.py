@@ -2,50 +2,205 @@
 Backend/routers/router_mensajes.py
 Router completo para gestionar mensajes entre usuarios
 Endpoints:
-- GET /api/mensajes/no-leidos -> Obtener número de mensajes no leídos
+- GET /api/mensajes/no-leidos -> Obtener número de mensajes no leídos (ETag / long-poll)
 - GET /api/mensajes/conversaciones -> Listar conversaciones del usuario
-- GET /api/mensajes/chat/{usuario_id} -> Obtener detalle de conversación
+- GET /api/mensajes/buscar -> Buscar en el historial de mensajes (texto completo)
+- GET /api/mensajes/chat/{usuario_id} -> Obtener detalle de conversación (sin efectos)
+- POST /api/mensajes/chat/{usuario_id}/leido -> Confirmar lectura hasta un mensaje
 - POST /api/mensajes/enviar -> Enviar un mensaje
+- POST /api/mensajes/enviar-lote -> Enviar un mensaje a varios destinatarios
 - PUT /api/mensajes/{mensaje_id}/marcar-leido -> Marcar mensaje como leído
+- PUT /api/mensajes/marcar-leidos -> Marcar varios mensajes como leídos
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, func
-from typing import Annotated, List, Optional
+from sqlalchemy import and_, or_, desc, func, insert
+from typing import Annotated, List, Optional, Tuple
 from datetime import datetime
 import logging
+import os
+import time
 
+from core.cache import etag_coincide
 from core.deps import get_db, get_current_user
-from models.mensajes import Mensaje
+from models.mensajes import Mensaje, LecturaConversacion
 from models.user import Usuario
+from services.contador_mensajes import contador_mensajes
+from services.archivo_mensajes import obtener_historial_conversacion, ultimos_mensajes_por_conversacion
+from services.busqueda_mensajes import BusquedaNoDisponible, buscar_mensajes, resaltar_fragmento
 from schemas.mensajes import (
     MensajeCreate,
+    MensajeLoteCreate,
+    MarcarLeidosLote,
+    MarcarLeidosHasta,
     MensajeResponse,
     ConversacionResponse,
-    ConversacionDetailResponse
+    ConversacionDetailResponse,
+    ResultadoBusquedaMensaje,
+    BusquedaMensajesResponse
 )
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/mensajes", tags=["mensajes"])
 
+# Cada cuántos segundos el long-poll de /no-leidos vuelve a consultar la BD;
+# también es la vida del ETag recordado en el proceso (retraso máximo con el
+# que se ve un cambio hecho en otro worker)
+MENSAJES_LONGPOLL_INTERVALO = float(os.getenv("MENSAJES_LONGPOLL_INTERVALO", "5"))
+
 # Tipados seguros
 DbDep = Annotated[Session, Depends(get_db)]
 UserDep = Annotated[Usuario, Depends(get_current_user)]
 
 
+# ============================================================
+# HELPER: Conteo de mensajes no leídos
+# ============================================================
+def _contar_no_leidos(db: Session, usuario_id: int) -> Tuple[dict, str]:
+    """
+    Conteo de no leídos del usuario y su ETag, en una sola consulta.
+
+    El ETag se deriva de la BD (no de estado del proceso) para que todos
+    los workers den la misma respuesta: cualquier mensaje nuevo cambia el
+    id máximo y cualquier lectura cambia el número de no leídos. Cada
+    proceso lo recuerda en contador_mensajes para responder los 304 sin
+    repetir la consulta.
+    """
+    no_leidos, conversaciones_no_leidas, ultimo_id = db.query(
+        func.count(Mensaje.id),
+        func.count(func.distinct(Mensaje.remitente_id)),
+        func.max(Mensaje.id)
+    ).filter(
+        and_(
+            Mensaje.destinatario_id == usuario_id,
+            Mensaje.leido == False
+        )
+    ).one()
+
+    no_leidos = no_leidos or 0
+    conversaciones_no_leidas = conversaciones_no_leidas or 0
+    etag = f'"{usuario_id}-{no_leidos}-{conversaciones_no_leidas}-{ultimo_id or 0}"'
+
+    return {
+        "no_leidos": no_leidos,
+        "conversaciones_no_leidas": conversaciones_no_leidas
+    }, etag
+
+
+async def _estado_no_leidos(db: Session, usuario_id: int, si_no_coincide: Optional[str]) -> Tuple[Optional[dict], str]:
+    """
+    (conteo, etag) de /no-leidos. Si el ETag recordado en el proceso sigue
+    vigente y coincide con If-None-Match no se consulta la BD y el conteo
+    es None (la respuesta será 304); en otro caso se consulta y se recuerda.
+    """
+    # La versión se lee antes de consultar para no perder un aviso intermedio
+    version = contador_mensajes.version(usuario_id)
+    etag = contador_mensajes.etag_vigente(usuario_id, MENSAJES_LONGPOLL_INTERVALO)
+    if etag is not None and etag_coincide(si_no_coincide, etag):
+        return None, etag
+
+    conteo, etag = await run_in_threadpool(_contar_no_leidos, db, usuario_id)
+    contador_mensajes.recordar_etag(usuario_id, version, etag)
+    return conteo, etag
+
+
+# ============================================================
+# HELPER: Confirmar lectura hasta una marca (watermark)
+# ============================================================
+def _marcar_leidos_hasta(
+    db: Session,
+    usuario_id: int,
+    otro_usuario_id: int,
+    hasta_id: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Marca como leídos los mensajes de otro_usuario_id hacia usuario_id
+    con id <= hasta_id (todos si hasta_id es None) en un solo UPDATE.
+
+    Evita escribir cuando no hay nada pendiente:
+    - Si hasta_id ya está cubierto por la marca guardada no toca mensajes
+    - Si no hay no leídos en el rango no ejecuta el UPDATE ni el commit
+
+    La marca decide si hay algo que hacer; el UPDATE sigue poniendo
+    `leido` en cada mensaje porque los conteos, la lista de conversaciones
+    y el archivo se basan en esa columna.
+
+    Returns:
+        (mensajes_marcados, ultimo_leido_id)
+    """
+    lectura = db.get(LecturaConversacion, (usuario_id, otro_usuario_id))
+    ultimo_leido_id = lectura.ultimo_leido_id if lectura else 0
+
+    if hasta_id is not None and hasta_id <= ultimo_leido_id:
+        return 0, ultimo_leido_id
+
+    filtros = [
+        Mensaje.remitente_id == otro_usuario_id,
+        Mensaje.destinatario_id == usuario_id,
+        Mensaje.leido == False
+    ]
+    if hasta_id is not None:
+        filtros.append(Mensaje.id <= hasta_id)
+
+    tope = db.query(func.max(Mensaje.id)).filter(and_(*filtros)).scalar()
+    if tope is None:
+        return 0, ultimo_leido_id
+
+    marcados = db.query(Mensaje).filter(
+        and_(*filtros[:3], Mensaje.id <= tope)
+    ).update(
+        {"leido": True, "fecha_actualizacion": datetime.utcnow()},
+        synchronize_session=False
+    )
+
+    if lectura is None:
+        lectura = LecturaConversacion(
+            usuario_id=usuario_id,
+            otro_usuario_id=otro_usuario_id,
+            ultimo_leido_id=tope
+        )
+        db.add(lectura)
+    elif tope > lectura.ultimo_leido_id:
+        lectura.ultimo_leido_id = tope
+
+    db.commit()
+
+    if marcados:
+        contador_mensajes.incrementar(usuario_id)
+
+    return marcados, max(ultimo_leido_id, tope)
+
+
 # ============================================================
 # ENDPOINT: Obtener número de mensajes no leídos
 # ============================================================
 @router.get("/no-leidos", response_model=dict)
-def obtener_mensajes_no_leidos(
+async def obtener_mensajes_no_leidos(
+    request: Request,
+    response: Response,
     current_user: UserDep,
-    db: DbDep
+    db: DbDep,
+    esperar: bool = False,
+    timeout: int = Query(25, ge=1, le=60)
 ):
     """
     Obtiene el número total de mensajes no leídos del usuario actual
 
+    Query Parameters:
+        esperar: Si es true y el cliente envía If-None-Match con el ETag
+                 vigente, mantiene la petición abierta (long-poll) hasta
+                 que llegue un cambio o se agote el timeout
+        timeout: Segundos máximos de espera en modo long-poll (1-60)
+
+    Headers:
+        If-None-Match: ETag de la última respuesta (admite W/ y listas). Si
+                       los no leídos no han cambiado se responde 304 sin
+                       cuerpo; mientras el ETag recordado en el proceso siga
+                       vigente, sin consultar la BD.
+
     Returns:
         {
             "no_leidos": int,
@@ -54,29 +209,38 @@ def obtener_mensajes_no_leidos(
     """
     try:
         usuario_id = current_user.id_usuario
+        si_no_coincide = request.headers.get("if-none-match")
+
+        version = contador_mensajes.version(usuario_id)
+        conteo, etag = await _estado_no_leidos(db, usuario_id, si_no_coincide)
+
+        if etag_coincide(si_no_coincide, etag):
+            if not esperar:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+            # Long-poll: los cambios hechos en este proceso despiertan la espera
+            # al instante; los de otros workers se detectan al caducar el ETag
+            # recordado (cada MENSAJES_LONGPOLL_INTERVALO segundos)
+            limite = time.monotonic() + timeout
+            while etag_coincide(si_no_coincide, etag):
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+                # Liberar la conexión del pool mientras la petición espera
+                await run_in_threadpool(db.rollback)
+                await contador_mensajes.esperar_cambio(
+                    usuario_id, version, min(restante, MENSAJES_LONGPOLL_INTERVALO)
+                )
+                version = contador_mensajes.version(usuario_id)
+                conteo, etag = await _estado_no_leidos(db, usuario_id, si_no_coincide)
 
-        # Contar mensajes no leídos
-        no_leidos = db.query(func.count(Mensaje.id)).filter(
-            and_(
-                Mensaje.destinatario_id == usuario_id,
-                Mensaje.leido == False
-            )
-        ).scalar() or 0
-
-        # Contar conversaciones con mensajes no leídos
-        conversaciones_no_leidas = db.query(func.count(func.distinct(Mensaje.remitente_id))).filter(
-            and_(
-                Mensaje.destinatario_id == usuario_id,
-                Mensaje.leido == False
-            )
-        ).scalar() or 0
+        logger.info(f"✅ Usuario {usuario_id} tiene {conteo['no_leidos']} mensajes no leídos")
 
-        logger.info(f"✅ Usuario {usuario_id} ({current_user.nombre}) tiene {no_leidos} mensajes no leídos")
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
 
-        return {
-            "no_leidos": no_leidos,
-            "conversaciones_no_leidas": conversaciones_no_leidas
-        }
+        return conteo
     except Exception as e:
         logger.error(f"❌ Error obteniendo mensajes no leídos: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -112,75 +276,46 @@ def obtener_conversaciones(
     try:
         usuario_id = current_user.id_usuario
 
-        # Obtener IDs de todos los usuarios con los que ha hablado
-        conversadores = db.query(
-            func.distinct(
-                func.coalesce(Mensaje.remitente_id, Mensaje.destinatario_id)
-            )
-        ).filter(
-            or_(
-                Mensaje.remitente_id == usuario_id,
-                Mensaje.destinatario_id == usuario_id
-            )
-        ).all()
+        # Último mensaje de cada conversación (tabla caliente + archivo), ya ordenado
+        ultimos = ultimos_mensajes_por_conversacion(db, usuario_id)
+        ids = [u.otro_usuario_id for u in ultimos]
 
-        conversadores_ids = [c[0] for c in conversadores if c[0] != usuario_id]
+        usuarios = {
+            u.id_usuario: u
+            for u in db.query(Usuario).filter(Usuario.id_usuario.in_(ids)).all()
+        } if ids else {}
+
+        # No leídos por remitente (los archivados siempre están leídos)
+        no_leidos = dict(
+            db.query(Mensaje.remitente_id, func.count(Mensaje.id)).filter(
+                Mensaje.destinatario_id == usuario_id,
+                Mensaje.leido == False
+            ).group_by(Mensaje.remitente_id).all()
+        ) if ids else {}
 
         conversaciones = []
 
-        for otro_usuario_id in conversadores_ids:
-            try:
-                # Obtener último mensaje
-                ultimo_mensaje = db.query(Mensaje).filter(
-                    or_(
-                        and_(Mensaje.remitente_id == usuario_id, Mensaje.destinatario_id == otro_usuario_id),
-                        and_(Mensaje.remitente_id == otro_usuario_id, Mensaje.destinatario_id == usuario_id)
-                    )
-                ).order_by(desc(Mensaje.fecha_creacion)).first()
-
-                if not ultimo_mensaje:
-                    continue
-
-                # Obtener info del otro usuario
-                otro_usuario = db.query(Usuario).filter(Usuario.id_usuario == otro_usuario_id).first()
-
-                if not otro_usuario:
-                    continue
-
-                # Contar mensajes no leídos
-                no_leidos = db.query(func.count(Mensaje.id)).filter(
-                    and_(
-                        Mensaje.remitente_id == otro_usuario_id,
-                        Mensaje.destinatario_id == usuario_id,
-                        Mensaje.leido == False
-                    )
-                ).scalar() or 0
-
-                # Obtener tipo de usuario (manejo seguro de enum)
-                tipo_usuario = "usuario"
-                if otro_usuario.tipo_usuario:
-                    tipo_usuario = otro_usuario.tipo_usuario.value if hasattr(otro_usuario.tipo_usuario, 'value') else str(otro_usuario.tipo_usuario)
-
-                conversaciones.append(
-                    ConversacionResponse(
-                        otro_usuario_id=otro_usuario_id,
-                        otro_usuario_nombre=otro_usuario.nombre,
-                        otro_usuario_foto=getattr(otro_usuario, 'documento_url', None),
-                        otro_usuario_tipo=tipo_usuario,
-                        ultimo_mensaje=ultimo_mensaje.contenido[:100] if ultimo_mensaje.contenido else "Sin mensaje",
-                        fecha_ultimo_mensaje=ultimo_mensaje.fecha_creacion.isoformat() if ultimo_mensaje.fecha_creacion else None,
-                        mensajes_no_leidos=no_leidos
-                    )
-                )
-            except Exception as item_error:
-                logger.warning(f"⚠️  Error procesando conversación con usuario {otro_usuario_id}: {str(item_error)}")
+        for ultimo in ultimos:
+            otro_usuario = usuarios.get(ultimo.otro_usuario_id)
+            if not otro_usuario:
                 continue
 
-        # Ordenar por fecha más reciente
-        conversaciones.sort(
-            key=lambda x: x.fecha_ultimo_mensaje or "",
-            reverse=True
-        )
+            # Obtener tipo de usuario (manejo seguro de enum)
+            tipo_usuario = "usuario"
+            if otro_usuario.tipo_usuario:
+                tipo_usuario = otro_usuario.tipo_usuario.value if hasattr(otro_usuario.tipo_usuario, 'value') else str(otro_usuario.tipo_usuario)
+
+            conversaciones.append(
+                ConversacionResponse(
+                    otro_usuario_id=ultimo.otro_usuario_id,
+                    otro_usuario_nombre=otro_usuario.nombre,
+                    otro_usuario_foto=getattr(otro_usuario, 'documento_url', None),
+                    otro_usuario_tipo=tipo_usuario,
+                    ultimo_mensaje=ultimo.contenido[:100] if ultimo.contenido else "Sin mensaje",
+                    fecha_ultimo_mensaje=ultimo.fecha_creacion.isoformat() if ultimo.fecha_creacion else None,
+                    mensajes_no_leidos=no_leidos.get(ultimo.otro_usuario_id, 0)
+                )
+            )
 
         logger.info(f"✅ Usuario {usuario_id} ({current_user.nombre}) tiene {len(conversaciones)} conversaciones")
         return conversaciones
@@ -193,6 +328,81 @@ def obtener_conversaciones(
         )
 
 
+# ============================================================
+# ENDPOINT: Buscar en el historial de mensajes
+# ============================================================
+@router.get("/buscar", response_model=BusquedaMensajesResponse)
+def buscar_en_mensajes(
+    current_user: UserDep,
+    db: DbDep,
+    q: str = Query(..., min_length=2, max_length=100),
+    con_usuario: Optional[int] = None,
+    cursor: Optional[int] = None,
+    limite: int = Query(20, ge=1, le=50)
+):
+    """
+    Busca texto en los mensajes enviados o recibidos por el usuario actual
+
+    Usa el índice de texto completo (FULLTEXT en MySQL, FTS5 en SQLite).
+
+    Query Parameters:
+        q: Texto a buscar (todas las palabras, con coincidencia por prefijo)
+        con_usuario: Limitar a la conversación con este usuario
+        cursor: siguiente_cursor de la página anterior
+        limite: Resultados por página (1-50)
+
+    Returns:
+        {
+            "resultados": [
+                {
+                    "id": int,
+                    "remitente_id": int,
+                    "destinatario_id": int,
+                    "otro_usuario_id": int,
+                    "fragmento": str,      # HTML escapado con <mark>
+                    "fecha_creacion": str
+                }
+            ],
+            "siguiente_cursor": int | null
+        }
+    """
+    try:
+        usuario_id = current_user.id_usuario
+
+        mensajes, siguiente_cursor = buscar_mensajes(
+            db, usuario_id, q, con_usuario=con_usuario, cursor=cursor, limite=limite
+        )
+
+        resultados = [
+            ResultadoBusquedaMensaje(
+                id=m.id,
+                remitente_id=m.remitente_id,
+                destinatario_id=m.destinatario_id,
+                otro_usuario_id=m.destinatario_id if m.remitente_id == usuario_id else m.remitente_id,
+                fragmento=resaltar_fragmento(m.contenido, q),
+                fecha_creacion=m.fecha_creacion.isoformat() if m.fecha_creacion else None
+            )
+            for m in mensajes
+        ]
+
+        logger.info(f"🔎 Búsqueda de {usuario_id}: {len(resultados)} resultados")
+
+        return BusquedaMensajesResponse(resultados=resultados, siguiente_cursor=siguiente_cursor)
+
+    except BusquedaNoDisponible as e:
+        logger.error(f"❌ {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="La búsqueda de mensajes no está disponible"
+        )
+    except Exception as e:
+        logger.error(f"❌ Error buscando mensajes: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al buscar mensajes"
+        )
+
+
 # ============================================================
 # ENDPOINT: Obtener detalle de una conversación
 # ============================================================
@@ -200,20 +410,33 @@ def obtener_conversaciones(
 def obtener_conversacion_detalle(
     usuario_id: int,
     current_user: UserDep,
-    db: DbDep
+    db: DbDep,
+    limite: Optional[int] = Query(None, ge=1, le=200),
+    antes_de: Optional[int] = None
 ):
     """
     Obtiene todos los mensajes de una conversación específica
 
+    No modifica el estado de lectura: el cliente confirma lo que leyó con
+    POST /api/mensajes/chat/{usuario_id}/leido
+
+    Incluye de forma transparente los mensajes movidos a mensajes_archivo.
+
     Path Parameters:
         usuario_id: ID del otro usuario en la conversación
 
+    Query Parameters:
+        limite: Número máximo de mensajes (los más recientes); sin él se
+                devuelve el historial completo
+        antes_de: cursor_anterior de la página previa
+
     Returns:
         {
             "otro_usuario_id": int,
             "otro_usuario_nombre": str,
             "otro_usuario_foto": str | null,
             "otro_usuario_tipo": str,
+            "cursor_anterior": int | null,
             "mensajes": [
                 {
                     "id": int,
@@ -238,23 +461,10 @@ def obtener_conversacion_detalle(
                 detail="Usuario no encontrado"
             )
 
-        # Obtener todos los mensajes de la conversación
-        mensajes = db.query(Mensaje).filter(
-            or_(
-                and_(Mensaje.remitente_id == usuario_actual_id, Mensaje.destinatario_id == usuario_id),
-                and_(Mensaje.remitente_id == usuario_id, Mensaje.destinatario_id == usuario_actual_id)
-            )
-        ).order_by(Mensaje.fecha_creacion).all()
-
-        # Marcar como leídos los mensajes que recibió el usuario actual
-        db.query(Mensaje).filter(
-            and_(
-                Mensaje.remitente_id == usuario_id,
-                Mensaje.destinatario_id == usuario_actual_id,
-                Mensaje.leido == False
-            )
-        ).update({"leido": True, "fecha_actualizacion": datetime.utcnow()})
-        db.commit()
+        # Obtener los mensajes de la conversación (tabla caliente + archivo)
+        mensajes, cursor_anterior = obtener_historial_conversacion(
+            db, usuario_actual_id, usuario_id, limite=limite, antes_de=antes_de
+        )
 
         # Convertir mensajes a respuesta
         mensajes_response = [
@@ -282,7 +492,8 @@ def obtener_conversacion_detalle(
             otro_usuario_nombre=otro_usuario.nombre,
             otro_usuario_foto=getattr(otro_usuario, 'documento_url', None),
             otro_usuario_tipo=tipo_usuario,
-            mensajes=mensajes_response
+            mensajes=mensajes_response,
+            cursor_anterior=cursor_anterior
         )
 
     except HTTPException:
@@ -295,6 +506,59 @@ def obtener_conversacion_detalle(
         )
 
 
+# ============================================================
+# ENDPOINT: Confirmar lectura de una conversación
+# ============================================================
+@router.post("/chat/{usuario_id}/leido", response_model=dict)
+def confirmar_lectura_conversacion(
+    usuario_id: int,
+    current_user: UserDep,
+    db: DbDep,
+    datos: Optional[MarcarLeidosHasta] = None
+):
+    """
+    Confirma que el usuario actual leyó la conversación hasta un mensaje
+
+    Path Parameters:
+        usuario_id: ID del otro usuario en la conversación
+
+    Request Body (opcional):
+        {
+            "hasta_id": int   # último mensaje leído; si se omite, todos
+        }
+
+    Returns:
+        {
+            "success": bool,
+            "marcados": int,
+            "ultimo_leido_id": int
+        }
+    """
+    try:
+        hasta_id = datos.hasta_id if datos else None
+
+        marcados, ultimo_leido_id = _marcar_leidos_hasta(
+            db, current_user.id_usuario, usuario_id, hasta_id
+        )
+
+        if marcados:
+            logger.info(f"✅ {marcados} mensajes de {usuario_id} marcados como leídos por {current_user.id_usuario}")
+
+        return {
+            "success": True,
+            "marcados": marcados,
+            "ultimo_leido_id": ultimo_leido_id
+        }
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error confirmando lectura: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al confirmar lectura"
+        )
+
+
 # ============================================================
 # ENDPOINT: Enviar un mensaje
 # ============================================================
@@ -350,6 +614,8 @@ def enviar_mensaje(
         db.commit()
         db.refresh(nuevo_mensaje)
 
+        contador_mensajes.incrementar(mensaje_data.destinatario_id)
+
         logger.info(f"✅ Mensaje enviado de {usuario_id} ({current_user.nombre}) a {mensaje_data.destinatario_id}")
 
         return MensajeResponse(
@@ -372,6 +638,96 @@ def enviar_mensaje(
         )
 
 
+# ============================================================
+# ENDPOINT: Enviar un mensaje a varios destinatarios
+# ============================================================
+@router.post("/enviar-lote", response_model=dict, status_code=status.HTTP_201_CREATED)
+def enviar_mensaje_lote(
+    datos: MensajeLoteCreate,
+    current_user: UserDep,
+    db: DbDep
+):
+    """
+    Envía el mismo mensaje a varios usuarios en una sola transacción
+
+    Los destinatarios se validan con una sola consulta IN y los mensajes
+    se insertan con un único executemany.
+
+    Request Body:
+        {
+            "destinatarios_ids": [int, ...],   # máx. 500
+            "contenido": str
+        }
+
+    Returns:
+        {
+            "success": bool,
+            "enviados": int,
+            "destinatarios_ids": [int, ...]
+        }
+    """
+    try:
+        usuario_id = current_user.id_usuario
+        destinatarios_ids = list(dict.fromkeys(datos.destinatarios_ids))
+
+        # Validar que no se envíe mensaje a sí mismo
+        if usuario_id in destinatarios_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No puedes enviar mensajes a ti mismo"
+            )
+
+        # Validar que todos los destinatarios existen (una sola consulta)
+        existentes = {
+            fila[0] for fila in db.query(Usuario.id_usuario).filter(
+                Usuario.id_usuario.in_(destinatarios_ids)
+            ).all()
+        }
+        faltantes = [d for d in destinatarios_ids if d not in existentes]
+        if faltantes:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Usuarios destinatarios no existen: {faltantes}"
+            )
+
+        ahora = datetime.utcnow()
+        db.execute(
+            insert(Mensaje),
+            [
+                {
+                    "remitente_id": usuario_id,
+                    "destinatario_id": destinatario_id,
+                    "contenido": datos.contenido,
+                    "leido": False,
+                    "fecha_creacion": ahora,
+                    "fecha_actualizacion": ahora
+                }
+                for destinatario_id in destinatarios_ids
+            ]
+        )
+        db.commit()
+
+        contador_mensajes.incrementar(*destinatarios_ids)
+
+        logger.info(f"✅ Mensaje de {usuario_id} ({current_user.nombre}) enviado a {len(destinatarios_ids)} destinatarios")
+
+        return {
+            "success": True,
+            "enviados": len(destinatarios_ids),
+            "destinatarios_ids": destinatarios_ids
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error enviando mensajes en lote: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al enviar mensajes"
+        )
+
+
 # ============================================================
 # ENDPOINT: Marcar mensaje como leído
 # ============================================================
@@ -406,9 +762,11 @@ def marcar_mensaje_leido(
             )
 
         # Marcar como leído
-        mensaje.leido = True
-        mensaje.fecha_actualizacion = datetime.utcnow()
-        db.commit()
+        if not mensaje.leido:
+            mensaje.leido = True
+            mensaje.fecha_actualizacion = datetime.utcnow()
+            db.commit()
+            contador_mensajes.incrementar(usuario_id)
 
         logger.info(f"✅ Mensaje {mensaje_id} marcado como leído por {usuario_id}")
 
@@ -421,4 +779,72 @@ def marcar_mensaje_leido(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error al marcar como leído"
-        )
\ No newline at end of file
+        )
+
+
+# ============================================================
+# ENDPOINT: Marcar varios mensajes como leídos
+# ============================================================
+@router.put("/marcar-leidos", response_model=dict)
+def marcar_mensajes_leidos_lote(
+    datos: MarcarLeidosLote,
+    current_user: UserDep,
+    db: DbDep
+):
+    """
+    Marca varios mensajes como leídos con un solo UPDATE
+
+    Request Body (una de las dos formas):
+        {"ids": [int, ...]}                         # mensajes concretos
+        {"remitente_id": int, "hasta_id": int}      # marca de lectura
+
+    Solo se marcan mensajes cuyo destinatario es el usuario actual;
+    los IDs ajenos o inexistentes se ignoran.
+
+    Returns:
+        {
+            "success": bool,
+            "marcados": int
+        }
+    """
+    try:
+        usuario_id = current_user.id_usuario
+
+        if datos.ids:
+            marcados = db.query(Mensaje).filter(
+                and_(
+                    Mensaje.id.in_(set(datos.ids)),
+                    Mensaje.destinatario_id == usuario_id,
+                    Mensaje.leido == False
+                )
+            ).update(
+                {"leido": True, "fecha_actualizacion": datetime.utcnow()},
+                synchronize_session=False
+            )
+
+            if marcados:
+                db.commit()
+                contador_mensajes.incrementar(usuario_id)
+
+        elif datos.remitente_id:
+            marcados, _ = _marcar_leidos_hasta(db, usuario_id, datos.remitente_id, datos.hasta_id)
+
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Indica 'ids' o 'remitente_id'"
+            )
+
+        logger.info(f"✅ {marcados} mensajes marcados como leídos por {usuario_id}")
+
+        return {"success": True, "marcados": marcados}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error marcando mensajes como leídos: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error al marcar como leídos"
+        )
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, status
 from pydantic import BaseModel
 from typing import Optional, List, Any, Dict, Annotated
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from datetime import datetime, timedelta
+from sqlalchemy import desc, func
+from datetime import date, datetime
 import os
 import uuid
 import enum
@@ -12,6 +12,13 @@ import shutil
 from core.deps import get_db, get_current_user
 from models.user import Usuario, ObjetivoUsuario, TipoUsuarioEnum
 from models import ValidacionNutriologo
+from models.resena_stats import ResenaStats
+from services.resena_stats_service import obtener_stats_lote, PRIOR_MEDIA
+from services.busqueda_nutriologos import MAX_RESULTADOS_BUSQUEDA, indice_nutriologos
+from core.cache import invalidar_etiquetas
+from services.catalogo_enfermedades import ENFERMEDADES
+from services.progreso_service import rachas_progreso, serie_progreso
+from services.relaciones_contrato import relaciones_contrato
 
 router = APIRouter(tags=["Usuarios"])  # <- SIN prefix aquí; se monta en main.py
 
@@ -58,6 +65,25 @@ class ProgresoOut(BaseModel):
     imc_series: Optional[List[float]] = None
 
 
+class PuntoProgresoOut(BaseModel):
+    inicio: date                   # día, o lunes de la semana
+    registros: int
+    peso_min: Optional[float] = None
+    peso_avg: Optional[float] = None
+    peso_max: Optional[float] = None
+    imc_avg: Optional[float] = None
+
+
+class SerieProgresoOut(BaseModel):
+    granularidad: str              # dia | semana
+    desde: Optional[date] = None
+    hasta: Optional[date] = None
+    puntos: List[PuntoProgresoOut]
+    racha_actual: int
+    racha_maxima: int
+    ultimo_registro: Optional[date] = None
+
+
 # ---------- Helpers ----------
 def _to_dict(u: Usuario) -> Dict[str, Any]:
     return {
@@ -190,6 +216,8 @@ async def subir_validacion(
     db.commit()
     db.refresh(db_user)
     db.refresh(v)
+    indice_nutriologos.invalidar()
+    invalidar_etiquetas(f"nutriologo:{db_user.id_usuario}")
 
     return {
         "ok": True,
@@ -246,6 +274,8 @@ def eliminar_validacion(
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    indice_nutriologos.invalidar()
+    invalidar_etiquetas(f"nutriologo:{db_user.id_usuario}")
     return {"ok": True}
 
 
@@ -319,6 +349,8 @@ def decidir_validacion(user_id: int, payload: DecisionPayload, db: DbDep):
     db.commit()
     db.refresh(user)
     db.refresh(v)
+    indice_nutriologos.invalidar()
+    invalidar_etiquetas(f"nutriologo:{user_id}")
 
     return {
         "ok": True,
@@ -332,6 +364,25 @@ def decidir_validacion(user_id: int, payload: DecisionPayload, db: DbDep):
 # ===========================================================
 #  LISTA PÚBLICA / PERFIL PÚBLICO DE NUTRIÓLOGOS (antes de /{user_id})
 # ===========================================================
+def _mejor_calificados(db: Session, ids, limite: int) -> List[int]:
+    """
+    Los `limite` ids mejor calificados, con el mismo orden que
+    order=calificacion (sin reseñas cuentan como la media a priori). Lee
+    resena_stats completa (una fila por nutriólogo con reseñas) en lugar de
+    pasar todas las coincidencias a un IN.
+    """
+    stats = {
+        fila.id_nutriologo: (fila.puntuacion, fila.total)
+        for fila in db.query(ResenaStats.id_nutriologo, ResenaStats.puntuacion, ResenaStats.total)
+    }
+
+    def clave(id_usuario: int):
+        puntuacion, total = stats.get(id_usuario, (None, None))
+        return (PRIOR_MEDIA if puntuacion is None else puntuacion, total or 0, id_usuario)
+
+    return sorted(ids, key=clave, reverse=True)[:limite]
+
+
 @router.get("/nutriologos", response_model=Dict[str, Any], tags=["Nutriólogos"])
 def listar_nutriologos(
         db: DbDep,
@@ -339,7 +390,8 @@ def listar_nutriologos(
         solo_validados: bool = True,          # por defecto solo validados
         page: int = 1,
         size: int = 20,
-        order: Optional[str] = "recientes"    # 'recientes' | 'nombre'
+        order: Optional[str] = "recientes",   # 'recientes' | 'nombre' | 'calificacion'
+        incluir_calificaciones: bool = False  # añade calificacion_promedio y total_resenas
 ):
     if page < 1:
         page = 1
@@ -351,18 +403,35 @@ def listar_nutriologos(
     if solo_validados and hasattr(Usuario, "validado"):
         qry = qry.filter(Usuario.validado == True)  # noqa: E712
 
-    if q:
-        # búsqueda simple por nombre o profesión si existen
-        conds = []
-        if hasattr(Usuario, "nombre"):
-            conds.append(Usuario.nombre.ilike(f"%{q}%"))
-        if hasattr(Usuario, "profesion"):
-            conds.append(Usuario.profesion.ilike(f"%{q}%"))
-        if conds:
-            from sqlalchemy import or_
-            qry = qry.filter(or_(*conds))
-
-    if order == "nombre" and hasattr(Usuario, "nombre"):
+    # Búsqueda por nombre/profesión con el índice en memoria (sin acentos,
+    # por prefijo y tolerante a erratas). Con búsqueda el total sale del
+    # índice en lugar de un COUNT: puede ir unos segundos por detrás de la BD.
+    total_aproximado = bool(q and q.strip())
+    if total_aproximado:
+        ids = indice_nutriologos.buscar(db, q, solo_validados)
+        if not ids:
+            return {"page": page, "size": size, "total": 0, "total_aproximado": True, "items": []}
+        total = len(ids)
+        if total > MAX_RESULTADOS_BUSQUEDA:
+            # El IN se acota a las primeras coincidencias según el orden
+            # pedido (por nombre: las más recientes, ordenadas por nombre)
+            if order == "calificacion":
+                ids = _mejor_calificados(db, ids, MAX_RESULTADOS_BUSQUEDA)
+            else:
+                ids = sorted(ids, reverse=True)[:MAX_RESULTADOS_BUSQUEDA]
+        qry = qry.filter(Usuario.id_usuario.in_(ids))
+    else:
+        total = qry.count()
+
+    if order == "calificacion":
+        # Ranking por promedio bayesiano precalculado en resena_stats;
+        # sin reseñas cuentan como la media a priori
+        qry = qry.outerjoin(ResenaStats, ResenaStats.id_nutriologo == Usuario.id_usuario).order_by(
+            func.coalesce(ResenaStats.puntuacion, PRIOR_MEDIA).desc(),
+            func.coalesce(ResenaStats.total, 0).desc(),
+            Usuario.id_usuario.desc(),
+        )
+    elif order == "nombre" and hasattr(Usuario, "nombre"):
         qry = qry.order_by(Usuario.nombre.asc())
     else:
         # recientes por fecha de registro si existe, si no por id desc
@@ -371,7 +440,6 @@ def listar_nutriologos(
         elif hasattr(Usuario, "id_usuario"):
             qry = qry.order_by(Usuario.id_usuario.desc())
 
-    total = qry.count()
     rows = qry.offset(offset).limit(size).all()
 
     items: List[NutriologoPublicOut] = []
@@ -385,11 +453,22 @@ def listar_nutriologos(
             documento_url=getattr(u, "documento_url", None),
         ))
 
+    items_out = [i.dict() for i in items]
+
+    if incluir_calificaciones:
+        # Una sola consulta a resena_stats para toda la página
+        stats = obtener_stats_lote(db, [i["id_usuario"] for i in items_out])
+        for item in items_out:
+            s = stats.get(item["id_usuario"])
+            item["calificacion_promedio"] = s.promedio if s else 0.0
+            item["total_resenas"] = s.total if s else 0
+
     return {
         "page": page,
         "size": size,
         "total": total,
-        "items": [i.dict() for i in items],
+        "total_aproximado": total_aproximado,
+        "items": items_out,
     }
 
 
@@ -416,6 +495,13 @@ def ver_nutriologo_publico(nutri_id: int, db: DbDep):
     )
 
 
+# ---------- Catálogo de enfermedades (antes de /{user_id}) ----------
+@router.get("/illnesses", response_model=List[str])
+def illnesses_catalog():
+    # Mismo catálogo que /api/catalogo/enfermedades
+    return ENFERMEDADES
+
+
 # ===========================================================
 #                 ENDPOINTS EXISTENTES
 # ===========================================================
@@ -468,19 +554,12 @@ def update_user(user_id: int, payload: UsuarioUpdate, db: DbDep):
     db.add(u)
     db.commit()
     db.refresh(u)
+    if u.tipo_usuario == TipoUsuarioEnum.nutriologo:
+        indice_nutriologos.invalidar()
+        invalidar_etiquetas(f"nutriologo:{user_id}")
     return _to_dict(u)
 
 
-# ---------- Catálogo de enfermedades ----------
-@router.get("/illnesses", response_model=List[str])
-def illnesses_catalog():
-    return [
-        "Diabetes", "Hipertensión", "Tiroides", "Cáncer", "Asma",
-        "Cardiopatías", "Insuficiencia renal", "Epilepsia", "Colesterol alto",
-        "Obesidad", "Artritis", "Migraña"
-    ]
-
-
 # ---------- Progreso del usuario (datos reales si hay historial) ----------
 @router.get("/{user_id}/progress", response_model=ProgresoOut)
 def get_user_progress(user_id: int, db: DbDep):
@@ -492,47 +571,26 @@ def get_user_progress(user_id: int, db: DbDep):
     peso_actual = u.peso
     altura = u.altura
 
-    # -------- Series desde el historial (si existe relación u.progresos) --------
-    progresos = []
-    try:
-        progresos = list(getattr(u, "progresos", []) or [])
-    except Exception:
-        progresos = []
-
-    # ordenar por fecha ascendente si existe atributo 'fecha'
-    def _key_fecha(p):
-        f = getattr(p, "fecha", None)
-        if isinstance(f, datetime):
-            return f
-        return datetime.min
-
-    progresos.sort(key=_key_fecha)
+    # -------- Series desde la tabla progreso (un punto por día, agrupado en SQL) --------
+    serie = serie_progreso(db, user_id)
 
     labels: List[str] = []
     peso_series: List[float] = []
     imc_series: List[float] = []
 
-    if progresos:
-        for p in progresos:
-            f = getattr(p, "fecha", None)
-            lbl = f.strftime("%d %b") if isinstance(f, datetime) else ""
-            peso_p = getattr(p, "peso", None)
-            imc_p = getattr(p, "imc", None)
-
-            labels.append(lbl or f"P{len(labels)+1}")
-
-            if isinstance(peso_p, (int, float)):
-                peso_series.append(float(peso_p))
-                if isinstance(imc_p, (int, float)):
-                    imc_series.append(float(imc_p))
-                else:
-                    if isinstance(altura, (int, float)) and altura > 0:
-                        imc_series.append(round(float(peso_p) / (altura * altura), 1))
-                    else:
-                        imc_series.append(0.0)
+    for p in serie:
+        labels.append(p.inicio.strftime("%d %b"))
+        if p.peso_avg is not None:
+            peso_series.append(p.peso_avg)
+            if p.imc_avg is not None:
+                imc_series.append(round(p.imc_avg, 1))
+            elif isinstance(altura, (int, float)) and altura > 0:
+                imc_series.append(round(p.peso_avg / (altura * altura), 1))
             else:
-                peso_series.append(peso_series[-1] if peso_series else float(peso_actual or 0))
-                imc_series.append(imc_series[-1] if imc_series else 0.0)
+                imc_series.append(0.0)
+        else:
+            peso_series.append(peso_series[-1] if peso_series else float(peso_actual or 0))
+            imc_series.append(imc_series[-1] if imc_series else 0.0)
 
     # Si no hay historial, genera serie mínima (Inicio -> Actual)
     if not labels:
@@ -546,37 +604,13 @@ def get_user_progress(user_id: int, db: DbDep):
             imc_series = [0.0, 0.0]
 
     # -------- KPIs reales a partir de historial --------
-    entrenamientos = 0
-    for p in progresos:
-        c = getattr(p, "completado", None)
-        entrenamientos += 1 if (c is True or c is None) else 0
-    if not progresos:
-        entrenamientos = 0
-
-    # racha: días consecutivos terminando en el último registro
-    racha = 0
-    if progresos and getattr(progresos[-1], "fecha", None):
-        streak = 1
-        for i in range(len(progresos) - 1, 0, -1):
-            f2 = getattr(progresos[i], "fecha", None)
-            f1 = getattr(progresos[i - 1], "fecha", None)
-            if isinstance(f1, datetime) and isinstance(f2, datetime):
-                if (f2.date() - f1.date()).days == 1:
-                    streak += 1
-                else:
-                    break
-            else:
-                break
-        racha = streak
+    entrenamientos = sum(p.registros for p in serie)
+
+    # racha: días consecutivos hasta hoy o ayer (funciones de ventana)
+    racha = rachas_progreso(db, user_id).actual if serie else 0
 
-    # calorías semana: suma últimos 7 días si existe atributo 'calorias'
-    siete_dias = datetime.utcnow().date() - timedelta(days=6)
+    # calorías semana: la tabla progreso no registra calorías
     calorias_semana = 0
-    for p in progresos:
-        f = getattr(p, "fecha", None)
-        cal = getattr(p, "calorias", None)
-        if isinstance(f, datetime) and f.date() >= siete_dias and isinstance(cal, (int, float)):
-            calorias_semana += int(cal)
 
     # logros: simple por % de bajada del peso inicial
     logros = 0
@@ -617,6 +651,45 @@ def get_user_progress(user_id: int, db: DbDep):
     )
 
 
+# ---------- Serie temporal de progreso (agregada en SQL) ----------
+@router.get("/{user_id}/progress/series", response_model=SerieProgresoOut)
+def get_user_progress_series(
+    user_id: int,
+    db: DbDep,
+    user: UserDep,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    granularidad: str = Query("dia", pattern="^(dia|semana)$"),
+):
+    """
+    Peso/IMC por día o por semana (mínimo, media y máximo) en un rango de
+    fechas, más la racha actual y máxima de días con registro.
+    Accesible para el propio usuario y para nutriólogos con contrato vigente.
+    """
+    permitido = user.id_usuario == user_id or (
+        user.tipo_usuario == TipoUsuarioEnum.nutriologo
+        and relaciones_contrato.contrato_con(db, user.id_usuario, user_id) is not None
+    )
+    if not permitido:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior a 'hasta'")
+
+    puntos = serie_progreso(db, user_id, desde, hasta, granularidad)
+    rachas = rachas_progreso(db, user_id)
+
+    return SerieProgresoOut(
+        granularidad=granularidad,
+        desde=desde,
+        hasta=hasta,
+        puntos=[PuntoProgresoOut(**p._asdict()) for p in puntos],
+        racha_actual=rachas.actual,
+        racha_maxima=rachas.maxima,
+        ultimo_registro=rachas.ultimo_registro,
+    )
+
+
 @router.get("/me", response_model=dict)
 def get_current_user_info(
         db: DbDep,
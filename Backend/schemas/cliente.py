@@ -1,7 +1,7 @@
 """
 Schemas para clientes y dietas
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 import json
@@ -108,10 +108,55 @@ class DietasVencidasResponse(BaseModel):
     dias_vencida: int
 
 
+class DietaVersionResponse(BaseModel):
+    """Una versión dentro de la cadena de renovaciones de una dieta"""
+    id_dieta: int
+    id_dieta_anterior: Optional[int] = None
+    version: int  # 1 = dieta original
+    nombre: str
+    objetivo: Optional[str] = None
+    calorias_totales: Optional[int] = None
+    fecha_creacion: Optional[datetime] = None
+    dias_duracion: Optional[int] = None
+    fecha_vencimiento: Optional[datetime] = None
+    estado: str
+
+
 class ClienteDietasResponse(BaseModel):
     """Response de un cliente con sus dietas"""
     id_usuario: int
     nombre: str
     dietas_activas: int
     dietas_vencidas: int
-    proxima_dieta_vencimiento: Optional[datetime] = None
\ No newline at end of file
+    proxima_dieta_vencimiento: Optional[datetime] = None
+
+
+class DietaAILoteRequest(BaseModel):
+    """Request para generar dietas con IA para varios clientes"""
+    ids_clientes: List[int] = Field(..., min_length=1, max_length=100)
+    nombre_dieta: str
+    dias_duracion: int = 30
+    calorias_objetivo: int
+    preferencias: Optional[str] = None
+
+
+class ItemLoteDieta(BaseModel):
+    """Progreso de un cliente dentro del lote"""
+    id_cliente: int
+    estado: str  # pendiente | generando | completado | error
+    id_dieta: Optional[int] = None
+    error: Optional[str] = None
+
+
+class LoteDietaResponse(BaseModel):
+    """Estado de un lote de generación"""
+    id_lote: str
+    estado: str  # en_proceso | terminado
+    total: int
+    completados: int
+    fallidos: int
+    pendientes: int
+    creado_en: datetime
+    terminado_en: Optional[datetime] = None
+    items: List[ItemLoteDieta]
+    rechazados: List[ItemLoteDieta] = []
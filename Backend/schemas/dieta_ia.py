@@ -0,0 +1,143 @@
+# Backend/schemas/dieta_ia.py
+# ===============================================
+# Schemas de la dieta estructurada que devuelve la IA
+# ===============================================
+#
+# Validan la respuesta JSON de Gemini (services/json_ia.py). Son tolerantes
+# con los tipos (números como texto, cantidades numéricas) porque el modelo
+# no siempre respeta el formato exacto.
+#
+# DietaEstructuradaIA es la forma que se envía a Gemini como response_schema
+# (modo JSON nativo): la distribución va como lista de días porque el esquema
+# de Gemini no admite objetos con claves libres. DietaIA la acepta en ambas
+# formas y la normaliza a {dia: comidas}.
+#
+# RenovacionDietaIA es la respuesta de una renovación por cambios: solo las
+# comidas que cambian y las recetas nuevas que necesitan.
+
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Dict, List, Literal, Optional
+
+OBJETIVOS_IA = ("perdida_grasa", "definicion", "volumen", "saludable")
+
+# Secciones de la dieta que se pueden pedir por separado a la IA
+SECCIONES_DIETA = ("informacion", "recetas", "distribucion_semanal", "recomendaciones")
+
+
+def _a_entero(v):
+    """Acepta 350, 350.0, "350" o "350 kcal" """
+    if isinstance(v, str):
+        digitos = "".join(c for c in v if c.isdigit() or c == ".")
+        v = digitos or None
+    if v is None:
+        return None
+    try:
+        return int(round(float(v)))
+    except ValueError:
+        return None
+
+
+class IngredienteIA(BaseModel):
+    nombre: str = Field(..., min_length=1, max_length=100)
+    cantidad: Optional[str] = Field(None, max_length=50)
+    unidad: Optional[str] = Field(None, max_length=20)
+
+    @field_validator('cantidad', 'unidad', mode='before')
+    @classmethod
+    def a_texto(cls, v):
+        """El modelo a veces devuelve la cantidad como número"""
+        return None if v is None else str(v)
+
+
+class RecetaIA(BaseModel):
+    nombre: str = Field(..., min_length=1, max_length=100)
+    descripcion: Optional[str] = None
+    calorias: Optional[int] = Field(None, ge=0)
+    tiempo_preparacion: Optional[int] = Field(None, ge=0)
+    ingredientes: List[IngredienteIA] = Field(..., min_length=1)
+    instrucciones: List[str] = Field(default_factory=list)
+
+    @field_validator('calorias', 'tiempo_preparacion', mode='before')
+    @classmethod
+    def a_entero(cls, v):
+        return _a_entero(v)
+
+
+class ComidasDiaIA(BaseModel):
+    desayuno: Optional[str] = None
+    comida: Optional[str] = None
+    cena: Optional[str] = None
+    snack: Optional[str] = None
+
+
+class DiaDistribucionIA(ComidasDiaIA):
+    dia: str
+
+
+def distribucion_a_dict(v: Any) -> Any:
+    """[{"dia": "lunes", "desayuno": ...}] -> {"lunes": {"desayuno": ...}}"""
+    if isinstance(v, list):
+        return {
+            str(d.get("dia")).strip().lower(): {k: c for k, c in d.items() if k != "dia"}
+            for d in v if isinstance(d, dict) and d.get("dia")
+        }
+    return v
+
+
+class InformacionDietaIA(BaseModel):
+    nombre: str = Field(..., min_length=1, max_length=100)
+    descripcion: Optional[str] = None
+    objetivo: str = "saludable"
+    calorias_totales: Optional[int] = Field(None, ge=0)
+
+    @field_validator('objetivo', mode='before')
+    @classmethod
+    def validar_objetivo(cls, v):
+        """Objetivo desconocido -> saludable"""
+        v = str(v or "").strip().lower()
+        return v if v in OBJETIVOS_IA else "saludable"
+
+    @field_validator('calorias_totales', mode='before')
+    @classmethod
+    def a_entero(cls, v):
+        return _a_entero(v)
+
+
+class DietaIA(InformacionDietaIA):
+    """Dieta completa generada por la IA"""
+    recetas: List[RecetaIA] = Field(..., min_length=1)
+    distribucion_semanal: Dict[str, ComidasDiaIA] = Field(..., min_length=1)
+    recomendaciones: List[str] = Field(..., min_length=1)
+
+    @field_validator('distribucion_semanal', mode='before')
+    @classmethod
+    def normalizar_distribucion(cls, v):
+        return distribucion_a_dict(v)
+
+
+class DietaEstructuradaIA(InformacionDietaIA):
+    """Esquema de respuesta que se pide a Gemini (response_schema)"""
+    objetivo: Literal["perdida_grasa", "definicion", "volumen", "saludable"]
+    recetas: List[RecetaIA]
+    distribucion_semanal: List[DiaDistribucionIA]
+    recomendaciones: List[str]
+
+
+class RecomendacionesIA(BaseModel):
+    """Respuesta de las recomendaciones de progreso"""
+    recomendaciones: List[str]
+
+
+class CambioComidaIA(BaseModel):
+    """Comida del plan anterior que se sustituye en una renovación"""
+    dia: str
+    comida: Literal["desayuno", "comida", "cena", "snack"]
+    receta: str = Field(..., min_length=1, max_length=100)  # receta nueva o del plan anterior
+
+
+class RenovacionDietaIA(BaseModel):
+    """Respuesta de una renovación por cambios: solo lo que cambia"""
+    descripcion: Optional[str] = None
+    cambios: List[CambioComidaIA] = Field(default_factory=list)
+    recetas_nuevas: List[RecetaIA] = Field(default_factory=list)
+    recomendaciones: List[str] = Field(default_factory=list)
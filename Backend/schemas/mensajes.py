@@ -14,6 +14,24 @@ class MensajeCreate(BaseModel):
     contenido: str = Field(..., min_length=1, max_length=1000, description="Contenido del mensaje")
 
 
+class MensajeLoteCreate(BaseModel):
+    """Schema para enviar el mismo mensaje a varios destinatarios"""
+    destinatarios_ids: List[int] = Field(..., min_length=1, max_length=500, description="IDs de los destinatarios")
+    contenido: str = Field(..., min_length=1, max_length=1000, description="Contenido del mensaje")
+
+
+class MarcarLeidosLote(BaseModel):
+    """Schema para marcar varios mensajes como leídos (por IDs o por marca)"""
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000, description="IDs de mensajes a marcar")
+    remitente_id: Optional[int] = Field(None, gt=0, description="Conversación a marcar por marca de lectura")
+    hasta_id: Optional[int] = Field(None, gt=0, description="Último mensaje leído de esa conversación")
+
+
+class MarcarLeidosHasta(BaseModel):
+    """Schema para confirmar lectura de una conversación hasta un mensaje"""
+    hasta_id: Optional[int] = Field(None, gt=0, description="ID del último mensaje leído (todos si se omite)")
+
+
 class MensajeResponse(BaseModel):
     """Schema para responder un mensaje"""
     id: int
@@ -49,6 +67,23 @@ class ConversacionDetailResponse(BaseModel):
     otro_usuario_foto: Optional[str] = None
     otro_usuario_tipo: str
     mensajes: List[MensajeResponse] = []
+    cursor_anterior: Optional[int] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class ResultadoBusquedaMensaje(BaseModel):
+    """Schema para un resultado de búsqueda de mensajes"""
+    id: int
+    remitente_id: int
+    destinatario_id: int
+    otro_usuario_id: int
+    fragmento: str
+    fecha_creacion: Optional[str] = None
+
+
+class BusquedaMensajesResponse(BaseModel):
+    """Schema para la respuesta paginada de búsqueda de mensajes"""
+    resultados: List[ResultadoBusquedaMensaje] = []
+    siguiente_cursor: Optional[int] = None
@@ -0,0 +1,113 @@
+"""
+Backend/scripts/carga_generar_dieta.py
+Prueba de carga de POST /api/clientes/generar-dieta-ia
+
+Mide la sobrecarga propia del backend (validaciones, BD, recetas, PDF,
+límites de concurrencia) usando el proveedor de IA simulado, sin gastar
+cuota ni depender de la red.
+
+1. Arrancar el backend con el proveedor simulado:
+       IA_PROVEEDOR=simulado IA_SIMULADO_LATENCIA_MS=1500 uvicorn main:app
+2. Lanzar la carga con un nutriólogo que tenga contrato con los clientes:
+       python scripts/carga_generar_dieta.py --correo nutri@x.com --contrasena ... \\
+           --clientes 12,13,14 --usuarios 10 --peticiones 5 --latencia-ia 1500
+
+La sobrecarga se calcula como latencia observada - latencia simulada de la
+IA. Ten en cuenta que IA_MAX_CONCURRENCIA e IA_MAX_POR_MINUTO también
+limitan al proveedor simulado: con más usuarios que IA_MAX_CONCURRENCIA la
+espera en cola aparece como sobrecarga.
+
+Solo usa la biblioteca estándar.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+
+def _peticion(url: str, datos: dict, token: Optional[str] = None, timeout: float = 300) -> Tuple[int, bytes]:
+    cabeceras = {"Content-Type": "application/json"}
+    if token:
+        cabeceras["Authorization"] = f"Bearer {token}"
+    req = urllib.request.Request(url, data=json.dumps(datos).encode("utf-8"), headers=cabeceras, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def iniciar_sesion(base: str, correo: str, contrasena: str) -> str:
+    estado, cuerpo = _peticion(f"{base}/api/auth/login", {"correo": correo, "contrasena": contrasena})
+    if estado != 200:
+        sys.exit(f"❌ Login fallido ({estado}): {cuerpo[:200]!r}")
+    return json.loads(cuerpo)["access_token"]
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prueba de carga de generar-dieta-ia")
+    parser.add_argument("--url", default="http://localhost:8000", help="URL base del backend")
+    parser.add_argument("--token", help="JWT de un nutriólogo (o usar --correo/--contrasena)")
+    parser.add_argument("--correo")
+    parser.add_argument("--contrasena")
+    parser.add_argument("--clientes", required=True, help="IDs de clientes con contrato, separados por comas")
+    parser.add_argument("--usuarios", type=int, default=10, help="Usuarios concurrentes")
+    parser.add_argument("--peticiones", type=int, default=5, help="Peticiones por usuario")
+    parser.add_argument("--latencia-ia", type=float, default=0, help="IA_SIMULADO_LATENCIA_MS del servidor")
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--calorias", type=int, default=2000)
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    token = args.token or iniciar_sesion(base, args.correo, args.contrasena)
+    clientes = [int(c) for c in args.clientes.split(",") if c.strip()]
+    total = args.usuarios * args.peticiones
+
+    def ejecutar(n: int) -> Tuple[int, float]:
+        datos = {
+            "id_cliente": clientes[n % len(clientes)],
+            "nombre_dieta": f"Carga {n}",
+            "dias_duracion": args.dias,
+            "calorias_objetivo": args.calorias,
+        }
+        inicio = time.perf_counter()
+        estado, _ = _peticion(f"{base}/api/clientes/generar-dieta-ia", datos, token)
+        return estado, (time.perf_counter() - inicio) * 1000
+
+    print(f"🚀 {total} peticiones ({args.usuarios} usuarios x {args.peticiones}) contra {base}")
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.usuarios) as pool:
+        resultados = list(pool.map(ejecutar, range(total)))
+    duracion = time.perf_counter() - inicio
+
+    estados = Counter(e for e, _ in resultados)
+    latencias = [ms for e, ms in resultados if e == 200]
+
+    print(f"\nEstados: {dict(estados)}")
+    print(f"Duración: {duracion:.1f} s  |  Rendimiento: {len(latencias) / duracion:.2f} dietas/s")
+    if not latencias:
+        return
+
+    print("\nLatencia (ms)   min      p50      p95      p99      max     media")
+    fila = [min(latencias), percentil(latencias, 50), percentil(latencias, 95),
+            percentil(latencias, 99), max(latencias), statistics.mean(latencias)]
+    print("  total       " + "".join(f"{v:8.0f} " for v in fila))
+    if args.latencia_ia:
+        print("  sobrecarga  " + "".join(f"{v - args.latencia_ia:8.0f} " for v in fila))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Backend/services/archivo_mensajes.py
+Retención y archivo de la tabla `mensajes`
+
+Los mensajes leídos con más de MENSAJES_RETENCION_DIAS días se mueven a
+`mensajes_archivo` en lotes pequeños (una transacción corta por lote),
+de forma que la tabla caliente mantiene un tamaño acotado sin bloqueos
+largos. El historial de una conversación se lee de forma transparente
+de ambas tablas con obtener_historial_conversacion(), y la lista de
+conversaciones con ultimos_mensajes_por_conversacion(), así un chat
+completamente archivado sigue apareciendo.
+
+La tarea periódica es exclusiva (candado en la BD): con varios workers
+solo uno archiva a la vez.
+
+Se usan tablas de archivo en lugar de particiones nativas porque MySQL
+no permite particionar tablas InnoDB con claves foráneas.
+
+Ejecución manual:
+    python -m services.archivo_mensajes
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple, Union
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, case, delete, func, insert, literal, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from config.database import SessionLocal
+from models.mensajes import Mensaje, MensajeArchivado
+from services.tareas_programadas import registrar_tarea_periodica
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RETENCION_DIAS = int(os.getenv("MENSAJES_RETENCION_DIAS", "180"))
+TAMANO_LOTE = int(os.getenv("MENSAJES_ARCHIVO_LOTE", "1000"))
+INTERVALO_MINUTOS = int(os.getenv("MENSAJES_ARCHIVO_INTERVALO_MIN", "60"))
+ARCHIVO_AUTOMATICO = os.getenv("MENSAJES_ARCHIVO_AUTOMATICO", "true").lower() == "true"
+
+_COLUMNAS = ["id", "remitente_id", "destinatario_id", "contenido", "leido", "fecha_creacion", "fecha_actualizacion"]
+
+
+# ============================================================
+# ARCHIVADO POR LOTES
+# ============================================================
+def archivar_mensajes_antiguos(
+    db: Optional[Session] = None,
+    retencion_dias: int = RETENCION_DIAS,
+    tamano_lote: int = TAMANO_LOTE,
+    max_lotes: Optional[int] = None
+) -> int:
+    """
+    Mueve a `mensajes_archivo` los mensajes leídos más antiguos que la retención
+
+    Cada lote copia y borra como máximo tamano_lote filas en su propia
+    transacción. Los mensajes no leídos nunca se archivan.
+
+    Returns:
+        Número total de mensajes archivados
+    """
+    propia = db is None
+    db = db or SessionLocal()
+    corte = datetime.utcnow() - timedelta(days=retencion_dias)
+    total = 0
+    lotes = 0
+
+    try:
+        while max_lotes is None or lotes < max_lotes:
+            ids = [
+                fila[0] for fila in db.query(Mensaje.id).filter(
+                    Mensaje.fecha_creacion < corte,
+                    Mensaje.leido == True
+                ).order_by(Mensaje.id).limit(tamano_lote).all()
+            ]
+            if not ids:
+                break
+
+            columnas_origen = [getattr(Mensaje, c) for c in _COLUMNAS]
+            db.execute(
+                insert(MensajeArchivado).from_select(
+                    _COLUMNAS + ["fecha_archivado"],
+                    select(*columnas_origen, literal(datetime.utcnow())).where(Mensaje.id.in_(ids))
+                )
+            )
+            db.execute(delete(Mensaje).where(Mensaje.id.in_(ids)))
+            db.commit()
+
+            total += len(ids)
+            lotes += 1
+            logger.info(f"📦 Lote {lotes}: {len(ids)} mensajes archivados")
+
+        if total:
+            logger.info(f"✅ {total} mensajes anteriores a {corte:%Y-%m-%d} archivados")
+        return total
+
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if propia:
+            db.close()
+
+
+# ============================================================
+# LECTURA TRANSPARENTE (CALIENTE + ARCHIVO)
+# ============================================================
+def obtener_historial_conversacion(
+    db: Session,
+    usuario_id: int,
+    otro_usuario_id: int,
+    limite: Optional[int] = None,
+    antes_de: Optional[int] = None
+) -> Tuple[List[Union[Mensaje, MensajeArchivado]], Optional[int]]:
+    """
+    Mensajes de una conversación en orden cronológico, combinando la tabla
+    caliente y el archivo.
+
+    Args:
+        limite: Máximo de mensajes (None = historial completo)
+        antes_de: Cursor; solo mensajes con id < antes_de
+
+    Returns:
+        (mensajes, cursor_anterior) — cursor_anterior es el id a usar como
+        antes_de para la página previa, o None si no hay más
+    """
+    def _filtro(modelo):
+        condiciones = [
+            or_(
+                and_(modelo.remitente_id == usuario_id, modelo.destinatario_id == otro_usuario_id),
+                and_(modelo.remitente_id == otro_usuario_id, modelo.destinatario_id == usuario_id)
+            )
+        ]
+        if antes_de is not None:
+            condiciones.append(modelo.id < antes_de)
+        return and_(*condiciones)
+
+    # Los mensajes no leídos antiguos siguen en caliente, así que los ids de
+    # ambas tablas se intercalan: se pide una página a cada una y se mezclan
+    mensajes: List[Union[Mensaje, MensajeArchivado]] = []
+    for modelo in (Mensaje, MensajeArchivado):
+        qry = db.query(modelo).filter(_filtro(modelo)).order_by(modelo.id.desc())
+        mensajes.extend(qry.limit(limite).all() if limite else qry.all())
+
+    mensajes.sort(key=lambda m: m.id, reverse=True)
+    if limite:
+        mensajes = mensajes[:limite]
+
+    cursor_anterior = mensajes[-1].id if limite and len(mensajes) == limite else None
+    mensajes.reverse()
+
+    return mensajes, cursor_anterior
+
+
+def ultimos_mensajes_por_conversacion(db: Session, usuario_id: int):
+    """
+    Último mensaje de cada conversación del usuario, de la tabla caliente y
+    del archivo, en una sola consulta (ROW_NUMBER() por interlocutor)
+
+    Returns:
+        Filas (otro_usuario_id, id, contenido, fecha_creacion), de la
+        conversación más reciente a la más antigua
+    """
+    partes = [
+        select(
+            case((modelo.remitente_id == usuario_id, modelo.destinatario_id), else_=modelo.remitente_id).label("otro_usuario_id"),
+            modelo.id,
+            modelo.contenido,
+            modelo.fecha_creacion,
+        ).where(
+            or_(modelo.remitente_id == usuario_id, modelo.destinatario_id == usuario_id),
+            modelo.remitente_id != modelo.destinatario_id
+        )
+        for modelo in (Mensaje, MensajeArchivado)
+    ]
+    todos = union_all(*partes).subquery()
+
+    numerados = select(
+        todos,
+        func.row_number().over(
+            partition_by=todos.c.otro_usuario_id,
+            order_by=(todos.c.fecha_creacion.desc(), todos.c.id.desc())
+        ).label("n")
+    ).subquery()
+
+    return db.execute(
+        select(numerados.c.otro_usuario_id, numerados.c.id, numerados.c.contenido, numerados.c.fecha_creacion)
+        .where(numerados.c.n == 1)
+        .order_by(numerados.c.fecha_creacion.desc(), numerados.c.id.desc())
+    ).all()
+
+
+if ARCHIVO_AUTOMATICO:
+    registrar_tarea_periodica("archivo_mensajes", archivar_mensajes_antiguos, INTERVALO_MINUTOS * 60, exclusiva=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"📦 Archivados: {archivar_mensajes_antiguos()}")
@@ -0,0 +1,227 @@
+"""
+Backend/services/busqueda_mensajes.py
+Búsqueda de texto completo sobre Mensaje.contenido
+
+- MySQL: índice FULLTEXT (ft_mensajes_contenido) + MATCH ... AGAINST en BOOLEAN MODE
+- SQLite (local/dev): tabla virtual FTS5 (mensajes_fts) sincronizada por triggers
+
+El archivo (mensajes_archivo, ver services/archivo_mensajes.py) tiene su
+propio índice y se busca junto con la tabla caliente, así los mensajes
+fuera de la ventana de retención siguen apareciendo.
+
+Nunca recurre a LIKE '%q%': si el motor no tiene índice de texto completo
+se lanza BusquedaNoDisponible.
+"""
+
+import html
+import logging
+from typing import List, Optional, Tuple, Union
+
+from sqlalchemy import and_, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from core.texto import extraer_terminos, plegar_texto
+from models.mensajes import Mensaje, MensajeArchivado
+
+logger = logging.getLogger(__name__)
+
+INDICE_MYSQL = "ft_mensajes_contenido"
+TABLA_FTS_SQLITE = "mensajes_fts"
+INDICE_MYSQL_ARCHIVO = "ft_mensajes_archivo_contenido"
+TABLA_FTS_SQLITE_ARCHIVO = "mensajes_archivo_fts"
+
+# Tabla -> (índice FULLTEXT en MySQL, tabla FTS5 en SQLite)
+_INDICES = {
+    Mensaje.__tablename__: (INDICE_MYSQL, TABLA_FTS_SQLITE),
+    MensajeArchivado.__tablename__: (INDICE_MYSQL_ARCHIVO, TABLA_FTS_SQLITE_ARCHIVO),
+}
+
+# Longitud aproximada del fragmento resaltado
+LONGITUD_FRAGMENTO = 160
+
+
+class BusquedaNoDisponible(RuntimeError):
+    """El motor de BD no cuenta con índice de texto completo"""
+
+
+# ============================================================
+# CREACIÓN DEL ÍNDICE
+# ============================================================
+def asegurar_indice_busqueda(engine: Engine) -> None:
+    """
+    Crea los índices de texto completo de `mensajes` y `mensajes_archivo`
+    si no existen (idempotente).
+    Se llama al arrancar, después de Base.metadata.create_all().
+    """
+    dialecto = engine.dialect.name
+
+    if dialecto not in ("mysql", "sqlite"):
+        logger.warning(f"⚠️  Búsqueda de mensajes no soportada en el dialecto '{dialecto}'")
+        return
+
+    for tabla, (indice_mysql, tabla_fts) in _INDICES.items():
+        try:
+            with engine.begin() as conn:
+                if dialecto == "mysql":
+                    _asegurar_fulltext_mysql(conn, tabla, indice_mysql)
+                else:
+                    _asegurar_fts5_sqlite(conn, tabla, tabla_fts)
+
+        except Exception as e:
+            logger.error(f"❌ No se pudo crear el índice de búsqueda de {tabla}: {str(e)}")
+
+
+def _asegurar_fulltext_mysql(conn, tabla: str, indice: str) -> None:
+    existe = conn.execute(
+        text(
+            "SELECT COUNT(*) FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla "
+            "AND INDEX_NAME = :indice"
+        ),
+        {"tabla": tabla, "indice": indice}
+    ).scalar()
+    if not existe:
+        logger.info(f"🔎 Creando índice FULLTEXT {indice}...")
+        conn.execute(text(f"ALTER TABLE {tabla} ADD FULLTEXT INDEX {indice} (contenido)"))
+
+
+def _asegurar_fts5_sqlite(conn, tabla: str, tabla_fts: str) -> None:
+    existe = conn.execute(
+        text("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = :tabla"),
+        {"tabla": tabla_fts}
+    ).scalar()
+    if existe:
+        return
+
+    logger.info(f"🔎 Creando tabla FTS5 {tabla_fts}...")
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {tabla_fts} USING fts5("
+        f"contenido, content='{tabla}', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {tabla_fts}_ai AFTER INSERT ON {tabla} BEGIN "
+        f"INSERT INTO {tabla_fts}(rowid, contenido) VALUES (new.id, new.contenido); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {tabla_fts}_ad AFTER DELETE ON {tabla} BEGIN "
+        f"INSERT INTO {tabla_fts}({tabla_fts}, rowid, contenido) "
+        f"VALUES ('delete', old.id, old.contenido); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER {tabla_fts}_au AFTER UPDATE OF contenido ON {tabla} BEGIN "
+        f"INSERT INTO {tabla_fts}({tabla_fts}, rowid, contenido) "
+        f"VALUES ('delete', old.id, old.contenido); "
+        f"INSERT INTO {tabla_fts}(rowid, contenido) VALUES (new.id, new.contenido); END"
+    ))
+    conn.execute(text(f"INSERT INTO {tabla_fts}({tabla_fts}) VALUES ('rebuild')"))
+
+
+# ============================================================
+# BÚSQUEDA
+# ============================================================
+def buscar_mensajes(
+    db: Session,
+    usuario_id: int,
+    q: str,
+    con_usuario: Optional[int] = None,
+    cursor: Optional[int] = None,
+    limite: int = 20
+) -> Tuple[List[Union[Mensaje, MensajeArchivado]], Optional[int]]:
+    """
+    Busca mensajes del usuario (enviados o recibidos), en la tabla caliente
+    y en el archivo, que contengan todos los términos de q (con
+    coincidencia por prefijo).
+
+    Paginación por cursor: los resultados van del más reciente al más
+    antiguo y el cursor es el id del último mensaje devuelto.
+
+    Returns:
+        (mensajes, siguiente_cursor)
+    """
+    terminos = extraer_terminos(q)
+    if not terminos:
+        return [], None
+
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "mysql":
+        consulta_ft = " ".join(f"+{t}*" for t in terminos)
+    elif dialecto == "sqlite":
+        consulta_ft = " ".join('"' + t.replace('"', '""') + '"*' for t in terminos)
+    else:
+        raise BusquedaNoDisponible(f"Búsqueda no soportada en '{dialecto}'")
+
+    # Los ids se conservan al archivar y los no leídos antiguos siguen en
+    # caliente, así que ambas tablas se intercalan: se pide una página a
+    # cada una y se mezclan (como obtener_historial_conversacion)
+    mensajes: List[Union[Mensaje, MensajeArchivado]] = []
+    for modelo in (Mensaje, MensajeArchivado):
+        tabla = modelo.__tablename__
+        tabla_fts = _INDICES[tabla][1]
+        if dialecto == "mysql":
+            condicion_ft = text(f"MATCH ({tabla}.contenido) AGAINST (:consulta_ft IN BOOLEAN MODE)")
+        else:
+            condicion_ft = text(
+                f"{tabla}.id IN (SELECT rowid FROM {tabla_fts} WHERE {tabla_fts} MATCH :consulta_ft)"
+            )
+
+        if con_usuario is not None:
+            alcance = or_(
+                and_(modelo.remitente_id == usuario_id, modelo.destinatario_id == con_usuario),
+                and_(modelo.remitente_id == con_usuario, modelo.destinatario_id == usuario_id)
+            )
+        else:
+            alcance = or_(modelo.remitente_id == usuario_id, modelo.destinatario_id == usuario_id)
+
+        qry = db.query(modelo).filter(condicion_ft.bindparams(consulta_ft=consulta_ft), alcance)
+        if cursor is not None:
+            qry = qry.filter(modelo.id < cursor)
+        mensajes.extend(qry.order_by(modelo.id.desc()).limit(limite + 1).all())
+
+    mensajes.sort(key=lambda m: m.id, reverse=True)
+
+    siguiente_cursor = None
+    if len(mensajes) > limite:
+        mensajes = mensajes[:limite]
+        siguiente_cursor = mensajes[-1].id
+
+    return mensajes, siguiente_cursor
+
+
+def resaltar_fragmento(contenido: str, q: str, longitud: int = LONGITUD_FRAGMENTO) -> str:
+    """
+    Devuelve un fragmento del contenido alrededor de la primera coincidencia
+    con los términos resaltados con <mark>. El texto se escapa como HTML.
+    """
+    contenido = contenido or ""
+    terminos = extraer_terminos(q)
+    plegado = plegar_texto(contenido)
+
+    # Localizar coincidencias (inicio de palabra, por prefijo)
+    coincidencias: List[Tuple[int, int]] = []
+    for termino in terminos:
+        inicio = plegado.find(termino)
+        while inicio != -1:
+            if inicio == 0 or not plegado[inicio - 1].isalnum():
+                coincidencias.append((inicio, inicio + len(termino)))
+            inicio = plegado.find(termino, inicio + 1)
+    coincidencias.sort()
+
+    # Ventana alrededor de la primera coincidencia
+    centro = coincidencias[0][0] if coincidencias else 0
+    desde = max(0, centro - longitud // 3)
+    hasta = min(len(contenido), desde + longitud)
+
+    partes = ["…" if desde > 0 else ""]
+    posicion = desde
+    for inicio, fin in coincidencias:
+        if inicio < posicion or fin > hasta:
+            continue
+        partes.append(html.escape(contenido[posicion:inicio]))
+        partes.append(f"<mark>{html.escape(contenido[inicio:fin])}</mark>")
+        posicion = fin
+    partes.append(html.escape(contenido[posicion:hasta]))
+    partes.append("…" if hasta < len(contenido) else "")
+
+    return "".join(partes)
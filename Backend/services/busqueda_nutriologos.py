@@ -0,0 +1,178 @@
+"""
+Backend/services/busqueda_nutriologos.py
+Índice de búsqueda en memoria para el directorio de nutriólogos
+
+Sustituye a los ILIKE '%q%' sobre `usuarios`: el índice se construye con
+una sola consulta (id, nombre, profesión, validado) y se reutiliza entre
+peticiones. Cada término de la búsqueda coincide con una palabra de
+nombre/profesión si:
+- es prefijo de la palabra ("nutri" -> "nutriologa"), o
+- se parece por trigramas (tolerancia a erratas: "nutriolgo")
+Todo sin acentos ni mayúsculas (core/texto.py).
+
+El índice se invalida al registrar un nutriólogo, editar su perfil o
+decidir su validación, y además caduca cada NUTRIOLOGOS_INDICE_TTL
+segundos para recoger cambios hechos por otros workers. Solo una petición
+lo reconstruye a la vez; mientras tanto las demás siguen usando la
+instantánea caducada (o esperan si todavía no hay ninguna).
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from core.texto import extraer_terminos
+from models.user import Usuario, TipoUsuarioEnum
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TTL_SEGUNDOS = int(os.getenv("NUTRIOLOGOS_INDICE_TTL", "300"))
+
+# Máximo de ids que una búsqueda pasa al IN de la consulta del directorio
+MAX_RESULTADOS_BUSQUEDA = int(os.getenv("NUTRIOLOGOS_BUSQUEDA_MAX", "500"))
+
+# Similitud mínima de trigramas para aceptar una palabra como coincidencia aproximada
+UMBRAL_SIMILITUD = 0.45
+# Términos más cortos solo coinciden por prefijo
+LONGITUD_MINIMA_APROXIMADA = 4
+
+
+def _trigramas(palabra: str) -> Set[str]:
+    relleno = f"  {palabra} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class _Instantanea:
+    """Estructuras inmutables de una construcción del índice"""
+
+    def __init__(self, filas: List[Tuple[int, Optional[str], Optional[str], bool]]):
+        self.creado = time.monotonic()
+        self.validados: Set[int] = set()
+        self.todos: Set[int] = set()
+        self.ids_por_palabra: Dict[str, Set[int]] = defaultdict(set)
+        self.palabras_por_trigrama: Dict[str, Set[str]] = defaultdict(set)
+
+        for id_usuario, nombre, profesion, validado in filas:
+            self.todos.add(id_usuario)
+            if validado:
+                self.validados.add(id_usuario)
+            for palabra in extraer_terminos(f"{nombre or ''} {profesion or ''}"):
+                self.ids_por_palabra[palabra].add(id_usuario)
+
+        for palabra in self.ids_por_palabra:
+            for trigrama in _trigramas(palabra):
+                self.palabras_por_trigrama[trigrama].add(palabra)
+
+        self.vocabulario = sorted(self.ids_por_palabra)
+
+    def palabras_para(self, termino: str) -> Set[str]:
+        """Palabras del vocabulario que coinciden con un término (prefijo o trigramas)"""
+        palabras: Set[str] = set()
+
+        # Prefijo: rango contiguo en el vocabulario ordenado
+        i = bisect.bisect_left(self.vocabulario, termino)
+        while i < len(self.vocabulario) and self.vocabulario[i].startswith(termino):
+            palabras.add(self.vocabulario[i])
+            i += 1
+
+        if len(termino) >= LONGITUD_MINIMA_APROXIMADA:
+            trigramas = _trigramas(termino)
+            compartidos: Dict[str, int] = defaultdict(int)
+            for trigrama in trigramas:
+                for palabra in self.palabras_por_trigrama.get(trigrama, ()):
+                    compartidos[palabra] += 1
+            for palabra, n in compartidos.items():
+                similitud = n / (len(trigramas) + len(_trigramas(palabra)) - n)
+                if similitud >= UMBRAL_SIMILITUD:
+                    palabras.add(palabra)
+
+        return palabras
+
+
+class IndiceNutriologos:
+    """Índice reconstruible bajo demanda; seguro entre threads"""
+
+    def __init__(self, ttl_segundos: int = TTL_SEGUNDOS):
+        self._ttl = ttl_segundos
+        self._lock = threading.Lock()
+        self._reconstruccion = threading.Lock()
+        self._instantanea: Optional[_Instantanea] = None
+        self._generacion = 0
+
+    def invalidar(self) -> None:
+        """Fuerza la reconstrucción en la próxima búsqueda"""
+        with self._lock:
+            self._instantanea = None
+            self._generacion += 1
+
+    def _vigente(self) -> Optional[_Instantanea]:
+        with self._lock:
+            actual = self._instantanea
+        if actual is not None and time.monotonic() - actual.creado < self._ttl:
+            return actual
+        return None
+
+    def _obtener(self, db: Session) -> _Instantanea:
+        actual = self._vigente()
+        if actual is not None:
+            return actual
+
+        # Con una instantánea caducada no se espera a otra reconstrucción en curso
+        with self._lock:
+            caducada = self._instantanea
+        if not self._reconstruccion.acquire(blocking=caducada is None):
+            return caducada
+
+        try:
+            # Otra petición pudo reconstruirlo mientras se esperaba el lock
+            actual = self._vigente()
+            if actual is not None:
+                return actual
+            with self._lock:
+                generacion = self._generacion
+
+            filas = db.query(
+                Usuario.id_usuario, Usuario.nombre, Usuario.profesion, Usuario.validado
+            ).filter(Usuario.tipo_usuario == TipoUsuarioEnum.nutriologo).all()
+            nueva = _Instantanea([(f[0], f[1], f[2], bool(f[3])) for f in filas])
+            logger.info(f"🔎 Índice de nutriólogos construido: {len(nueva.todos)} perfiles, {len(nueva.vocabulario)} palabras")
+
+            with self._lock:
+                # Si se invalidó durante la consulta se reconstruye en la próxima búsqueda
+                if self._generacion == generacion:
+                    self._instantanea = nueva
+            return nueva
+        finally:
+            self._reconstruccion.release()
+
+    def buscar(self, db: Session, q: Optional[str], solo_validados: bool = True) -> Set[int]:
+        """
+        IDs de nutriólogos que coinciden con todos los términos de q.
+        Sin términos devuelve todos (o todos los validados).
+        """
+        indice = self._obtener(db)
+        universo = indice.validados if solo_validados else indice.todos
+
+        resultado = set(universo)
+        for termino in extraer_terminos(q or ""):
+            ids: Set[int] = set()
+            for palabra in indice.palabras_para(termino):
+                ids |= indice.ids_por_palabra[palabra]
+            resultado &= ids
+            if not resultado:
+                break
+
+        return resultado
+
+
+# Instancia única compartida por los routers
+indice_nutriologos = IndiceNutriologos()
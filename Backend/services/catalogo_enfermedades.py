@@ -0,0 +1,200 @@
+"""
+Backend/services/catalogo_enfermedades.py
+Catálogo único de enfermedades (lo usan /api/catalogo y /api/users/illnesses)
+
+Se construye una sola vez al importar:
+- ENFERMEDADES: tupla inmutable ordenada alfabéticamente (sin acentos)
+- Índice ordenado de claves plegadas (nombre completo, cada palabra y
+  alias) para búsquedas por prefijo con bisect
+- Alias de nombres antiguos/coloquiales ("Colesterol alto" -> "Hiperlipidemia")
+
+Todas las comparaciones ignoran acentos y mayúsculas (core/texto.py).
+"""
+
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from core.texto import extraer_terminos, plegar_texto
+
+_NOMBRES = [
+    "Diabetes",
+    "Hipertensión",
+    "Asma",
+    "Artritis",
+    "Enfermedad renal",
+    "Cáncer",
+    "Hipotiroidismo",
+    "Cardiopatía",
+    "Obesidad",
+    "Migraña",
+    "Tiroiditis",
+    "Osteoporosis",
+    "Enfermedad pulmonar obstructiva crónica (EPOC)",
+    "Síndrome del intestino irritable",
+    "Enfermedad de Crohn",
+    "Colitis ulcerosa",
+    "Celiaquía",
+    "Alergia alimentaria",
+    "Gastritis",
+    "Reflujo gastroesofágico",
+    "Fibromialgia",
+    "Lupus",
+    "Artritis reumatoide",
+    "Enfermedad de Graves",
+    "Vitíligo",
+    "Psoriasis",
+    "Dermatitis atópica",
+    "Anemia",
+    "Hemofilia",
+    "Trombosis",
+    "Hiperlipidemia",
+    "Gota",
+    "Depresión",
+    "Ansiedad",
+    "Trastorno bipolar",
+    "Esquizofrenia",
+    "Insomnio",
+    "Apnea del sueño",
+    "Síndrome metabólico",
+    "Acné",
+    "Caspa",
+    "Eczema",
+    "Epilepsia",
+]
+
+# Nombres alternativos -> nombre del catálogo
+# (incluye los que usaba la antigua lista de /api/users/illnesses)
+_ALIAS = {
+    "Tiroides": "Hipotiroidismo",
+    "Cardiopatías": "Cardiopatía",
+    "Insuficiencia renal": "Enfermedad renal",
+    "Colesterol alto": "Hiperlipidemia",
+    "EPOC": "Enfermedad pulmonar obstructiva crónica (EPOC)",
+    "Colon irritable": "Síndrome del intestino irritable",
+    "Intolerancia al gluten": "Celiaquía",
+    "Presión alta": "Hipertensión",
+    "Reflujo": "Reflujo gastroesofágico",
+}
+
+# Distancia de edición máxima según la longitud del término
+_MAX_ERRORES = ((4, 0), (7, 1))  # hasta 4 letras: 0, hasta 7: 1, más: 2
+
+
+def _clave(texto: str) -> str:
+    return " ".join(extraer_terminos(texto))
+
+
+ENFERMEDADES: Tuple[str, ...] = tuple(sorted(_NOMBRES, key=plegar_texto))
+
+# Nombre completo o alias plegado -> nombre del catálogo
+_EXACTAS: Dict[str, str] = {
+    **{_clave(n): n for n in ENFERMEDADES},
+    **{_clave(a): n for a, n in _ALIAS.items()},
+}
+
+# (clave, nombre, es_inicio): clave = nombre completo/alias (es_inicio=True) o una palabra suelta
+_INDICE: Tuple[Tuple[str, str, bool], ...] = tuple(sorted({
+    *((clave, nombre, True) for clave, nombre in _EXACTAS.items()),
+    *((palabra, nombre, False) for clave, nombre in _EXACTAS.items() for palabra in clave.split()),
+}))
+_CLAVES: Tuple[str, ...] = tuple(c for c, _, _ in _INDICE)
+
+
+# ============================================================
+# CONSULTAS
+# ============================================================
+def normalizar(enfermedad: str) -> Optional[str]:
+    """Nombre del catálogo para una enfermedad o alias (None si no existe)"""
+    return _EXACTAS.get(_clave(enfermedad or ""))
+
+
+def _distancia(a: str, b: str, maximo: int) -> int:
+    """Distancia de edición con transposiciones (OSA); maximo + 1 si se supera"""
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    previa: List[int] = []
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            valor = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                valor = min(valor, previa[j - 2] + 1)
+            actual.append(valor)
+        # La transposición mira dos filas atrás: cortar solo si ambas superan el máximo
+        if min(actual) > maximo and min(anterior) > maximo:
+            return maximo + 1
+        previa, anterior = anterior, actual
+    return anterior[-1]
+
+
+def _max_errores(termino: str) -> int:
+    for longitud, errores in _MAX_ERRORES:
+        if len(termino) <= longitud:
+            return errores
+    return 2
+
+
+def autocompletar(q: str, limite: int = 10) -> List[str]:
+    """
+    Sugerencias para el texto escrito ("dia" -> ["Diabetes"]).
+
+    Orden: primero las que empiezan por q, luego las que tienen una palabra
+    que empieza por q y al final las aproximadas (erratas).
+    """
+    clave = _clave(q or "")
+    if not clave:
+        return []
+
+    inicio: List[str] = []
+    palabra: List[str] = []
+    i = bisect.bisect_left(_CLAVES, clave)
+    while i < len(_INDICE) and _CLAVES[i].startswith(clave):
+        _, nombre, es_inicio = _INDICE[i]
+        (inicio if es_inicio else palabra).append(nombre)
+        i += 1
+
+    resultado = list(dict.fromkeys(inicio + palabra))
+
+    # Tolerancia a erratas: se compara con los prefijos de longitud parecida
+    if len(resultado) < limite:
+        maximo = _max_errores(clave)
+        if maximo:
+            n = len(clave)
+            aproximadas = sorted(
+                (min(_distancia(clave, c[:largo], maximo) for largo in (n - 1, n, n + 1)), nombre)
+                for c, nombre, _ in _INDICE
+                if nombre not in resultado
+            )
+            for distancia, nombre in aproximadas:
+                if distancia > maximo:
+                    break
+                if nombre not in resultado:
+                    resultado.append(nombre)
+
+    return resultado[:limite]
+
+
+def validar_lote(enfermedades: List[str]) -> Dict[str, object]:
+    """
+    Valida varias enfermedades a la vez.
+
+    Returns:
+        {"validas": [nombres del catálogo sin duplicados],
+         "invalidas": [textos no reconocidos],
+         "sugerencias": {texto inválido: [posibles nombres]}}
+    """
+    validas: List[str] = []
+    invalidas: List[str] = []
+    sugerencias: Dict[str, List[str]] = {}
+
+    for enfermedad in enfermedades:
+        nombre = normalizar(enfermedad)
+        if nombre:
+            if nombre not in validas:
+                validas.append(nombre)
+        else:
+            invalidas.append(enfermedad)
+            sugerencias[enfermedad] = autocompletar(enfermedad, limite=3)
+
+    return {"validas": validas, "invalidas": invalidas, "sugerencias": sugerencias}
@@ -0,0 +1,113 @@
+"""
+Backend/services/contador_mensajes.py
+Aviso de cambios en la bandeja de mensajes por usuario (en memoria)
+
+Cada vez que cambia la bandeja de un usuario (recibe un mensaje o marca
+mensajes como leídos) se incrementa su versión y se despiertan las
+peticiones long-poll de /api/mensajes/no-leidos que lo esperan.
+
+También recuerda el último ETag de /no-leidos calculado en la BD junto a
+la versión con la que se calculó: mientras la versión no cambie y el ETag
+no haya caducado, un If-None-Match que coincide se responde 304 sin
+consultar la BD.
+
+NOTA: el estado vive en el proceso. Un cambio hecho en otro worker no
+incrementa la versión local, así que se detecta cuando caduca el ETag
+recordado (en la siguiente consulta a la BD).
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class ContadorMensajes:
+    """
+    Versión por usuario para despertar las esperas long-poll.
+    Seguro para usarse desde endpoints síncronos (threadpool) y asíncronos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versiones: Dict[int, int] = {}
+        self._esperas: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        # usuario -> (versión, ETag, instante en que se calculó)
+        self._etags: Dict[int, Tuple[int, str, float]] = {}
+
+    def version(self, usuario_id: int) -> int:
+        """Versión actual de la bandeja del usuario"""
+        with self._lock:
+            return self._versiones.get(usuario_id, 0)
+
+    def recordar_etag(self, usuario_id: int, version: int, etag: str) -> None:
+        """
+        Guarda el ETag calculado en la BD. `version` debe leerse antes de la
+        consulta: si cambió entretanto el ETag nace ya caducado.
+        """
+        with self._lock:
+            self._etags[usuario_id] = (version, etag, time.monotonic())
+
+    def etag_vigente(self, usuario_id: int, max_edad: float) -> Optional[str]:
+        """ETag recordado si la versión no ha cambiado y tiene menos de max_edad segundos"""
+        with self._lock:
+            entrada = self._etags.get(usuario_id)
+            if entrada is None:
+                return None
+            version, etag, calculado = entrada
+            if version != self._versiones.get(usuario_id, 0) or time.monotonic() - calculado >= max_edad:
+                return None
+            return etag
+
+    def incrementar(self, *usuarios_ids: int) -> None:
+        """
+        Marca como modificada la bandeja de uno o varios usuarios y
+        despierta a las peticiones long-poll que los esperan.
+        """
+        despertar: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+        with self._lock:
+            for usuario_id in set(usuarios_ids):
+                self._versiones[usuario_id] = self._versiones.get(usuario_id, 0) + 1
+                despertar.extend(self._esperas.pop(usuario_id, ()))
+
+        for loop, futuro in despertar:
+            loop.call_soon_threadsafe(_resolver, futuro)
+
+    async def esperar_cambio(self, usuario_id: int, version: int, timeout: float) -> bool:
+        """
+        Espera (sin bloquear threads) a que la versión del usuario cambie.
+
+        Returns:
+            True si la versión cambió, False si se agotó el tiempo
+        """
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        entrada = (loop, futuro)
+
+        with self._lock:
+            if self._versiones.get(usuario_id, 0) != version:
+                return True
+            self._esperas.setdefault(usuario_id, set()).add(entrada)
+
+        try:
+            await asyncio.wait_for(futuro, timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                esperas = self._esperas.get(usuario_id)
+                if esperas:
+                    esperas.discard(entrada)
+                    if not esperas:
+                        self._esperas.pop(usuario_id, None)
+
+
+def _resolver(futuro: asyncio.Future) -> None:
+    if not futuro.done():
+        futuro.set_result(True)
+
+
+# Instancia única compartida por los routers
+contador_mensajes = ContadorMensajes()
@@ -1,16 +1,32 @@
-import json
-from typing import List, Dict, Any
-import google.generativeai as genai
+from typing import Any, Dict, List, Optional
 import os
 from dotenv import load_dotenv
 import logging
 
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, func, literal_column, not_, or_, select, update
+from sqlalchemy.orm import Session, aliased
 from datetime import datetime, timedelta
-from typing import List, Optional
+from core.sql import dias_restantes
+from models.calendario import ComidaDieta
 from models.dieta import Dieta, EstadoDieta, ObjetivoDieta
-from models.user import Usuario
-import logging
+from models.receta import Receta
+from services.prompts_dieta import (
+    PromptRenderizado,
+    prompt_dieta_json,
+    prompt_recomendaciones_progreso,
+    prompt_seccion_dieta,
+)
+from services.json_ia import (
+    CAMPOS_SECCION,
+    ESQUEMA_DIETA,
+    ESQUEMA_RECOMENDACIONES,
+    completar_dieta,
+    esquema_secciones,
+    extraer_json,
+    leer_stream,
+)
+from services.proveedores_ia import obtener_proveedor
+from services.vencimiento_dietas import filtro_vigente, iterar_reporte_vencimientos, marcar_dietas_vencidas
 
 # Cargar variables de entorno
 load_dotenv()
@@ -21,30 +37,19 @@ logger = logging.getLogger("DietaIAService")
 
 class DietaIAService:
     """
-    Servicio para generar dietas personalizadas usando Google Gemini 2.5 AI
+    Servicio para generar dietas personalizadas con IA
+    (Google Gemini 2.5 o el proveedor configurado en IA_PROVEEDOR)
     """
 
     def __init__(self):
-        # Obtener API key desde variables de entorno
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY no está configurada en las variables de entorno")
-
-        # Obtener modelo desde .env (default: gemini-2.5-flash)
-        self.model_id = os.getenv("GEMINI_MODEL_ID", "models/gemini-2.5-flash")
+        # Proveedor configurado en IA_PROVEEDOR (Gemini o simulado)
+        self.proveedor = obtener_proveedor()
+        self.model_id = self.proveedor.modelo
         self.max_output_tokens = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "8192"))
 
-        # Configurar Google Gemini
-        genai.configure(api_key=self.api_key)
-
-        try:
-            self.model = genai.GenerativeModel(self.model_id)
-            print(f"✅ Google Gemini 2.5 configurada correctamente")
-            print(f"   Modelo: {self.model_id}")
-            print(f"   Max tokens: {self.max_output_tokens}")
-        except Exception as e:
-            print(f"❌ Error al configurar Gemini: {str(e)}")
-            raise
+        print(f"✅ Proveedor de IA: {self.proveedor.nombre}")
+        print(f"   Modelo: {self.model_id}")
+        print(f"   Max tokens: {self.max_output_tokens}")
 
     def generar_dieta_personalizada(
             self,
@@ -61,13 +66,13 @@ class DietaIAService:
     ) -> Dict[str, Any]:
         """
         Genera una dieta personalizada basada en las características del cliente
-        usando Google Gemini 2.5 API
+        usando el proveedor de IA configurado
         """
 
         # Calcular IMC
         imc = peso / (altura ** 2)
 
-        # Construir el prompt para Gemini
+        # Construir el prompt para la IA
         prompt = self._construir_prompt(
             nombre_cliente=nombre_cliente,
             edad=edad,
@@ -83,33 +88,42 @@ class DietaIAService:
         )
 
         try:
-            print(f"🤖 Generando dieta para {nombre_cliente} con Gemini 2.5...")
-
-            # Llamar a la API de Google Gemini 2.5
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.95,
-                    top_k=40,
-                    max_output_tokens=self.max_output_tokens,
-                    candidate_count=1,
-                )
+            print(f"🤖 Generando dieta para {nombre_cliente} con {self.proveedor.nombre} (~{prompt.tokens_estimados} tokens)...")
+
+            # Llamar a la IA en modo JSON (response_schema) y en streaming:
+            # las recetas se extraen a medida que llegan y un corte por
+            # límite de tokens se repara
+            recetas_recibidas = []
+            datos = leer_stream(
+                self.proveedor.generar_stream(prompt, ESQUEMA_DIETA, self.max_output_tokens),
+                recetas_recibidas.append
             )
 
-            # Extraer la respuesta
-            response_text = response.text
-            print(f"✅ Respuesta recibida ({len(response_text)} caracteres)")
+            print(f"✅ Respuesta recibida ({len(recetas_recibidas)} recetas completas)")
 
-            # Parsear el JSON de respuesta
-            dieta_data = self._parsear_respuesta(response_text)
+            # Validar por secciones y pedir solo lo que falte
+            dieta = completar_dieta(
+                datos,
+                lambda secciones, validos: self._pedir_secciones(prompt.contenido, secciones, validos)
+            )
 
-            return dieta_data
+            return dieta.model_dump()
 
         except Exception as e:
             print(f"❌ Error al generar dieta con IA: {str(e)}")
             raise
 
+    def _pedir_secciones(self, paciente: str, secciones: List[str], validos: Dict[str, Any]) -> str:
+        """Genera solo las secciones de la dieta que faltaron o eran inválidas"""
+        campos = tuple(campo for seccion in secciones for campo in CAMPOS_SECCION[seccion])
+        prompt = prompt_seccion_dieta(
+            paciente=paciente,
+            secciones=secciones,
+            campos=campos,
+            recetas_existentes=[r["nombre"] for r in validos.get("recetas", [])]
+        )
+        return self.proveedor.generar(prompt, esquema_secciones(campos), self.max_output_tokens).texto
+
     def _construir_prompt(
             self,
             nombre_cliente: str,
@@ -123,144 +137,36 @@ class DietaIAService:
             restricciones_alimentarias: List[str],
             preferencias: str,
             duracion_semanas: int
-    ) -> str:
+    ) -> PromptRenderizado:
         """
-        Construye el prompt para la generación de dieta
+        Construye el prompt para la generación de dieta (plantilla compartida
+        en services/prompts_dieta.py)
         """
-
-        prompt = f"""Como nutriólogo experto, crea un plan de dieta personalizado detallado para el siguiente paciente:
-
-**INFORMACIÓN DEL PACIENTE:**
-- Nombre: {nombre_cliente}
-- Edad: {edad} años
-- Peso actual: {peso} kg
-- Altura: {altura} m
-- IMC: {imc:.2f}
-- Objetivo: {objetivo}
-"""
-
-        if enfermedades:
-            prompt += f"- Enfermedades/Condiciones: {', '.join(enfermedades)}\n"
-
-        if descripcion_medica:
-            prompt += f"- Descripción médica adicional: {descripcion_medica}\n"
-
-        if restricciones_alimentarias:
-            prompt += f"- Restricciones alimentarias: {', '.join(restricciones_alimentarias)}\n"
-
-        if preferencias:
-            prompt += f"- Preferencias del paciente: {preferencias}\n"
-
-        prompt += f"\n**DURACIÓN DEL PLAN:** {duracion_semanas} semanas\n"
-
-        prompt += """
-**INSTRUCCIONES:**
-Genera un plan de dieta completo que incluya:
-
-1. **Información General:**
-   - Nombre descriptivo del plan
-   - Descripción general
-   - Objetivo nutricional específico (perdida_grasa, definicion, volumen, o saludable)
-   - Calorías totales diarias recomendadas
-
-2. **Recetas (mínimo 15 recetas variadas):**
-   Para cada receta incluye:
-   - Nombre
-   - Descripción breve
-   - Calorías por porción
-   - Tiempo de preparación (en minutos)
-   - Lista detallada de ingredientes con cantidad y unidad
-   - Instrucciones paso a paso
-
-3. **Distribución Semanal:**
-   Un plan de 7 días con:
-   - Desayuno
-   - Comida
-   - Cena
-   - Snack
-
-   Asigna las recetas a diferentes comidas y días de manera balanceada.
-
-4. **Recomendaciones:**
-   - Consejos nutricionales personalizados
-   - Consideraciones especiales basadas en las condiciones del paciente
-   - Sugerencias de hidratación y suplementos si son necesarios
-
-**FORMATO DE RESPUESTA:**
-Responde ÚNICAMENTE con un objeto JSON válido siguiendo esta estructura exacta:
-
-{
-  "nombre": "Nombre del Plan de Dieta",
-  "descripcion": "Descripción general del plan",
-  "objetivo": "perdida_grasa | definicion | volumen | saludable",
-  "calorias_totales": 2000,
-  "recetas": [
-    {
-      "nombre": "Nombre de la Receta",
-      "descripcion": "Descripción de la receta",
-      "calorias": 350,
-      "tiempo_preparacion": 20,
-      "ingredientes": [
-        {
-          "nombre": "Ingrediente 1",
-          "cantidad": "100",
-          "unidad": "g"
-        }
-      ],
-      "instrucciones": [
-        "Paso 1",
-        "Paso 2"
-      ]
-    }
-  ],
-  "distribucion_semanal": {
-    "lunes": {
-      "desayuno": "Nombre de receta",
-      "comida": "Nombre de receta",
-      "cena": "Nombre de receta",
-      "snack": "Nombre de receta"
-    }
-  },
-  "recomendaciones": [
-    "Recomendación 1",
-    "Recomendación 2"
-  ]
-}
-
-IMPORTANTE: 
-- Responde SOLO con el JSON, sin texto adicional antes ni después
-- NO uses bloques de código markdown (```json)
-- Asegúrate de que el JSON sea válido y parseable
-- Todos los nombres de recetas en la distribución semanal deben existir en el array de recetas
-"""
-
-        return prompt
+        return prompt_dieta_json(
+            nombre_cliente=nombre_cliente,
+            edad=edad,
+            peso=peso,
+            altura=altura,
+            imc=imc,
+            objetivo=objetivo,
+            enfermedades=enfermedades,
+            descripcion_medica=descripcion_medica,
+            restricciones_alimentarias=restricciones_alimentarias,
+            preferencias=preferencias,
+            duracion_semanas=duracion_semanas
+        )
 
     def _parsear_respuesta(self, response_text: str) -> Dict[str, Any]:
         """
-        Parsea la respuesta de Gemini eliminando posibles marcadores de markdown
+        Parsea la respuesta de la IA de forma tolerante (ignora bloques
+        markdown y repara JSON truncado; ver services/json_ia.py)
         """
-        # Limpiar el texto de posibles marcadores de código
-        cleaned_text = response_text.strip()
-
-        # Eliminar bloques de código markdown si existen
-        if cleaned_text.startswith("```json"):
-            cleaned_text = cleaned_text[7:]
-        if cleaned_text.startswith("```"):
-            cleaned_text = cleaned_text[3:]
-        if cleaned_text.endswith("```"):
-            cleaned_text = cleaned_text[:-3]
-
-        cleaned_text = cleaned_text.strip()
-
-        # Parsear JSON
         try:
-            dieta_data = json.loads(cleaned_text)
-            return dieta_data
-        except json.JSONDecodeError as e:
+            return extraer_json(response_text)
+        except ValueError as e:
             print(f"❌ Error al parsear JSON: {str(e)}")
-            print(f"Texto recibido: {cleaned_text[:500]}...")
-            raise ValueError("La respuesta de la IA no está en formato JSON válido")
+            print(f"Texto recibido: {response_text[:500]}...")
+            raise
 
     def generar_recomendaciones_progreso(
             self,
@@ -272,47 +178,20 @@ IMPORTANTE:
     ) -> List[str]:
         """
         Genera recomendaciones basadas en el progreso del cliente
-        usando Google Gemini 2.5
+        usando el proveedor de IA configurado
         """
 
-        diferencia_peso = peso_actual - peso_inicial
-        porcentaje_cambio = (diferencia_peso / peso_inicial) * 100
-
-        prompt = f"""Como nutriólogo, analiza el progreso del paciente {nombre_cliente}:
-
-- Peso inicial: {peso_inicial} kg
-- Peso actual: {peso_actual} kg
-- Cambio: {diferencia_peso:+.2f} kg ({porcentaje_cambio:+.2f}%)
-- Objetivo: {objetivo}
-- Semanas transcurridas: {semanas_transcurridas}
-
-Proporciona 5 recomendaciones específicas y accionables para el paciente.
-
-Responde SOLO con un JSON con este formato:
-{{
-  "recomendaciones": [
-    "Recomendación 1",
-    "Recomendación 2",
-    "Recomendación 3",
-    "Recomendación 4",
-    "Recomendación 5"
-  ]
-}}
-
-NO agregues texto adicional, SOLO el JSON.
-"""
+        prompt = prompt_recomendaciones_progreso(
+            nombre_cliente=nombre_cliente,
+            peso_inicial=peso_inicial,
+            peso_actual=peso_actual,
+            objetivo=objetivo,
+            semanas_transcurridas=semanas_transcurridas
+        )
 
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=1000,
-                )
-            )
-
-            response_text = response.text
-            data = self._parsear_respuesta(response_text)
+            respuesta = self.proveedor.generar(prompt, ESQUEMA_RECOMENDACIONES, max_tokens=1000)
+            data = self._parsear_respuesta(respuesta.texto)
 
             return data.get("recomendaciones", [])
 
@@ -329,6 +208,10 @@ NO agregues texto adicional, SOLO el JSON.
 logger = logging.getLogger("DietaService")
 
 
+class DietaYaRenovada(ValueError):
+    """La dieta ya fue sustituida por una versión nueva (evita bifurcar la cadena)"""
+
+
 class DietaService:
     """
     Servicio para manejar operaciones de dietas
@@ -342,10 +225,13 @@ class DietaService:
         descripcion: str,
         objetivo: str,
         calorias_totales: int,
-        dias_duracion: int = 30
+        dias_duracion: int = 30,
+        commit: bool = True
     ) -> Dieta:
         """
         Crea una nueva dieta
+
+        Con commit=False solo hace flush (para incluirla en una transacción mayor)
         """
         logger.info(f"📝 Creando dieta para usuario {id_usuario}")
 
@@ -372,8 +258,11 @@ class DietaService:
         )
 
         db.add(nueva_dieta)
-        db.commit()
-        db.refresh(nueva_dieta)
+        if commit:
+            db.commit()
+            db.refresh(nueva_dieta)
+        else:
+            db.flush()
 
         logger.info(f"✅ Dieta creada: ID={nueva_dieta.id_dieta}, Vence: {fecha_vencimiento}")
         return nueva_dieta
@@ -382,20 +271,15 @@ class DietaService:
     def obtener_dieta_activa(db: Session, id_usuario: int) -> Optional[Dieta]:
         """
         Obtiene la dieta activa de un usuario
+
+        Solo lectura: una dieta vencida que el barrido periódico aún no
+        marcó (services/vencimiento_dietas.py) simplemente no se devuelve.
         """
-        dieta = db.query(Dieta).filter(
+        return db.query(Dieta).filter(
             Dieta.id_usuario == id_usuario,
-            Dieta.estado == EstadoDieta.activa
+            filtro_vigente()
         ).order_by(Dieta.fecha_creacion.desc()).first()
 
-        if dieta and dieta.esta_vencida():
-            logger.warning(f"⚠️ Dieta {dieta.id_dieta} está vencida pero sigue como activa")
-            dieta.marcar_vencida()
-            db.commit()
-            return None
-
-        return dieta
-
     @staticmethod
     def obtener_dietas_vencidas(db: Session, id_usuario: int) -> List[Dieta]:
         """
@@ -409,29 +293,16 @@ class DietaService:
         return dietas
 
     @staticmethod
-    def verificar_y_actualizar_vencimientos(db: Session, id_usuario: int) -> List[Dieta]:
+    def verificar_y_actualizar_vencimientos(db: Session, id_usuario: int) -> int:
         """
-        Verifica si hay dietas vencidas y las marca como vencidas
+        Marca como vencidas las dietas activas ya vencidas de un usuario
+        (un UPDATE por conjuntos; el barrido periódico hace lo mismo para todos)
+
+        Returns:
+            Número de dietas marcadas
         """
         logger.info(f"🔍 Verificando vencimientos para usuario {id_usuario}")
-
-        dietas_activas = db.query(Dieta).filter(
-            Dieta.id_usuario == id_usuario,
-            Dieta.estado == EstadoDieta.activa
-        ).all()
-
-        vencidas = []
-        for dieta in dietas_activas:
-            if dieta.esta_vencida():
-                logger.warning(f"⏰ Dieta {dieta.id_dieta} ha vencido")
-                dieta.marcar_vencida()
-                vencidas.append(dieta)
-
-        if vencidas:
-            db.commit()
-            logger.info(f"✅ {len(vencidas)} dietas marcadas como vencidas")
-
-        return vencidas
+        return marcar_dietas_vencidas(db, id_usuario=id_usuario)
 
     @staticmethod
     def crear_nueva_dieta_desde_vencida(
@@ -444,132 +315,212 @@ class DietaService:
     ) -> Dieta:
         """
         Crea una nueva dieta basada en una anterior que vencio
+
+        La nueva dieta y el cambio de la anterior a `actualizada` se
+        guardan en una sola transacción.
         """
         logger.info(f"🔄 Creando nueva dieta basada en {id_dieta_anterior}")
 
-        # Obtener dieta anterior
-        dieta_anterior = db.query(Dieta).filter(Dieta.id_dieta == id_dieta_anterior).first()
+        # Obtener dieta anterior (bloqueada hasta el commit en MySQL)
+        dieta_anterior = db.query(Dieta).filter(
+            Dieta.id_dieta == id_dieta_anterior
+        ).with_for_update().first()
         if not dieta_anterior:
             raise ValueError(f"Dieta {id_dieta_anterior} no encontrada")
+        if dieta_anterior.estado == EstadoDieta.actualizada:
+            db.rollback()
+            raise DietaYaRenovada(f"La dieta {id_dieta_anterior} ya fue renovada")
 
-        # Crear nueva dieta
+        ahora = datetime.now()
         nueva_dieta = Dieta(
             id_usuario=dieta_anterior.id_usuario,
             nombre=nombre_nueva,
             descripcion=descripcion_nueva,
             objetivo=dieta_anterior.objetivo,
             calorias_totales=calorias_nuevas,
-            fecha_creacion=datetime.now(),
+            fecha_creacion=ahora,
             dias_duracion=dias_duracion,
-            fecha_vencimiento=datetime.now() + timedelta(days=dias_duracion),
+            fecha_vencimiento=ahora + timedelta(days=dias_duracion),
             estado=EstadoDieta.activa,
             id_dieta_anterior=id_dieta_anterior
         )
 
-        db.add(nueva_dieta)
-        db.commit()
+        try:
+            db.add(nueva_dieta)
+            dieta_anterior.marcar_actualizada()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
         db.refresh(nueva_dieta)
 
-        # Marcar anterior como actualizada
-        dieta_anterior.marcar_actualizada()
-        db.commit()
-
         logger.info(f"✅ Nueva dieta creada: {nueva_dieta.id_dieta}")
         return nueva_dieta
 
     @staticmethod
-    def obtener_info_dietas(db: Session, id_usuario: int) -> dict:
+    def eliminar_dieta(db: Session, id_dieta: int) -> bool:
         """
-        Obtiene información completa de dietas del usuario
+        Elimina una dieta sin romper los planes de sus renovaciones
+
+        Las recetas que otras dietas reutilizan en su plan (renovación por
+        cambios) pasan antes a la primera de esas dietas; así el borrado en
+        cascada solo quita las recetas que nadie más usa. Un db.delete()
+        directo de la dieta se las quitaría también al plan de sus
+        renovaciones.
+
+        Returns:
+            False si la dieta no existe
         """
-        dietas_activas = db.query(Dieta).filter(
-            Dieta.id_usuario == id_usuario,
-            Dieta.estado == EstadoDieta.activa
-        ).all()
+        dieta = db.get(Dieta, id_dieta)
+        if dieta is None:
+            return False
 
-        dietas_vencidas = db.query(Dieta).filter(
-            Dieta.id_usuario == id_usuario,
-            Dieta.estado.in_([EstadoDieta.vencida, EstadoDieta.actualizada])
-        ).all()
+        primera_que_la_usa = select(func.min(ComidaDieta.id_dieta)).where(
+            ComidaDieta.id_receta == Receta.id_receta,
+            ComidaDieta.id_dieta != id_dieta
+        ).scalar_subquery()
 
-        proxima_vencimiento = None
-        if dietas_activas:
-            proxima = min(dietas_activas, key=lambda d: d.fecha_vencimiento or datetime.max)
-            proxima_vencimiento = proxima.fecha_vencimiento
+        try:
+            reasignadas = db.execute(
+                update(Receta)
+                .where(Receta.id_dieta == id_dieta, primera_que_la_usa.is_not(None))
+                .values(id_dieta=primera_que_la_usa)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.expire_all()
+            db.delete(db.get(Dieta, id_dieta))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
 
-        return {
-            "dietas_activas": len(dietas_activas),
-            "dietas_vencidas": len(dietas_vencidas),
-            "proxima_vencimiento": proxima_vencimiento,
-            "dietas_activas_list": dietas_activas
-        }
+        logger.info(f"🗑️  Dieta {id_dieta} eliminada ({reasignadas} recetas reasignadas a sus renovaciones)")
+        return True
 
     @staticmethod
-    def generar_reporte_vencimientos(db: Session) -> List[dict]:
+    def obtener_historial(db: Session, id_dieta: int) -> list:
         """
-        Genera reporte de todas las dietas que vencerán en los próximos 7 días
+        Cadena completa de versiones a la que pertenece una dieta, en una
+        sola consulta con CTE recursivas (MySQL 8+ y SQLite):
+        1. ancestros: sube por id_dieta_anterior hasta la dieta original
+           (sin anterior, o con una anterior ya borrada)
+        2. cadena: baja desde la original por todas sus renovaciones
+           (idx_dieta_anterior)
+
+        Returns:
+            Filas ordenadas de la primera versión a la última, con `version`
+            (1 = dieta original). Lista vacía si la dieta no existe.
         """
-        logger.info("📊 Generando reporte de vencimientos")
+        d = aliased(Dieta)
+
+        ancestros = select(
+            Dieta.id_dieta, Dieta.id_dieta_anterior, Dieta.id_usuario
+        ).where(Dieta.id_dieta == id_dieta).cte("ancestros", recursive=True)
+        ancestros = ancestros.union_all(
+            select(d.id_dieta, d.id_dieta_anterior, d.id_usuario).join(
+                ancestros,
+                and_(d.id_dieta == ancestros.c.id_dieta_anterior, d.id_usuario == ancestros.c.id_usuario)
+            )
+        )
 
-        fecha_hoy = datetime.now()
-        fecha_una_semana = fecha_hoy + timedelta(days=7)
+        # La original es la que no tiene anterior (o cuya anterior ya no existe)
+        original = select(ancestros.c.id_dieta).where(or_(
+            ancestros.c.id_dieta_anterior.is_(None),
+            ancestros.c.id_dieta_anterior.not_in(select(ancestros.c.id_dieta))
+        ))
+        cadena = select(
+            Dieta.id_dieta, literal_column("1").label("version")
+        ).where(Dieta.id_dieta.in_(original)).cte("cadena", recursive=True)
+        cadena = cadena.union_all(
+            select(d.id_dieta, (cadena.c.version + 1).label("version")).join(
+                cadena, d.id_dieta_anterior == cadena.c.id_dieta
+            )
+        )
 
-        dietas_proximas = db.query(Dieta).filter(
-            Dieta.estado == EstadoDieta.activa,
-            Dieta.fecha_vencimiento >= fecha_hoy,
-            Dieta.fecha_vencimiento <= fecha_una_semana
+        return db.query(
+            Dieta.id_dieta,
+            Dieta.id_dieta_anterior,
+            Dieta.id_usuario,
+            Dieta.nombre,
+            Dieta.objetivo,
+            Dieta.calorias_totales,
+            Dieta.fecha_creacion,
+            Dieta.dias_duracion,
+            Dieta.fecha_vencimiento,
+            Dieta.estado,
+            cadena.c.version,
+        ).join(cadena, cadena.c.id_dieta == Dieta.id_dieta).order_by(
+            cadena.c.version, Dieta.fecha_creacion, Dieta.id_dieta
         ).all()
 
-        reporte = []
-        for dieta in dietas_proximas:
-            usuario = db.query(Usuario).filter(Usuario.id_usuario == dieta.id_usuario).first()
-            dias_restantes = dieta.dias_restantes()
-
-            reporte.append({
-                "id_dieta": dieta.id_dieta,
-                "nombre_dieta": dieta.nombre,
-                "usuario": usuario.nombre if usuario else "Desconocido",
-                "correo": usuario.correo if usuario else "N/A",
-                "dias_restantes": dias_restantes,
-                "fecha_vencimiento": dieta.fecha_vencimiento,
-                "accion": "⚠️ Recordatorio de renovación próxima" if dias_restantes <= 3 else "ℹ️ Próximo vencimiento"
-            })
-
-        logger.info(f"✅ Reporte generado: {len(reporte)} dietas próximas a vencer")
-        return reporte
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    @staticmethod
+    def obtener_info_dietas(db: Session, id_usuario: int) -> dict:
+        """
+        Conteo de dietas por estado y próximo vencimiento en una sola consulta
+        agregada (sin cargar filas ni la descripción)
 
+        Una dieta activa ya vencida que el barrido aún no marcó cuenta como
+        vencida.
+        """
+        ahora = datetime.now()
+        vigente = filtro_vigente(ahora)
+
+        def _contar(condicion):
+            return func.coalesce(func.sum(case((condicion, 1), else_=0)), 0)
+
+        proxima = func.min(case((vigente, Dieta.fecha_vencimiento)))
+        fila = db.query(
+            _contar(vigente).label("activas"),
+            _contar(and_(Dieta.estado == EstadoDieta.activa, not_(vigente))).label("sin_marcar"),
+            _contar(Dieta.estado == EstadoDieta.vencida).label("vencidas"),
+            _contar(Dieta.estado == EstadoDieta.actualizada).label("actualizadas"),
+            _contar(Dieta.estado == EstadoDieta.pausada).label("pausadas"),
+            proxima.label("proxima_vencimiento"),
+            func.min(case((vigente, dias_restantes(Dieta.fecha_vencimiento, ahora)))).label("dias_restantes"),
+        ).filter(Dieta.id_usuario == id_usuario).one()
+
+        vencidas = fila.vencidas + fila.sin_marcar
+        return {
+            "dietas_activas": fila.activas,
+            "dietas_vencidas": vencidas + fila.actualizadas,
+            "por_estado": {
+                EstadoDieta.activa.value: fila.activas,
+                EstadoDieta.vencida.value: vencidas,
+                EstadoDieta.actualizada.value: fila.actualizadas,
+                EstadoDieta.pausada.value: fila.pausadas,
+            },
+            "proxima_vencimiento": fila.proxima_vencimiento,
+            "dias_restantes_proxima": fila.dias_restantes
+        }
 
+    @staticmethod
+    def listar_dietas_vigentes(db: Session, id_usuario: int) -> list:
+        """
+        Dietas activas del usuario con dias_restantes calculado en SQL
+        (solo las columnas que muestra el panel)
+        """
+        ahora = datetime.now()
+        return db.query(
+            Dieta.id_dieta,
+            Dieta.nombre,
+            Dieta.fecha_vencimiento,
+            Dieta.estado,
+            func.coalesce(dias_restantes(Dieta.fecha_vencimiento, ahora), Dieta.dias_duracion).label("dias_restantes"),
+        ).filter(
+            Dieta.id_usuario == id_usuario,
+            filtro_vigente(ahora)
+        ).order_by(Dieta.fecha_vencimiento).all()
 
+    @staticmethod
+    def generar_reporte_vencimientos(db: Session, dias: int = 7) -> List[dict]:
+        """
+        Genera reporte de todas las dietas que vencerán en los próximos 7 días
 
+        Para muchas dietas usar iterar_reporte_vencimientos() directamente
+        (services/vencimiento_dietas.py), que no carga el reporte en memoria.
+        """
+        logger.info("📊 Generando reporte de vencimientos")
+        reporte = list(iterar_reporte_vencimientos(db, dias=dias))
+        logger.info(f"✅ Reporte generado: {len(reporte)} dietas próximas a vencer")
+        return reporte
 
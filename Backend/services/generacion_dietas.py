@@ -0,0 +1,715 @@
+"""
+Backend/services/generacion_dietas.py
+Generación de dietas con IA (individual y por lotes)
+
+- generar_dieta_para_cliente(): flujo completo reutilizable
+  (prompt -> IA en modo JSON y streaming -> Dieta + recetas + calendario
+  -> PDF); síncrono, se ejecuta en el threadpool desde los endpoints.
+- renovar_dieta_con_cambios(): renovación que solo pide a la IA las
+  comidas que cambian y reutiliza las recetas de la versión anterior.
+- Lotes: iniciar_lote() lanza una tarea asyncio que genera las dietas de
+  varios clientes en paralelo, limitadas globalmente por
+  IA_MAX_CONCURRENCIA llamadas simultáneas e IA_MAX_POR_MINUTO llamadas
+  por minuto. Cada dieta se guarda en cuanto termina y el progreso se
+  consulta con obtener_lote().
+
+Los prompts salen de services/prompts_dieta.py, las llamadas van al
+proveedor de services/proveedores_ia.py (Gemini o simulado) y el consumo de tokens/costo de cada dieta se guarda
+en dieta_uso_ia (services/uso_ia.py).
+
+El registro de lotes vive en memoria del proceso (se pierde al reiniciar).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import weakref
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, contains_eager, joinedload, selectinload
+
+from config.database import SessionLocal
+from core.texto import plegar_texto
+from models.calendario import CalendarioDieta, ComidaDieta, DiaSemana, TipoComida
+from models.dieta import Dieta, EstadoDieta
+from models.ingrediente import Ingrediente
+from models.progreso import Progreso
+from models.receta import Receta
+from models.user import Usuario
+from schemas.dieta_ia import ComidasDiaIA, DietaIA, IngredienteIA, RecetaIA, RenovacionDietaIA
+from services.dieta_ia_service import DietaService, DietaYaRenovada
+from services.json_ia import (
+    CAMPOS_SECCION,
+    ESQUEMA_DIETA,
+    ESQUEMA_RENOVACION,
+    completar_dieta,
+    esquema_secciones,
+    extraer_json,
+    leer_stream,
+    validar_renovacion,
+)
+from services.pdf_generator import generar_pdf_dieta_estructurada
+from services.prompts_dieta import (
+    PromptRenderizado,
+    prompt_dieta_cliente,
+    prompt_renovacion_dieta,
+    prompt_seccion_dieta,
+)
+from services.proveedores_ia import RespuestaIA, RespuestaStreamIA, obtener_proveedor
+from services.uso_ia import registrar_uso
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCIA = int(os.getenv("IA_MAX_CONCURRENCIA", "4"))
+MAX_POR_MINUTO = int(os.getenv("IA_MAX_POR_MINUTO", "30"))
+
+# Comidas que puede cambiar como máximo una renovación por cambios (de 28)
+RENOVACION_MAX_CAMBIOS = int(os.getenv("IA_RENOVACION_MAX_CAMBIOS", "14"))
+
+# Lotes terminados que se conservan para consultar su resultado
+LOTES_RETENCION_SEGUNDOS = 3600
+
+OBJETIVO_FORMATO = {
+    'bajar_peso': 'Bajar de peso',
+    'mantener': 'Mantener peso',
+    'aumentar_masa': 'Aumentar masa muscular'
+}
+
+
+# ============================================================
+# GENERACIÓN INDIVIDUAL
+# ============================================================
+def parsear_enfermedades(enfermedades) -> List[str]:
+    """La columna JSON ya llega como lista; registros antiguos pueden traer un string JSON"""
+    if isinstance(enfermedades, str):
+        try:
+            enfermedades = json.loads(enfermedades)
+        except ValueError:
+            enfermedades = []
+    return enfermedades or []
+
+
+def construir_prompt_dieta(
+    cliente: Usuario,
+    nombre_dieta: str,
+    dias_duracion: int,
+    calorias_objetivo: int,
+    preferencias: Optional[str] = None
+) -> PromptRenderizado:
+    """Prompt de generación de dieta a partir del perfil del cliente"""
+    objetivo = str(cliente.objetivo.value) if cliente.objetivo else None
+
+    return prompt_dieta_cliente(
+        nombre=cliente.nombre,
+        edad=cliente.edad,
+        peso=cliente.peso,
+        altura=cliente.altura,
+        peso_inicial=cliente.peso_inicial,
+        objetivo=OBJETIVO_FORMATO.get(objetivo or 'mantener', objetivo or 'Mantener peso'),
+        enfermedades=parsear_enfermedades(cliente.enfermedades),
+        descripcion_medica=cliente.descripcion_medica,
+        nombre_dieta=nombre_dieta,
+        dias_duracion=dias_duracion,
+        calorias_objetivo=calorias_objetivo,
+        preferencias=preferencias
+    )
+
+
+def llamar_ia(prompt: PromptRenderizado, esquema: Optional[Dict[str, Any]] = None) -> RespuestaIA:
+    """Llamada bloqueante al proveedor de IA configurado (IA_PROVEEDOR), respetando IA_MAX_POR_MINUTO"""
+    _limitador.esperar_turno()
+    return obtener_proveedor().generar(prompt, esquema)
+
+
+def llamar_ia_stream(prompt: PromptRenderizado, esquema: Optional[Dict[str, Any]] = None) -> RespuestaStreamIA:
+    """Llamada en streaming al proveedor de IA configurado (el consumo queda en .uso al terminar)"""
+    _limitador.esperar_turno()
+    return obtener_proveedor().generar_stream(prompt, esquema)
+
+
+def formatear_dieta(dieta: DietaIA) -> str:
+    """Texto legible de la dieta estructurada (se guarda como descripción de la Dieta)"""
+    lineas: List[str] = []
+    if dieta.descripcion:
+        lineas += [dieta.descripcion, ""]
+    if dieta.calorias_totales:
+        lineas += [f"Calorías diarias: {dieta.calorias_totales} kcal", ""]
+
+    lineas.append("DISTRIBUCIÓN SEMANAL")
+    for dia, comidas in dieta.distribucion_semanal.items():
+        platos = [f"{tipo.capitalize()}: {plato}" for tipo, plato in comidas.model_dump().items() if plato]
+        lineas.append(f"{dia.capitalize()}: " + " | ".join(platos))
+
+    lineas += ["", "RECETAS"]
+    for n, receta in enumerate(dieta.recetas, 1):
+        lineas += _lineas_receta(n, receta)
+
+    lineas += ["", "RECOMENDACIONES"]
+    lineas += [f"- {r}" for r in dieta.recomendaciones]
+    return "\n".join(lineas)
+
+
+def _lineas_receta(n: int, receta: RecetaIA) -> List[str]:
+    datos = ", ".join(filter(None, [
+        f"{receta.calorias} kcal" if receta.calorias else None,
+        f"{receta.tiempo_preparacion} min" if receta.tiempo_preparacion else None,
+    ]))
+    lineas = [f"{n}. {receta.nombre}" + (f" ({datos})" if datos else "")]
+    if receta.descripcion:
+        lineas.append(f"   {receta.descripcion}")
+    ingredientes = ", ".join(
+        " ".join(filter(None, [i.cantidad, i.unidad, i.nombre])) for i in receta.ingredientes
+    )
+    lineas.append(f"   Ingredientes: {ingredientes}")
+    for paso, instruccion in enumerate(receta.instrucciones, 1):
+        lineas.append(f"   {paso}) {instruccion}")
+    return lineas
+
+
+_DIAS = {d.value: d for d in DiaSemana}
+_COMIDAS = {c.value: c for c in TipoComida}
+
+
+def _receta_desde_ia(receta_ia: RecetaIA, id_dieta: int) -> Receta:
+    return Receta(
+        id_dieta=id_dieta,
+        nombre=receta_ia.nombre,
+        descripcion=receta_ia.descripcion,
+        calorias=receta_ia.calorias,
+        tiempo_preparacion=receta_ia.tiempo_preparacion,
+        instrucciones=list(receta_ia.instrucciones),
+        ingredientes=[
+            Ingrediente(nombre=i.nombre, cantidad=i.cantidad, unidad=i.unidad)
+            for i in receta_ia.ingredientes
+        ]
+    )
+
+
+def _receta_a_ia(receta: Receta) -> RecetaIA:
+    """Receta guardada como RecetaIA (para el PDF); sin validar, puede venir de datos antiguos"""
+    return RecetaIA.model_construct(
+        nombre=receta.nombre,
+        descripcion=receta.descripcion,
+        calorias=receta.calorias,
+        tiempo_preparacion=receta.tiempo_preparacion,
+        ingredientes=[
+            IngredienteIA.model_construct(nombre=i.nombre, cantidad=i.cantidad, unidad=i.unidad)
+            for i in receta.ingredientes
+        ],
+        instrucciones=list(receta.instrucciones or [])
+    )
+
+
+def _guardar_plan(db: Session, dieta: Dieta, plan: Dict[Tuple[DiaSemana, TipoComida], Receta]) -> None:
+    """Plan semanal de la dieta (comidas_dieta) y calendario actual del cliente (sin commit)"""
+    db.query(CalendarioDieta).filter(
+        CalendarioDieta.id_usuario == dieta.id_usuario
+    ).delete(synchronize_session=False)
+
+    for (dia_semana, comida), receta in plan.items():
+        db.add(ComidaDieta(id_dieta=dieta.id_dieta, receta=receta, dia_semana=dia_semana, comida=comida))
+        db.add(CalendarioDieta(id_usuario=dieta.id_usuario, receta=receta, dia_semana=dia_semana, comida=comida))
+
+
+def guardar_recetas(db: Session, dieta: Dieta, dieta_ia: DietaIA) -> None:
+    """
+    Guarda recetas e ingredientes de la dieta, su plan semanal y sustituye
+    el calendario del cliente por el de esta dieta (sin commit)
+    """
+    recetas: Dict[str, Receta] = {}
+    for receta_ia in dieta_ia.recetas:
+        recetas.setdefault(plegar_texto(receta_ia.nombre.strip()), _receta_desde_ia(receta_ia, dieta.id_dieta))
+    db.add_all(recetas.values())
+
+    plan: Dict[Tuple[DiaSemana, TipoComida], Receta] = {}
+    for dia, comidas in dieta_ia.distribucion_semanal.items():
+        dia_semana = _DIAS.get(plegar_texto(dia.strip()))
+        if dia_semana is None:
+            continue
+        for tipo, plato in comidas.model_dump().items():
+            receta = recetas.get(plegar_texto((plato or "").strip()))
+            if receta is not None:
+                plan[(dia_semana, _COMIDAS[tipo])] = receta
+
+    _guardar_plan(db, dieta, plan)
+
+
+def generar_dieta_para_cliente(
+    db: Session,
+    cliente: Usuario,
+    nombre_dieta: str,
+    dias_duracion: int,
+    calorias_objetivo: int,
+    preferencias: Optional[str] = None,
+    id_nutriologo: Optional[int] = None
+) -> Dieta:
+    """
+    Genera la dieta con IA en modo JSON, la guarda en BD (con recetas,
+    calendario y consumo de tokens) y crea su PDF
+    """
+    prompt = construir_prompt_dieta(cliente, nombre_dieta, dias_duracion, calorias_objetivo, preferencias)
+
+    logger.info(
+        f"📝 Prompt generado para cliente {cliente.id_usuario} (~{prompt.tokens_estimados} tokens), llamando a la IA..."
+    )
+    # Las recetas se extraen en cuanto se cierran; un corte a mitad conserva lo recibido
+    respuesta = llamar_ia_stream(prompt, ESQUEMA_DIETA)
+    recibidas: List[str] = []
+    datos = leer_stream(respuesta, lambda receta: recibidas.append(receta.get("nombre")))
+    usos = [respuesta.uso]
+    logger.info(
+        f"✅ Respuesta de la IA recibida ({len(respuesta.texto)} caracteres, {len(recibidas)} recetas completas)"
+    )
+
+    def pedir_secciones(secciones: List[str], validos: Dict[str, Any]) -> str:
+        # Solo si la respuesta llegó truncada (límite de tokens de salida)
+        campos = tuple(c for seccion in secciones for c in CAMPOS_SECCION[seccion])
+        parcial = llamar_ia(
+            prompt_seccion_dieta(
+                paciente=prompt.contenido,
+                secciones=secciones,
+                campos=campos,
+                recetas_existentes=[r["nombre"] for r in validos.get("recetas", [])]
+            ),
+            esquema_secciones(campos)
+        )
+        usos.append(parcial.uso)
+        return parcial.texto
+
+    dieta_ia = completar_dieta(datos, pedir_secciones)
+
+    # Dieta, recetas, calendario y consumo en una sola transacción
+    try:
+        dieta = DietaService.crear_dieta(
+            db=db,
+            id_usuario=cliente.id_usuario,
+            nombre=nombre_dieta,
+            descripcion=formatear_dieta(dieta_ia),
+            objetivo=dieta_ia.objetivo,
+            calorias_totales=calorias_objetivo,
+            dias_duracion=dias_duracion,
+            commit=False
+        )
+        guardar_recetas(db, dieta, dieta_ia)
+        for uso in usos:
+            registrar_uso(db, uso, id_dieta=dieta.id_dieta, id_nutriologo=id_nutriologo, commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(dieta)
+
+    generar_pdf_dieta_estructurada(dieta.id_dieta, dieta.nombre, dieta_ia)
+    logger.info(f"✅ Dieta guardada en BD con ID={dieta.id_dieta} ({len(dieta_ia.recetas)} recetas)")
+
+    return dieta
+
+
+# ============================================================
+# RENOVACIÓN POR CAMBIOS
+# ============================================================
+class SinPlanEstructurado(ValueError):
+    """La dieta anterior no tiene plan semanal guardado (no se puede renovar por cambios)"""
+
+
+def plan_de_dieta(db: Session, dieta: Dieta) -> Dict[Tuple[DiaSemana, TipoComida], Receta]:
+    """{(día, comida): receta} del plan semanal de una dieta"""
+    filas = db.query(ComidaDieta).options(
+        joinedload(ComidaDieta.receta).selectinload(Receta.ingredientes)
+    ).filter(
+        ComidaDieta.id_dieta == dieta.id_dieta
+    ).all()
+    if filas:
+        return {(f.dia_semana, f.comida): f.receta for f in filas}
+
+    # Dietas anteriores a comidas_dieta: su calendario, si sigue siendo el del cliente
+    filas = db.query(CalendarioDieta).join(CalendarioDieta.receta).options(
+        contains_eager(CalendarioDieta.receta).selectinload(Receta.ingredientes)
+    ).filter(
+        CalendarioDieta.id_usuario == dieta.id_usuario,
+        Receta.id_dieta == dieta.id_dieta
+    ).all()
+    return {(f.dia_semana, f.comida): f.receta for f in filas}
+
+
+def _lineas_plan(plan: Dict[Tuple[DiaSemana, TipoComida], Receta], marcados=()) -> List[str]:
+    """Una línea por día: "lunes: desayuno=Avena (350 kcal) | ..." (* = cambiado)"""
+    lineas = []
+    for dia in DiaSemana:
+        platos = []
+        for comida in TipoComida:
+            receta = plan.get((dia, comida))
+            if receta is not None:
+                kcal = f" ({receta.calorias} kcal)" if receta.calorias else ""
+                marca = "*" if (dia, comida) in marcados else ""
+                platos.append(f"{comida.value}={receta.nombre}{kcal}{marca}")
+        if platos:
+            lineas.append(f"{dia.value}: " + " | ".join(platos))
+    return lineas
+
+
+def _lineas_progreso(db: Session, id_usuario: int, limite: int = 5) -> List[str]:
+    """Últimos registros de progreso del cliente, del más antiguo al más reciente"""
+    filas = db.query(Progreso.fecha_registro, Progreso.peso, Progreso.imc).filter(
+        Progreso.id_usuario == id_usuario
+    ).order_by(Progreso.fecha_registro.desc(), Progreso.id_progreso.desc()).limit(limite).all()
+    return [
+        f"{f.fecha_registro}: {f.peso} kg" + (f" (IMC {f.imc})" if f.imc else "")
+        for f in reversed(filas)
+    ]
+
+
+def renovar_dieta_con_cambios(
+    db: Session,
+    dieta_anterior: Dieta,
+    cliente: Usuario,
+    nombre_dieta: str,
+    dias_duracion: int,
+    calorias_objetivo: int,
+    preferencias: Optional[str] = None,
+    id_nutriologo: Optional[int] = None
+) -> Tuple[Dieta, dict]:
+    """
+    Renueva una dieta pidiendo a la IA solo las comidas que cambian
+
+    La IA recibe el plan anterior (nombres y calorías, sin recetas
+    completas) y el progreso del cliente, y devuelve los cambios y las
+    recetas nuevas que necesitan. La nueva dieta guarda solo esas recetas;
+    el resto de su plan apunta a las recetas de la versión anterior. La
+    nueva dieta, su plan y el paso de la anterior a `actualizada` se guardan
+    en una sola transacción, con la anterior bloqueada (SELECT ... FOR
+    UPDATE) para que dos renovaciones simultáneas no bifurquen la cadena.
+
+    Returns:
+        (nueva dieta, resumen con comidas_cambiadas / recetas_nuevas / recetas_reutilizadas)
+
+    Raises:
+        SinPlanEstructurado si la dieta anterior no tiene plan guardado
+        DietaYaRenovada si la dieta anterior ya tiene una versión nueva
+    """
+    if dieta_anterior.estado == EstadoDieta.actualizada:
+        raise DietaYaRenovada(f"La dieta {dieta_anterior.id_dieta} ya fue renovada")
+
+    plan = plan_de_dieta(db, dieta_anterior)
+    if not plan:
+        raise SinPlanEstructurado(f"La dieta {dieta_anterior.id_dieta} no tiene plan semanal guardado")
+
+    objetivo = str(cliente.objetivo.value) if cliente.objetivo else None
+    prompt = prompt_renovacion_dieta(
+        nombre=cliente.nombre,
+        objetivo=OBJETIVO_FORMATO.get(objetivo or 'mantener', objetivo or 'Mantener peso'),
+        enfermedades=parsear_enfermedades(cliente.enfermedades),
+        progreso=_lineas_progreso(db, cliente.id_usuario),
+        plan_anterior=_lineas_plan(plan),
+        nombre_dieta=nombre_dieta,
+        dias_duracion=dias_duracion,
+        calorias_objetivo=calorias_objetivo,
+        max_cambios=RENOVACION_MAX_CAMBIOS,
+        preferencias=preferencias
+    )
+    logger.info(
+        f"📝 Renovación por cambios de la dieta {dieta_anterior.id_dieta} (~{prompt.tokens_estimados} tokens)"
+    )
+    respuesta = llamar_ia(prompt, ESQUEMA_RENOVACION)
+    renovacion = validar_renovacion(extraer_json(respuesta.texto))
+
+    existentes = {plegar_texto(r.nombre.strip()): r for r in plan.values()}
+    propuestas: Dict[str, RecetaIA] = {}
+    for receta_ia in renovacion.recetas_nuevas:
+        propuestas.setdefault(plegar_texto(receta_ia.nombre.strip()), receta_ia)
+
+    # Aplicar los cambios sobre una copia del plan anterior
+    nuevo_plan = dict(plan)
+    cambiados: List[Tuple[DiaSemana, TipoComida]] = []
+    usadas: Dict[str, RecetaIA] = {}
+    for cambio in renovacion.cambios[:RENOVACION_MAX_CAMBIOS]:
+        dia_semana = _DIAS.get(plegar_texto(cambio.dia.strip()))
+        nombre = plegar_texto(cambio.receta.strip())
+        if dia_semana is None or (nombre not in propuestas and nombre not in existentes):
+            continue
+        clave = (dia_semana, _COMIDAS[cambio.comida])
+        if nombre in propuestas:
+            usadas.setdefault(nombre, propuestas[nombre])
+            nuevo_plan[clave] = nombre
+        elif nuevo_plan.get(clave) is not existentes[nombre]:
+            nuevo_plan[clave] = existentes[nombre]
+        else:
+            continue
+        if clave not in cambiados:
+            cambiados.append(clave)
+
+    ahora = datetime.now()
+    dieta = Dieta(
+        id_usuario=dieta_anterior.id_usuario,
+        nombre=nombre_dieta,
+        objetivo=dieta_anterior.objetivo,
+        calorias_totales=calorias_objetivo,
+        fecha_creacion=ahora,
+        dias_duracion=dias_duracion,
+        fecha_vencimiento=ahora + timedelta(days=dias_duracion),
+        estado=EstadoDieta.activa,
+        id_dieta_anterior=dieta_anterior.id_dieta
+    )
+
+    try:
+        # Otra renovación pudo terminar mientras se esperaba a la IA
+        bloqueada = db.query(Dieta).filter(
+            Dieta.id_dieta == dieta_anterior.id_dieta
+        ).with_for_update().populate_existing().one()
+        if bloqueada.estado == EstadoDieta.actualizada:
+            raise DietaYaRenovada(f"La dieta {dieta_anterior.id_dieta} ya fue renovada")
+
+        db.add(dieta)
+        db.flush()
+        creadas = {nombre: _receta_desde_ia(receta_ia, dieta.id_dieta) for nombre, receta_ia in usadas.items()}
+        db.add_all(creadas.values())
+        nuevo_plan = {clave: creadas.get(r, r) if isinstance(r, str) else r for clave, r in nuevo_plan.items()}
+        dieta.descripcion = formatear_renovacion(dieta_anterior.nombre, nuevo_plan, cambiados, list(usadas.values()), renovacion)
+        _guardar_plan(db, dieta, nuevo_plan)
+        bloqueada.marcar_actualizada()
+        registrar_uso(db, respuesta.uso, id_dieta=dieta.id_dieta, id_nutriologo=id_nutriologo, commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(dieta)
+
+    generar_pdf_dieta_estructurada(dieta.id_dieta, dieta.nombre, DietaIA.model_construct(
+        nombre=nombre_dieta,
+        descripcion=renovacion.descripcion,
+        objetivo=dieta.objetivo.value if dieta.objetivo else "saludable",
+        calorias_totales=calorias_objetivo,
+        # Todas las recetas del plan (nuevas y reutilizadas) con ingredientes y pasos
+        recetas=[usadas[nombre] if nombre in usadas else _receta_a_ia(receta) for nombre, receta in _recetas_del_plan(nuevo_plan, creadas)],
+        distribucion_semanal={
+            dia.value: ComidasDiaIA(**{
+                comida.value: receta.nombre for (d, comida), receta in nuevo_plan.items() if d == dia
+            })
+            for dia in DiaSemana
+        },
+        recomendaciones=renovacion.recomendaciones
+    ))
+
+    resumen = {
+        "comidas_cambiadas": len(cambiados),
+        "recetas_nuevas": len(creadas),
+        "recetas_reutilizadas": len({r.id_receta for r in nuevo_plan.values() if r.id_dieta != dieta.id_dieta}),
+    }
+    logger.info(f"✅ Dieta {dieta.id_dieta} renovada desde {dieta_anterior.id_dieta}: {resumen}")
+    return dieta, resumen
+
+
+def _recetas_del_plan(
+    plan: Dict[Tuple[DiaSemana, TipoComida], Receta],
+    creadas: Dict[str, Receta]
+) -> List[Tuple[Optional[str], Receta]]:
+    """Recetas distintas del plan en orden de la semana, con su nombre en `creadas` si es nueva"""
+    nombres = {id(r): nombre for nombre, r in creadas.items()}
+    vistas: Dict[int, Tuple[Optional[str], Receta]] = {}
+    for dia in DiaSemana:
+        for comida in TipoComida:
+            receta = plan.get((dia, comida))
+            if receta is not None and id(receta) not in vistas:
+                vistas[id(receta)] = (nombres.get(id(receta)), receta)
+    return list(vistas.values())
+
+
+def formatear_renovacion(
+    nombre_anterior: str,
+    plan: Dict[Tuple[DiaSemana, TipoComida], Receta],
+    cambiados: List[Tuple[DiaSemana, TipoComida]],
+    recetas_nuevas: List[RecetaIA],
+    renovacion: RenovacionDietaIA
+) -> str:
+    """Descripción de una dieta renovada: solo incluye completas las recetas nuevas"""
+    lineas: List[str] = []
+    if renovacion.descripcion:
+        lineas += [renovacion.descripcion, ""]
+    lineas += [
+        f"Renovación de \"{nombre_anterior}\": {len(cambiados)} comidas cambiadas (*); "
+        f"el resto de recetas se conservan de la versión anterior.",
+        "",
+        "DISTRIBUCIÓN SEMANAL"
+    ]
+    lineas += _lineas_plan(plan, set(cambiados))
+
+    if recetas_nuevas:
+        lineas += ["", "RECETAS NUEVAS"]
+        for n, receta in enumerate(recetas_nuevas, 1):
+            lineas += _lineas_receta(n, receta)
+
+    if renovacion.recomendaciones:
+        lineas += ["", "RECOMENDACIONES"]
+        lineas += [f"- {r}" for r in renovacion.recomendaciones]
+    return "\n".join(lineas)
+
+
+# ============================================================
+# LÍMITES GLOBALES DE LLAMADAS A LA IA
+# ============================================================
+class LimitadorTasa:
+    """
+    Espacia las llamadas para no superar max_por_minuto.
+    Bloqueante y seguro entre hilos: se usa dentro de llamar_ia(), que
+    corre en el threadpool, para contar también las llamadas de secciones
+    faltantes que hace una misma generación.
+    """
+
+    def __init__(self, max_por_minuto: int):
+        self._intervalo = 60.0 / max_por_minuto if max_por_minuto > 0 else 0.0
+        self._siguiente = 0.0
+        self._lock = threading.Lock()
+
+    def esperar_turno(self) -> None:
+        if not self._intervalo:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            espera = self._siguiente - ahora
+            self._siguiente = max(ahora, self._siguiente) + self._intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+# Un semáforo por event loop: un asyncio.Semaphore queda ligado al primer
+# loop que lo usa (varias apps/TestClient o asyncio.run() en el mismo proceso)
+_semaforos: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_semaforos_lock = threading.Lock()
+_limitador = LimitadorTasa(MAX_POR_MINUTO)
+
+
+def _obtener_semaforo() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _semaforos_lock:
+        semaforo = _semaforos.get(loop)
+        if semaforo is None:
+            semaforo = _semaforos[loop] = asyncio.Semaphore(MAX_CONCURRENCIA)
+        return semaforo
+
+
+async def ejecutar_con_limite(funcion, *args):
+    """
+    Ejecuta una función bloqueante que llama a la IA en el threadpool,
+    respetando la concurrencia global (individual y lotes). La tasa se
+    aplica en cada llamada a la IA (llamar_ia / llamar_ia_stream).
+    """
+    async with _obtener_semaforo():
+        return await run_in_threadpool(funcion, *args)
+
+
+# ============================================================
+# LOTES
+# ============================================================
+class LoteGeneracion:
+    """Estado de un lote de generación (se actualiza a medida que avanza)"""
+
+    def __init__(self, id_nutriologo: int, ids_clientes: List[int], parametros: dict):
+        self.id_lote = uuid.uuid4().hex
+        self.id_nutriologo = id_nutriologo
+        self.parametros = parametros
+        self.creado_en = datetime.utcnow()
+        self.terminado_en: Optional[datetime] = None
+        self.items: Dict[int, dict] = {
+            id_cliente: {"id_cliente": id_cliente, "estado": "pendiente", "id_dieta": None, "error": None}
+            for id_cliente in ids_clientes
+        }
+        self.tarea: Optional[asyncio.Task] = None
+
+    def resumen(self) -> dict:
+        items = list(self.items.values())
+        completados = sum(1 for i in items if i["estado"] == "completado")
+        fallidos = sum(1 for i in items if i["estado"] == "error")
+        return {
+            "id_lote": self.id_lote,
+            "estado": "terminado" if self.terminado_en else "en_proceso",
+            "total": len(items),
+            "completados": completados,
+            "fallidos": fallidos,
+            "pendientes": len(items) - completados - fallidos,
+            "creado_en": self.creado_en,
+            "terminado_en": self.terminado_en,
+            "items": [dict(i) for i in items],
+        }
+
+
+_lotes: Dict[str, LoteGeneracion] = {}
+_lotes_lock = threading.Lock()
+
+
+def _generar_en_hilo(id_cliente: int, id_nutriologo: int, parametros: dict) -> int:
+    """Genera y guarda la dieta de un cliente con su propia sesión de BD"""
+    db = SessionLocal()
+    try:
+        cliente = db.query(Usuario).filter(Usuario.id_usuario == id_cliente).first()
+        if not cliente:
+            raise ValueError("Cliente no encontrado")
+        return generar_dieta_para_cliente(db, cliente, id_nutriologo=id_nutriologo, **parametros).id_dieta
+    finally:
+        db.close()
+
+
+async def _procesar_cliente(lote: LoteGeneracion, id_cliente: int) -> None:
+    item = lote.items[id_cliente]
+
+    def _generar() -> int:
+        item["estado"] = "generando"
+        return _generar_en_hilo(id_cliente, lote.id_nutriologo, lote.parametros)
+
+    try:
+        item["id_dieta"] = await ejecutar_con_limite(_generar)
+        item["estado"] = "completado"
+    except Exception as e:
+        logger.error(f"❌ Lote {lote.id_lote}: error con cliente {id_cliente}: {str(e)}")
+        item["estado"] = "error"
+        item["error"] = str(e)
+
+
+async def _procesar_lote(lote: LoteGeneracion) -> None:
+    await asyncio.gather(*(_procesar_cliente(lote, c) for c in lote.items))
+    lote.terminado_en = datetime.utcnow()
+    resumen = lote.resumen()
+    logger.info(
+        f"✅ Lote {lote.id_lote} terminado: {resumen['completados']} dietas, {resumen['fallidos']} errores"
+    )
+
+
+def _limpiar_lotes() -> None:
+    # terminado_en es UTC naive: se compara con otro UTC naive (no con .timestamp())
+    limite = datetime.utcnow() - timedelta(seconds=LOTES_RETENCION_SEGUNDOS)
+    with _lotes_lock:
+        for id_lote in [
+            i for i, l in _lotes.items()
+            if l.terminado_en and l.terminado_en < limite
+        ]:
+            _lotes.pop(id_lote, None)
+
+
+def iniciar_lote(id_nutriologo: int, ids_clientes: List[int], parametros: dict) -> LoteGeneracion:
+    """
+    Registra un lote y lanza su procesamiento en segundo plano
+    (llamar dentro del event loop, p. ej. desde un endpoint async).
+
+    Args:
+        parametros: nombre_dieta, dias_duracion, calorias_objetivo, preferencias
+    """
+    _limpiar_lotes()
+    lote = LoteGeneracion(id_nutriologo, ids_clientes, parametros)
+    with _lotes_lock:
+        _lotes[lote.id_lote] = lote
+    lote.tarea = asyncio.create_task(_procesar_lote(lote), name=f"lote-dietas-{lote.id_lote}")
+    logger.info(f"🚀 Lote {lote.id_lote}: {len(ids_clientes)} dietas (concurrencia {MAX_CONCURRENCIA})")
+    return lote
+
+
+def obtener_lote(id_lote: str) -> Optional[LoteGeneracion]:
+    with _lotes_lock:
+        return _lotes.get(id_lote)
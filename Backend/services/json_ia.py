@@ -0,0 +1,439 @@
+"""
+Backend/services/json_ia.py
+Lectura tolerante de las respuestas JSON de la IA
+
+- ParserJSONIncremental: escáner que se alimenta por trozos mientras llega
+  el streaming de Gemini. Devuelve cada receta en cuanto se cierra su
+  objeto y, al final, reconstruye un JSON válido aunque la respuesta venga
+  truncada (cierra strings y contenedores abiertos y descarta el último
+  valor incompleto). Ignora texto y bloques ```json alrededor del objeto.
+- leer_stream(): consume una respuesta en streaming con el parser; si la
+  conexión se corta a mitad conserva lo recibido.
+- validar_dieta(): valida por secciones contra schemas/dieta_ia.py y
+  devuelve qué secciones faltan o son inválidas, de modo que solo esas se
+  vuelven a pedir (completar_dieta()) en lugar de regenerar todo.
+- validar_renovacion(): igual para las renovaciones por cambios.
+- esquema_gemini(): convierte un modelo pydantic al subconjunto de OpenAPI
+  que acepta Gemini como response_schema (modo JSON nativo).
+"""
+
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from schemas.dieta_ia import (
+    CambioComidaIA,
+    ComidasDiaIA,
+    DietaEstructuradaIA,
+    DietaIA,
+    InformacionDietaIA,
+    RecetaIA,
+    RecomendacionesIA,
+    RenovacionDietaIA,
+    distribucion_a_dict,
+)
+
+logger = logging.getLogger(__name__)
+
+_ESPACIOS = " \t\r\n"
+_UNICODE_INCOMPLETO = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+
+
+class _Contenedor:
+    __slots__ = ("tipo", "clave", "inicio", "espera_clave", "ultima_clave")
+
+    def __init__(self, tipo: str, clave: Optional[str], inicio: int):
+        self.tipo = tipo                  # "{" o "["
+        self.clave = clave                # clave bajo la que cuelga en el objeto padre
+        self.inicio = inicio              # posición de la llave/corchete de apertura
+        self.espera_clave = tipo == "{"
+        self.ultima_clave: Optional[str] = None
+
+
+# ============================================================
+# PARSER INCREMENTAL
+# ============================================================
+class ParserJSONIncremental:
+    """
+    Uso:
+        parser = ParserJSONIncremental(("recetas",))
+        for trozo in stream:
+            for receta in parser.alimentar(trozo):
+                ...  # receta completa (dict)
+        datos = parser.resultado()
+    """
+
+    def __init__(self, arreglos_emitidos: Tuple[str, ...] = ("recetas",)):
+        self._arreglos = set(arreglos_emitidos)
+        self._texto = ""
+        self._pos = 0
+        self._raiz: Optional[int] = None
+        self._fin: Optional[int] = None
+        self._pila: List[_Contenedor] = []
+        self._en_string = False
+        self._escape = False
+        self._inicio_string = 0
+        self._inicio_escalar: Optional[int] = None
+        # Último punto donde cortar deja un JSON válido: (posición, cierres pendientes)
+        self._corte: Tuple[int, str] = (0, "")
+
+    @property
+    def completo(self) -> bool:
+        """True si el objeto raíz ya se cerró"""
+        return self._fin is not None
+
+    def _cierres(self) -> str:
+        return "".join("}" if c.tipo == "{" else "]" for c in reversed(self._pila))
+
+    def _marcar_corte(self, posicion: int) -> None:
+        self._corte = (posicion, self._cierres())
+
+    def alimentar(self, trozo: str) -> List[Dict[str, Any]]:
+        """Procesa un trozo; devuelve los elementos completos de los arreglos vigilados"""
+        self._texto += trozo
+        emitidos: List[Dict[str, Any]] = []
+        texto = self._texto
+
+        i = self._pos
+        while i < len(texto) and self._fin is None:
+            c = texto[i]
+
+            if self._raiz is None:
+                if c == "{":
+                    self._raiz = i
+                    self._pila.append(_Contenedor("{", None, i))
+                    self._marcar_corte(i + 1)
+                i += 1
+                continue
+
+            if self._en_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._en_string = False
+                    self._terminar_string(i)
+                i += 1
+                continue
+
+            if self._inicio_escalar is not None:
+                if c not in _ESPACIOS and c not in ",]}":
+                    i += 1
+                    continue
+                self._inicio_escalar = None
+                self._marcar_corte(i)
+
+            actual = self._pila[-1]
+            if c == '"':
+                self._en_string = True
+                self._inicio_string = i
+            elif c in "{[":
+                clave = actual.ultima_clave if actual.tipo == "{" else None
+                self._pila.append(_Contenedor(c, clave, i))
+                self._marcar_corte(i + 1)
+            elif c in "}]":
+                cerrado = self._pila.pop()
+                if not self._pila:
+                    self._fin = i + 1
+                elif (
+                    cerrado.tipo == "{"
+                    and len(self._pila) == 2
+                    and self._pila[-1].tipo == "["
+                    and self._pila[-1].clave in self._arreglos
+                ):
+                    elemento = self._cargar(texto[cerrado.inicio:i + 1])
+                    if isinstance(elemento, dict):
+                        emitidos.append(elemento)
+                self._marcar_corte(i + 1)
+            elif c == ":":
+                actual.espera_clave = False
+            elif c == ",":
+                actual.espera_clave = actual.tipo == "{"
+            elif c not in _ESPACIOS:
+                self._inicio_escalar = i
+            i += 1
+
+        self._pos = i
+        return emitidos
+
+    def _terminar_string(self, fin: int) -> None:
+        actual = self._pila[-1]
+        if actual.tipo == "{" and actual.espera_clave:
+            actual.ultima_clave = self._cargar(self._texto[self._inicio_string:fin + 1])
+        else:
+            self._marcar_corte(fin + 1)
+
+    @staticmethod
+    def _cargar(fragmento: str) -> Any:
+        try:
+            return json.loads(fragmento)
+        except ValueError:
+            return None
+
+    def texto_reparado(self) -> Optional[str]:
+        """JSON válido con todo lo recibido hasta ahora (None si no hubo objeto)"""
+        if self._raiz is None:
+            return None
+        if self._fin is not None:
+            return self._texto[self._raiz:self._fin]
+
+        actual = self._pila[-1]
+        string_valor = self._en_string and not (actual.tipo == "{" and actual.espera_clave)
+        if string_valor:
+            # Un texto cortado se conserva: se cierra la comilla
+            parcial = self._texto[self._raiz:]
+            if self._escape:
+                parcial = parcial[:-1]
+            parcial = _UNICODE_INCOMPLETO.sub("", parcial)
+            return parcial + '"' + self._cierres()
+
+        posicion, cierres = self._corte
+        return self._texto[self._raiz:posicion].rstrip(_ESPACIOS + ",") + cierres
+
+    def resultado(self) -> Dict[str, Any]:
+        """
+        Objeto JSON recibido (reparado si vino truncado).
+
+        Raises:
+            ValueError si la respuesta no contiene un objeto JSON
+        """
+        reparado = self.texto_reparado()
+        if reparado is None:
+            raise ValueError("La respuesta de la IA no contiene un objeto JSON")
+        if self._fin is None:
+            logger.warning(f"⚠️  JSON truncado reparado ({len(self._texto)} caracteres recibidos)")
+        try:
+            return json.loads(reparado)
+        except ValueError as e:
+            raise ValueError(f"La respuesta de la IA no está en formato JSON válido: {str(e)}")
+
+
+def extraer_json(texto: str) -> Dict[str, Any]:
+    """Parsea una respuesta completa de la IA de forma tolerante"""
+    parser = ParserJSONIncremental(())
+    parser.alimentar(texto)
+    return parser.resultado()
+
+
+def leer_stream(
+    trozos: Iterable[str],
+    al_recibir: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Analiza una respuesta en streaming a medida que llega
+
+    Cada receta completa se pasa a al_recibir en cuanto se cierra. Si el
+    stream falla después de empezar el objeto JSON, se devuelve lo recibido
+    (reparado) para que completar_dieta() pida solo lo que falte.
+
+    Raises:
+        La excepción del stream si no llegó nada aprovechable
+    """
+    parser = ParserJSONIncremental(("recetas",))
+    try:
+        for trozo in trozos:
+            for receta in parser.alimentar(trozo):
+                if al_recibir:
+                    al_recibir(receta)
+    except Exception as e:
+        if parser.texto_reparado() is None:
+            raise
+        logger.warning(f"⚠️  Streaming interrumpido, se conserva lo recibido: {str(e)}")
+    return parser.resultado()
+
+
+# ============================================================
+# VALIDACIÓN DE LA DIETA POR SECCIONES
+# ============================================================
+DIAS_SEMANA = 7
+
+_distribucion = TypeAdapter(Dict[str, ComidasDiaIA])
+_recomendaciones = TypeAdapter(List[str])
+
+CAMPOS_SECCION = {
+    "informacion": ("nombre", "descripcion", "objetivo", "calorias_totales"),
+    "recetas": ("recetas",),
+    "distribucion_semanal": ("distribucion_semanal",),
+    "recomendaciones": ("recomendaciones",),
+}
+
+
+def validar_dieta(datos: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Valida cada sección por separado.
+
+    Returns:
+        (datos válidos normalizados, secciones faltantes o inválidas)
+        Las recetas inválidas se descartan una a una; la sección solo falta
+        si no queda ninguna.
+    """
+    validos: Dict[str, Any] = {}
+    faltantes: List[str] = []
+
+    try:
+        validos.update(InformacionDietaIA.model_validate(datos).model_dump())
+    except ValidationError:
+        faltantes.append("informacion")
+
+    recetas = []
+    for receta in datos.get("recetas") or []:
+        try:
+            recetas.append(RecetaIA.model_validate(receta).model_dump())
+        except ValidationError:
+            continue
+    if recetas:
+        validos["recetas"] = recetas
+    else:
+        faltantes.append("recetas")
+
+    try:
+        distribucion = _distribucion.validate_python(distribucion_a_dict(datos.get("distribucion_semanal")) or {})
+        if len(distribucion) < DIAS_SEMANA:
+            raise ValueError("distribución incompleta")
+        validos["distribucion_semanal"] = {d: c.model_dump() for d, c in distribucion.items()}
+    except (ValidationError, ValueError):
+        faltantes.append("distribucion_semanal")
+
+    try:
+        recomendaciones = [r for r in _recomendaciones.validate_python(datos.get("recomendaciones") or []) if r.strip()]
+        if not recomendaciones:
+            raise ValueError("sin recomendaciones")
+        validos["recomendaciones"] = recomendaciones
+    except (ValidationError, ValueError):
+        faltantes.append("recomendaciones")
+
+    return validos, faltantes
+
+
+def validar_renovacion(datos: Dict[str, Any]) -> RenovacionDietaIA:
+    """
+    Valida la respuesta de una renovación por cambios descartando uno a uno
+    los cambios y recetas inválidos (una renovación sin cambios es válida)
+    """
+    def _validos(modelo: Type[BaseModel], elementos) -> list:
+        resultado = []
+        for elemento in elementos or []:
+            try:
+                resultado.append(modelo.model_validate(elemento))
+            except ValidationError:
+                logger.warning(f"⚠️  {modelo.__name__} inválido descartado: {str(elemento)[:120]}")
+        return resultado
+
+    try:
+        recomendaciones = [r for r in _recomendaciones.validate_python(datos.get("recomendaciones") or []) if r.strip()]
+    except ValidationError:
+        recomendaciones = []
+
+    descripcion = datos.get("descripcion")
+    return RenovacionDietaIA(
+        descripcion=descripcion if isinstance(descripcion, str) else None,
+        cambios=_validos(CambioComidaIA, datos.get("cambios")),
+        recetas_nuevas=_validos(RecetaIA, datos.get("recetas_nuevas")),
+        recomendaciones=recomendaciones
+    )
+
+
+def completar_dieta(
+    datos: Dict[str, Any],
+    pedir_secciones: Callable[[List[str], Dict[str, Any]], str],
+    reintentos: int = 1
+) -> DietaIA:
+    """
+    Valida la dieta y pide a la IA solo las secciones que falten
+    (todas las faltantes en una misma llamada).
+
+    Args:
+        datos: JSON (posiblemente reparado) de la respuesta principal
+        pedir_secciones: función(secciones, datos_validos) -> texto de la IA
+            con un objeto JSON que contiene los campos de esas secciones
+        reintentos: Llamadas adicionales permitidas
+
+    Raises:
+        ValueError si tras los reintentos la dieta sigue incompleta
+    """
+    validos, faltantes = validar_dieta(datos)
+
+    for intento in range(reintentos):
+        if not faltantes:
+            break
+        logger.info(f"🔁 Pidiendo a la IA solo las secciones {faltantes} (intento {intento + 1})")
+        try:
+            parcial = extraer_json(pedir_secciones(faltantes, validos))
+        except ValueError as e:
+            logger.warning(f"⚠️  Respuesta parcial ilegible: {str(e)}")
+            continue
+        nuevos = {k: parcial.get(k) for seccion in faltantes for k in CAMPOS_SECCION[seccion]}
+        validos, faltantes = validar_dieta({**validos, **nuevos})
+
+    try:
+        return DietaIA.model_validate(validos)
+    except ValidationError as e:
+        raise ValueError(f"La dieta generada por la IA está incompleta (faltan {faltantes}): {e.error_count()} errores")
+
+
+# ============================================================
+# ESQUEMA DE RESPUESTA PARA GEMINI
+# ============================================================
+# Claves de JSON Schema que entiende el response_schema de Gemini
+_CLAVES_GEMINI = ("type", "enum", "description", "nullable")
+
+
+def _convertir(nodo: Dict[str, Any], definiciones: Dict[str, Any]) -> Dict[str, Any]:
+    if "$ref" in nodo:
+        return _convertir(definiciones[nodo["$ref"].split("/")[-1]], definiciones)
+
+    variantes = nodo.get("anyOf")
+    if variantes:
+        # Optional[X] -> X nullable (otras uniones no están soportadas)
+        no_nulas = [v for v in variantes if v.get("type") != "null"]
+        convertido = _convertir(no_nulas[0], definiciones)
+        if len(no_nulas) < len(variantes):
+            convertido["nullable"] = True
+        return convertido
+
+    esquema = {k: nodo[k] for k in _CLAVES_GEMINI if k in nodo}
+    if "enum" in esquema:
+        esquema["type"] = "string"
+    if "properties" in nodo:
+        esquema["type"] = "object"
+        esquema["properties"] = {k: _convertir(v, definiciones) for k, v in nodo["properties"].items()}
+        # Todas obligatorias (las opcionales quedan nullable): así el modelo
+        # siempre devuelve la misma forma y la presentación es determinista
+        esquema["required"] = list(nodo["properties"])
+    if "items" in nodo:
+        esquema["items"] = _convertir(nodo["items"], definiciones)
+    return esquema
+
+
+def esquema_gemini(modelo: Type[BaseModel], campos: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    response_schema para Gemini a partir de un modelo pydantic.
+
+    Args:
+        campos: Si se indica, solo esas propiedades de primer nivel
+    """
+    esquema_json = modelo.model_json_schema()
+    esquema = _convertir(esquema_json, esquema_json.get("$defs", {}))
+    if campos is not None:
+        campos = list(campos)
+        esquema["properties"] = {k: v for k, v in esquema["properties"].items() if k in campos}
+        esquema["required"] = campos
+    return esquema
+
+
+# response_schema de la dieta completa, de las renovaciones por cambios y
+# de las recomendaciones de progreso
+ESQUEMA_DIETA = esquema_gemini(DietaEstructuradaIA)
+ESQUEMA_RENOVACION = esquema_gemini(RenovacionDietaIA)
+ESQUEMA_RECOMENDACIONES = esquema_gemini(RecomendacionesIA)
+
+
+@lru_cache(maxsize=16)
+def esquema_secciones(campos: Tuple[str, ...]) -> Dict[str, Any]:
+    """response_schema con solo los campos de las secciones pedidas"""
+    return esquema_gemini(DietaEstructuradaIA, campos)
@@ -1,9 +1,10 @@
 # services/pdf_generator.py
 
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, ListFlowable
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
+from xml.sax.saxutils import escape
 import os
 
 def generar_pdf_dieta(dieta_id: int, nombre: str, contenido: str):
@@ -38,3 +39,86 @@ def generar_pdf_dieta(dieta_id: int, nombre: str, contenido: str):
     doc.build(story)
 
     return ruta_pdf
+
+
+def generar_pdf_dieta_estructurada(dieta_id: int, nombre: str, dieta):
+    """
+    PDF con maquetación fija a partir de la dieta estructurada
+    (schemas.dieta_ia.DietaIA): resumen, tabla semanal, recetas y
+    recomendaciones.
+    """
+    ruta_dir = "pdfs"
+    if not os.path.exists(ruta_dir):
+        os.makedirs(ruta_dir)
+
+    ruta_pdf = f"{ruta_dir}/dieta_{dieta_id}.pdf"
+
+    styles = getSampleStyleSheet()
+    title_style = styles["Heading1"]
+    section_style = styles["Heading2"]
+    recipe_style = styles["Heading3"]
+    text_style = styles["BodyText"]
+    small_style = styles["BodyText"].clone("Celda", fontSize=8, leading=10)
+
+    doc = SimpleDocTemplate(ruta_pdf, pagesize=letter)
+    story = []
+
+    # Resumen
+    story.append(Paragraph(f"<b>{escape(nombre)}</b>", title_style))
+    if dieta.descripcion:
+        story.append(Paragraph(escape(dieta.descripcion), text_style))
+    if dieta.calorias_totales:
+        story.append(Paragraph(f"Calorías diarias: <b>{dieta.calorias_totales} kcal</b>", text_style))
+    story.append(Spacer(1, 12))
+
+    # Distribución semanal
+    story.append(Paragraph("Distribución semanal", section_style))
+    comidas = ["desayuno", "comida", "cena", "snack"]
+    filas = [[""] + [Paragraph(f"<b>{c.capitalize()}</b>", small_style) for c in comidas]]
+    for dia, platos in dieta.distribucion_semanal.items():
+        datos = platos.model_dump()
+        filas.append(
+            [Paragraph(f"<b>{escape(dia.capitalize())}</b>", small_style)]
+            + [Paragraph(escape(datos.get(c) or "-"), small_style) for c in comidas]
+        )
+    tabla = Table(filas, colWidths=[70, 110, 110, 110, 110], repeatRows=1)
+    tabla.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+    story.append(tabla)
+    story.append(Spacer(1, 16))
+
+    # Recetas
+    story.append(Paragraph("Recetas", section_style))
+    for receta in dieta.recetas:
+        datos = " · ".join(filter(None, [
+            f"{receta.calorias} kcal" if receta.calorias else None,
+            f"{receta.tiempo_preparacion} min" if receta.tiempo_preparacion else None,
+        ]))
+        story.append(Paragraph(escape(receta.nombre) + (f" <font size=9>({datos})</font>" if datos else ""), recipe_style))
+        if receta.descripcion:
+            story.append(Paragraph(escape(receta.descripcion), text_style))
+        story.append(ListFlowable(
+            [Paragraph(escape(" ".join(filter(None, [i.cantidad, i.unidad, i.nombre]))), text_style)
+             for i in receta.ingredientes],
+            bulletType="bullet"
+        ))
+        if receta.instrucciones:
+            story.append(ListFlowable(
+                [Paragraph(escape(paso), text_style) for paso in receta.instrucciones],
+                bulletType="1"
+            ))
+        story.append(Spacer(1, 8))
+
+    # Recomendaciones
+    story.append(Paragraph("Recomendaciones", section_style))
+    story.append(ListFlowable(
+        [Paragraph(escape(r), text_style) for r in dieta.recomendaciones],
+        bulletType="bullet"
+    ))
+
+    doc.build(story)
+
+    return ruta_pdf
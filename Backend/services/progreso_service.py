@@ -0,0 +1,134 @@
+"""
+Backend/services/progreso_service.py
+Series de progreso (peso / IMC) calculadas en SQL
+
+- serie_progreso(): registros de un usuario agrupados por día o semana
+  (mínimo, media y máximo de peso, IMC medio) dentro de un rango de fechas;
+  la base de datos devuelve un punto por intervalo en lugar de todas las
+  filas.
+- rachas_progreso(): días consecutivos con registro, con funciones de
+  ventana (fecha - ROW_NUMBER() es constante dentro de cada racha).
+
+Ambas usan el índice idx_progreso_usuario_fecha (id_usuario, fecha_registro).
+"""
+
+from datetime import date, timedelta
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Session
+
+from core.sql import dias_entre, inicio_semana
+from models.progreso import Progreso
+
+GRANULARIDADES = ("dia", "semana")
+
+# Origen arbitrario para numerar los días (solo importan las diferencias)
+_ORIGEN = date(2000, 1, 1)
+
+
+class PuntoProgreso(NamedTuple):
+    """Un intervalo de la serie"""
+    inicio: date
+    registros: int
+    peso_min: Optional[float]
+    peso_avg: Optional[float]
+    peso_max: Optional[float]
+    imc_avg: Optional[float]
+
+
+class Rachas(NamedTuple):
+    actual: int           # racha vigente (0 si el último registro es anterior a ayer)
+    maxima: int
+    ultimo_registro: Optional[date]
+
+
+def _redondear(valor) -> Optional[float]:
+    return None if valor is None else round(float(valor), 2)
+
+
+def serie_progreso(
+    db: Session,
+    id_usuario: int,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    granularidad: str = "dia"
+) -> List[PuntoProgreso]:
+    """
+    Serie de peso/IMC agrupada en SQL, en orden cronológico
+
+    Args:
+        granularidad: "dia" o "semana" (semanas de lunes a domingo)
+    """
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad inválida: {granularidad}")
+
+    intervalo = (Progreso.fecha_registro if granularidad == "dia" else inicio_semana(Progreso.fecha_registro)).label("inicio")
+
+    qry = select(
+        intervalo,
+        func.count().label("registros"),
+        func.min(Progreso.peso).label("peso_min"),
+        func.avg(Progreso.peso).label("peso_avg"),
+        func.max(Progreso.peso).label("peso_max"),
+        func.avg(Progreso.imc).label("imc_avg"),
+    ).where(Progreso.id_usuario == id_usuario, Progreso.fecha_registro.is_not(None))
+    if desde:
+        qry = qry.where(Progreso.fecha_registro >= desde)
+    if hasta:
+        qry = qry.where(Progreso.fecha_registro <= hasta)
+
+    filas = db.execute(qry.group_by(intervalo).order_by(intervalo)).all()
+    return [
+        PuntoProgreso(
+            inicio=f.inicio,
+            registros=f.registros,
+            peso_min=_redondear(f.peso_min),
+            peso_avg=_redondear(f.peso_avg),
+            peso_max=_redondear(f.peso_max),
+            imc_avg=_redondear(f.imc_avg),
+        )
+        for f in filas
+    ]
+
+
+def rachas_progreso(db: Session, id_usuario: int, hoy: Optional[date] = None) -> Rachas:
+    """
+    Racha actual y máxima de días consecutivos con registro
+
+    La racha actual solo cuenta si su último día es hoy o ayer; si no, se
+    rompió y vale 0.
+
+    Cada día distinto se numera (días desde un origen) y se le resta su
+    ROW_NUMBER() en orden de fecha: el resultado es igual para todos los
+    días de una misma racha, así que agrupar por él da cada racha.
+    """
+    dias = select(Progreso.fecha_registro.label("fecha")).where(
+        Progreso.id_usuario == id_usuario,
+        Progreso.fecha_registro.is_not(None)
+    ).distinct().subquery()
+
+    numerados = select(
+        dias.c.fecha,
+        (dias_entre(literal(_ORIGEN), dias.c.fecha) - func.row_number().over(order_by=dias.c.fecha)).label("isla"),
+    ).subquery()
+
+    islas = select(
+        func.count().label("largo"),
+        func.max(numerados.c.fecha).label("fin"),
+    ).group_by(numerados.c.isla).subquery()
+
+    # La última racha, con la máxima de todas calculada en la misma fila
+    fila = db.execute(
+        select(
+            islas.c.largo,
+            func.max(islas.c.largo).over().label("maxima"),
+            islas.c.fin,
+        ).order_by(islas.c.fin.desc()).limit(1)
+    ).first()
+    if fila is None:
+        return Rachas(0, 0, None)
+
+    hoy = hoy or date.today()
+    actual = int(fila.largo) if fila.fin >= hoy - timedelta(days=1) else 0
+    return Rachas(actual, int(fila.maxima), fila.fin)
@@ -0,0 +1,288 @@
+"""
+Backend/services/prompts_dieta.py
+Plantillas de prompts para la IA (dietas y recomendaciones)
+
+Cada plantilla separa:
+- instrucciones: prefijo estático (reglas + formato/esquema), construido una
+  sola vez al importar. Se envía como system_instruction y siempre igual y
+  al principio, así Gemini puede reutilizarlo con su caché de contexto.
+- contenido: solo los datos del cliente/petición; las líneas sin valor se
+  omiten para no gastar tokens.
+
+Las dietas se piden en modo JSON nativo de Gemini: el formato lo fija el
+response_schema (schemas/dieta_ia.py), por eso las instrucciones ya no
+describen la estructura.
+
+Antes de enviar se estiman los tokens (estimar_tokens) y se rechazan los
+prompts que superan IA_MAX_TOKENS_PROMPT. Los tokens reales y el costo de
+cada llamada se guardan con services/uso_ia.py.
+"""
+
+import math
+import os
+import textwrap
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MAX_TOKENS_PROMPT = int(os.getenv("IA_MAX_TOKENS_PROMPT", "4000"))
+
+# Aproximación para texto en español (Gemini ronda 3.5-4 caracteres por token)
+CARACTERES_POR_TOKEN = 3.5
+
+
+def estimar_tokens(texto: str) -> int:
+    """Tokens aproximados de un texto, sin llamar a la API"""
+    return math.ceil(len(texto or "") / CARACTERES_POR_TOKEN)
+
+
+class PromptDemasiadoLargo(ValueError):
+    """El prompt supera IA_MAX_TOKENS_PROMPT"""
+
+
+class PromptRenderizado(NamedTuple):
+    """Prompt listo para enviar"""
+    plantilla: str
+    instrucciones: str
+    contenido: str
+    tokens_estimados: int
+
+    @property
+    def completo(self) -> str:
+        """Instrucciones + contenido en un solo texto (para APIs sin system_instruction)"""
+        return f"{self.instrucciones}\n\n{self.contenido}"
+
+
+class PlantillaPrompt:
+    """Prefijo estático precalculado; renderizar() añade la parte variable"""
+
+    def __init__(self, nombre: str, instrucciones: str):
+        self.nombre = nombre
+        self.instrucciones = textwrap.dedent(instrucciones).strip()
+        self.tokens_instrucciones = estimar_tokens(self.instrucciones)
+
+    def renderizar(self, contenido: str) -> PromptRenderizado:
+        tokens = self.tokens_instrucciones + estimar_tokens(contenido)
+        if tokens > MAX_TOKENS_PROMPT:
+            raise PromptDemasiadoLargo(
+                f"El prompt '{self.nombre}' tiene ~{tokens} tokens (máximo {MAX_TOKENS_PROMPT})"
+            )
+        return PromptRenderizado(self.nombre, self.instrucciones, contenido, tokens)
+
+
+def _lineas(titulo: str, campos: Iterable[Tuple[str, object]]) -> str:
+    """Bloque "TITULO:\\n- Campo: valor" omitiendo los valores vacíos"""
+    lineas = [f"- {campo}: {valor}" for campo, valor in campos if valor not in (None, "", [])]
+    return f"{titulo}:\n" + "\n".join(lineas)
+
+
+# ============================================================
+# DIETA DE UN CLIENTE (generar-dieta-ia y lotes)
+# ============================================================
+DIETA_CLIENTE = PlantillaPrompt("dieta_cliente", """
+    Eres un nutriólogo experto. Genera una dieta personalizada para el cliente
+    y la dieta descritos en el mensaje:
+    1. Recetas variadas con calorías por porción, tiempo de preparación
+       (minutos), ingredientes con cantidad y unidad e instrucciones
+    2. Distribución de 7 días (desayuno, comida, cena y snack) que se repite
+       durante la duración indicada, usando solo nombres de las recetas
+    3. Adecuada a sus condiciones médicas y cerca de las calorías objetivo
+    4. Recomendaciones nutricionales y consejos de salud personalizados
+""")
+
+
+def prompt_dieta_cliente(
+    *,
+    nombre: str,
+    edad: Optional[int],
+    peso: Optional[float],
+    altura: Optional[float],
+    peso_inicial: Optional[float],
+    objetivo: str,
+    enfermedades: List[str],
+    descripcion_medica: Optional[str],
+    nombre_dieta: str,
+    dias_duracion: int,
+    calorias_objetivo: int,
+    preferencias: Optional[str] = None
+) -> PromptRenderizado:
+    cliente = _lineas("CLIENTE", [
+        ("Nombre", nombre),
+        ("Edad", f"{edad} años" if edad else None),
+        ("Peso actual", f"{peso} kg" if peso else None),
+        ("Altura", f"{altura} m" if altura else None),
+        ("Peso inicial", f"{peso_inicial} kg" if peso_inicial else None),
+        ("Objetivo", objetivo),
+        ("Condiciones médicas", ", ".join(enfermedades) or "Ninguna"),
+        ("Descripción médica", descripcion_medica),
+    ])
+    dieta = _lineas("DIETA", [
+        ("Nombre", nombre_dieta),
+        ("Días de duración", dias_duracion),
+        ("Calorías diarias objetivo", calorias_objetivo),
+        ("Preferencias", preferencias),
+    ])
+    return DIETA_CLIENTE.renderizar(f"{cliente}\n\n{dieta}")
+
+
+# ============================================================
+# RENOVACIÓN POR CAMBIOS (solo las comidas que cambian)
+# ============================================================
+RENOVACION_DIETA = PlantillaPrompt("renovacion_dieta", """
+    Eres un nutriólogo experto renovando el plan semanal de un cliente. El
+    mensaje incluye su progreso y el plan anterior. Conserva lo que siga
+    siendo adecuado y devuelve SOLO lo que cambia:
+    1. cambios: día, comida y nombre de la receta que la sustituye (una
+       receta nueva o una del plan anterior)
+    2. recetas_nuevas: solo las recetas que no están en el plan anterior,
+       con calorías, tiempo, ingredientes e instrucciones
+    3. Recomendaciones actualizadas según el progreso y una descripción
+       breve de los cambios
+    Las comidas que no aparezcan en cambios se mantienen. Respeta el máximo
+    de cambios indicado y ajusta el plan a las calorías objetivo.
+""")
+
+
+def prompt_renovacion_dieta(
+    *,
+    nombre: str,
+    objetivo: str,
+    enfermedades: List[str],
+    progreso: Iterable[str],
+    plan_anterior: Iterable[str],
+    nombre_dieta: str,
+    dias_duracion: int,
+    calorias_objetivo: int,
+    max_cambios: int,
+    preferencias: Optional[str] = None
+) -> PromptRenderizado:
+    """
+    Args:
+        progreso: Líneas "fecha: peso" de los últimos registros
+        plan_anterior: Una línea por día, "lunes: desayuno=Avena (350 kcal) | ..."
+    """
+    cliente = _lineas("CLIENTE", [
+        ("Nombre", nombre),
+        ("Objetivo", objetivo),
+        ("Condiciones médicas", ", ".join(enfermedades) or "Ninguna"),
+    ])
+    lineas_progreso = list(progreso)
+    historial = "PROGRESO:\n" + "\n".join(f"- {p}" for p in lineas_progreso) if lineas_progreso else "PROGRESO: sin registros"
+    plan = "PLAN ANTERIOR:\n" + "\n".join(plan_anterior)
+    renovacion = _lineas("RENOVACIÓN", [
+        ("Nombre", nombre_dieta),
+        ("Días de duración", dias_duracion),
+        ("Calorías diarias objetivo", calorias_objetivo),
+        ("Máximo de cambios", max_cambios),
+        ("Preferencias", preferencias),
+    ])
+    return RENOVACION_DIETA.renderizar(f"{cliente}\n\n{historial}\n\n{plan}\n\n{renovacion}")
+
+
+# ============================================================
+# PLAN COMPLETO DEL PACIENTE (DietaIAService)
+# ============================================================
+DIETA_JSON = PlantillaPrompt("dieta_json", """
+    Como nutriólogo experto, crea un plan de dieta personalizado para el
+    paciente descrito en el mensaje. Incluye:
+    1. Nombre, descripción, objetivo (perdida_grasa, definicion, volumen o
+       saludable) y calorías diarias recomendadas
+    2. Mínimo 15 recetas variadas con descripción, calorías por porción,
+       tiempo de preparación (minutos), ingredientes con cantidad y unidad e
+       instrucciones paso a paso
+    3. Distribución de 7 días (desayuno, comida, cena y snack) usando solo
+       recetas del arreglo de recetas
+    4. Recomendaciones personalizadas según sus condiciones, hidratación y
+       suplementos si son necesarios
+""")
+
+
+def prompt_dieta_json(
+    *,
+    nombre_cliente: str,
+    edad: int,
+    peso: float,
+    altura: float,
+    imc: float,
+    objetivo: str,
+    enfermedades: List[str],
+    descripcion_medica: Optional[str],
+    restricciones_alimentarias: List[str],
+    preferencias: Optional[str],
+    duracion_semanas: int
+) -> PromptRenderizado:
+    paciente = _lineas("PACIENTE", [
+        ("Nombre", nombre_cliente),
+        ("Edad", f"{edad} años"),
+        ("Peso actual", f"{peso} kg"),
+        ("Altura", f"{altura} m"),
+        ("IMC", f"{imc:.2f}"),
+        ("Objetivo", objetivo),
+        ("Enfermedades/Condiciones", ", ".join(enfermedades)),
+        ("Descripción médica adicional", descripcion_medica),
+        ("Restricciones alimentarias", ", ".join(restricciones_alimentarias)),
+        ("Preferencias", preferencias),
+        ("Duración del plan", f"{duracion_semanas} semanas"),
+    ])
+    return DIETA_JSON.renderizar(paciente)
+
+
+SECCION_DIETA_JSON = PlantillaPrompt("dieta_json_seccion", """
+    Estás completando un plan de dieta ya iniciado para el paciente descrito
+    en el mensaje. Genera SOLO los campos de las secciones pedidas; la
+    distribución debe usar los nombres de las recetas existentes.
+""")
+
+
+def prompt_seccion_dieta(
+    *,
+    paciente: str,
+    secciones: Iterable[str],
+    campos: Iterable[str],
+    recetas_existentes: Iterable[str] = ()
+) -> PromptRenderizado:
+    """
+    Prompt para pedir solo algunas secciones de la dieta estructurada.
+
+    Args:
+        paciente: Contenido variable del prompt original
+        recetas_existentes: Nombres de recetas ya generadas (la distribución debe usarlas)
+    """
+    pedido = _lineas("SECCIONES PEDIDAS", [
+        ("Secciones", ", ".join(secciones)),
+        ("Campos", ", ".join(campos)),
+        ("Recetas existentes", ", ".join(recetas_existentes)),
+    ])
+    return SECCION_DIETA_JSON.renderizar(f"{paciente}\n\n{pedido}")
+
+
+# ============================================================
+# RECOMENDACIONES DE PROGRESO
+# ============================================================
+RECOMENDACIONES_PROGRESO = PlantillaPrompt("recomendaciones_progreso", """
+    Como nutriólogo, analiza el progreso del paciente descrito en el mensaje
+    y proporciona 5 recomendaciones específicas y accionables.
+""")
+
+
+def prompt_recomendaciones_progreso(
+    *,
+    nombre_cliente: str,
+    peso_inicial: float,
+    peso_actual: float,
+    objetivo: str,
+    semanas_transcurridas: int
+) -> PromptRenderizado:
+    diferencia = peso_actual - peso_inicial
+    porcentaje = (diferencia / peso_inicial) * 100
+    progreso = _lineas("PACIENTE", [
+        ("Nombre", nombre_cliente),
+        ("Peso inicial", f"{peso_inicial} kg"),
+        ("Peso actual", f"{peso_actual} kg"),
+        ("Cambio", f"{diferencia:+.2f} kg ({porcentaje:+.2f}%)"),
+        ("Objetivo", objetivo),
+        ("Semanas transcurridas", semanas_transcurridas),
+    ])
+    return RECOMENDACIONES_PROGRESO.renderizar(progreso)
@@ -0,0 +1,293 @@
+"""
+Backend/services/proveedores_ia.py
+Proveedores de IA intercambiables
+
+Toda llamada a un modelo pasa por un ProveedorIA:
+- ProveedorGemini: Google Gemini (google.generativeai). La API key se exige
+  en la primera llamada, no al importar.
+- ProveedorSimulado: respuestas deterministas sin red ni cuota (pruebas de
+  carga y benchmarks). Genera JSON que cumple el response_schema pedido;
+  la latencia (IA_SIMULADO_LATENCIA_MS) y el tamaño de la respuesta
+  (IA_SIMULADO_ELEMENTOS recetas) son configurables.
+
+Se elige con IA_PROVEEDOR=gemini|simulado (por defecto gemini) y se obtiene
+con obtener_proveedor().
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+
+from services.prompts_dieta import PromptRenderizado, estimar_tokens
+from services.uso_ia import UsoIA, uso_desde_respuesta
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+IA_PROVEEDOR = os.getenv("IA_PROVEEDOR", "gemini").lower()
+GEMINI_MODEL_ID = os.getenv("GEMINI_MODEL_ID", "models/gemini-2.5-flash")
+SIMULADO_LATENCIA_MS = int(os.getenv("IA_SIMULADO_LATENCIA_MS", "1500"))
+SIMULADO_ELEMENTOS = int(os.getenv("IA_SIMULADO_ELEMENTOS", "15"))
+
+
+class RespuestaIA(NamedTuple):
+    """Texto generado y su consumo"""
+    texto: str
+    uso: UsoIA
+
+
+class RespuestaStreamIA:
+    """
+    Respuesta en streaming: se itera por trozos de texto. Al terminar la
+    iteración (o si se corta con una excepción) `texto` y `uso` quedan
+    con lo recibido.
+    """
+
+    def __init__(self, trozos: Iterator[str], calcular_uso: Callable[[str], UsoIA]):
+        self._trozos = trozos
+        self._calcular_uso = calcular_uso
+        self._partes: List[str] = []
+        self.uso: Optional[UsoIA] = None
+
+    @property
+    def texto(self) -> str:
+        return "".join(self._partes)
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for trozo in self._trozos:
+                self._partes.append(trozo)
+                yield trozo
+        finally:
+            self.uso = self._calcular_uso(self.texto)
+
+
+class ProveedorIA(ABC):
+    """Interfaz común de los proveedores (llamadas bloqueantes)"""
+
+    nombre = "base"
+    modelo = ""
+
+    @abstractmethod
+    def generar(
+        self,
+        prompt: PromptRenderizado,
+        esquema: Optional[Dict[str, Any]] = None,
+        max_tokens: int = 8192,
+        temperatura: float = 0.7
+    ) -> RespuestaIA:
+        """Respuesta completa; con esquema el texto es JSON que lo cumple"""
+
+    @abstractmethod
+    def generar_stream(
+        self,
+        prompt: PromptRenderizado,
+        esquema: Optional[Dict[str, Any]] = None,
+        max_tokens: int = 8192,
+        temperatura: float = 0.7
+    ) -> RespuestaStreamIA:
+        """La respuesta en trozos de texto a medida que se genera, con su consumo al final"""
+
+
+# ============================================================
+# GEMINI
+# ============================================================
+class ProveedorGemini(ProveedorIA):
+    """Google Gemini; el prefijo estático de cada plantilla va como system_instruction"""
+
+    nombre = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, modelo: str = GEMINI_MODEL_ID):
+        self.modelo = modelo
+        self._api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self._lock = threading.Lock()
+        self._genai = None
+        # Un modelo por plantilla (instrucciones distintas)
+        self._modelos: Dict[str, Any] = {}
+
+    def _modelo_para(self, prompt: PromptRenderizado):
+        with self._lock:
+            if self._genai is None:
+                if not self._api_key:
+                    raise ValueError("GEMINI_API_KEY no está configurada en las variables de entorno")
+                import google.generativeai as genai  # solo se necesita con este proveedor
+                genai.configure(api_key=self._api_key)
+                self._genai = genai
+                logger.info(f"✅ Google Gemini configurada (modelo {self.modelo})")
+
+            modelo = self._modelos.get(prompt.plantilla)
+            if modelo is None:
+                modelo = self._genai.GenerativeModel(self.modelo, system_instruction=prompt.instrucciones)
+                self._modelos[prompt.plantilla] = modelo
+            return modelo
+
+    def _configuracion(self, esquema: Optional[Dict[str, Any]], max_tokens: int, temperatura: float):
+        formato = {"response_mime_type": "application/json", "response_schema": esquema} if esquema else {}
+        return self._genai.types.GenerationConfig(
+            temperature=temperatura,
+            top_p=0.95,
+            top_k=40,
+            max_output_tokens=max_tokens,
+            candidate_count=1,
+            **formato
+        )
+
+    def generar(self, prompt, esquema=None, max_tokens=8192, temperatura=0.7) -> RespuestaIA:
+        modelo = self._modelo_para(prompt)
+        inicio = time.monotonic()
+        response = modelo.generate_content(
+            prompt.contenido,
+            generation_config=self._configuracion(esquema, max_tokens, temperatura)
+        )
+        texto = response.text
+        duracion_ms = int((time.monotonic() - inicio) * 1000)
+        return RespuestaIA(texto, uso_desde_respuesta(response, prompt, self.modelo, texto, duracion_ms))
+
+    def generar_stream(self, prompt, esquema=None, max_tokens=8192, temperatura=0.7) -> RespuestaStreamIA:
+        modelo = self._modelo_para(prompt)
+        inicio = time.monotonic()
+        response = modelo.generate_content(
+            prompt.contenido,
+            generation_config=self._configuracion(esquema, max_tokens, temperatura),
+            stream=True
+        )
+        # El último trozo trae usage_metadata con el total de la llamada
+        ultimo = {"chunk": None}
+
+        def trozos() -> Iterator[str]:
+            for chunk in response:
+                ultimo["chunk"] = chunk
+                try:
+                    yield chunk.text
+                except ValueError:
+                    # Trozo sin texto (p. ej. solo metadatos de finalización)
+                    continue
+
+        def calcular_uso(texto: str) -> UsoIA:
+            duracion_ms = int((time.monotonic() - inicio) * 1000)
+            return uso_desde_respuesta(ultimo["chunk"], prompt, self.modelo, texto, duracion_ms)
+
+        return RespuestaStreamIA(trozos(), calcular_uso)
+
+
+# ============================================================
+# SIMULADO (DETERMINISTA, SIN RED)
+# ============================================================
+_DIAS = ("lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo")
+
+
+class ProveedorSimulado(ProveedorIA):
+    """
+    Respuestas deterministas: la misma entrada produce la misma salida.
+    Con esquema construye un JSON válido para él; sin esquema, texto plano.
+    """
+
+    nombre = "simulado"
+    modelo = "simulado"
+
+    def __init__(self, latencia_ms: int = SIMULADO_LATENCIA_MS, elementos: int = SIMULADO_ELEMENTOS):
+        self.latencia_ms = latencia_ms
+        self.elementos = elementos
+
+    def _longitud(self, campo: Optional[str]) -> int:
+        if campo == "recetas":
+            return self.elementos
+        if campo == "recetas_nuevas":
+            return max(1, self.elementos // 5)
+        if campo == "distribucion_semanal":
+            return len(_DIAS)
+        return 3
+
+    def _valor(self, esquema: Dict[str, Any], campo: Optional[str], indice: int, azar: random.Random) -> Any:
+        tipo = esquema.get("type")
+        if esquema.get("enum"):
+            return azar.choice(esquema["enum"])
+        if tipo == "object":
+            return {k: self._valor(v, k, indice, azar) for k, v in esquema.get("properties", {}).items()}
+        if tipo == "array":
+            return [self._valor(esquema["items"], campo, i, azar) for i in range(self._longitud(campo))]
+        if tipo == "integer":
+            return azar.randint(5, 600)
+        if tipo == "number":
+            return round(azar.uniform(1, 100), 1)
+        if tipo == "boolean":
+            return azar.random() < 0.5
+        if campo == "dia":
+            return _DIAS[indice % len(_DIAS)]
+        return f"{(campo or 'texto').replace('_', ' ').capitalize()} {indice + 1}"
+
+    def _contenido(self, prompt: PromptRenderizado, esquema: Optional[Dict[str, Any]]) -> str:
+        semilla = hashlib.sha256(f"{prompt.plantilla}\n{prompt.contenido}".encode("utf-8")).hexdigest()
+        azar = random.Random(semilla)
+
+        if not esquema:
+            return "\n".join(f"Línea {i + 1} de la respuesta simulada ({semilla[:8]})" for i in range(self.elementos * 4))
+
+        datos = self._valor(esquema, None, 0, azar)
+        # La distribución y los cambios deben referirse a recetas generadas
+        generadas = datos.get("recetas") or datos.get("recetas_nuevas") or []
+        recetas = [r["nombre"] for r in generadas] or [f"Receta {i + 1}" for i in range(self.elementos)]
+        for i, dia in enumerate(datos.get("distribucion_semanal", [])):
+            for j, comida in enumerate(k for k in dia if k != "dia"):
+                dia[comida] = recetas[(i * 4 + j) % len(recetas)]
+        for i, cambio in enumerate(datos.get("cambios", [])):
+            cambio["receta"] = recetas[i % len(recetas)]
+        return json.dumps(datos, ensure_ascii=False)
+
+    def generar(self, prompt, esquema=None, max_tokens=8192, temperatura=0.7) -> RespuestaIA:
+        inicio = time.monotonic()
+        texto = self._contenido(prompt, esquema)
+        time.sleep(self.latencia_ms / 1000)
+        duracion_ms = int((time.monotonic() - inicio) * 1000)
+        return RespuestaIA(texto, uso_desde_respuesta(None, prompt, self.modelo, texto, duracion_ms))
+
+    def generar_stream(self, prompt, esquema=None, max_tokens=8192, temperatura=0.7) -> RespuestaStreamIA:
+        inicio = time.monotonic()
+        texto = self._contenido(prompt, esquema)
+        n_trozos = max(1, estimar_tokens(texto) // 50)
+        tamano = -(-len(texto) // n_trozos)
+
+        def trozos() -> Iterator[str]:
+            for i in range(0, len(texto), tamano):
+                time.sleep(self.latencia_ms / 1000 / n_trozos)
+                yield texto[i:i + tamano]
+
+        def calcular_uso(recibido: str) -> UsoIA:
+            duracion_ms = int((time.monotonic() - inicio) * 1000)
+            return uso_desde_respuesta(None, prompt, self.modelo, recibido, duracion_ms)
+
+        return RespuestaStreamIA(trozos(), calcular_uso)
+
+
+# ============================================================
+# SELECCIÓN
+# ============================================================
+_PROVEEDORES = {
+    "gemini": ProveedorGemini,
+    "simulado": ProveedorSimulado,
+}
+
+_proveedor: Optional[ProveedorIA] = None
+_proveedor_lock = threading.Lock()
+
+
+def obtener_proveedor() -> ProveedorIA:
+    """Proveedor configurado en IA_PROVEEDOR (instancia única)"""
+    global _proveedor
+    with _proveedor_lock:
+        if _proveedor is None:
+            clase = _PROVEEDORES.get(IA_PROVEEDOR)
+            if clase is None:
+                raise ValueError(f"IA_PROVEEDOR desconocido: {IA_PROVEEDOR} (opciones: {', '.join(_PROVEEDORES)})")
+            _proveedor = clase()
+            logger.info(f"🤖 Proveedor de IA: {_proveedor.nombre} ({_proveedor.modelo})")
+        return _proveedor
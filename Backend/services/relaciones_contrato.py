@@ -0,0 +1,127 @@
+"""
+Backend/services/relaciones_contrato.py
+Caché de relaciones nutriólogo → clientes con contrato vigente
+
+Las comprobaciones de permiso ("¿tiene este nutriólogo un contrato ACTIVO o
+PENDIENTE con este cliente?") se resuelven con una sola consulta por
+nutriólogo que carga todos sus clientes vigentes; las siguientes
+comprobaciones salen de memoria hasta que:
+- caduca el TTL (CONTRATOS_CACHE_TTL segundos, por defecto 60), o
+- cambia el estado de un contrato del nutriólogo (invalidar())
+
+La caché es por proceso: el TTL acota el desfase entre workers.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Annotated, Dict, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from core.deps import get_db, get_current_user
+from models.contrato import Contrato, EstadoContrato
+from models.user import Usuario
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TTL_SEGUNDOS = int(os.getenv("CONTRATOS_CACHE_TTL", "60"))
+
+ESTADOS_VIGENTES = (EstadoContrato.ACTIVO, EstadoContrato.PENDIENTE)
+
+
+class RelacionContrato(NamedTuple):
+    """Contrato vigente entre un nutriólogo y un cliente"""
+    id_contrato: int
+    estado: EstadoContrato
+
+
+class CacheRelacionesContrato:
+    """{id_nutriologo: {id_cliente: RelacionContrato}} con caducidad"""
+
+    def __init__(self, ttl_segundos: int = TTL_SEGUNDOS):
+        self._ttl = ttl_segundos
+        self._lock = threading.Lock()
+        self._datos: Dict[int, Tuple[float, Dict[int, RelacionContrato]]] = {}
+
+    def clientes_de(self, db: Session, id_nutriologo: int) -> Dict[int, RelacionContrato]:
+        """Clientes con contrato vigente del nutriólogo (desde caché o una consulta)"""
+        with self._lock:
+            guardado = self._datos.get(id_nutriologo)
+        if guardado and guardado[0] > time.monotonic():
+            return guardado[1]
+
+        filas = db.query(Contrato.id_cliente, Contrato.id_contrato, Contrato.estado).filter(
+            Contrato.id_nutriologo == id_nutriologo,
+            Contrato.estado.in_(ESTADOS_VIGENTES)
+        ).order_by(Contrato.id_contrato).all()
+
+        # Si hay varios contratos con el mismo cliente se prefiere el ACTIVO más antiguo
+        relaciones: Dict[int, RelacionContrato] = {}
+        for id_cliente, id_contrato, estado in filas:
+            actual = relaciones.get(id_cliente)
+            if actual is None or (actual.estado != EstadoContrato.ACTIVO and estado == EstadoContrato.ACTIVO):
+                relaciones[id_cliente] = RelacionContrato(id_contrato, estado)
+
+        with self._lock:
+            self._datos[id_nutriologo] = (time.monotonic() + self._ttl, relaciones)
+        return relaciones
+
+    def contrato_con(self, db: Session, id_nutriologo: int, id_cliente: int) -> Optional[RelacionContrato]:
+        """Contrato vigente entre ambos, o None"""
+        return self.clientes_de(db, id_nutriologo).get(id_cliente)
+
+    def invalidar(self, id_nutriologo: Optional[int] = None) -> None:
+        """Descarta la caché de un nutriólogo (o toda si no se indica)"""
+        with self._lock:
+            if id_nutriologo is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(id_nutriologo, None)
+
+
+# Instancia única compartida por routers y servicios
+relaciones_contrato = CacheRelacionesContrato()
+
+
+# ============================================================
+# COMPROBACIÓN DE PERMISOS
+# ============================================================
+def verificar_contrato_cliente(db: Session, nutriologo: Usuario, id_cliente: int) -> RelacionContrato:
+    """
+    Exige que el usuario sea nutriólogo y tenga contrato vigente con el cliente.
+
+    Raises:
+        HTTPException 403 si no es nutriólogo o no hay contrato
+    """
+    if nutriologo.tipo_usuario.value != "nutriologo":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo nutriólogos pueden acceder"
+        )
+
+    relacion = relaciones_contrato.contrato_con(db, nutriologo.id_usuario, id_cliente)
+    if relacion is None:
+        logger.warning(f"❌ No hay contrato entre nutriólogo {nutriologo.id_usuario} y cliente {id_cliente}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes acceso a este cliente"
+        )
+    return relacion
+
+
+def contrato_cliente_dep(
+    cliente_id: int,
+    current_user: Annotated[Usuario, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_db)]
+) -> RelacionContrato:
+    """Dependencia para rutas con {cliente_id} en el path"""
+    return verificar_contrato_cliente(db, current_user, cliente_id)
+
+
+ContratoClienteDep = Annotated[RelacionContrato, Depends(contrato_cliente_dep)]
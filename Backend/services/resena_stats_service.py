@@ -0,0 +1,231 @@
+"""
+Backend/services/resena_stats_service.py
+Mantenimiento incremental de la tabla `resena_stats`
+
+Las funciones registrar_* no hacen commit: se llaman desde los endpoints
+de reseñas antes de su db.commit(), así el agregado y la reseña se
+confirman (o revierten) en la misma transacción. Los incrementos se hacen
+con UPDATE atómicos (col = col + n) para no perder cambios concurrentes.
+
+La columna `puntuacion` guarda un promedio bayesiano ponderado:
+
+    (PRIOR_PESO * PRIOR_MEDIA + suma_ponderada) / (PRIOR_PESO + total_ponderado)
+
+donde las reseñas no verificadas cuentan PESO_NO_VERIFICADA. Así un
+nutriólogo con una sola reseña de 5 no supera a uno con cincuenta de 4.8.
+Si se cambian estas variables hay que reconstruir la tabla.
+
+Reconciliación (si el agregado se desincroniza):
+    python -m services.resena_stats_service
+"""
+
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from dotenv import load_dotenv
+
+from config.database import SessionLocal
+from models.resena import Resena
+from models.resena_stats import ResenaStats
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PRIOR_MEDIA = float(os.getenv("RESENAS_PRIOR_MEDIA", "3.5"))
+PRIOR_PESO = float(os.getenv("RESENAS_PRIOR_PESO", "5"))
+PESO_NO_VERIFICADA = float(os.getenv("RESENAS_PESO_NO_VERIFICADA", "0.5"))
+
+
+def estrella_de(calificacion: float) -> int:
+    """Estrella (1-5) en la que cuenta una calificación"""
+    return min(5, max(1, int(round(calificacion))))
+
+
+def puntuacion_bayesiana(total, suma, total_verificadas, suma_verificadas):
+    """
+    Promedio bayesiano ponderado. Acepta números o expresiones SQL, de modo
+    que la misma fórmula sirve en Python y dentro de un UPDATE.
+    """
+    total_ponderado = total_verificadas + PESO_NO_VERIFICADA * (total - total_verificadas)
+    suma_ponderada = suma_verificadas + PESO_NO_VERIFICADA * (suma - suma_verificadas)
+    return (PRIOR_PESO * PRIOR_MEDIA + suma_ponderada) / (PRIOR_PESO + total_ponderado)
+
+
+# ============================================================
+# ACTUALIZACIÓN INCREMENTAL
+# ============================================================
+def _aplicar(db: Session, id_nutriologo: int, calificacion: float, verificado: bool, signo: int) -> None:
+    """Suma (signo=1) o resta (signo=-1) una calificación al agregado"""
+    columna = f"estrellas_{estrella_de(calificacion)}"
+    delta_verificadas = signo if verificado else 0
+
+    # Los nuevos valores se expresan sobre los actuales: la puntuación se
+    # calcula con ellos porque el SET no ve las columnas ya modificadas
+    total = ResenaStats.total + signo
+    suma = ResenaStats.suma + signo * calificacion
+    total_verificadas = ResenaStats.total_verificadas + delta_verificadas
+    suma_verificadas = ResenaStats.suma_verificadas + delta_verificadas * calificacion
+    cambios = {
+        "total": total,
+        "suma": suma,
+        "total_verificadas": total_verificadas,
+        "suma_verificadas": suma_verificadas,
+        "puntuacion": puntuacion_bayesiana(total, suma, total_verificadas, suma_verificadas),
+        columna: getattr(ResenaStats, columna) + signo,
+        "actualizado_en": datetime.utcnow(),
+    }
+
+    resultado = db.execute(
+        update(ResenaStats).where(ResenaStats.id_nutriologo == id_nutriologo).values(**cambios)
+    )
+    if resultado.rowcount or signo < 0:
+        return
+
+    # Primera reseña del nutriólogo: crear la fila
+    try:
+        with db.begin_nested():
+            db.execute(insert(ResenaStats).values(
+                id_nutriologo=id_nutriologo, total=1, suma=calificacion,
+                total_verificadas=delta_verificadas, suma_verificadas=delta_verificadas * calificacion,
+                puntuacion=puntuacion_bayesiana(1, calificacion, delta_verificadas, delta_verificadas * calificacion),
+                **{f"estrellas_{e}": int(f"estrellas_{e}" == columna) for e in range(1, 6)},
+                actualizado_en=datetime.utcnow()
+            ))
+    except IntegrityError:
+        # Otra transacción la creó entre el UPDATE y el INSERT
+        db.execute(update(ResenaStats).where(ResenaStats.id_nutriologo == id_nutriologo).values(**cambios))
+
+
+def registrar_alta(db: Session, id_nutriologo: int, calificacion: float, verificado: bool = False) -> None:
+    """Cuenta una reseña nueva"""
+    _aplicar(db, id_nutriologo, calificacion, verificado, 1)
+
+
+def registrar_baja(db: Session, id_nutriologo: int, calificacion: float, verificado: bool = False) -> None:
+    """Descuenta una reseña eliminada"""
+    _aplicar(db, id_nutriologo, calificacion, verificado, -1)
+
+
+def registrar_cambio(
+    db: Session,
+    id_nutriologo: int,
+    anterior: float,
+    nueva: float,
+    verificado: bool = False
+) -> None:
+    """Refleja el cambio de calificación de una reseña existente"""
+    if anterior == nueva:
+        return
+    registrar_baja(db, id_nutriologo, anterior, verificado)
+    registrar_alta(db, id_nutriologo, nueva, verificado)
+
+
+def obtener_stats(db: Session, id_nutriologo: int) -> Optional[ResenaStats]:
+    """Agregado de un nutriólogo (búsqueda por clave primaria)"""
+    return db.get(ResenaStats, id_nutriologo)
+
+
+def obtener_stats_lote(db: Session, ids_nutriologos: Iterable[int]) -> Dict[int, ResenaStats]:
+    """Agregados de varios nutriólogos en una sola consulta (los que no tienen reseñas no aparecen)"""
+    ids = set(ids_nutriologos)
+    if not ids:
+        return {}
+    filas = db.query(ResenaStats).filter(ResenaStats.id_nutriologo.in_(ids)).all()
+    return {f.id_nutriologo: f for f in filas}
+
+
+# ============================================================
+# RECONSTRUCCIÓN
+# ============================================================
+def reconstruir_stats(db: Optional[Session] = None, id_nutriologo: Optional[int] = None) -> int:
+    """
+    Recalcula `resena_stats` desde la tabla `resenas` con un GROUP BY.
+
+    Args:
+        id_nutriologo: Solo ese nutriólogo (None = todos)
+
+    Returns:
+        Número de nutriólogos con estadísticas
+    """
+    propia = db is None
+    db = db or SessionLocal()
+
+    try:
+        qry = db.query(
+            Resena.id_nutriologo,
+            Resena.calificacion,
+            Resena.verificado,
+            func.count(Resena.id_resena),
+        ).group_by(Resena.id_nutriologo, Resena.calificacion, Resena.verificado)
+        if id_nutriologo is not None:
+            qry = qry.filter(Resena.id_nutriologo == id_nutriologo)
+
+        filas: Dict[int, dict] = defaultdict(lambda: {
+            "total": 0, "suma": 0.0, "total_verificadas": 0, "suma_verificadas": 0.0,
+            **{f"estrellas_{e}": 0 for e in range(1, 6)}
+        })
+        for nutri_id, calificacion, verificado, cantidad in qry.all():
+            fila = filas[nutri_id]
+            fila["total"] += cantidad
+            fila["suma"] += calificacion * cantidad
+            fila[f"estrellas_{estrella_de(calificacion)}"] += cantidad
+            if verificado:
+                fila["total_verificadas"] += cantidad
+                fila["suma_verificadas"] += calificacion * cantidad
+
+        for fila in filas.values():
+            fila["puntuacion"] = puntuacion_bayesiana(
+                fila["total"], fila["suma"], fila["total_verificadas"], fila["suma_verificadas"]
+            )
+
+        borrar = delete(ResenaStats)
+        if id_nutriologo is not None:
+            borrar = borrar.where(ResenaStats.id_nutriologo == id_nutriologo)
+        db.execute(borrar)
+
+        ahora = datetime.utcnow()
+        if filas:
+            db.execute(insert(ResenaStats), [
+                {"id_nutriologo": nutri_id, **valores, "actualizado_en": ahora}
+                for nutri_id, valores in filas.items()
+            ])
+        db.commit()
+
+        logger.info(f"✅ Estadísticas de reseñas reconstruidas: {len(filas)} nutriólogos")
+        return len(filas)
+
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if propia:
+            db.close()
+
+
+def inicializar_stats(forzar: bool = False) -> None:
+    """
+    Reconstruye los agregados al arrancar si la tabla está vacía y hay
+    reseñas, o siempre con forzar (p. ej. tras añadirle columnas)
+    """
+    db = SessionLocal()
+    try:
+        vacia = db.query(ResenaStats.id_nutriologo).first() is None
+        if (forzar or vacia) and db.query(Resena.id_resena).first() is not None:
+            reconstruir_stats(db)
+    except Exception as e:
+        logger.error(f"❌ No se pudieron inicializar las estadísticas de reseñas: {str(e)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"📊 Nutriólogos reconciliados: {reconstruir_stats()}")
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 
 from models.contrato import Contrato, EstadoContrato
 from models.user import Usuario, TipoUsuarioEnum  # 🔥 Importante
+from services.relaciones_contrato import relaciones_contrato
 
 
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "sk_test_dummy")
@@ -67,6 +68,7 @@ class StripeService:
             # Guardar payment_intent_id
             contrato.stripe_payment_intent_id = payment_intent.id
             db.commit()
+            relaciones_contrato.invalidar(id_nutriologo)
 
             return True, {
                 "contrato_id": contrato.id_contrato,
@@ -115,6 +117,7 @@ class StripeService:
             contrato.validado = True
 
             db.commit()
+            relaciones_contrato.invalidar(contrato.id_nutriologo)
 
             return True, {
                 "contrato_id": contrato.id_contrato,
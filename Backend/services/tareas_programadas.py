@@ -0,0 +1,111 @@
+"""
+Backend/services/tareas_programadas.py
+Tareas periódicas en segundo plano (asyncio)
+
+Las tareas se registran al importar los servicios y se arrancan/detienen
+desde el lifespan de la aplicación (main.py). Cada ejecución corre en el
+threadpool para no bloquear el event loop con consultas síncronas.
+
+Cada worker arranca sus propias tareas. Las registradas con exclusiva=True
+toman antes un candado con nombre en la BD (GET_LOCK en MySQL, advisory
+lock en PostgreSQL) y, si otro worker ya la está ejecutando, se saltan esa
+vuelta. En SQLite (desarrollo, un solo proceso) el candado no se usa.
+"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from config.database import engine
+
+logger = logging.getLogger(__name__)
+
+_registradas: List[Tuple[str, Callable[[], object], float]] = []
+_en_ejecucion: List[asyncio.Task] = []
+
+_PREFIJO_CANDADO = "fitso:tarea:"
+
+
+@contextmanager
+def candado_bd(nombre: str) -> Iterator[bool]:
+    """
+    Candado con nombre en la BD, sin espera; devuelve si se obtuvo
+
+    Se mantiene mientras dure el bloque (en su propia conexión) y se libera
+    al salir, también si la tarea falla.
+    """
+    dialecto = engine.dialect.name
+    if dialecto not in ("mysql", "postgresql"):
+        yield True
+        return
+
+    clave = _PREFIJO_CANDADO + nombre
+    if dialecto == "mysql":
+        tomar, soltar = "SELECT GET_LOCK(:clave, 0)", "SELECT RELEASE_LOCK(:clave)"
+    else:
+        tomar, soltar = "SELECT pg_try_advisory_lock(hashtext(:clave))", "SELECT pg_advisory_unlock(hashtext(:clave))"
+
+    with engine.connect() as conexion:
+        obtenido = bool(conexion.execute(text(tomar), {"clave": clave}).scalar())
+        try:
+            yield obtenido
+        finally:
+            if obtenido:
+                conexion.execute(text(soltar), {"clave": clave})
+            conexion.commit()
+
+
+def registrar_tarea_periodica(
+    nombre: str,
+    funcion: Callable[[], object],
+    intervalo_segundos: float,
+    exclusiva: bool = False
+) -> None:
+    """
+    Registra una función síncrona para ejecutarse cada intervalo_segundos
+
+    Args:
+        exclusiva: Ejecutar en un solo worker a la vez (candado en la BD)
+    """
+    if exclusiva:
+        funcion = _exclusiva(nombre, funcion)
+    _registradas.append((nombre, funcion, intervalo_segundos))
+
+
+def _exclusiva(nombre: str, funcion: Callable[[], object]) -> Callable[[], object]:
+    def ejecutar():
+        with candado_bd(nombre) as obtenido:
+            if not obtenido:
+                logger.info(f"⏭️  Tarea '{nombre}' en curso en otro worker; se omite esta vuelta")
+                return None
+            return funcion()
+    return ejecutar
+
+
+async def _bucle(nombre: str, funcion: Callable[[], object], intervalo_segundos: float) -> None:
+    while True:
+        await asyncio.sleep(intervalo_segundos)
+        try:
+            resultado = await run_in_threadpool(funcion)
+            logger.info(f"⏱️  Tarea '{nombre}' ejecutada: {resultado}")
+        except Exception as e:
+            logger.error(f"❌ Error en tarea '{nombre}': {str(e)}", exc_info=True)
+
+
+def iniciar_tareas() -> None:
+    """Arranca todas las tareas registradas (llamar dentro del event loop)"""
+    for nombre, funcion, intervalo in _registradas:
+        logger.info(f"⏱️  Iniciando tarea '{nombre}' cada {intervalo:.0f}s")
+        _en_ejecucion.append(asyncio.create_task(_bucle(nombre, funcion, intervalo), name=nombre))
+
+
+async def detener_tareas() -> None:
+    """Cancela las tareas en ejecución y espera a que terminen"""
+    for tarea in _en_ejecucion:
+        tarea.cancel()
+    await asyncio.gather(*_en_ejecucion, return_exceptions=True)
+    _en_ejecucion.clear()
@@ -0,0 +1,145 @@
+"""
+Backend/services/uso_ia.py
+Contabilidad de tokens y costo de las llamadas a la IA
+
+- uso_desde_respuesta(): lee usage_metadata de la respuesta de Gemini
+  (si no viene, usa la estimación local)
+- registrar_uso(): guarda una fila en dieta_uso_ia
+- resumen_uso(): totales por plantilla de un nutriólogo
+
+Precios en USD por millón de tokens, configurables por entorno
+(por defecto los de gemini-2.5-flash).
+"""
+
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.dieta_uso_ia import DietaUsoIA
+from services.prompts_dieta import PromptRenderizado, estimar_tokens
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PRECIO_ENTRADA_1M = float(os.getenv("GEMINI_PRECIO_ENTRADA_1M", "0.30"))
+PRECIO_CACHE_1M = float(os.getenv("GEMINI_PRECIO_CACHE_1M", "0.075"))
+PRECIO_SALIDA_1M = float(os.getenv("GEMINI_PRECIO_SALIDA_1M", "2.50"))
+
+
+def calcular_costo(tokens_prompt: int, tokens_cache: int, tokens_respuesta: int) -> float:
+    """Costo en USD; los tokens servidos desde caché se cobran a precio reducido"""
+    sin_cache = max(0, tokens_prompt - tokens_cache)
+    costo = (
+        sin_cache * PRECIO_ENTRADA_1M
+        + tokens_cache * PRECIO_CACHE_1M
+        + tokens_respuesta * PRECIO_SALIDA_1M
+    ) / 1_000_000
+    return round(costo, 6)
+
+
+class UsoIA(NamedTuple):
+    """Consumo de una llamada"""
+    plantilla: str
+    modelo: str
+    tokens_estimados: int
+    tokens_prompt: int
+    tokens_cache: int
+    tokens_respuesta: int
+    duracion_ms: int
+
+    @property
+    def costo_usd(self) -> float:
+        return calcular_costo(self.tokens_prompt, self.tokens_cache, self.tokens_respuesta)
+
+
+def uso_desde_respuesta(
+    respuesta,
+    prompt: PromptRenderizado,
+    modelo: str,
+    texto: str,
+    duracion_ms: int
+) -> UsoIA:
+    """Construye el UsoIA a partir de usage_metadata de Gemini"""
+    metadatos = getattr(respuesta, "usage_metadata", None)
+    tokens_prompt = getattr(metadatos, "prompt_token_count", 0) or prompt.tokens_estimados
+    tokens_cache = getattr(metadatos, "cached_content_token_count", 0) or 0
+    tokens_respuesta = getattr(metadatos, "candidates_token_count", 0) or estimar_tokens(texto)
+
+    return UsoIA(
+        plantilla=prompt.plantilla,
+        modelo=modelo,
+        tokens_estimados=prompt.tokens_estimados,
+        tokens_prompt=tokens_prompt,
+        tokens_cache=tokens_cache,
+        tokens_respuesta=tokens_respuesta,
+        duracion_ms=duracion_ms,
+    )
+
+
+def registrar_uso(
+    db: Session,
+    uso: UsoIA,
+    id_dieta: Optional[int] = None,
+    id_nutriologo: Optional[int] = None,
+    commit: bool = True
+) -> DietaUsoIA:
+    """Guarda el consumo de una llamada (con commit=False queda en la transacción en curso)"""
+    registro = DietaUsoIA(
+        id_dieta=id_dieta,
+        id_nutriologo=id_nutriologo,
+        plantilla=uso.plantilla,
+        modelo=uso.modelo,
+        tokens_estimados=uso.tokens_estimados,
+        tokens_prompt=uso.tokens_prompt,
+        tokens_cache=uso.tokens_cache,
+        tokens_respuesta=uso.tokens_respuesta,
+        costo_usd=uso.costo_usd,
+        duracion_ms=uso.duracion_ms,
+    )
+    db.add(registro)
+    if commit:
+        db.commit()
+
+    logger.info(
+        f"💰 Uso IA [{uso.plantilla}]: {uso.tokens_prompt} tokens prompt "
+        f"({uso.tokens_cache} en caché, ~{uso.tokens_estimados} estimados), "
+        f"{uso.tokens_respuesta} respuesta, ${uso.costo_usd:.6f}"
+    )
+    return registro
+
+
+def resumen_uso(db: Session, id_nutriologo: int, desde: Optional[datetime] = None) -> List[Dict[str, object]]:
+    """Totales por plantilla (llamadas, tokens y costo) de un nutriólogo"""
+    query = db.query(
+        DietaUsoIA.plantilla,
+        func.count(DietaUsoIA.id_uso),
+        func.coalesce(func.sum(DietaUsoIA.tokens_prompt), 0),
+        func.coalesce(func.sum(DietaUsoIA.tokens_cache), 0),
+        func.coalesce(func.sum(DietaUsoIA.tokens_respuesta), 0),
+        func.coalesce(func.sum(DietaUsoIA.costo_usd), 0.0),
+        func.avg(DietaUsoIA.duracion_ms),
+    ).filter(DietaUsoIA.id_nutriologo == id_nutriologo)
+
+    if desde:
+        query = query.filter(DietaUsoIA.creado_en >= desde)
+
+    return [
+        {
+            "plantilla": plantilla,
+            "llamadas": llamadas,
+            "tokens_prompt": int(prompt),
+            "tokens_cache": int(cache),
+            "tokens_respuesta": int(respuesta),
+            "tokens_prompt_promedio": round(prompt / llamadas) if llamadas else 0,
+            "costo_usd": round(float(costo), 6),
+            "duracion_ms_promedio": round(float(duracion)) if duracion is not None else None,
+        }
+        for plantilla, llamadas, prompt, cache, respuesta, costo, duracion
+        in query.group_by(DietaUsoIA.plantilla).order_by(DietaUsoIA.plantilla).all()
+    ]
@@ -0,0 +1,326 @@
+"""
+Backend/services/vencimiento_dietas.py
+Vencimiento de dietas en segundo plano
+
+Una tarea periódica marca como `vencida` las dietas activas cuya
+fecha_vencimiento ya pasó, con UPDATE por conjuntos en lotes pequeños (una
+transacción corta por lote). Así las lecturas no escriben nunca ni recorren
+filas en Python: filtran con filtro_vigente() para no mostrar como activa
+una dieta que venció entre dos barridos.
+
+También genera el reporte de próximos vencimientos (una sola consulta
+Dieta ⋈ Usuario leída con cursor en servidor, yield_per) en JSON lines o
+CSV, y envía los recordatorios de renovación como mensajes insertados en
+lote.
+
+Ejecución manual:
+    python -m services.vencimiento_dietas
+    python -m services.vencimiento_dietas reporte > vencimientos.csv
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from config.database import SessionLocal
+from models.contrato import Contrato
+from models.dieta import Dieta, EstadoDieta
+from models.mensajes import Mensaje
+from models.user import Usuario
+from services.contador_mensajes import contador_mensajes
+from services.relaciones_contrato import ESTADOS_VIGENTES
+from services.tareas_programadas import registrar_tarea_periodica
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = int(os.getenv("DIETAS_VENCIMIENTO_LOTE", "1000"))
+INTERVALO_MINUTOS = int(os.getenv("DIETAS_VENCIMIENTO_INTERVALO_MIN", "15"))
+VENCIMIENTO_AUTOMATICO = os.getenv("DIETAS_VENCIMIENTO_AUTOMATICO", "true").lower() == "true"
+
+# Filas que el cursor trae del servidor en cada viaje
+FILAS_POR_LECTURA = int(os.getenv("DIETAS_REPORTE_FILAS_POR_LECTURA", "1000"))
+
+COLUMNAS_REPORTE = [
+    "id_dieta", "nombre_dieta", "id_usuario", "usuario", "correo",
+    "dias_restantes", "fecha_vencimiento", "accion"
+]
+
+
+def filtro_vigente(ahora: Optional[datetime] = None):
+    """Condición SQL: dieta activa y todavía no vencida"""
+    ahora = ahora or datetime.now()
+    return and_(
+        Dieta.estado == EstadoDieta.activa,
+        or_(Dieta.fecha_vencimiento.is_(None), Dieta.fecha_vencimiento >= ahora)
+    )
+
+
+def marcar_dietas_vencidas(
+    db: Optional[Session] = None,
+    id_usuario: Optional[int] = None,
+    tamano_lote: int = TAMANO_LOTE,
+    max_lotes: Optional[int] = None
+) -> int:
+    """
+    Marca como vencidas las dietas activas con fecha_vencimiento pasada
+
+    Cada lote es un único UPDATE ... WHERE estado='activa' AND
+    fecha_vencimiento < ahora sobre como máximo tamano_lote filas (usa
+    idx_estado / idx_id_usuario_estado).
+
+    Args:
+        id_usuario: Limitar a las dietas de un usuario (None = todas)
+
+    Returns:
+        Número total de dietas marcadas
+    """
+    propia = db is None
+    db = db or SessionLocal()
+    ahora = datetime.now()
+    condiciones = [Dieta.estado == EstadoDieta.activa, Dieta.fecha_vencimiento < ahora]
+    if id_usuario is not None:
+        condiciones.append(Dieta.id_usuario == id_usuario)
+
+    total = 0
+    lotes = 0
+
+    try:
+        while max_lotes is None or lotes < max_lotes:
+            # MySQL no admite LIMIT en una subconsulta IN; se leen los ids del lote
+            ids = db.execute(
+                select(Dieta.id_dieta).where(*condiciones).order_by(Dieta.id_dieta).limit(tamano_lote)
+            ).scalars().all()
+            if not ids:
+                break
+
+            marcadas = db.execute(
+                update(Dieta)
+                .where(Dieta.id_dieta.in_(ids), *condiciones)
+                .values(estado=EstadoDieta.vencida)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+
+            total += marcadas
+            lotes += 1
+            if len(ids) < tamano_lote:
+                break
+
+        if total:
+            logger.info(f"⏰ {total} dietas marcadas como vencidas")
+        return total
+
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if propia:
+            db.close()
+
+
+# ============================================================
+# REPORTE DE PRÓXIMOS VENCIMIENTOS
+# ============================================================
+def _proximos_vencimientos(
+    dias: int,
+    id_nutriologo: Optional[int],
+    ahora: datetime,
+    sin_recordatorio_desde: Optional[datetime] = None
+):
+    """SELECT de las dietas activas que vencen en los próximos `dias` días"""
+    qry = select(
+        Dieta.id_dieta,
+        Dieta.nombre,
+        Dieta.fecha_vencimiento,
+        Usuario.id_usuario,
+        Usuario.nombre.label("usuario"),
+        Usuario.correo,
+    ).join(Usuario, Usuario.id_usuario == Dieta.id_usuario).where(
+        Dieta.estado == EstadoDieta.activa,
+        Dieta.fecha_vencimiento >= ahora,
+        Dieta.fecha_vencimiento <= ahora + timedelta(days=dias)
+    )
+    if id_nutriologo is not None:
+        qry = qry.where(Dieta.id_usuario.in_(
+            select(Contrato.id_cliente).where(
+                Contrato.id_nutriologo == id_nutriologo,
+                Contrato.estado.in_(ESTADOS_VIGENTES)
+            )
+        ))
+    if sin_recordatorio_desde is not None:
+        qry = qry.where(or_(
+            Dieta.recordatorio_enviado_en.is_(None),
+            Dieta.recordatorio_enviado_en < sin_recordatorio_desde
+        ))
+    return qry.order_by(Dieta.fecha_vencimiento, Dieta.id_dieta)
+
+
+def iterar_reporte_vencimientos(
+    db: Optional[Session] = None,
+    dias: int = 7,
+    id_nutriologo: Optional[int] = None,
+    filas_por_lectura: int = FILAS_POR_LECTURA,
+    sin_recordatorio_desde: Optional[datetime] = None
+) -> Iterator[dict]:
+    """
+    Dietas activas que vencen en los próximos `dias` días, fila a fila
+
+    Una sola consulta con JOIN a usuarios; las filas se leen del servidor de
+    filas_por_lectura en filas_por_lectura, así la memoria no crece con el
+    número de dietas. Sin `db` abre su propia sesión (útil al transmitir una
+    respuesta, que sigue leyendo después de cerrar la del endpoint).
+
+    Args:
+        id_nutriologo: Solo clientes con contrato vigente con él (None = todas)
+        sin_recordatorio_desde: Omite las dietas que recibieron un
+            recordatorio desde esa fecha (None = todas)
+    """
+    propia = db is None
+    db = db or SessionLocal()
+    ahora = datetime.now()
+
+    try:
+        resultado = db.execute(
+            _proximos_vencimientos(dias, id_nutriologo, ahora, sin_recordatorio_desde)
+            .execution_options(yield_per=filas_por_lectura)
+        )
+        for fila in resultado:
+            dias_restantes = max(0, (fila.fecha_vencimiento - ahora).days)
+            yield {
+                "id_dieta": fila.id_dieta,
+                "nombre_dieta": fila.nombre,
+                "id_usuario": fila.id_usuario,
+                "usuario": fila.usuario,
+                "correo": fila.correo,
+                "dias_restantes": dias_restantes,
+                "fecha_vencimiento": fila.fecha_vencimiento,
+                "accion": "⚠️ Recordatorio de renovación próxima" if dias_restantes <= 3 else "ℹ️ Próximo vencimiento"
+            }
+    finally:
+        if propia:
+            db.close()
+
+
+def reporte_jsonl(filas: Iterable[dict], agrupar: int = 500) -> Iterator[str]:
+    """Una línea JSON por fila, emitidas en bloques de `agrupar` filas"""
+    bloque = []
+    for fila in filas:
+        bloque.append(json.dumps(fila, ensure_ascii=False, default=str))
+        if len(bloque) >= agrupar:
+            yield "\n".join(bloque) + "\n"
+            bloque = []
+    if bloque:
+        yield "\n".join(bloque) + "\n"
+
+
+def reporte_csv(filas: Iterable[dict], agrupar: int = 500) -> Iterator[str]:
+    """CSV con cabecera, emitido en bloques de `agrupar` filas"""
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=COLUMNAS_REPORTE)
+    escritor.writeheader()
+    for n, fila in enumerate(filas, 1):
+        escritor.writerow(fila)
+        if n % agrupar == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# ============================================================
+# RECORDATORIOS DE RENOVACIÓN
+# ============================================================
+def enviar_recordatorios_vencimiento(
+    db: Session,
+    id_nutriologo: int,
+    dias: int = 3,
+    tamano_lote: int = TAMANO_LOTE
+) -> int:
+    """
+    Envía un mensaje del nutriólogo a cada cliente suyo cuya dieta activa
+    vence en los próximos `dias` días
+
+    Las dietas se leen con el mismo cursor que el reporte y los mensajes se
+    insertan con un executemany por lote (una transacción por lote).
+
+    Cada dieta recibe un solo recordatorio por ventana: se guarda la fecha
+    en Dieta.recordatorio_enviado_en (en la misma transacción que el
+    mensaje) y se omiten las dietas recordadas en los últimos `dias` días
+    (al menos uno), así repetir el POST no vuelve a escribir a los mismos
+    clientes.
+
+    Returns:
+        Número de mensajes enviados
+    """
+    ahora = datetime.utcnow()
+    # Sesión aparte para leer: los commit de cada lote no cortan el cursor
+    filas = iterar_reporte_vencimientos(
+        dias=dias, id_nutriologo=id_nutriologo, sin_recordatorio_desde=ahora - timedelta(days=max(dias, 1))
+    )
+    total = 0
+
+    def _enviar(lote: list, ids_dietas: list) -> int:
+        db.execute(insert(Mensaje), lote)
+        db.execute(
+            update(Dieta)
+            .where(Dieta.id_dieta.in_(ids_dietas))
+            .values(recordatorio_enviado_en=ahora)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        contador_mensajes.incrementar(*{m["destinatario_id"] for m in lote})
+        return len(lote)
+
+    try:
+        lote, ids_dietas = [], []
+        for fila in filas:
+            cuando = {0: "hoy", 1: "mañana"}.get(fila["dias_restantes"], f"en {fila['dias_restantes']} días")
+            lote.append({
+                "remitente_id": id_nutriologo,
+                "destinatario_id": fila["id_usuario"],
+                "contenido": (
+                    f"⏰ Tu dieta \"{fila['nombre_dieta']}\" vence {cuando} "
+                    f"({fila['fecha_vencimiento']:%d/%m/%Y}). Escríbeme para renovarla."
+                ),
+                "leido": False,
+                "fecha_creacion": ahora,
+                "fecha_actualizacion": ahora
+            })
+            ids_dietas.append(fila["id_dieta"])
+            if len(lote) >= tamano_lote:
+                total += _enviar(lote, ids_dietas)
+                lote, ids_dietas = [], []
+        if lote:
+            total += _enviar(lote, ids_dietas)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        filas.close()
+
+    logger.info(f"📨 {total} recordatorios de vencimiento enviados por el nutriólogo {id_nutriologo}")
+    return total
+
+
+if VENCIMIENTO_AUTOMATICO:
+    registrar_tarea_periodica("vencimiento_dietas", marcar_dietas_vencidas, INTERVALO_MINUTOS * 60, exclusiva=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] == ["reporte"]:
+        sys.stdout.writelines(reporte_csv(iterar_reporte_vencimientos()))
+    else:
+        print(f"⏰ Dietas vencidas: {marcar_dietas_vencidas()}")
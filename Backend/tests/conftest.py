@@ -0,0 +1,109 @@
+"""
+Backend/tests/conftest.py
+Configuración común de las pruebas
+
+- SQLite temporal en lugar de MySQL (DATABASE_URL se fija antes de
+  importar config.database); las tablas se recrean en cada prueba
+- Proveedor de IA simulado, sin latencia ni red
+- Cada prueba corre en un directorio temporal (PDFs y archivos subidos)
+
+Ejecuta desde Backend/: python -m pytest -q
+"""
+
+import os
+import sys
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="fitso-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ["UPLOAD_DIR_VALIDACIONES"] = os.path.join(_TMP, "validaciones")
+os.environ["IA_PROVEEDOR"] = "simulado"
+os.environ["IA_SIMULADO_LATENCIA_MS"] = "0"
+os.environ["CACHE_REDIS_URL"] = ""
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from config.database import Base, SessionLocal, engine
+import models  # noqa: F401  (registra todas las tablas)
+from core.deps import create_access_token
+from models.resena import Resena
+from models.user import TipoUsuarioEnum, Usuario
+
+# resenas se declara con su propia Base (en producción la tabla se crea por SQL)
+_METADATOS = (Base.metadata, Resena.metadata)
+
+
+@pytest.fixture(autouse=True)
+def _entorno(tmp_path, monkeypatch):
+    """Tablas vacías y directorio de trabajo temporal en cada prueba"""
+    monkeypatch.chdir(tmp_path)
+    for metadata in _METADATOS:
+        metadata.create_all(bind=engine)
+    yield
+    for metadata in _METADATOS:
+        metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def db():
+    sesion = SessionLocal()
+    try:
+        yield sesion
+    finally:
+        sesion.close()
+
+
+@pytest.fixture
+def crear_usuario(db):
+    """Crea un usuario (cliente por defecto) y devuelve su id"""
+    contador = {"n": 0}
+
+    def _crear(tipo: TipoUsuarioEnum = TipoUsuarioEnum.cliente, **campos) -> int:
+        contador["n"] += 1
+        n = contador["n"]
+        usuario = Usuario(
+            nombre=campos.pop("nombre", f"Usuario {n}"),
+            correo=campos.pop("correo", f"usuario{n}_{tipo.value}@fitso.test"),
+            contrasena="x",
+            tipo_usuario=tipo,
+            **campos
+        )
+        db.add(usuario)
+        db.commit()
+        return usuario.id_usuario
+
+    return _crear
+
+
+@pytest.fixture
+def auth():
+    """Cabeceras Authorization para un id de usuario"""
+    def _auth(id_usuario: int) -> dict:
+        return {"Authorization": "Bearer " + create_access_token({"sub": str(id_usuario)})}
+    return _auth
+
+
+@pytest.fixture
+def api():
+    """TestClient sobre una app con los routers indicados ((router, prefijo) o router)"""
+    clientes = []
+
+    def _api(*routers) -> TestClient:
+        app = FastAPI()
+        for router in routers:
+            if isinstance(router, APIRouter):
+                app.include_router(router)
+            else:
+                app.include_router(router[0], prefix=router[1])
+        cliente = TestClient(app)
+        clientes.append(cliente)
+        return cliente
+
+    yield _api
+    for cliente in clientes:
+        cliente.close()
@@ -0,0 +1,84 @@
+"""
+Pruebas del archivo de mensajes (services/archivo_mensajes.py) y de su
+lectura transparente desde el router
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.mensajes import Mensaje, MensajeArchivado
+from routers import router_mensajes
+from services import tareas_programadas
+from services.archivo_mensajes import archivar_mensajes_antiguos
+
+ANTIGUO = datetime.utcnow() - timedelta(days=400)
+
+
+@pytest.fixture
+def conversacion(db, crear_usuario):
+    """a y b con 3 mensajes antiguos leídos, 1 antiguo sin leer y 1 reciente"""
+    a, b = crear_usuario(), crear_usuario()
+    for i in range(3):
+        db.add(Mensaje(remitente_id=a, destinatario_id=b, contenido=f"viejo {i}", leido=True,
+                       fecha_creacion=ANTIGUO + timedelta(minutes=i)))
+    db.add(Mensaje(remitente_id=b, destinatario_id=a, contenido="viejo sin leer", leido=False,
+                   fecha_creacion=ANTIGUO + timedelta(minutes=5)))
+    db.add(Mensaje(remitente_id=a, destinatario_id=b, contenido="reciente", leido=True))
+    db.commit()
+    return a, b
+
+
+def test_archiva_solo_leidos_antiguos_por_lotes(db, conversacion):
+    assert archivar_mensajes_antiguos(tamano_lote=2) == 3
+
+    assert db.query(MensajeArchivado).count() == 3
+    assert sorted(m.contenido for m in db.query(Mensaje)) == ["reciente", "viejo sin leer"]
+    # Sin nada pendiente no archiva más
+    assert archivar_mensajes_antiguos() == 0
+
+
+def test_archivo_respeta_max_lotes(db, conversacion):
+    assert archivar_mensajes_antiguos(tamano_lote=1, max_lotes=2) == 2
+    assert db.query(MensajeArchivado).count() == 2
+
+
+def test_historial_pagina_entre_tabla_caliente_y_archivo(api, auth, conversacion):
+    a, b = conversacion
+    archivar_mensajes_antiguos()
+    cliente = api(router_mensajes.router)
+
+    r = cliente.get(f"/api/mensajes/chat/{a}?limite=2", headers=auth(b)).json()
+    assert [m["contenido"] for m in r["mensajes"]] == ["viejo sin leer", "reciente"]
+
+    r = cliente.get(f"/api/mensajes/chat/{a}?limite=2&antes_de={r['cursor_anterior']}", headers=auth(b)).json()
+    assert [m["contenido"] for m in r["mensajes"]] == ["viejo 1", "viejo 2"]
+
+    r = cliente.get(f"/api/mensajes/chat/{a}?limite=2&antes_de={r['cursor_anterior']}", headers=auth(b)).json()
+    assert [m["contenido"] for m in r["mensajes"]] == ["viejo 0"]
+    assert r["cursor_anterior"] is None
+
+
+def test_conversaciones_incluye_las_solo_archivadas(api, auth, db, crear_usuario):
+    a, b, c = crear_usuario(), crear_usuario(), crear_usuario()
+    db.add(Mensaje(remitente_id=a, destinatario_id=b, contenido="archivado", leido=True, fecha_creacion=ANTIGUO))
+    db.add(Mensaje(remitente_id=c, destinatario_id=a, contenido="hola 1", leido=False))
+    db.add(Mensaje(remitente_id=c, destinatario_id=a, contenido="hola 2", leido=False))
+    db.commit()
+    archivar_mensajes_antiguos()
+    cliente = api(router_mensajes.router)
+
+    r = cliente.get("/api/mensajes/conversaciones", headers=auth(a)).json()
+    assert [(x["otro_usuario_id"], x["ultimo_mensaje"], x["mensajes_no_leidos"]) for x in r] == [
+        (c, "hola 2", 2),
+        (b, "archivado", 0),
+    ]
+
+
+def test_tarea_de_archivo_es_exclusiva():
+    registradas = {nombre: intervalo for nombre, _, intervalo in tareas_programadas._registradas}
+    assert "archivo_mensajes" in registradas
+
+    # En SQLite no hay locks con nombre: el candado se concede siempre
+    with tareas_programadas.candado_bd("prueba") as obtenido:
+        assert obtenido is True
@@ -0,0 +1,128 @@
+"""
+Pruebas del índice de búsqueda del directorio de nutriólogos
+(services/busqueda_nutriologos.py y GET /api/users/nutriologos)
+"""
+
+import threading
+import time
+
+import pytest
+
+from models.user import TipoUsuarioEnum
+from routers import users
+from services import busqueda_nutriologos
+from services.busqueda_nutriologos import IndiceNutriologos, indice_nutriologos
+
+PERFILES = [
+    ("María Pérez", "Nutrióloga clínica", True),
+    ("Juan López", "Nutriólogo deportivo", True),
+    ("Ana Ruiz", "Dietista", True),
+    ("Pedro Mar", "Nutriólogo", False),
+]
+
+
+@pytest.fixture
+def nutriologos(crear_usuario):
+    indice_nutriologos.invalidar()
+    yield [
+        crear_usuario(TipoUsuarioEnum.nutriologo, nombre=nombre, profesion=profesion, validado=validado)
+        for nombre, profesion, validado in PERFILES
+    ]
+    indice_nutriologos.invalidar()
+
+
+@pytest.fixture
+def cliente(api):
+    return api((users.router, "/api/users"))
+
+
+def _buscar(cliente, q, solo_validados=True):
+    r = cliente.get("/api/users/nutriologos", params={"q": q, "solo_validados": solo_validados}).json()
+    return r["total"], sorted(i["nombre"] for i in r["items"])
+
+
+@pytest.mark.parametrize("q, esperado", [
+    ("maria", ["María Pérez"]),                       # sin acentos
+    ("nutri", ["Juan López", "María Pérez"]),         # prefijo
+    ("NUTRIOLGO", ["Juan López", "María Pérez"]),     # errata (trigramas)
+    ("juan lop", ["Juan López"]),                     # todos los términos
+    ("xyz", []),
+])
+def test_busqueda(cliente, nutriologos, q, esperado):
+    assert _buscar(cliente, q) == (len(esperado), esperado)
+
+
+def test_busqueda_respeta_solo_validados(cliente, nutriologos):
+    assert _buscar(cliente, "pedro") == (0, [])
+    assert _buscar(cliente, "pedro", solo_validados=False) == (1, ["Pedro Mar"])
+
+
+def test_total_exacto_sin_busqueda(cliente, nutriologos):
+    r = cliente.get("/api/users/nutriologos").json()
+    assert (r["total"], r["total_aproximado"]) == (3, False)
+
+    r = cliente.get("/api/users/nutriologos", params={"q": "nutri"}).json()
+    assert (r["total"], r["total_aproximado"]) == (2, True)
+
+
+def test_busqueda_acota_los_ids(cliente, nutriologos, monkeypatch):
+    monkeypatch.setattr(users, "MAX_RESULTADOS_BUSQUEDA", 1)
+
+    r = cliente.get("/api/users/nutriologos", params={"q": "nutri"}).json()
+    # El total cuenta todas las coincidencias; se conservan las más recientes
+    assert r["total"] == 2
+    assert [i["id_usuario"] for i in r["items"]] == [nutriologos[1]]
+
+
+def test_busqueda_acotada_por_calificacion(cliente, nutriologos, db, monkeypatch):
+    from models.resena_stats import ResenaStats
+
+    monkeypatch.setattr(users, "MAX_RESULTADOS_BUSQUEDA", 1)
+    db.add(ResenaStats(id_nutriologo=nutriologos[0], total=10, suma=48.0, puntuacion=4.8))
+    db.commit()
+
+    r = cliente.get("/api/users/nutriologos", params={"q": "nutri", "order": "calificacion"}).json()
+    # Se ordena antes de acotar: gana la mejor calificada aunque sea la más antigua
+    assert r["total"] == 2
+    assert [i["id_usuario"] for i in r["items"]] == [nutriologos[0]]
+
+
+def test_invalidar_recoge_cambios(cliente, nutriologos, db):
+    from models.user import Usuario
+
+    assert _buscar(cliente, "dietista") == (1, ["Ana Ruiz"])
+    db.get(Usuario, nutriologos[2]).profesion = "Nutrióloga"
+    db.commit()
+    indice_nutriologos.invalidar()
+    assert _buscar(cliente, "dietista") == (0, [])
+
+
+def test_reconstruccion_concurrente_una_sola_vez(nutriologos, monkeypatch):
+    from config.database import SessionLocal
+
+    indice = IndiceNutriologos(ttl_segundos=0)
+    construcciones = []
+    original = busqueda_nutriologos._Instantanea.__init__
+
+    def lenta(self, filas):
+        construcciones.append(1)
+        time.sleep(0.2)
+        original(self, filas)
+
+    def buscar():
+        sesion = SessionLocal()
+        try:
+            indice.buscar(sesion, "nutri")
+        finally:
+            sesion.close()
+
+    buscar()
+    monkeypatch.setattr(busqueda_nutriologos._Instantanea, "__init__", lenta)
+    hilos = [threading.Thread(target=buscar) for _ in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    # Con el índice caducado una petición lo reconstruye y las demás usan el anterior
+    assert len(construcciones) == 1
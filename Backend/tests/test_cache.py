@@ -0,0 +1,134 @@
+"""
+Pruebas de la caché de respuestas (core/cache.py)
+"""
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from core import cache
+from core.cache import CacheMemoria, CacheRespuestasMiddleware, _Regla, etag_coincide
+
+
+def _entrada(cuerpo: bytes = b"{}"):
+    return cuerpo, [], '"etag"'
+
+
+# ============================================================
+# Backend en memoria
+# ============================================================
+def test_memoria_expulsa_la_menos_usada():
+    memoria = CacheMemoria(max_entradas=2)
+    memoria.guardar("a", _entrada(b"a"), 60, ["x"])
+    memoria.guardar("b", _entrada(b"b"), 60, ["x"])
+    memoria.obtener("a")
+    memoria.guardar("c", _entrada(b"c"), 60, [])
+
+    assert len(memoria) == 2
+    assert memoria.obtener("b") is None
+    assert memoria.obtener("a")[0] == b"a"
+    # La clave expulsada también sale de sus etiquetas
+    assert memoria._etiquetas["x"] == {"a"}
+
+
+def test_memoria_invalida_por_etiqueta():
+    memoria = CacheMemoria()
+    memoria.guardar("a", _entrada(), 60, ["resenas:1"])
+    memoria.guardar("b", _entrada(), 60, ["resenas:2"])
+
+    memoria.invalidar(["resenas:1"])
+    assert memoria.obtener("a") is None
+    assert memoria.obtener("b") is not None
+
+
+def test_memoria_respeta_ttl():
+    memoria = CacheMemoria()
+    memoria.guardar("a", _entrada(), -1, [])
+    assert memoria.obtener("a") is None
+    assert len(memoria) == 0
+
+
+@pytest.mark.parametrize("si_no_coincide, coincide", [
+    ('"a1"', True),
+    ('W/"a1"', True),
+    ('"b2", W/"a1"', True),
+    ("*", True),
+    ('"b2"', False),
+    ("", False),
+    (None, False),
+])
+def test_etag_coincide(si_no_coincide, coincide):
+    assert etag_coincide(si_no_coincide, '"a1"') is coincide
+
+
+def test_clave_solo_con_parametros_aceptados():
+    regla = _Regla(r"^/x$", 60, lambda m: [], ("q", "limite"), False)
+
+    assert regla.clave("/x", b"limite=5&q=av&_=123") == regla.clave("/x", b"q=av&limite=5")
+    assert regla.clave("/x", b"q=av") != regla.clave("/x", b"q=avena")
+
+
+# ============================================================
+# Middleware
+# ============================================================
+@pytest.fixture
+def cliente(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_HABILITADA", True)
+    monkeypatch.setattr(cache, "cache_respuestas", CacheMemoria())
+    monkeypatch.setattr(cache, "_reglas", [])
+    llamadas = {"n": 0}
+
+    app = FastAPI()
+
+    @app.get("/publico/{id}")
+    def publico(id: int, q: str = ""):
+        llamadas["n"] += 1
+        if id == 0:
+            raise HTTPException(status_code=404)
+        return {"id": id, "q": q, "llamada": llamadas["n"]}
+
+    @app.get("/perfil/{id}")
+    def perfil(id: int):
+        llamadas["n"] += 1
+        return {"id": id, "llamada": llamadas["n"]}
+
+    cache.registrar_ruta_cacheable(r"^/publico/(?P<id>\d+)$", ttl=60, parametros=("q",))
+    cache.registrar_ruta_cacheable(
+        r"^/perfil/(?P<id>\d+)$", ttl=60, etiquetas=lambda m: [f"perfil:{m['id']}"], revalidar=True
+    )
+    app.add_middleware(CacheRespuestasMiddleware)
+
+    with TestClient(app) as c:
+        yield c
+
+
+def test_middleware_hit_y_304(cliente):
+    r1 = cliente.get("/publico/1?q=a")
+    r2 = cliente.get("/publico/1?q=a&ignorado=1")
+    assert (r1.headers["x-cache"], r2.headers["x-cache"]) == ("MISS", "HIT")
+    assert r1.json() == r2.json()
+    assert r1.headers["cache-control"] == "public, max-age=60"
+
+    r3 = cliente.get("/publico/1?q=a", headers={"If-None-Match": r1.headers["etag"]})
+    assert r3.status_code == 304
+    assert r3.content == b""
+
+    assert cliente.get("/publico/1?q=b").headers["x-cache"] == "MISS"
+
+
+def test_middleware_revalidar_tras_invalidar(cliente):
+    r1 = cliente.get("/perfil/7")
+    assert r1.headers["cache-control"] == "public, no-cache"
+
+    cache.invalidar_etiquetas("perfil:7")
+    r2 = cliente.get("/perfil/7", headers={"If-None-Match": r1.headers["etag"]})
+    assert r2.status_code == 200
+    assert r2.headers["x-cache"] == "MISS"
+    assert r2.json()["llamada"] == 2
+
+
+def test_middleware_no_cachea_errores_ni_otras_rutas(cliente):
+    assert cliente.get("/publico/0").status_code == 404
+    assert cliente.get("/publico/0").headers.get("x-cache") is None
+    assert "x-cache" not in cliente.get("/docs").headers
+    assert len(cache.cache_respuestas) == 0
@@ -0,0 +1,51 @@
+"""
+Pruebas del catálogo de enfermedades (services/catalogo_enfermedades.py
+y /api/catalogo/enfermedades)
+"""
+
+import pytest
+
+from routers import catalogo_router, users
+from services.catalogo_enfermedades import ENFERMEDADES, autocompletar, normalizar, validar_lote
+
+
+@pytest.mark.parametrize("q, esperado", [
+    ("DIAB", ["Diabetes"]),                                   # prefijo sin mayúsculas
+    ("diabtes", ["Diabetes"]),                                # errata
+    ("hipertencion", ["Hipertensión"]),                       # errata y sin acentos
+    ("artr", ["Artritis", "Artritis reumatoide"]),
+    ("colesterol", ["Hiperlipidemia"]),                       # alias
+    ("xq", []),
+])
+def test_autocompletar(q, esperado):
+    assert autocompletar(q) == esperado
+
+
+def test_autocompletar_respeta_limite():
+    assert len(autocompletar("s", limite=2)) == 2
+
+
+def test_normalizar_devuelve_el_nombre_del_catalogo():
+    assert normalizar("  diabetes ") == "Diabetes"
+    assert normalizar("inexistente") is None
+
+
+def test_validar_lote_deduplica_y_sugiere():
+    assert validar_lote(["Tiroides", "Diabetes", "diabetes", "Diabetis", "foo"]) == {
+        "validas": ["Hipotiroidismo", "Diabetes"],
+        "invalidas": ["Diabetis", "foo"],
+        "sugerencias": {"Diabetis": ["Diabetes"], "foo": []},
+    }
+    assert validar_lote(["diabetes"])["invalidas"] == []
+
+
+def test_catalogo_unico_en_ambas_rutas(api):
+    cliente = api((users.router, "/api/users"), catalogo_router.router)
+
+    assert cliente.get("/api/catalogo/enfermedades").json() == list(ENFERMEDADES)
+    assert cliente.get("/api/users/illnesses").json() == list(ENFERMEDADES)
+    assert cliente.get("/api/catalogo/enfermedades/autocompletar", params={"q": "renal"}).json() == ["Enfermedad renal"]
+    r = cliente.post("/api/catalogo/enfermedades/validar", params={"enfermedad": "diabetes"}).json()
+    assert (r["valido"], r["enfermedad_catalogo"]) == (True, "Diabetes")
+    r = cliente.post("/api/catalogo/enfermedades/validar-lote", json={"enfermedades": ["Diabetes", "foo"]}).json()
+    assert (r["valido"], r["invalidas"]) == (False, ["foo"])
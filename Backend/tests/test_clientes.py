@@ -0,0 +1,146 @@
+"""
+Pruebas de la cartera de clientes del nutriólogo (/api/clientes) y de la
+caché de relaciones nutriólogo-cliente (services/relaciones_contrato.py)
+"""
+
+import pytest
+from sqlalchemy import event
+
+from config.database import engine
+from models.contrato import Contrato, EstadoContrato
+from models.user import ObjetivoUsuario, TipoUsuarioEnum
+from routers import clientes_router
+from services.relaciones_contrato import relaciones_contrato
+
+
+@pytest.fixture(autouse=True)
+def _relaciones_vacias():
+    # Los ids se repiten entre pruebas (tablas recreadas): la caché no debe sobrevivir
+    relaciones_contrato.invalidar()
+    yield
+    relaciones_contrato.invalidar()
+
+
+@pytest.fixture
+def cliente(api):
+    return api(clientes_router.router)
+
+
+@pytest.fixture
+def cartera(db, crear_usuario):
+    """Nutriólogo con 5 clientes: contratos activo, pendiente y cancelado alternados"""
+    nutriologo = crear_usuario(TipoUsuarioEnum.nutriologo)
+    estados = [EstadoContrato.ACTIVO, EstadoContrato.PENDIENTE, EstadoContrato.CANCELADO]
+    clientes = []
+    for i, nombre in enumerate(["Zoe", "Ana", "Luis", "Bea", "Carl"]):
+        id_cliente = crear_usuario(
+            nombre=nombre,
+            edad=20 + i,
+            objetivo=ObjetivoUsuario.mantener if i % 2 else ObjetivoUsuario.bajar_peso,
+            enfermedades=["Asma"] if i == 0 else '["Gota"]'
+        )
+        db.add(Contrato(
+            id_cliente=id_cliente, id_nutriologo=nutriologo, monto=1,
+            estado=estados[i % 3], stripe_payment_intent_id=f"pi_{i}"
+        ))
+        clientes.append(id_cliente)
+    db.commit()
+    return nutriologo, clientes
+
+
+# ============================================================
+# Cartera desde un solo join
+# ============================================================
+def test_mis_clientes_excluye_cancelados(cliente, auth, cartera):
+    nutriologo, _ = cartera
+
+    r = cliente.get("/api/clientes/mis-clientes", headers=auth(nutriologo)).json()
+    assert [(x["nombre"], x["contrato_estado"], x["enfermedades"]) for x in r] == [
+        ("Ana", "pendiente", ["Gota"]),
+        ("Bea", "activo", ["Gota"]),
+        ("Carl", "pendiente", ["Gota"]),
+        ("Zoe", "activo", ["Asma"]),
+    ]
+
+
+def test_mis_clientes_filtra_ordena_y_pagina(cliente, auth, cartera):
+    nutriologo, _ = cartera
+    cabeceras = auth(nutriologo)
+
+    r = cliente.get("/api/clientes/mis-clientes?orden=edad&descendente=true&limit=2&offset=1", headers=cabeceras)
+    assert [x["nombre"] for x in r.json()] == ["Bea", "Ana"]
+    assert r.headers["x-total-count"] == "4"
+
+    r = cliente.get("/api/clientes/mis-clientes?objetivo=mantener", headers=cabeceras)
+    assert [x["nombre"] for x in r.json()] == ["Ana", "Bea"]
+
+    r = cliente.get("/api/clientes/mis-clientes?estado=pendiente&q=a", headers=cabeceras)
+    assert [x["nombre"] for x in r.json()] == ["Ana", "Carl"]
+
+    assert cliente.get("/api/clientes/mis-clientes?objetivo=x", headers=cabeceras).status_code == 400
+
+
+def test_mis_clientes_solo_nutriologos(cliente, auth, cartera):
+    _, clientes = cartera
+    assert cliente.get("/api/clientes/mis-clientes", headers=auth(clientes[0])).status_code == 403
+
+
+def test_mis_clientes_en_una_consulta(cliente, auth, cartera):
+    nutriologo, _ = cartera
+    cabeceras = auth(nutriologo)
+    consultas = []
+
+    def contar(conn, cursor, sql, *args):
+        if "contratos" in sql:
+            consultas.append(sql)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        cliente.get("/api/clientes/mis-clientes", headers=cabeceras)
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    assert len(consultas) == 1
+
+
+# ============================================================
+# Caché de relaciones para los permisos
+# ============================================================
+def test_relacion_prefiere_contrato_activo(db, crear_usuario):
+    nutriologo, id_cliente = crear_usuario(TipoUsuarioEnum.nutriologo), crear_usuario()
+    db.add(Contrato(id_cliente=id_cliente, id_nutriologo=nutriologo, monto=1,
+                    estado=EstadoContrato.PENDIENTE, stripe_payment_intent_id="pi_a"))
+    db.add(Contrato(id_cliente=id_cliente, id_nutriologo=nutriologo, monto=1,
+                    estado=EstadoContrato.ACTIVO, stripe_payment_intent_id="pi_b"))
+    db.commit()
+
+    relacion = relaciones_contrato.contrato_con(db, nutriologo, id_cliente)
+    assert relacion.estado == EstadoContrato.ACTIVO
+
+
+def test_permisos_desde_cache_hasta_invalidar(cliente, auth, cartera, db):
+    nutriologo, clientes = cartera
+    consultas = []
+
+    def contar(conn, cursor, sql, *args):
+        if "contratos" in sql:
+            consultas.append(sql)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        for _ in range(3):
+            assert cliente.get(f"/api/clientes/cliente/{clientes[0]}", headers=auth(nutriologo)).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    assert len(consultas) == 1
+
+    # Cliente con contrato cancelado, o un cliente consultando a otro
+    assert cliente.get(f"/api/clientes/cliente/{clientes[2]}", headers=auth(nutriologo)).status_code == 403
+    assert cliente.get(f"/api/clientes/cliente/{clientes[0]}", headers=auth(clientes[1])).status_code == 403
+
+    # Cancelar sin invalidar sigue sirviendo la caché; al invalidar se aplica
+    db.query(Contrato).update({"estado": EstadoContrato.CANCELADO})
+    db.commit()
+    assert cliente.get(f"/api/clientes/cliente/{clientes[0]}", headers=auth(nutriologo)).status_code == 200
+    relaciones_contrato.invalidar(nutriologo)
+    assert cliente.get(f"/api/clientes/cliente/{clientes[0]}", headers=auth(nutriologo)).status_code == 403
@@ -0,0 +1,206 @@
+"""
+Pruebas de la generación de dietas con IA (services/generacion_dietas.py):
+transacción única, plan estructurado, límites globales y lotes
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models.calendario import CalendarioDieta, ComidaDieta, DiaSemana, TipoComida
+from models.contrato import Contrato, EstadoContrato
+from models.dieta import Dieta
+from models.dieta_uso_ia import DietaUsoIA
+from models.user import TipoUsuarioEnum, Usuario
+from routers import clientes_router
+from schemas.dieta_ia import DietaIA
+from services import generacion_dietas
+from services.dieta_ia_service import DietaService
+from services.generacion_dietas import (
+    LimitadorTasa,
+    LoteGeneracion,
+    ejecutar_con_limite,
+    generar_dieta_para_cliente,
+    guardar_recetas,
+    plan_de_dieta,
+)
+from services.relaciones_contrato import relaciones_contrato
+
+
+@pytest.fixture(autouse=True)
+def _sin_estado_global(monkeypatch):
+    # Sin espera entre llamadas, lotes y relaciones aislados por prueba
+    monkeypatch.setattr(generacion_dietas, "_limitador", LimitadorTasa(0))
+    monkeypatch.setattr(generacion_dietas, "_lotes", {})
+    relaciones_contrato.invalidar()
+    yield
+    relaciones_contrato.invalidar()
+
+
+# ============================================================
+# Una sola transacción por generación
+# ============================================================
+def test_generacion_confirma_una_vez_con_su_consumo(db, crear_usuario, monkeypatch):
+    cliente = db.get(Usuario, crear_usuario())
+    turnos, commits = [], []
+    monkeypatch.setattr(generacion_dietas._limitador, "esperar_turno", lambda: turnos.append(1))
+    event.listen(db, "after_commit", lambda s: commits.append(1))
+
+    dieta = generar_dieta_para_cliente(db, cliente, "Plan", 30, 2000)
+
+    assert (len(commits), len(turnos)) == (1, 1)
+    assert db.query(DietaUsoIA).filter_by(id_dieta=dieta.id_dieta).count() == 1
+    assert dieta.recetas
+
+
+def test_fallo_a_mitad_no_deja_nada_guardado(db, crear_usuario, monkeypatch):
+    cliente = db.get(Usuario, crear_usuario())
+
+    def falla(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(generacion_dietas, "registrar_uso", falla)
+    with pytest.raises(RuntimeError):
+        generar_dieta_para_cliente(db, cliente, "Plan", 30, 2000)
+
+    assert db.query(Dieta).count() == 0
+    assert db.query(DietaUsoIA).count() == 0
+
+
+# ============================================================
+# Dieta estructurada: recetas, plan semanal y calendario
+# ============================================================
+def test_generacion_guarda_plan_y_calendario(db, crear_usuario):
+    cliente = db.get(Usuario, crear_usuario())
+
+    primera = generar_dieta_para_cliente(db, cliente, "Plan", 30, 2000)
+    segunda = generar_dieta_para_cliente(db, cliente, "Plan 2", 30, 2000)
+
+    assert len(plan_de_dieta(db, primera)) == len(plan_de_dieta(db, segunda)) == 28
+    # El calendario del cliente es el de la última dieta
+    calendario = db.query(CalendarioDieta).filter_by(id_usuario=cliente.id_usuario).all()
+    assert len(calendario) == 28
+    assert {c.receta.id_dieta for c in calendario} == {segunda.id_dieta}
+
+
+def test_guardar_recetas_empareja_nombres_sin_acentos(db, crear_usuario):
+    id_cliente = crear_usuario()
+    dieta = DietaService.crear_dieta(db=db, id_usuario=id_cliente, nombre="Plan", descripcion="",
+                                     objetivo="saludable", calorias_totales=2000, dias_duracion=30)
+    receta = {"nombre": "Avena con plátano", "ingredientes": [{"nombre": "Avena"}]}
+    dieta_ia = DietaIA.model_validate({
+        "nombre": "Plan", "recomendaciones": ["Agua"],
+        "recetas": [receta, {**receta, "nombre": "AVENA CON PLATANO"}],
+        "distribucion_semanal": [
+            {"dia": "Miércoles", "desayuno": "avena con platano", "comida": "Inexistente"},
+            {"dia": "Feriado", "desayuno": "Avena con plátano"},
+        ],
+    })
+
+    guardar_recetas(db, dieta, dieta_ia)
+    db.commit()
+
+    # Recetas deduplicadas y comidas sin receta o días desconocidos descartados
+    assert len(dieta.recetas) == 1
+    assert [(c.dia_semana, c.comida) for c in db.query(ComidaDieta).all()] == [
+        (DiaSemana.miercoles, TipoComida.desayuno)
+    ]
+
+
+# ============================================================
+# Límites globales
+# ============================================================
+def test_limitador_espacia_llamadas_entre_hilos():
+    limitador = LimitadorTasa(600)  # una llamada cada 0.1 s
+    hilos = [threading.Thread(target=limitador.esperar_turno) for _ in range(5)]
+
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    # La primera pasa sin esperar; las otras cuatro, espaciadas
+    assert 0.35 <= time.monotonic() - inicio < 1
+
+
+def test_limitador_sin_limite_no_espera():
+    limitador = LimitadorTasa(0)
+    inicio = time.monotonic()
+    for _ in range(100):
+        limitador.esperar_turno()
+    assert time.monotonic() - inicio < 0.1
+
+
+def test_concurrencia_limitada_en_cada_event_loop(monkeypatch):
+    monkeypatch.setattr(generacion_dietas, "MAX_CONCURRENCIA", 2)
+    lock = threading.Lock()
+    estado = {"activas": 0, "maximo": 0}
+
+    def llamada():
+        with lock:
+            estado["activas"] += 1
+            estado["maximo"] = max(estado["maximo"], estado["activas"])
+        time.sleep(0.05)
+        with lock:
+            estado["activas"] -= 1
+
+    async def lote():
+        await asyncio.gather(*(ejecutar_con_limite(llamada) for _ in range(5)))
+
+    # Dos loops distintos en el mismo proceso (p. ej. dos apps o asyncio.run)
+    for _ in range(2):
+        asyncio.run(lote())
+        assert estado["maximo"] == 2
+
+
+# ============================================================
+# Lotes
+# ============================================================
+def test_limpiar_lotes_conserva_los_recientes():
+    reciente, viejo, en_curso = (LoteGeneracion(1, [], {}) for _ in range(3))
+    reciente.terminado_en = datetime.utcnow() - timedelta(seconds=generacion_dietas.LOTES_RETENCION_SEGUNDOS - 60)
+    viejo.terminado_en = datetime.utcnow() - timedelta(seconds=generacion_dietas.LOTES_RETENCION_SEGUNDOS + 60)
+    for lote in (reciente, viejo, en_curso):
+        generacion_dietas._lotes[lote.id_lote] = lote
+
+    generacion_dietas._limpiar_lotes()
+
+    assert set(generacion_dietas._lotes) == {reciente.id_lote, en_curso.id_lote}
+
+
+def test_lote_genera_para_clientes_con_contrato(api, auth, crear_usuario, db):
+    nutriologo = crear_usuario(TipoUsuarioEnum.nutriologo)
+    clientes = [crear_usuario() for _ in range(3)]
+    for i, id_cliente in enumerate(clientes[:2]):
+        db.add(Contrato(id_cliente=id_cliente, id_nutriologo=nutriologo, monto=1,
+                        estado=EstadoContrato.ACTIVO, stripe_payment_intent_id=f"pi_{i}"))
+    db.commit()
+
+    with api(clientes_router.router) as cliente:
+        r = cliente.post(
+            "/api/clientes/generar-dieta-ia/lote",
+            json={"ids_clientes": clientes, "nombre_dieta": "Plan", "calorias_objetivo": 2000},
+            headers=auth(nutriologo)
+        )
+        assert r.status_code == 202
+        assert r.json()["total"] == 2
+        assert [x["id_cliente"] for x in r.json()["rechazados"]] == [clientes[2]]
+
+        ruta = f"/api/clientes/generar-dieta-ia/lote/{r.json()['id_lote']}"
+        limite = time.monotonic() + 10
+        while (progreso := cliente.get(ruta, headers=auth(nutriologo)).json())["estado"] != "terminado":
+            assert time.monotonic() < limite
+            time.sleep(0.05)
+
+        assert progreso["completados"] == 2
+        assert all(i["estado"] == "completado" and i["id_dieta"] for i in progreso["items"])
+        # Solo el nutriólogo que lo lanzó ve el lote
+        assert cliente.get(ruta, headers=auth(clientes[0])).status_code == 404
+
+    assert db.query(Dieta).count() == 2
+    assert db.query(DietaUsoIA).count() == 2
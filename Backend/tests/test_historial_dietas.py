@@ -0,0 +1,148 @@
+"""
+Pruebas de la cadena de versiones de una dieta (DietaService.obtener_historial
+y GET /api/clientes/dieta/{id}/historial) y de la sincronización del esquema
+(core/esquema.py)
+"""
+
+import pytest
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, event, inspect, text
+
+from config.database import engine
+from core.esquema import sincronizar_esquema
+from models.contrato import Contrato, EstadoContrato
+from models.dieta import Dieta
+from models.user import TipoUsuarioEnum
+from routers import clientes_router
+from services.dieta_ia_service import DietaService, DietaYaRenovada
+from services.relaciones_contrato import relaciones_contrato
+
+
+@pytest.fixture
+def cadena(db, crear_usuario):
+    """Dieta original renovada dos veces: ids [v1, v2, v3] y su dueño"""
+    id_usuario = crear_usuario()
+    v1 = DietaService.crear_dieta(db=db, id_usuario=id_usuario, nombre="V1", descripcion="",
+                                  objetivo="saludable", calorias_totales=2000, dias_duracion=30).id_dieta
+    v2 = DietaService.crear_nueva_dieta_desde_vencida(db, v1, "V2", "", 1900).id_dieta
+    v3 = DietaService.crear_nueva_dieta_desde_vencida(db, v2, "V3", "", 1800).id_dieta
+    return id_usuario, [v1, v2, v3]
+
+
+def _versiones(db, id_dieta):
+    return [(v.id_dieta, v.version) for v in DietaService.obtener_historial(db, id_dieta)]
+
+
+# ============================================================
+# CTE recursiva
+# ============================================================
+def test_historial_completo_desde_cualquier_version(db, cadena):
+    _, (v1, v2, v3) = cadena
+    esperado = [(v1, 1), (v2, 2), (v3, 3)]
+
+    assert _versiones(db, v1) == _versiones(db, v2) == _versiones(db, v3) == esperado
+    assert _versiones(db, 999) == []
+
+
+def test_historial_en_una_consulta(db, cadena):
+    _, ids = cadena
+    consultas = []
+
+    def contar(conn, cursor, sql, *args):
+        consultas.append(sql)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        DietaService.obtener_historial(db, ids[1])
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    assert len(consultas) == 1
+
+
+def test_historial_con_ramas_y_original_borrada(db, cadena):
+    id_usuario, (v1, v2, v3) = cadena
+    rama = Dieta(id_usuario=id_usuario, nombre="Rama", id_dieta_anterior=v1)
+    db.add(rama)
+    db.commit()
+
+    assert _versiones(db, v3) == [(v1, 1), (v2, 2), (rama.id_dieta, 2), (v3, 3)]
+
+    # Sin la original, la cadena empieza en su primera renovación
+    DietaService.eliminar_dieta(db, v1)
+    assert _versiones(db, v3) == [(v2, 1), (v3, 2)]
+
+
+def test_no_se_renueva_dos_veces(db, cadena):
+    _, (v1, _, _) = cadena
+    with pytest.raises(DietaYaRenovada):
+        DietaService.crear_nueva_dieta_desde_vencida(db, v1, "Otra", "", 2000)
+
+
+def test_endpoint_historial_respeta_permisos(api, auth, db, crear_usuario, cadena):
+    id_usuario, (v1, v2, v3) = cadena
+    nutriologo, sin_contrato = crear_usuario(TipoUsuarioEnum.nutriologo), crear_usuario(TipoUsuarioEnum.nutriologo)
+    db.add(Contrato(id_cliente=id_usuario, id_nutriologo=nutriologo, monto=1,
+                    estado=EstadoContrato.ACTIVO, stripe_payment_intent_id="pi_1"))
+    db.commit()
+    relaciones_contrato.invalidar()
+    cliente = api(clientes_router.router)
+    ruta = f"/api/clientes/dieta/{v2}/historial"
+
+    try:
+        r = cliente.get(ruta, headers=auth(id_usuario)).json()
+        assert [(v["id_dieta"], v["version"], v["estado"]) for v in r] == [
+            (v1, 1, "actualizada"), (v2, 2, "actualizada"), (v3, 3, "activa")
+        ]
+        assert cliente.get(ruta, headers=auth(nutriologo)).status_code == 200
+        assert cliente.get(ruta, headers=auth(sin_contrato)).status_code == 404
+        assert cliente.get(ruta, headers=auth(crear_usuario())).status_code == 404
+        assert cliente.get("/api/clientes/dieta/999/historial", headers=auth(id_usuario)).status_code == 404
+    finally:
+        relaciones_contrato.invalidar()
+
+
+def test_indice_de_linaje_en_el_modelo():
+    assert "idx_dieta_anterior" in {i["name"] for i in inspect(engine).get_indexes("dietas")}
+
+
+# ============================================================
+# Sincronización del esquema
+# ============================================================
+@pytest.fixture
+def tabla_antigua():
+    """Tabla creada con una versión anterior del modelo (con una fila)"""
+    antigua = MetaData()
+    Table("t_sincronizar", antigua, Column("id", Integer, primary_key=True), Column("a", String(20)))
+    antigua.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO t_sincronizar (id, a) VALUES (1, 'x')"))
+    yield
+    antigua.drop_all(bind=engine)
+
+
+def test_sincronizar_anade_columnas_e_indices(tabla_antigua):
+    actual = MetaData()
+    Table(
+        "t_sincronizar", actual,
+        Column("id", Integer, primary_key=True),
+        Column("a", String(20)),
+        Column("b", String(20), nullable=True),
+        Column("c", Integer, nullable=False, default=0),
+        Column("d", Integer, nullable=False),             # sin default: no se puede añadir
+        Index("idx_t_sincronizar_a", "a"),
+    )
+
+    assert sincronizar_esquema(engine, actual) == {"t_sincronizar"}
+
+    inspector = inspect(engine)
+    assert {c["name"] for c in inspector.get_columns("t_sincronizar")} == {"id", "a", "b", "c"}
+    assert [i["name"] for i in inspector.get_indexes("t_sincronizar")] == ["idx_t_sincronizar_a"]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT b, c FROM t_sincronizar")).one() == (None, 0)
+
+    # Idempotente
+    assert sincronizar_esquema(engine, actual) == set()
+
+
+def test_sincronizar_sin_cambios_en_los_modelos():
+    assert sincronizar_esquema(engine) == set()
@@ -0,0 +1,210 @@
+"""
+Pruebas de la lectura tolerante del JSON de la IA (services/json_ia.py)
+"""
+
+import json
+
+import pytest
+
+from schemas.dieta_ia import DietaIA
+from services.json_ia import (
+    ESQUEMA_DIETA,
+    ParserJSONIncremental,
+    completar_dieta,
+    esquema_secciones,
+    extraer_json,
+    leer_stream,
+    validar_dieta,
+)
+
+DIAS = ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]
+
+
+def _receta(nombre):
+    return {
+        "nombre": nombre, "descripcion": None, "calorias": 400, "tiempo_preparacion": 10,
+        "ingredientes": [{"nombre": "Avena", "cantidad": "50", "unidad": "g"}],
+        "instrucciones": ["Mezclar"]
+    }
+
+
+def _dieta(**campos):
+    datos = {
+        "nombre": "Plan", "descripcion": "Plan semanal", "objetivo": "saludable", "calorias_totales": 2000,
+        "recetas": [_receta("Avena"), _receta("Ensalada")],
+        "distribucion_semanal": [
+            {"dia": d, "desayuno": "Avena", "comida": "Ensalada", "cena": "Ensalada", "snack": None} for d in DIAS
+        ],
+        "recomendaciones": ["Beber agua"],
+    }
+    datos.update(campos)
+    return datos
+
+
+def _trozos(texto, tamano=7):
+    return [texto[i:i + tamano] for i in range(0, len(texto), tamano)]
+
+
+# ============================================================
+# Parser incremental
+# ============================================================
+def test_emite_cada_receta_al_cerrarse():
+    texto = json.dumps(_dieta())
+    parser = ParserJSONIncremental(("recetas",))
+    emitidas = []
+    recibido_al_emitir = []
+    for trozo in _trozos(texto):
+        nuevas = [r["nombre"] for r in parser.alimentar(trozo)]
+        if nuevas:
+            emitidas.extend(nuevas)
+            recibido_al_emitir.append(len(parser._texto))
+
+    assert emitidas == ["Avena", "Ensalada"]
+    # La primera receta sale antes de recibir la segunda
+    assert recibido_al_emitir[0] < texto.index('"Ensalada"')
+    assert parser.completo
+    assert parser.resultado() == _dieta()
+
+
+def test_ignora_texto_y_bloques_de_codigo():
+    assert extraer_json('Aquí tienes:\n```json\n{"a": [1, {"b": "}"}]}\n```\nSaludos {x}') == {"a": [1, {"b": "}"}]}
+
+
+@pytest.mark.parametrize("truncado, esperado", [
+    ('{"a": 1, "b": [1, 2]', {"a": 1, "b": [1, 2]}),
+    ('{"a": 1, "b": [1, 2', {"a": 1, "b": [1]}),            # número posiblemente incompleto
+    ('{"a": 1, "b": 12', {"a": 1}),
+    ('{"a": 1, "b": tr', {"a": 1}),
+    ('{"a": "hola mun', {"a": "hola mun"}),                 # texto cortado se conserva
+    ('{"a": "x\\', {"a": "x"}),                             # escape a medias
+    ('{"a": "caf\\u00e', {"a": "caf"}),                     # unicode a medias
+    ('{"a": 1, "cla', {"a": 1}),                            # clave a medias
+    ('{"a": 1, "b":', {"a": 1}),
+    ('{"a": {"b": [{"c": 1}, {"d', {"a": {"b": [{"c": 1}, {}]}}),
+])
+def test_repara_json_truncado(truncado, esperado):
+    assert extraer_json(truncado) == esperado
+
+
+def test_sin_objeto_json():
+    with pytest.raises(ValueError):
+        extraer_json("Lo siento, no puedo ayudar")
+
+
+# ============================================================
+# Streaming
+# ============================================================
+def test_stream_cortado_conserva_lo_recibido():
+    texto = json.dumps(_dieta())
+    corte = texto.index('"distribucion_semanal"') + 40
+
+    def stream():
+        yield from _trozos(texto[:corte])
+        raise ConnectionError("se cayó la conexión")
+
+    recibidas = []
+    datos = leer_stream(stream(), lambda r: recibidas.append(r["nombre"]))
+
+    assert recibidas == ["Avena", "Ensalada"]
+    assert len(datos["recetas"]) == 2
+    assert "recomendaciones" not in datos
+
+
+def test_stream_que_falla_sin_datos_propaga_el_error():
+    def stream():
+        yield "Pensando..."
+        raise ConnectionError("sin respuesta")
+
+    with pytest.raises(ConnectionError):
+        leer_stream(stream())
+
+
+# ============================================================
+# Validación por secciones y reintento de lo que falta
+# ============================================================
+def test_validar_descarta_recetas_invalidas_una_a_una():
+    validos, faltantes = validar_dieta(_dieta(recetas=[_receta("Avena"), {"nombre": "Sin ingredientes"}]))
+
+    assert faltantes == []
+    assert [r["nombre"] for r in validos["recetas"]] == ["Avena"]
+
+
+def test_validar_detecta_secciones_faltantes():
+    datos = _dieta(distribucion_semanal=_dieta()["distribucion_semanal"][:3])
+    del datos["recomendaciones"]
+
+    assert validar_dieta(datos)[1] == ["distribucion_semanal", "recomendaciones"]
+
+
+def test_completar_pide_solo_lo_que_falta():
+    truncado = extraer_json(json.dumps(_dieta())[:-60])
+    pedidas = []
+
+    def pedir(secciones, validos):
+        pedidas.append((secciones, [r["nombre"] for r in validos["recetas"]]))
+        return json.dumps({"recomendaciones": ["Dormir bien"], "recetas": []})
+
+    dieta = completar_dieta(truncado, pedir)
+
+    assert pedidas == [(["recomendaciones"], ["Avena", "Ensalada"])]
+    # Solo se toman los campos pedidos; las recetas válidas se conservan
+    assert [r.nombre for r in dieta.recetas] == ["Avena", "Ensalada"]
+    assert dieta.recomendaciones == ["Dormir bien"]
+    assert len(dieta.distribucion_semanal) == 7
+
+
+def test_completar_falla_si_sigue_incompleta():
+    datos = _dieta()
+    del datos["recomendaciones"]
+
+    with pytest.raises(ValueError, match="incompleta"):
+        completar_dieta(datos, lambda secciones, validos: "sin json", reintentos=2)
+
+
+# ============================================================
+# Esquema de respuesta para Gemini
+# ============================================================
+def _claves(nodo):
+    """Todas las claves del esquema, recorriendo propiedades e items"""
+    claves = set(nodo)
+    for hijo in nodo.get("properties", {}).values():
+        claves |= _claves(hijo)
+    if "items" in nodo:
+        claves |= _claves(nodo["items"])
+    return claves
+
+
+def test_esquema_dieta_en_el_subconjunto_de_gemini():
+    assert _claves(ESQUEMA_DIETA) <= {"type", "enum", "description", "nullable", "properties", "required", "items"}
+
+    propiedades = ESQUEMA_DIETA["properties"]
+    assert ESQUEMA_DIETA["required"] == list(propiedades)
+    assert propiedades["objetivo"] == {
+        "type": "string", "enum": ["perdida_grasa", "definicion", "volumen", "saludable"]
+    }
+    # Optional -> nullable y $ref resuelto en línea
+    assert propiedades["calorias_totales"] == {"type": "integer", "nullable": True}
+    ingrediente = propiedades["recetas"]["items"]["properties"]["ingredientes"]["items"]
+    assert ingrediente["required"] == ["nombre", "cantidad", "unidad"]
+    # La distribución va como lista de días (Gemini no admite claves libres)
+    assert propiedades["distribucion_semanal"]["type"] == "array"
+    assert "dia" in propiedades["distribucion_semanal"]["items"]["properties"]
+
+
+def test_esquema_de_secciones_solo_con_los_campos_pedidos():
+    esquema = esquema_secciones(("recetas", "recomendaciones"))
+
+    assert list(esquema["properties"]) == ["recetas", "recomendaciones"]
+    assert esquema["required"] == ["recetas", "recomendaciones"]
+    assert esquema_secciones(("recetas", "recomendaciones")) is esquema
+    assert set(ESQUEMA_DIETA["properties"]) > set(esquema["properties"])
+
+
+def test_dieta_acepta_distribucion_como_lista_o_diccionario():
+    como_lista = DietaIA.model_validate(_dieta())
+    como_dict = DietaIA.model_validate(_dieta(distribucion_semanal={
+        d: {"desayuno": "Avena", "comida": "Ensalada", "cena": "Ensalada"} for d in DIAS
+    }))
+
+    assert como_lista.distribucion_semanal == como_dict.distribucion_semanal
+    assert list(como_lista.distribucion_semanal) == DIAS
@@ -0,0 +1,298 @@
+"""
+Pruebas del router de mensajes (/api/mensajes)
+"""
+
+import threading
+import time
+
+import pytest
+
+from models.mensajes import Mensaje
+from routers import router_mensajes
+
+
+@pytest.fixture
+def cliente(api):
+    return api(router_mensajes.router)
+
+
+def _enviar(cliente, auth, de, para, contenido="hola"):
+    r = cliente.post("/api/mensajes/enviar", json={"destinatario_id": para, "contenido": contenido}, headers=auth(de))
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+# ============================================================
+# /no-leidos: ETag y long-poll
+# ============================================================
+def test_no_leidos_responde_304_con_etag_vigente(cliente, crear_usuario, auth):
+    a, b = crear_usuario(), crear_usuario()
+
+    r = cliente.get("/api/mensajes/no-leidos", headers=auth(b))
+    assert r.json() == {"no_leidos": 0, "conversaciones_no_leidas": 0}
+    etag = r.headers["etag"]
+
+    r = cliente.get("/api/mensajes/no-leidos", headers={**auth(b), "If-None-Match": etag})
+    assert r.status_code == 304
+
+    _enviar(cliente, auth, a, b)
+    r = cliente.get("/api/mensajes/no-leidos", headers={**auth(b), "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json() == {"no_leidos": 1, "conversaciones_no_leidas": 1}
+    assert r.headers["etag"] != etag
+
+
+def test_304_sin_consultar_la_bd(cliente, crear_usuario, auth):
+    from sqlalchemy import event
+    from config.database import engine
+
+    b = crear_usuario()
+    etag = cliente.get("/api/mensajes/no-leidos", headers=auth(b)).headers["etag"]
+    conteos = []
+
+    def contar(conn, cursor, sql, *args):
+        if "count(" in sql.lower():
+            conteos.append(sql)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        for si_no_coincide in (etag, f"W/{etag}", f'"otro", W/{etag}'):
+            r = cliente.get("/api/mensajes/no-leidos", headers={**auth(b), "If-None-Match": si_no_coincide})
+            assert (r.status_code, r.headers["etag"]) == (304, etag)
+        assert conteos == []
+
+        # Un ETag desconocido sí consulta la BD
+        r = cliente.get("/api/mensajes/no-leidos", headers={**auth(b), "If-None-Match": '"otro"'})
+        assert r.status_code == 200
+        assert len(conteos) == 1
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+
+def test_etag_de_otro_worker_se_detecta_al_caducar(cliente, crear_usuario, auth, db, monkeypatch):
+    """Un mensaje guardado por otro worker (sin aviso en memoria) cambia el ETag"""
+    monkeypatch.setattr(router_mensajes, "MENSAJES_LONGPOLL_INTERVALO", 0.2)
+    a, b = crear_usuario(), crear_usuario()
+    etag = cliente.get("/api/mensajes/no-leidos", headers=auth(b)).headers["etag"]
+
+    db.add(Mensaje(remitente_id=a, destinatario_id=b, contenido="desde otro worker"))
+    db.commit()
+    time.sleep(0.25)
+
+    r = cliente.get("/api/mensajes/no-leidos", headers={**auth(b), "If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["no_leidos"] == 1
+
+
+def test_long_poll_despierta_al_recibir_mensaje(cliente, crear_usuario, auth):
+    a, b = crear_usuario(), crear_usuario()
+    etag = cliente.get("/api/mensajes/no-leidos", headers=auth(b)).headers["etag"]
+
+    def enviar_despues():
+        time.sleep(0.3)
+        _enviar(cliente, auth, a, b)
+
+    hilo = threading.Thread(target=enviar_despues)
+    hilo.start()
+    inicio = time.monotonic()
+    r = cliente.get("/api/mensajes/no-leidos?esperar=true&timeout=10", headers={**auth(b), "If-None-Match": etag})
+    hilo.join()
+
+    assert r.status_code == 200
+    assert r.json()["no_leidos"] == 1
+    assert time.monotonic() - inicio < 5
+
+
+def test_long_poll_detecta_cambios_de_otro_worker(cliente, crear_usuario, auth, monkeypatch):
+    monkeypatch.setattr(router_mensajes, "MENSAJES_LONGPOLL_INTERVALO", 0.2)
+    a, b = crear_usuario(), crear_usuario()
+    etag = cliente.get("/api/mensajes/no-leidos", headers=auth(b)).headers["etag"]
+
+    def guardar_directo():
+        time.sleep(0.3)
+        from config.database import SessionLocal
+        sesion = SessionLocal()
+        sesion.add(Mensaje(remitente_id=a, destinatario_id=b, contenido="x"))
+        sesion.commit()
+        sesion.close()
+
+    hilo = threading.Thread(target=guardar_directo)
+    hilo.start()
+    r = cliente.get("/api/mensajes/no-leidos?esperar=true&timeout=5", headers={**auth(b), "If-None-Match": etag})
+    hilo.join()
+
+    assert r.status_code == 200
+    assert r.json()["no_leidos"] == 1
+
+
+def test_long_poll_agota_timeout_con_304(cliente, crear_usuario, auth):
+    b = crear_usuario()
+    etag = cliente.get("/api/mensajes/no-leidos", headers=auth(b)).headers["etag"]
+
+    r = cliente.get("/api/mensajes/no-leidos?esperar=true&timeout=1", headers={**auth(b), "If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag
+
+
+# ============================================================
+# Lectura: GET sin efectos y confirmación hasta una marca
+# ============================================================
+def test_ver_chat_no_marca_como_leido(cliente, crear_usuario, auth):
+    a, b = crear_usuario(), crear_usuario()
+    _enviar(cliente, auth, a, b)
+
+    r = cliente.get(f"/api/mensajes/chat/{a}", headers=auth(b))
+    assert r.status_code == 200
+    assert r.json()["mensajes"][0]["leido"] is False
+    assert cliente.get("/api/mensajes/no-leidos", headers=auth(b)).json()["no_leidos"] == 1
+
+
+def test_confirmar_lectura_hasta_marca(cliente, crear_usuario, auth):
+    a, b = crear_usuario(), crear_usuario()
+    ids = [_enviar(cliente, auth, a, b, f"m{i}") for i in range(3)]
+
+    r = cliente.post(f"/api/mensajes/chat/{a}/leido", json={"hasta_id": ids[1]}, headers=auth(b))
+    assert r.json() == {"success": True, "marcados": 2, "ultimo_leido_id": ids[1]}
+
+    # Una marca ya cubierta no toca nada
+    r = cliente.post(f"/api/mensajes/chat/{a}/leido", json={"hasta_id": ids[0]}, headers=auth(b))
+    assert r.json() == {"success": True, "marcados": 0, "ultimo_leido_id": ids[1]}
+    assert cliente.get("/api/mensajes/no-leidos", headers=auth(b)).json()["no_leidos"] == 1
+
+    # Sin hasta_id confirma todo; repetirlo es idempotente
+    r = cliente.post(f"/api/mensajes/chat/{a}/leido", headers=auth(b))
+    assert r.json() == {"success": True, "marcados": 1, "ultimo_leido_id": ids[2]}
+    r = cliente.post(f"/api/mensajes/chat/{a}/leido", headers=auth(b))
+    assert r.json()["marcados"] == 0
+
+
+def test_confirmar_lectura_no_toca_mensajes_enviados(cliente, crear_usuario, auth):
+    a, b = crear_usuario(), crear_usuario()
+    _enviar(cliente, auth, a, b)
+
+    # a confirma la conversación: su propio mensaje sigue sin leer para b
+    cliente.post(f"/api/mensajes/chat/{b}/leido", headers=auth(a))
+    assert cliente.get("/api/mensajes/no-leidos", headers=auth(b)).json()["no_leidos"] == 1
+
+
+# ============================================================
+# Envío y marcado en lote
+# ============================================================
+def test_enviar_lote_deduplica_destinatarios(cliente, crear_usuario, auth):
+    a, b, c = crear_usuario(), crear_usuario(), crear_usuario()
+
+    r = cliente.post("/api/mensajes/enviar-lote", json={"destinatarios_ids": [b, c, b], "contenido": "tip"}, headers=auth(a))
+    assert r.status_code == 201
+    assert r.json() == {"success": True, "enviados": 2, "destinatarios_ids": [b, c]}
+    for usuario in (b, c):
+        assert cliente.get("/api/mensajes/no-leidos", headers=auth(usuario)).json()["no_leidos"] == 1
+
+
+def test_enviar_lote_valida_destinatarios(cliente, crear_usuario, auth):
+    a, b = crear_usuario(), crear_usuario()
+
+    r = cliente.post("/api/mensajes/enviar-lote", json={"destinatarios_ids": [b, 999], "contenido": "tip"}, headers=auth(a))
+    assert r.status_code == 404
+    r = cliente.post("/api/mensajes/enviar-lote", json={"destinatarios_ids": [a], "contenido": "tip"}, headers=auth(a))
+    assert r.status_code == 400
+    # Nada se envió: la validación es de todo el lote
+    assert cliente.get("/api/mensajes/no-leidos", headers=auth(b)).json()["no_leidos"] == 0
+
+
+def test_marcar_leidos_por_ids_solo_los_propios(cliente, crear_usuario, auth):
+    a, b, c = crear_usuario(), crear_usuario(), crear_usuario()
+    para_b = _enviar(cliente, auth, a, b)
+    para_c = _enviar(cliente, auth, a, c)
+
+    r = cliente.put("/api/mensajes/marcar-leidos", json={"ids": [para_b, para_c]}, headers=auth(b))
+    assert r.json() == {"success": True, "marcados": 1}
+    assert cliente.get("/api/mensajes/no-leidos", headers=auth(c)).json()["no_leidos"] == 1
+
+
+def test_marcar_leidos_por_remitente(cliente, crear_usuario, auth):
+    a, b = crear_usuario(), crear_usuario()
+    for i in range(2):
+        _enviar(cliente, auth, a, b, f"m{i}")
+
+    r = cliente.put("/api/mensajes/marcar-leidos", json={"remitente_id": a}, headers=auth(b))
+    assert r.json() == {"success": True, "marcados": 2}
+    assert cliente.put("/api/mensajes/marcar-leidos", json={}, headers=auth(b)).status_code == 400
+
+
+# ============================================================
+# Búsqueda de texto completo
+# ============================================================
+@pytest.fixture
+def indice_busqueda():
+    from sqlalchemy import text
+    from config.database import engine
+    from services.busqueda_mensajes import TABLA_FTS_SQLITE, TABLA_FTS_SQLITE_ARCHIVO, asegurar_indice_busqueda
+
+    asegurar_indice_busqueda(engine)
+    yield
+    with engine.begin() as conn:
+        for tabla in (TABLA_FTS_SQLITE, TABLA_FTS_SQLITE_ARCHIVO):
+            conn.execute(text(f"DROP TABLE IF EXISTS {tabla}"))
+
+
+def test_buscar_sin_acentos_por_prefijo_y_con_cursor(cliente, crear_usuario, auth, indice_busqueda):
+    a, b = crear_usuario(), crear_usuario()
+    primero = _enviar(cliente, auth, a, b, "Hola, ¿cómo vas con la dieta?")
+    _enviar(cliente, auth, a, b, "nada que ver")
+    ultimo = _enviar(cliente, auth, a, b, "Dieta nueva lista")
+
+    r = cliente.get("/api/mensajes/buscar?q=DIET&limite=1", headers=auth(b)).json()
+    assert [m["id"] for m in r["resultados"]] == [ultimo]
+    assert r["resultados"][0]["fragmento"] == "<mark>Diet</mark>a nueva lista"
+    assert r["siguiente_cursor"] == ultimo
+
+    r = cliente.get(f"/api/mensajes/buscar?q=diet&cursor={ultimo}", headers=auth(b)).json()
+    assert [m["id"] for m in r["resultados"]] == [primero]
+    assert r["siguiente_cursor"] is None
+
+    r = cliente.get("/api/mensajes/buscar?q=como", headers=auth(b)).json()
+    assert [m["id"] for m in r["resultados"]] == [primero]
+
+
+def test_buscar_solo_en_mensajes_propios(cliente, crear_usuario, auth, indice_busqueda):
+    a, b, c = crear_usuario(), crear_usuario(), crear_usuario()
+    _enviar(cliente, auth, a, b, "dieta de b")
+    propio = _enviar(cliente, auth, a, c, "dieta de c")
+
+    r = cliente.get("/api/mensajes/buscar?q=dieta", headers=auth(c)).json()
+    assert [m["id"] for m in r["resultados"]] == [propio]
+
+
+def test_buscar_incluye_el_archivo(cliente, crear_usuario, auth, db, indice_busqueda):
+    from datetime import datetime, timedelta
+    from models.mensajes import Mensaje, MensajeArchivado
+    from services.archivo_mensajes import archivar_mensajes_antiguos
+
+    a, b = crear_usuario(), crear_usuario()
+    antiguo = Mensaje(remitente_id=a, destinatario_id=b, contenido="Dieta de enero", leido=True,
+                      fecha_creacion=datetime.utcnow() - timedelta(days=400))
+    db.add(antiguo)
+    db.commit()
+    id_antiguo = antiguo.id
+    reciente = _enviar(cliente, auth, b, a, "Dieta de marzo")
+    assert archivar_mensajes_antiguos(db, retencion_dias=30) == 1
+    assert db.get(MensajeArchivado, id_antiguo) is not None
+
+    r = cliente.get("/api/mensajes/buscar?q=dieta&limite=1", headers=auth(b)).json()
+    assert [m["id"] for m in r["resultados"]] == [reciente]
+
+    r = cliente.get(f"/api/mensajes/buscar?q=dieta&cursor={r['siguiente_cursor']}", headers=auth(b)).json()
+    assert [(m["id"], m["otro_usuario_id"]) for m in r["resultados"]] == [(id_antiguo, a)]
+    assert r["resultados"][0]["fragmento"] == "<mark>Dieta</mark> de enero"
+    assert r["siguiente_cursor"] is None
+
+    # Solo los mensajes propios, también en el archivo
+    assert cliente.get("/api/mensajes/buscar?q=enero", headers=auth(crear_usuario())).json()["resultados"] == []
+
+
+def test_resaltar_fragmento_escapa_html():
+    from services.busqueda_mensajes import resaltar_fragmento
+
+    assert resaltar_fragmento("La proteína <b>extra</b> ayuda", "proteina") == (
+        "La <mark>proteína</mark> &lt;b&gt;extra&lt;/b&gt; ayuda"
+    )
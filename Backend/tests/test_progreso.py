@@ -0,0 +1,130 @@
+"""
+Pruebas de las series y rachas de progreso (services/progreso_service.py y
+GET /api/users/{id}/progress[/series])
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from models.contrato import Contrato, EstadoContrato
+from models.progreso import Progreso
+from models.user import TipoUsuarioEnum
+from routers import users
+from services.progreso_service import rachas_progreso, serie_progreso
+from services.relaciones_contrato import relaciones_contrato
+
+LUNES = date(2026, 3, 9)
+
+
+@pytest.fixture
+def registrar(db):
+    """Guarda registros de progreso: registrar(id_usuario, (fecha, peso), ...)"""
+    def _registrar(id_usuario: int, *registros) -> None:
+        for fecha, peso in registros:
+            db.add(Progreso(id_usuario=id_usuario, fecha_registro=fecha, peso=peso, imc=round(peso / 3, 2)))
+        db.commit()
+    return _registrar
+
+
+def _dias(*desplazamientos, desde=LUNES):
+    return [desde + timedelta(days=d) for d in desplazamientos]
+
+
+# ============================================================
+# Series agrupadas en SQL
+# ============================================================
+def test_serie_por_dia(db, crear_usuario, registrar):
+    id_usuario = crear_usuario()
+    registrar(id_usuario, (LUNES, 80), (LUNES, 81), (LUNES + timedelta(days=2), 79.5))
+    registrar(crear_usuario(), (LUNES, 60))
+
+    serie = serie_progreso(db, id_usuario)
+
+    assert [(str(p.inicio), p.registros, p.peso_min, p.peso_avg, p.peso_max) for p in serie] == [
+        ("2026-03-09", 2, 80.0, 80.5, 81.0),
+        ("2026-03-11", 1, 79.5, 79.5, 79.5),
+    ]
+    assert serie[0].imc_avg == pytest.approx((80 / 3 + 81 / 3) / 2, abs=0.01)
+
+
+def test_serie_por_semana_de_lunes_a_domingo(db, crear_usuario, registrar):
+    id_usuario = crear_usuario()
+    registrar(id_usuario, *((d, 80 - i) for i, d in enumerate(_dias(-1, 0, 3, 6, 7))))
+
+    serie = serie_progreso(db, id_usuario, granularidad="semana")
+
+    assert [(str(p.inicio), p.registros, p.peso_max) for p in serie] == [
+        ("2026-03-02", 1, 80.0), ("2026-03-09", 3, 79.0), ("2026-03-16", 1, 76.0)
+    ]
+
+
+def test_serie_en_rango(db, crear_usuario, registrar):
+    id_usuario = crear_usuario()
+    registrar(id_usuario, *((d, 80) for d in _dias(0, 1, 2, 3)))
+
+    serie = serie_progreso(db, id_usuario, desde=LUNES + timedelta(days=1), hasta=LUNES + timedelta(days=2))
+    assert [str(p.inicio) for p in serie] == ["2026-03-10", "2026-03-11"]
+
+    with pytest.raises(ValueError):
+        serie_progreso(db, id_usuario, granularidad="mes")
+
+
+# ============================================================
+# Rachas con funciones de ventana
+# ============================================================
+@pytest.mark.parametrize("hoy, actual", [
+    (LUNES + timedelta(days=6), 2),        # último registro hoy
+    (LUNES + timedelta(days=7), 2),        # último registro ayer: la racha sigue
+    (LUNES + timedelta(days=8), 0),        # antes de ayer: se rompió
+])
+def test_rachas(db, crear_usuario, registrar, hoy, actual):
+    id_usuario = crear_usuario()
+    # Racha de 3 (con un día repetido) y racha de 2 al final
+    registrar(id_usuario, *((d, 80) for d in _dias(0, 1, 1, 2, 5, 6)))
+
+    assert rachas_progreso(db, id_usuario, hoy=hoy) == (actual, 3, LUNES + timedelta(days=6))
+
+
+def test_rachas_sin_registros(db, crear_usuario):
+    assert rachas_progreso(db, crear_usuario()) == (0, 0, None)
+
+
+# ============================================================
+# Endpoints
+# ============================================================
+def test_endpoint_serie_respeta_permisos(api, auth, db, crear_usuario, registrar):
+    id_usuario = crear_usuario()
+    nutriologo, sin_contrato = crear_usuario(TipoUsuarioEnum.nutriologo), crear_usuario(TipoUsuarioEnum.nutriologo)
+    db.add(Contrato(id_cliente=id_usuario, id_nutriologo=nutriologo, monto=1,
+                    estado=EstadoContrato.ACTIVO, stripe_payment_intent_id="pi_1"))
+    hoy = date.today()
+    registrar(id_usuario, *((d, 80) for d in _dias(-2, -1, 0, desde=hoy)))
+    relaciones_contrato.invalidar()
+    cliente = api((users.router, "/api/users"))
+    ruta = f"/api/users/{id_usuario}/progress/series"
+
+    try:
+        r = cliente.get(ruta, params={"granularidad": "dia"}, headers=auth(id_usuario)).json()
+        assert (len(r["puntos"]), r["racha_actual"], r["racha_maxima"]) == (3, 3, 3)
+        assert r["ultimo_registro"] == hoy.isoformat()
+
+        assert cliente.get(ruta, headers=auth(nutriologo)).status_code == 200
+        assert cliente.get(ruta, headers=auth(sin_contrato)).status_code == 404
+        assert cliente.get(ruta, params={"desde": "2026-03-10", "hasta": "2026-03-01"},
+                           headers=auth(id_usuario)).status_code == 400
+        assert cliente.get(ruta, params={"granularidad": "mes"}, headers=auth(id_usuario)).status_code == 422
+    finally:
+        relaciones_contrato.invalidar()
+
+
+def test_endpoint_progreso_con_historial(api, crear_usuario, registrar):
+    id_usuario = crear_usuario(peso=78, peso_inicial=80, altura=1.8)
+    hoy = date.today()
+    registrar(id_usuario, *((d, 80 - i) for i, d in enumerate(_dias(-1, 0, 0, desde=hoy))))
+    cliente = api((users.router, "/api/users"))
+
+    r = cliente.get(f"/api/users/{id_usuario}/progress").json()
+
+    assert (r["entrenamientos"], r["racha"], r["cambio_peso"]) == (3, 2, 2.0)
+    assert r["peso_series"] == [80.0, 78.5]
@@ -0,0 +1,114 @@
+"""
+Pruebas de las plantillas de prompts (services/prompts_dieta.py) y del
+consumo de tokens de la IA (services/uso_ia.py y GET /api/clientes/uso-ia)
+"""
+
+import pytest
+
+from models.contrato import Contrato, EstadoContrato
+from models.user import TipoUsuarioEnum
+from routers import clientes_router
+from services import generacion_dietas
+from services.generacion_dietas import LimitadorTasa
+from services.prompts_dieta import DIETA_CLIENTE, PromptDemasiadoLargo, estimar_tokens, prompt_dieta_cliente
+from services.relaciones_contrato import relaciones_contrato
+from services.uso_ia import UsoIA, calcular_costo, registrar_uso, resumen_uso
+
+
+def _prompt(**campos):
+    datos = dict(
+        nombre="Ana", edad=30, peso=70, altura=1.7, peso_inicial=None, objetivo="Mantener",
+        enfermedades=[], descripcion_medica=None, nombre_dieta="Plan", dias_duracion=30,
+        calorias_objetivo=2000
+    )
+    datos.update(campos)
+    return prompt_dieta_cliente(**datos)
+
+
+# ============================================================
+# Plantillas
+# ============================================================
+def test_prefijo_estatico_igual_para_todos_los_clientes():
+    a, b = _prompt(nombre="Ana"), _prompt(nombre="Luis", enfermedades=["Diabetes"])
+
+    assert a.plantilla == "dieta_cliente"
+    assert a.instrucciones is b.instrucciones is DIETA_CLIENTE.instrucciones
+    assert "Ana" not in a.instrucciones
+    assert a.completo.startswith(a.instrucciones)
+
+
+def test_contenido_omite_valores_vacios():
+    contenido = _prompt(peso_inicial=None, descripcion_medica="", preferencias=None).contenido
+
+    assert "- Nombre: Ana" in contenido
+    assert "- Condiciones médicas: Ninguna" in contenido
+    assert "Peso inicial" not in contenido
+    assert "Descripción médica" not in contenido
+    assert "Preferencias" not in contenido
+
+
+def test_tokens_estimados_y_limite():
+    prompt = _prompt()
+    assert prompt.tokens_estimados == DIETA_CLIENTE.tokens_instrucciones + estimar_tokens(prompt.contenido)
+
+    with pytest.raises(PromptDemasiadoLargo):
+        _prompt(preferencias="x" * 20000)
+
+
+# ============================================================
+# Consumo y costo
+# ============================================================
+def _uso(plantilla="dieta_cliente", prompt=1000, cache=0, respuesta=2000):
+    return UsoIA(plantilla, "modelo", prompt, prompt, cache, respuesta, 10)
+
+
+def test_costo_cobra_la_cache_a_precio_reducido():
+    assert calcular_costo(1000, 600, 0) < calcular_costo(1000, 0, 0)
+    assert _uso(cache=600).costo_usd == calcular_costo(1000, 600, 2000)
+
+
+def test_resumen_por_plantilla(db, crear_usuario):
+    nutriologo, otro = crear_usuario(TipoUsuarioEnum.nutriologo), crear_usuario(TipoUsuarioEnum.nutriologo)
+    registrar_uso(db, _uso(prompt=1000), id_nutriologo=nutriologo)
+    registrar_uso(db, _uso(prompt=3000, cache=1000), id_nutriologo=nutriologo)
+    registrar_uso(db, _uso("renovacion_dieta"), id_nutriologo=nutriologo)
+    registrar_uso(db, _uso(), id_nutriologo=otro)
+
+    resumen = {r["plantilla"]: r for r in resumen_uso(db, nutriologo)}
+    assert set(resumen) == {"dieta_cliente", "renovacion_dieta"}
+    assert resumen["dieta_cliente"]["llamadas"] == 2
+    assert resumen["dieta_cliente"]["tokens_prompt"] == 4000
+    assert resumen["dieta_cliente"]["tokens_cache"] == 1000
+    assert resumen["dieta_cliente"]["tokens_prompt_promedio"] == 2000
+
+
+def test_registrar_uso_sin_commit_queda_en_la_transaccion(db, crear_usuario):
+    nutriologo = crear_usuario(TipoUsuarioEnum.nutriologo)
+    registrar_uso(db, _uso(), id_nutriologo=nutriologo, commit=False)
+    db.rollback()
+    assert resumen_uso(db, nutriologo) == []
+
+
+def test_endpoint_uso_ia(api, auth, crear_usuario, db, monkeypatch):
+    monkeypatch.setattr(generacion_dietas, "_limitador", LimitadorTasa(0))
+    relaciones_contrato.invalidar()
+    nutriologo, id_cliente = crear_usuario(TipoUsuarioEnum.nutriologo), crear_usuario()
+    db.add(Contrato(id_cliente=id_cliente, id_nutriologo=nutriologo, monto=1,
+                    estado=EstadoContrato.ACTIVO, stripe_payment_intent_id="pi_1"))
+    db.commit()
+    cliente = api(clientes_router.router)
+    pedido = {"id_cliente": id_cliente, "nombre_dieta": "Plan", "calorias_objetivo": 1800}
+
+    try:
+        assert cliente.post("/api/clientes/generar-dieta-ia", json=pedido, headers=auth(nutriologo)).status_code == 200
+        r = cliente.post(
+            "/api/clientes/generar-dieta-ia", json={**pedido, "preferencias": "x" * 20000}, headers=auth(nutriologo)
+        )
+        assert r.status_code == 400
+
+        uso = cliente.get("/api/clientes/uso-ia", headers=auth(nutriologo)).json()
+        assert uso["llamadas"] == 1
+        assert [p["plantilla"] for p in uso["por_plantilla"]] == ["dieta_cliente"]
+        assert cliente.get("/api/clientes/uso-ia", headers=auth(id_cliente)).status_code == 403
+    finally:
+        relaciones_contrato.invalidar()
@@ -0,0 +1,104 @@
+"""
+Pruebas de los proveedores de IA intercambiables (services/proveedores_ia.py)
+"""
+
+import json
+
+import pytest
+
+from schemas.dieta_ia import DietaEstructuradaIA, RenovacionDietaIA
+from services import generacion_dietas, proveedores_ia
+from services.json_ia import ESQUEMA_DIETA, ESQUEMA_RENOVACION
+from services.prompts_dieta import PromptRenderizado
+from services.proveedores_ia import (
+    ProveedorGemini,
+    ProveedorIA,
+    ProveedorSimulado,
+    RespuestaIA,
+    obtener_proveedor,
+)
+from services.uso_ia import UsoIA
+
+PROMPT = PromptRenderizado("dieta_cliente", "Instrucciones", "CLIENTE:\n- Nombre: Ana", 10)
+
+
+def test_interfaz_abstracta():
+    with pytest.raises(TypeError):
+        ProveedorIA()
+
+
+def test_obtener_proveedor_segun_configuracion(monkeypatch):
+    monkeypatch.setattr(proveedores_ia, "_proveedor", None)
+    proveedor = obtener_proveedor()
+
+    assert isinstance(proveedor, ProveedorSimulado)
+    assert obtener_proveedor() is proveedor
+
+    monkeypatch.setattr(proveedores_ia, "_proveedor", None)
+    monkeypatch.setattr(proveedores_ia, "IA_PROVEEDOR", "otro")
+    with pytest.raises(ValueError, match="IA_PROVEEDOR desconocido"):
+        obtener_proveedor()
+
+
+def test_gemini_exige_la_clave_en_la_primera_llamada(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    proveedor = ProveedorGemini()
+
+    with pytest.raises(ValueError, match="GEMINI_API_KEY"):
+        proveedor.generar(PROMPT)
+
+
+# ============================================================
+# Proveedor simulado
+# ============================================================
+def test_simulado_es_determinista():
+    proveedor = ProveedorSimulado(latencia_ms=0)
+    otro = PromptRenderizado("dieta_cliente", "Instrucciones", "CLIENTE:\n- Nombre: Luis", 10)
+
+    texto = proveedor.generar(PROMPT, ESQUEMA_DIETA).texto
+    assert ProveedorSimulado(latencia_ms=0).generar(PROMPT, ESQUEMA_DIETA).texto == texto
+    assert proveedor.generar(otro, ESQUEMA_DIETA).texto != texto
+
+
+def test_simulado_cumple_el_esquema():
+    proveedor = ProveedorSimulado(latencia_ms=0, elementos=5)
+
+    dieta = DietaEstructuradaIA.model_validate_json(proveedor.generar(PROMPT, ESQUEMA_DIETA).texto)
+    nombres = {r.nombre for r in dieta.recetas}
+    assert len(dieta.recetas) == 5
+    assert len(dieta.distribucion_semanal) == 7
+    # El plan se refiere a recetas generadas
+    assert all(d.desayuno in nombres for d in dieta.distribucion_semanal)
+
+    renovacion = RenovacionDietaIA.model_validate_json(proveedor.generar(PROMPT, ESQUEMA_RENOVACION).texto)
+    nuevas = {r.nombre for r in renovacion.recetas_nuevas}
+    assert all(c.receta in nuevas for c in renovacion.cambios)
+
+
+def test_simulado_stream_igual_a_la_respuesta_completa():
+    proveedor = ProveedorSimulado(latencia_ms=0)
+    completa = proveedor.generar(PROMPT, ESQUEMA_DIETA)
+
+    stream = proveedor.generar_stream(PROMPT, ESQUEMA_DIETA)
+    trozos = list(stream)
+
+    assert len(trozos) > 1
+    assert "".join(trozos) == stream.texto == completa.texto
+    assert stream.uso.tokens_respuesta == completa.uso.tokens_respuesta
+
+
+def test_generacion_usa_el_proveedor_configurado(monkeypatch):
+    class Fijo(ProveedorIA):
+        nombre = modelo = "fijo"
+
+        def generar(self, prompt, esquema=None, max_tokens=8192, temperatura=0.7):
+            return RespuestaIA(json.dumps({"ok": prompt.plantilla}), UsoIA(prompt.plantilla, "fijo", 1, 1, 0, 1, 0))
+
+        def generar_stream(self, prompt, esquema=None, max_tokens=8192, temperatura=0.7):
+            raise NotImplementedError
+
+    monkeypatch.setattr(proveedores_ia, "_proveedor", Fijo())
+    monkeypatch.setattr(generacion_dietas, "_limitador", generacion_dietas.LimitadorTasa(0))
+
+    respuesta = generacion_dietas.llamar_ia(PROMPT)
+    assert (respuesta.texto, respuesta.uso.modelo) == ('{"ok": "dieta_cliente"}', "fijo")
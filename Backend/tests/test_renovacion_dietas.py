@@ -0,0 +1,186 @@
+"""
+Pruebas de la renovación por cambios (renovar_dieta_con_cambios y
+POST /api/clientes/actualizar-dieta-vencida con "modo": "cambios")
+"""
+
+import json
+
+import pytest
+
+from models.calendario import DiaSemana, TipoComida
+from models.contrato import Contrato, EstadoContrato
+from models.dieta import Dieta, EstadoDieta
+from models.dieta_uso_ia import DietaUsoIA
+from models.receta import Receta
+from models.user import TipoUsuarioEnum, Usuario
+from routers import clientes_router
+from services import generacion_dietas
+from services.dieta_ia_service import DietaService, DietaYaRenovada
+from services.generacion_dietas import (
+    LimitadorTasa,
+    SinPlanEstructurado,
+    generar_dieta_para_cliente,
+    plan_de_dieta,
+    renovar_dieta_con_cambios,
+)
+from services.proveedores_ia import RespuestaIA
+from services.relaciones_contrato import relaciones_contrato
+from services.uso_ia import UsoIA
+
+LUNES_DESAYUNO = (DiaSemana.lunes, TipoComida.desayuno)
+MARTES_COMIDA = (DiaSemana.martes, TipoComida.comida)
+
+
+@pytest.fixture(autouse=True)
+def _sin_estado_global(monkeypatch):
+    monkeypatch.setattr(generacion_dietas, "_limitador", LimitadorTasa(0))
+    relaciones_contrato.invalidar()
+    yield
+    relaciones_contrato.invalidar()
+
+
+@pytest.fixture
+def anterior(db, crear_usuario):
+    """Dieta generada (plan de 28 comidas) de un cliente"""
+    cliente = db.get(Usuario, crear_usuario())
+    return generar_dieta_para_cliente(db, cliente, "Plan", 30, 2000)
+
+
+@pytest.fixture
+def respuesta_ia(monkeypatch, db, anterior):
+    """La IA cambia el desayuno del lunes por una receta nueva y la comida del martes por una existente"""
+    plan = plan_de_dieta(db, anterior)
+    reutilizada = plan[LUNES_DESAYUNO].nombre
+    respuesta = {
+        "descripcion": "Menos carbohidratos",
+        "cambios": [
+            {"dia": "Lunes", "comida": "desayuno", "receta": "Omelette de claras"},
+            {"dia": "martes", "comida": "comida", "receta": reutilizada.upper()},
+            {"dia": "feriado", "comida": "cena", "receta": "Omelette de claras"},      # día desconocido
+            {"dia": "jueves", "comida": "cena", "receta": "Receta inexistente"},
+            {"dia": "viernes", "comida": "snack", "receta": plan[(DiaSemana.viernes, TipoComida.snack)].nombre},
+        ],
+        "recetas_nuevas": [
+            {"nombre": "Omelette de claras", "ingredientes": [{"nombre": "Claras"}]},
+            {"nombre": "Sin usar", "ingredientes": [{"nombre": "Agua"}]},
+        ],
+        "recomendaciones": ["Caminar 30 minutos"],
+    }
+    prompts = []
+
+    def llamar_ia(prompt, esquema=None):
+        prompts.append(prompt)
+        return RespuestaIA(json.dumps(respuesta), UsoIA(prompt.plantilla, "fijo", 1, 1, 0, 1, 0))
+
+    monkeypatch.setattr(generacion_dietas, "llamar_ia", llamar_ia)
+    return prompts
+
+
+def _renovar(db, dieta):
+    return renovar_dieta_con_cambios(db, dieta, db.get(Usuario, dieta.id_usuario), "Plan 2", 30, 1800)
+
+
+# ============================================================
+# Renovación por cambios
+# ============================================================
+def test_renovacion_reutiliza_lo_que_no_cambia(db, anterior, respuesta_ia):
+    plan_anterior = {k: r.id_receta for k, r in plan_de_dieta(db, anterior).items()}
+
+    nueva, resumen = _renovar(db, anterior)
+
+    plan = plan_de_dieta(db, nueva)
+    reutilizadas = {r.id_receta for r in plan.values() if r.id_dieta == anterior.id_dieta}
+    assert resumen == {"comidas_cambiadas": 2, "recetas_nuevas": 1, "recetas_reutilizadas": len(reutilizadas)}
+    assert len(plan) == 28
+    assert plan[LUNES_DESAYUNO].nombre == "Omelette de claras"
+    assert plan[LUNES_DESAYUNO].id_dieta == nueva.id_dieta
+    assert plan[MARTES_COMIDA].id_receta == plan_anterior[LUNES_DESAYUNO]
+    assert {k: r.id_receta for k, r in plan.items() if k not in (LUNES_DESAYUNO, MARTES_COMIDA)} == {
+        k: v for k, v in plan_anterior.items() if k not in (LUNES_DESAYUNO, MARTES_COMIDA)
+    }
+    # Solo se guardó la receta nueva que se usa
+    assert db.query(Receta).filter_by(id_dieta=nueva.id_dieta).count() == 1
+
+    db.refresh(anterior)
+    assert (anterior.estado, nueva.id_dieta_anterior) == (EstadoDieta.actualizada, anterior.id_dieta)
+    assert db.query(DietaUsoIA).filter_by(id_dieta=nueva.id_dieta).count() == 1
+    # La IA recibe el plan anterior por nombre, sin recetas completas
+    assert plan_de_dieta(db, anterior)[LUNES_DESAYUNO].nombre in respuesta_ia[0].contenido
+    assert "Claras" not in respuesta_ia[0].contenido
+
+
+def test_no_se_renueva_dos_veces(db, anterior, respuesta_ia):
+    _renovar(db, anterior)
+    with pytest.raises(DietaYaRenovada):
+        _renovar(db, anterior)
+    assert len(respuesta_ia) == 1
+
+
+def test_sin_plan_guardado(db, crear_usuario, respuesta_ia):
+    dieta = DietaService.crear_dieta(db=db, id_usuario=crear_usuario(), nombre="Texto", descripcion="",
+                                     objetivo="saludable", calorias_totales=2000, dias_duracion=30)
+    with pytest.raises(SinPlanEstructurado):
+        _renovar(db, dieta)
+    assert respuesta_ia == []
+
+
+# ============================================================
+# Borrado de dietas con recetas compartidas
+# ============================================================
+def test_eliminar_anterior_conserva_el_plan_de_la_renovacion(db, anterior, respuesta_ia):
+    nueva, _ = _renovar(db, anterior)
+    id_anterior = anterior.id_dieta
+    plan = {k: r.id_receta for k, r in plan_de_dieta(db, nueva).items()}
+
+    assert DietaService.eliminar_dieta(db, id_anterior)
+
+    assert db.get(Dieta, id_anterior) is None
+    assert {k: r.id_receta for k, r in plan_de_dieta(db, nueva).items()} == plan
+    # Las recetas que solo usaba la anterior se borran con ella
+    assert db.query(Receta).filter(Receta.id_dieta.is_(None)).count() == 0
+    assert not DietaService.eliminar_dieta(db, id_anterior)
+
+
+def test_endpoint_eliminar_dieta(api, auth, db, crear_usuario, anterior, respuesta_ia):
+    nutriologo, sin_contrato = crear_usuario(TipoUsuarioEnum.nutriologo), crear_usuario(TipoUsuarioEnum.nutriologo)
+    db.add(Contrato(id_cliente=anterior.id_usuario, id_nutriologo=nutriologo, monto=1,
+                    estado=EstadoContrato.ACTIVO, stripe_payment_intent_id="pi_1"))
+    db.commit()
+    nueva, _ = _renovar(db, anterior)
+    id_anterior, id_nueva = anterior.id_dieta, nueva.id_dieta
+    cliente = api(clientes_router.router)
+    ruta = f"/api/clientes/dieta/{id_anterior}"
+
+    assert cliente.delete(ruta, headers=auth(anterior.id_usuario)).status_code == 403
+    assert cliente.delete(ruta, headers=auth(sin_contrato)).status_code == 404
+
+    r = cliente.delete(ruta, headers=auth(nutriologo))
+    assert r.json() == {"success": True, "id_dieta": id_anterior}
+    db.expire_all()
+    assert len(plan_de_dieta(db, db.get(Dieta, id_nueva))) == 28
+
+    assert cliente.delete(ruta, headers=auth(nutriologo)).status_code == 404
+
+
+# ============================================================
+# Endpoint
+# ============================================================
+def test_endpoint_renovacion_por_cambios(api, auth, db, crear_usuario, anterior, respuesta_ia):
+    nutriologo, sin_contrato = crear_usuario(TipoUsuarioEnum.nutriologo), crear_usuario(TipoUsuarioEnum.nutriologo)
+    db.add(Contrato(id_cliente=anterior.id_usuario, id_nutriologo=nutriologo, monto=1,
+                    estado=EstadoContrato.ACTIVO, stripe_payment_intent_id="pi_1"))
+    db.commit()
+    cliente = api(clientes_router.router)
+    pedido = {"id_dieta_anterior": anterior.id_dieta, "modo": "cambios"}
+
+    def renovar(id_usuario, **extra):
+        return cliente.post("/api/clientes/actualizar-dieta-vencida", json={**pedido, **extra}, headers=auth(id_usuario))
+
+    assert renovar(sin_contrato).status_code == 403
+    assert renovar(nutriologo, id_dieta_anterior=999).status_code == 404
+
+    r = renovar(nutriologo)
+    assert r.status_code == 200
+    assert (r.json()["comidas_cambiadas"], r.json()["recetas_nuevas"], r.json()["nombre"]) == (2, 1, "Plan")
+
+    assert renovar(nutriologo).status_code == 409
@@ -0,0 +1,180 @@
+"""
+Pruebas de reseñas (/api/resenas) y de sus agregados en resena_stats
+"""
+
+import pytest
+
+from models.user import TipoUsuarioEnum
+from routers import resenas
+
+
+@pytest.fixture
+def cliente(api):
+    return api((resenas.router, "/api/resenas"))
+
+
+@pytest.fixture
+def nutriologo(crear_usuario):
+    return crear_usuario(TipoUsuarioEnum.nutriologo)
+
+
+def _resenar(cliente, auth, id_cliente, id_nutriologo, calificacion, **extra):
+    r = cliente.post(
+        "/api/resenas",
+        json={"id_nutriologo": id_nutriologo, "calificacion": calificacion, **extra},
+        headers=auth(id_cliente)
+    )
+    assert r.status_code == 200
+    return r.json()["id_resena"]
+
+
+# ============================================================
+# Listado con join y paginación keyset
+# ============================================================
+def test_listado_por_cursor_sin_repetir(cliente, auth, crear_usuario, nutriologo):
+    clientes = [crear_usuario(nombre=f"Cliente {i}") for i in range(4)]
+    ids = [_resenar(cliente, auth, c, nutriologo, 4) for c in clientes]
+
+    r = cliente.get(f"/api/resenas/nutriologo/{nutriologo}?limit=3")
+    assert [x["id_resena"] for x in r.json()] == ids[::-1][:3]
+    assert r.json()[0]["cliente_nombre"] == "Cliente 3"
+    cursor = r.headers["x-siguiente-cursor"]
+
+    r = cliente.get(f"/api/resenas/nutriologo/{nutriologo}?limit=3&cursor={cursor}")
+    assert [x["id_resena"] for x in r.json()] == [ids[0]]
+    assert "x-siguiente-cursor" not in r.headers
+
+
+def test_listado_nutriologo_inexistente_o_sin_resenas(cliente, crear_usuario):
+    otro = crear_usuario()
+    assert cliente.get("/api/resenas/nutriologo/999").status_code == 404
+    assert cliente.get(f"/api/resenas/nutriologo/{otro}").json() == []
+
+
+def test_detalle_incluye_nombre_del_cliente(cliente, auth, crear_usuario, nutriologo):
+    id_resena = _resenar(cliente, auth, crear_usuario(nombre="Ana"), nutriologo, 3.5, titulo="Bien")
+
+    r = cliente.get(f"/api/resenas/{id_resena}").json()
+    assert (r["cliente_nombre"], r["titulo"], r["calificacion"]) == ("Ana", "Bien", 3.5)
+    assert cliente.get("/api/resenas/999").status_code == 404
+
+
+# ============================================================
+# Agregados incrementales (resena_stats)
+# ============================================================
+def test_stats_se_actualizan_al_crear_editar_y_borrar(cliente, auth, crear_usuario, nutriologo):
+    clientes = [crear_usuario() for _ in range(4)]
+    ids = [_resenar(cliente, auth, c, nutriologo, v) for c, v in zip(clientes, [5, 4.3, 2, 1])]
+
+    assert cliente.get(f"/api/resenas/stats/nutriologo/{nutriologo}").json() == {
+        "id_nutriologo": nutriologo,
+        "total_resenas": 4,
+        "calificacion_promedio": 3.1,
+        "distribucion_estrellas": {"5": 1, "4": 1, "3": 0, "2": 1, "1": 1},
+    }
+
+    cliente.put(f"/api/resenas/{ids[1]}", json={"calificacion": 5}, headers=auth(clientes[1]))
+    cliente.delete(f"/api/resenas/{ids[3]}", headers=auth(clientes[3]))
+
+    stats = cliente.get(f"/api/resenas/stats/nutriologo/{nutriologo}").json()
+    assert stats["total_resenas"] == 3
+    assert stats["calificacion_promedio"] == 4.0
+    assert stats["distribucion_estrellas"] == {"5": 2, "4": 0, "3": 0, "2": 1, "1": 0}
+
+
+def test_stats_incrementales_coinciden_con_reconstruccion(cliente, auth, crear_usuario, nutriologo, db):
+    from models.resena_stats import ResenaStats
+    from services.resena_stats_service import reconstruir_stats
+
+    clientes = [crear_usuario() for _ in range(3)]
+    ids = [_resenar(cliente, auth, c, nutriologo, v, id_contrato=1) for c, v in zip(clientes, [5, 3, 1.5])]
+    cliente.put(f"/api/resenas/{ids[0]}", json={"calificacion": 2}, headers=auth(clientes[0]))
+    cliente.delete(f"/api/resenas/{ids[2]}", headers=auth(clientes[2]))
+
+    def columnas():
+        db.expire_all()
+        fila = db.get(ResenaStats, nutriologo)
+        return {c.name: getattr(fila, c.name) for c in ResenaStats.__table__.columns if c.name != "actualizado_en"}
+
+    incremental = columnas()
+    assert reconstruir_stats() == 1
+    assert columnas() == pytest.approx(incremental)
+
+
+def test_stats_sin_resenas(cliente, crear_usuario):
+    otro = crear_usuario()
+    assert cliente.get("/api/resenas/stats/nutriologo/999").status_code == 404
+    stats = cliente.get(f"/api/resenas/stats/nutriologo/{otro}").json()
+    assert (stats["total_resenas"], stats["calificacion_promedio"]) == (0, 0.0)
+
+
+# ============================================================
+# Estadísticas en lote y calificaciones en el directorio
+# ============================================================
+def test_stats_en_lote_en_orden_y_con_ceros(cliente, auth, crear_usuario):
+    clientes = [crear_usuario() for _ in range(2)]
+    n1, n2, n3 = (crear_usuario(TipoUsuarioEnum.nutriologo) for _ in range(3))
+    for c in clientes:
+        _resenar(cliente, auth, c, n1, 4)
+    _resenar(cliente, auth, clientes[0], n2, 2)
+
+    r = cliente.get(f"/api/resenas/stats/nutriologos?ids={n2}&ids={n1}&ids={n3}&ids={n2}").json()
+    assert [(s["id_nutriologo"], s["total_resenas"], s["calificacion_promedio"]) for s in r] == [
+        (n2, 1, 2.0), (n1, 2, 4.0), (n3, 0, 0.0)
+    ]
+
+
+def test_stats_en_lote_limita_ids(cliente):
+    from routers.resenas import MAX_STATS_LOTE
+
+    ids = "&".join(f"ids={i}" for i in range(1, MAX_STATS_LOTE + 2))
+    assert cliente.get(f"/api/resenas/stats/nutriologos?{ids}").status_code == 400
+
+
+def test_directorio_incluye_calificaciones(api, auth, crear_usuario):
+    from routers import users
+
+    cliente = api((resenas.router, "/api/resenas"), (users.router, "/api/users"))
+    c = crear_usuario()
+    n1, n2 = crear_usuario(TipoUsuarioEnum.nutriologo), crear_usuario(TipoUsuarioEnum.nutriologo)
+    _resenar(cliente, auth, c, n1, 4.5)
+
+    items = cliente.get("/api/users/nutriologos?solo_validados=false&incluir_calificaciones=true").json()["items"]
+    assert {i["id_usuario"]: (i["calificacion_promedio"], i["total_resenas"]) for i in items} == {
+        n1: (4.5, 1), n2: (0.0, 0)
+    }
+
+    sin = cliente.get("/api/users/nutriologos?solo_validados=false").json()["items"]
+    assert "calificacion_promedio" not in sin[0]
+
+
+# ============================================================
+# Ranking bayesiano
+# ============================================================
+def test_puntuacion_bayesiana():
+    from services.resena_stats_service import PRIOR_MEDIA, puntuacion_bayesiana
+
+    assert puntuacion_bayesiana(0, 0, 0, 0) == pytest.approx(PRIOR_MEDIA)
+    # Una sola reseña de 5 apenas mueve la media a priori
+    una = puntuacion_bayesiana(1, 5, 0, 0)
+    muchas = puntuacion_bayesiana(5, 24, 5, 24)
+    assert PRIOR_MEDIA < una < muchas
+    # Las verificadas pesan más que las no verificadas
+    assert puntuacion_bayesiana(2, 10, 2, 10) > puntuacion_bayesiana(2, 10, 0, 0)
+
+
+def test_directorio_ordenado_por_calificacion(api, auth, crear_usuario):
+    from routers import users
+
+    cliente = api((resenas.router, "/api/resenas"), (users.router, "/api/users"))
+    clientes = [crear_usuario() for _ in range(5)]
+    una_de_5, muchas_altas, bajas, sin_resenas = (crear_usuario(TipoUsuarioEnum.nutriologo) for _ in range(4))
+
+    _resenar(cliente, auth, clientes[0], una_de_5, 5)
+    for c in clientes:
+        _resenar(cliente, auth, c, muchas_altas, 4.8, id_contrato=1)
+    for c in clientes[:3]:
+        _resenar(cliente, auth, c, bajas, 2)
+
+    r = cliente.get("/api/users/nutriologos?solo_validados=false&order=calificacion").json()
+    assert [i["id_usuario"] for i in r["items"]] == [muchas_altas, una_de_5, sin_resenas, bajas]
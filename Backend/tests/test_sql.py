@@ -0,0 +1,67 @@
+"""
+Pruebas de las expresiones SQL portables (core/sql.py)
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import column, literal, select
+from sqlalchemy.dialects import mysql, postgresql
+
+from config.database import engine
+from core.sql import dias_entre, dias_restantes, inicio_semana
+from models.dieta import Dieta
+
+AHORA = datetime(2026, 3, 10, 12, 0)
+
+
+def _valor(expresion):
+    with engine.connect() as conexion:
+        return conexion.execute(select(expresion)).scalar()
+
+
+# ============================================================
+# Diferencias en días
+# ============================================================
+@pytest.mark.parametrize("delta", [
+    timedelta(days=3), timedelta(days=2, hours=23), timedelta(hours=5), timedelta(days=400, minutes=1),
+])
+def test_dias_entre_como_timedelta_days(delta):
+    assert _valor(dias_entre(literal(AHORA), literal(AHORA + delta))) == delta.days
+
+
+@pytest.mark.parametrize("fecha", [
+    AHORA + timedelta(days=10, hours=1), AHORA + timedelta(hours=23), AHORA - timedelta(days=2), None,
+])
+def test_dias_restantes_igual_que_en_python(fecha):
+    esperado = max(0, (fecha - AHORA).days) if fecha else None
+    assert _valor(dias_restantes(literal(fecha, Dieta.fecha_vencimiento.type), AHORA)) == esperado
+
+
+def test_dias_entre_por_dialecto():
+    expresion = dias_entre(column("desde"), column("hasta"))
+
+    assert str(expresion.compile(dialect=mysql.dialect())) == "TIMESTAMPDIFF(DAY, desde, hasta)"
+    assert "julianday(hasta) - julianday(desde)" in str(expresion.compile(dialect=engine.dialect))
+    assert "EXTRACT(DAY FROM (hasta - desde))" in str(expresion.compile(dialect=postgresql.dialect()))
+
+
+# ============================================================
+# Agrupación por semana
+# ============================================================
+@pytest.mark.parametrize("fecha, lunes", [
+    (date(2026, 3, 9), date(2026, 3, 9)),        # lunes
+    (date(2026, 3, 11), date(2026, 3, 9)),
+    (date(2026, 3, 15), date(2026, 3, 9)),       # domingo: semana que empezó el lunes anterior
+    (date(2026, 3, 1), date(2026, 2, 23)),       # cruza de mes
+    (date(2027, 1, 2), date(2026, 12, 28)),      # cruza de año
+])
+def test_inicio_semana_en_lunes(fecha, lunes):
+    assert str(_valor(inicio_semana(literal(fecha)))) == lunes.isoformat()
+
+
+def test_inicio_semana_por_dialecto():
+    expresion = inicio_semana(column("fecha"))
+
+    assert str(expresion.compile(dialect=mysql.dialect())) == "DATE(DATE_SUB(fecha, INTERVAL WEEKDAY(fecha) DAY))"
+    assert "date_trunc('week', fecha)" in str(expresion.compile(dialect=postgresql.dialect()))
@@ -0,0 +1,284 @@
+"""
+Pruebas del vencimiento de dietas (services/vencimiento_dietas.py): barrido
+periódico, estado por dieta, reporte de próximos vencimientos y recordatorios
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from config.database import engine
+from models.contrato import Contrato, EstadoContrato
+from models.dieta import Dieta, EstadoDieta
+from models.mensajes import Mensaje
+from models.user import TipoUsuarioEnum
+from routers import clientes_router
+from services import tareas_programadas
+from services.contador_mensajes import contador_mensajes
+from services.dieta_ia_service import DietaService
+from services.vencimiento_dietas import (
+    COLUMNAS_REPORTE,
+    enviar_recordatorios_vencimiento,
+    filtro_vigente,
+    iterar_reporte_vencimientos,
+    marcar_dietas_vencidas,
+    reporte_csv,
+    reporte_jsonl,
+)
+
+
+@pytest.fixture
+def crear_dieta(db):
+    """Crea una dieta que vence dentro de `dias` días (negativos = ya vencida) y devuelve su id"""
+    def _crear(id_usuario: int, dias=None, estado=EstadoDieta.activa, **campos) -> int:
+        dieta = Dieta(
+            id_usuario=id_usuario,
+            nombre=campos.pop("nombre", "Plan"),
+            descripcion="",
+            calorias_totales=2000,
+            dias_duracion=30,
+            fecha_vencimiento=datetime.now() + timedelta(days=dias) if dias is not None else None,
+            estado=estado,
+            **campos
+        )
+        db.add(dieta)
+        db.commit()
+        return dieta.id_dieta
+    return _crear
+
+
+def _estados(db):
+    db.expire_all()
+    return {d.id_dieta: d.estado for d in db.query(Dieta).all()}
+
+
+# ============================================================
+# Barrido periódico por lotes
+# ============================================================
+def test_barrido_marca_solo_las_vencidas(db, crear_usuario, crear_dieta):
+    id_usuario = crear_usuario()
+    vencidas = [crear_dieta(id_usuario, -d) for d in range(1, 6)]
+    vigente, sin_fecha = crear_dieta(id_usuario, 5), crear_dieta(id_usuario)
+    pausada = crear_dieta(id_usuario, -3, EstadoDieta.pausada)
+
+    assert marcar_dietas_vencidas(db, tamano_lote=2) == 5
+
+    estados = _estados(db)
+    assert {estados[i] for i in vencidas} == {EstadoDieta.vencida}
+    assert (estados[vigente], estados[sin_fecha], estados[pausada]) == (
+        EstadoDieta.activa, EstadoDieta.activa, EstadoDieta.pausada
+    )
+    assert marcar_dietas_vencidas(db) == 0
+
+
+def test_barrido_limitado_por_lotes_y_usuario(db, crear_usuario, crear_dieta):
+    uno, otro = crear_usuario(), crear_usuario()
+    for _ in range(3):
+        crear_dieta(uno, -1)
+    crear_dieta(otro, -1)
+
+    assert marcar_dietas_vencidas(db, tamano_lote=2, max_lotes=1) == 2
+    assert marcar_dietas_vencidas(db, id_usuario=otro) == 1
+    assert marcar_dietas_vencidas(db) == 1
+
+
+def test_barrido_con_sesion_propia(crear_usuario, crear_dieta):
+    crear_dieta(crear_usuario(), -1)
+    assert marcar_dietas_vencidas() == 1
+
+
+def test_barrido_registrado_como_tarea_periodica():
+    assert "vencimiento_dietas" in [nombre for nombre, _, _ in tareas_programadas._registradas]
+
+
+# ============================================================
+# Lecturas sin escrituras
+# ============================================================
+def test_lectura_oculta_vencidas_sin_marcarlas(db, crear_usuario, crear_dieta):
+    id_usuario = crear_usuario()
+    vigente = crear_dieta(id_usuario, 10, nombre="Vigente")
+    pendiente = crear_dieta(id_usuario, -1, nombre="Vencida sin barrer")
+
+    assert db.query(Dieta).filter(filtro_vigente()).count() == 1
+    assert DietaService.obtener_dieta_activa(db, id_usuario).id_dieta == vigente
+    # Con otra hora de referencia la misma dieta sí es vigente
+    assert db.query(Dieta).filter(filtro_vigente(datetime.now() - timedelta(days=2))).count() == 2
+    assert _estados(db)[pendiente] == EstadoDieta.activa
+
+
+def test_endpoint_de_dietas_asignadas_no_escribe(api, auth, db, crear_usuario, crear_dieta):
+    id_usuario = crear_usuario()
+    crear_dieta(id_usuario, 10, nombre="Vigente")
+    pendiente = crear_dieta(id_usuario, -1, nombre="Vencida sin barrer")
+    cliente = api(clientes_router.router)
+
+    r = cliente.get("/api/clientes/mis-dietas-asignadas", headers=auth(id_usuario))
+
+    assert [d["nombre"] for d in r.json()] == ["Vigente"]
+    assert _estados(db)[pendiente] == EstadoDieta.activa
+
+
+# ============================================================
+# Estado de las dietas calculado en SQL
+# ============================================================
+def test_info_dietas_en_una_consulta(db, crear_usuario, crear_dieta):
+    id_usuario = crear_usuario()
+    crear_dieta(id_usuario, 10.5)
+    crear_dieta(id_usuario, 3.5)
+    crear_dieta(id_usuario)                              # sin fecha: vigente
+    crear_dieta(id_usuario, -1)                          # vencida sin barrer
+    crear_dieta(id_usuario, -5, EstadoDieta.vencida)
+    crear_dieta(id_usuario, -9, EstadoDieta.actualizada)
+    crear_dieta(id_usuario, 20, EstadoDieta.pausada)
+    crear_dieta(crear_usuario(), 1.5)                    # de otro usuario
+    consultas = []
+
+    def contar(conn, cursor, sql, *args):
+        consultas.append(sql)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        info = DietaService.obtener_info_dietas(db, id_usuario)
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    assert len(consultas) == 1
+    assert (info["dietas_activas"], info["dietas_vencidas"]) == (3, 3)
+    assert info["por_estado"] == {"activa": 3, "vencida": 2, "actualizada": 1, "pausada": 1}
+    assert info["dias_restantes_proxima"] == 3
+
+
+def test_endpoint_estado_dietas(api, auth, crear_usuario, crear_dieta):
+    id_usuario = crear_usuario()
+    cliente = api(clientes_router.router)
+
+    vacio = cliente.get("/api/clientes/dietas-estado", headers=auth(id_usuario)).json()
+    assert (vacio["dietas_activas"], vacio["proxima_vencimiento"], vacio["dietas"]) == (0, None, [])
+
+    sin_fecha = crear_dieta(id_usuario, nombre="Sin fecha")
+    proxima = crear_dieta(id_usuario, 2.5, nombre="Próxima")
+    crear_dieta(id_usuario, -1, nombre="Vencida")
+
+    r = cliente.get("/api/clientes/dietas-estado", headers=auth(id_usuario)).json()
+    # dias_restantes de una dieta sin fecha es su duración, como Dieta.dias_restantes()
+    assert {d["id_dieta"]: d["dias_restantes"] for d in r["dietas"]} == {proxima: 2, sin_fecha: 30}
+    assert (r["dietas_activas"], r["dietas_vencidas"], r["dias_restantes_proxima"]) == (2, 1, 2)
+
+
+# ============================================================
+# Reporte de próximos vencimientos y recordatorios
+# ============================================================
+@pytest.fixture
+def cartera(db, crear_usuario, crear_dieta):
+    """Nutriólogo con un cliente con contrato activo y otro cancelado; ids de dietas por nombre"""
+    nutriologo = crear_usuario(TipoUsuarioEnum.nutriologo)
+    activo, cancelado = crear_usuario(nombre="Ana"), crear_usuario(nombre="Luis")
+    for i, (id_cliente, estado) in enumerate([(activo, EstadoContrato.ACTIVO), (cancelado, EstadoContrato.CANCELADO)]):
+        db.add(Contrato(id_cliente=id_cliente, id_nutriologo=nutriologo, monto=1,
+                        estado=estado, stripe_payment_intent_id=f"pi_{i}"))
+    db.commit()
+
+    dietas = {
+        "cinco": crear_dieta(activo, 5.5, nombre="Cinco"),
+        "dos": crear_dieta(activo, 2.5, nombre="Dos"),
+        "lejana": crear_dieta(activo, 20.5, nombre="Lejana"),
+        "vencida": crear_dieta(activo, -1, nombre="Vencida"),
+        "sin_contrato": crear_dieta(cancelado, 1.5, nombre="Sin contrato"),
+    }
+    return nutriologo, activo, dietas
+
+
+def test_reporte_en_una_consulta(cartera):
+    nutriologo, activo, dietas = cartera
+    consultas = []
+
+    def contar(conn, cursor, sql, *args):
+        consultas.append(sql)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        filas = list(iterar_reporte_vencimientos(dias=7, id_nutriologo=nutriologo, filas_por_lectura=1))
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    assert len(consultas) == 1
+    assert [(f["id_dieta"], f["usuario"], f["dias_restantes"]) for f in filas] == [
+        (dietas["dos"], "Ana", 2), (dietas["cinco"], "Ana", 5)
+    ]
+    assert filas[0]["accion"].endswith("Recordatorio de renovación próxima")
+    assert filas[1]["accion"].endswith("Próximo vencimiento")
+
+
+def test_reporte_de_todos_sin_nutriologo(cartera):
+    _, _, dietas = cartera
+    assert [f["id_dieta"] for f in iterar_reporte_vencimientos(dias=7)] == [
+        dietas["sin_contrato"], dietas["dos"], dietas["cinco"]
+    ]
+
+
+def test_reporte_csv_y_jsonl_por_bloques():
+    filas = [{c: i for c in COLUMNAS_REPORTE} for i in range(5)]
+
+    bloques = list(reporte_csv(filas, agrupar=2))
+    assert len(bloques) == 3
+    assert "".join(bloques).splitlines()[0] == ",".join(COLUMNAS_REPORTE)
+
+    bloques = list(reporte_jsonl(filas, agrupar=2))
+    assert len(bloques) == 3
+    assert [json.loads(l)["id_dieta"] for l in "".join(bloques).splitlines()] == list(range(5))
+
+
+def test_endpoint_reporte(api, auth, cartera):
+    nutriologo, activo, dietas = cartera
+    cliente = api(clientes_router.router)
+
+    r = cliente.get("/api/clientes/reporte-vencimientos?dias=3", headers=auth(nutriologo))
+    assert r.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(l)["id_dieta"] for l in r.text.splitlines()] == [dietas["dos"]]
+
+    r = cliente.get("/api/clientes/reporte-vencimientos?formato=csv", headers=auth(nutriologo))
+    assert r.headers["content-type"].startswith("text/csv")
+    assert len(r.text.strip().splitlines()) == 3
+
+    assert cliente.get("/api/clientes/reporte-vencimientos", headers=auth(activo)).status_code == 403
+
+
+def test_recordatorios_en_lote(db, cartera):
+    nutriologo, activo, _ = cartera
+    version = contador_mensajes.version(activo)
+
+    assert enviar_recordatorios_vencimiento(db, nutriologo, dias=7, tamano_lote=1) == 2
+
+    mensajes = db.query(Mensaje).order_by(Mensaje.id).all()
+    assert [(m.remitente_id, m.destinatario_id, m.leido) for m in mensajes] == [(nutriologo, activo, False)] * 2
+    assert '"Dos" vence en 2 días' in mensajes[0].contenido
+    assert contador_mensajes.version(activo) > version
+
+
+def test_recordatorios_una_vez_por_ventana(db, cartera):
+    nutriologo, activo, dietas = cartera
+
+    assert enviar_recordatorios_vencimiento(db, nutriologo, dias=3) == 1
+    # Repetir el envío (o la siguiente ejecución) no vuelve a escribir
+    assert enviar_recordatorios_vencimiento(db, nutriologo, dias=3) == 0
+    # Una ventana más amplia solo recuerda las que faltaban
+    assert enviar_recordatorios_vencimiento(db, nutriologo, dias=7) == 1
+    assert db.query(Mensaje).count() == 2
+
+    # Pasada la ventana del último recordatorio se puede volver a enviar
+    db.get(Dieta, dietas["dos"]).recordatorio_enviado_en = datetime.utcnow() - timedelta(days=4)
+    db.commit()
+    assert enviar_recordatorios_vencimiento(db, nutriologo, dias=3) == 1
+
+
+def test_endpoint_recordatorios(api, auth, cartera):
+    nutriologo, activo, _ = cartera
+    cliente = api(clientes_router.router)
+
+    r = cliente.post("/api/clientes/recordatorios-vencimiento?dias=3", headers=auth(nutriologo))
+    assert r.json() == {"success": True, "enviados": 1, "dias": 3}
+    r = cliente.post("/api/clientes/recordatorios-vencimiento?dias=3", headers=auth(nutriologo))
+    assert r.json()["enviados"] == 0
+    assert cliente.post("/api/clientes/recordatorios-vencimiento", headers=auth(activo)).status_code == 403